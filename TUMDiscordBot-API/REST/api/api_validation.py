@@ -1,16 +1,14 @@
 import json
-import sys
 from pathlib import Path
 import datetime
 import functools
 
-from flask import request, jsonify
-
-# Add the project root to Python path to make imports work correctly
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from flask import request, jsonify, make_response
 
 # Import settings manager
 from REST import settings_manager
+from REST.utils.metrics import STORAGE_WRITE_SECONDS
+from REST.utils import tracing
 
 # Get settings from the central manager
 SETTINGS = settings_manager.SETTINGS
@@ -70,33 +68,55 @@ def audit_api_call():
     audit_file = audit_dir / f"audit_{datetime.datetime.now().strftime('%Y-%m-%d')}.json"
 
     # Append to existing audit file or create new one
-    if audit_file.exists():
-        with open(audit_file, 'r') as f:
-            try:
-                entries = json.load(f)
-            except json.JSONDecodeError:
-                entries = []
-    else:
-        entries = []
+    with STORAGE_WRITE_SECONDS.time(kind="audit"), tracing.span("storage.write", kind="audit"):
+        if audit_file.exists():
+            with open(audit_file, 'r') as f:
+                try:
+                    entries = json.load(f)
+                except json.JSONDecodeError:
+                    entries = []
+        else:
+            entries = []
 
-    entries.append(audit_entry)
+        entries.append(audit_entry)
 
-    with open(audit_file, 'w') as f:
-        json.dump(entries, f, indent=2)
+        with open(audit_file, 'w') as f:
+            json.dump(entries, f, indent=2)
 
 
 # API validation decorator
 def requires_api_key(f):
     @functools.wraps(f)
     def decorated_function(*args, **kwargs):
-        # Audit the API call first
-        audit_api_call()
-        
-        # Then validate the API key
-        valid, message = validate_api_key()
-        if not valid:
-            return jsonify({"status": "error", "message": message}), 401
-            
-        # If valid, proceed with the function
-        return f(*args, **kwargs)
+        # Start the trace of this request, a trace id passed by the caller is kept as an attribute
+        root, token = tracing.tracer.start_trace(
+            request.endpoint or request.path,
+            caller_trace_id=request.headers.get('X-Trace-Id'),
+            method=request.method,
+            path=request.path,
+        )
+        status = None
+        try:
+            # Audit the API call first
+            audit_api_call()
+
+            # Then validate the API key
+            with tracing.span("validate_api_key"):
+                valid, message = validate_api_key()
+            if not valid:
+                response = make_response(jsonify({"status": "error", "message": message}), 401)
+            else:
+                # If valid, proceed with the function
+                response = make_response(f(*args, **kwargs))
+
+            status = "ok" if response.status_code < 400 else "error"
+            if root is not None:
+                root.set_attribute("status_code", response.status_code)
+                response.headers['X-Trace-Id'] = root.trace_id
+            return response
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            tracing.tracer.end_trace(root, token, status)
     return decorated_function
@@ -1,40 +1,45 @@
-import datetime
-import logging
-from pathlib import Path
+import time
 
-from flask import Flask
+from flask import Flask, g, request
+
+from REST.bot_manager.bot_data import data_bp
+from REST.utils import metrics
+from REST.utils.logging_config import configure_logging
+
+# Set up the queued, rotating log handlers once for the whole process
+configure_logging()
+
+
+def setup_session_logging():
+    """
+    Return the 'discord_bot' logger. Logging is configured once when the app is imported,
+    this is kept for scripts that still call it and does not add handlers.
+    """
+    return configure_logging()
 
-import bot
-from bot_manager.bot_data import data_bp
 
 app = Flask(__name__)
 
 # Register blueprints
 app.register_blueprint(data_bp)
 
-# Create logs directory if it doesn't exist
-logs_dir = Path('../data/logs')
-logs_dir.mkdir(exist_ok=True, parents=True)
 
-# Helper function to create session log file
-def setup_session_logging():
-    timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M')
-    log_file = logs_dir / f"{timestamp}.log"
-
-    # Configure logging for the root logger
-    logging.basicConfig(
-        level=logging.INFO,  # Set root logger level to INFO
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
-
-    # Reduce logging level for discord.py loggers to WARNING to suppress INFO logs
-    discord_loggers = ['discord', 'discord.client', 'discord.gateway']
-    for logger_name in discord_loggers:
-        logger = logging.getLogger(logger_name)
-        logger.setLevel(logging.WARNING)  # Only log WARNING and above for discord loggers
-
-    return logging.getLogger('discord_bot')
+# Record latency and status of every request per blueprint route
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        blueprint = request.blueprint or "app"
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start, blueprint=blueprint, route=route, method=request.method
+        )
+        metrics.HTTP_REQUESTS.inc(
+            blueprint=blueprint, route=route, method=request.method, status=response.status_code
+        )
+    return response
@@ -0,0 +1,115 @@
+"""
+Contains API endpoints returning server-computed survey, feedback and attendance aggregates
+and charts rendered from them.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import datetime
+
+from flask import Blueprint, Response, jsonify, request
+
+from REST.api import requires_api_key
+from REST.utils.lazy_import import lazy_import
+
+# pandas and the chart renderer are imported on the first analytics request
+reports = lazy_import('analytics.reports')
+charts = lazy_import('analytics.chart_service')
+
+# Create a blueprint for analytics endpoints
+analytics_bp = Blueprint('analytics', __name__)
+
+
+def _time_range():
+    """Read the optional since/until parameters, raises ValueError if they are not ISO dates."""
+    since = request.args.get('since')
+    until = request.args.get('until')
+    for value in (since, until):
+        if value:
+            datetime.datetime.fromisoformat(value)
+    return since, until
+
+
+def _guild_id():
+    """Read the optional guild_id parameter, raises ValueError if it is not a Discord id."""
+    guild_id = request.args.get('guild_id')
+    if guild_id and not guild_id.isdigit():
+        raise ValueError(guild_id)
+    return guild_id or None
+
+
+def _report_response(build, **params):
+    try:
+        since, until = _time_range()
+    except ValueError:
+        return jsonify({"status": "error", "message": "since and until must be ISO dates or date times"}), 400
+    try:
+        guild_id = _guild_id()
+    except ValueError:
+        return jsonify({"status": "error", "message": "Guild ID must be a number"}), 400
+
+    try:
+        report = build(since=since, until=until, guild_id=guild_id, **params)
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Failed to compute analytics: {str(e)}"}), 500
+
+    return jsonify({"status": "success", **report})
+
+
+@analytics_bp.route('/api/analytics/surveys', methods=['GET'])
+@requires_api_key
+def survey_analytics():
+    """Answer distributions per survey topic and question, and one data point per survey session"""
+    return _report_response(reports.survey_report, topic=request.args.get('topic'))
+
+
+@analytics_bp.route('/api/analytics/feedback', methods=['GET'])
+@requires_api_key
+def feedback_analytics():
+    """Tutor session feedback overall and per group, and one data point per session"""
+    return _report_response(reports.feedback_report, group=request.args.get('group'))
+
+
+@analytics_bp.route('/api/analytics/attendance', methods=['GET'])
+@requires_api_key
+def attendance_analytics():
+    """Attendance per tutor group and one data point per attendance session"""
+    return _report_response(reports.attendance_report, group=request.args.get('group'))
+
+
+@analytics_bp.route('/api/analytics/charts/<kind>', methods=['GET'])
+@requires_api_key
+def analytics_chart(kind):
+    """Render a chart of a survey topic, the tutor feedback or the attendance over time as PNG or SVG"""
+    fmt = request.args.get('format', 'png').lower()
+    if fmt not in charts.FORMATS:
+        return jsonify({"status": "error", "message": "Format must be 'png' or 'svg'"}), 400
+
+    topic = request.args.get('topic')
+    group = request.args.get('group')
+    try:
+        guild_id = _guild_id()
+    except ValueError:
+        return jsonify({"status": "error", "message": "Guild ID must be a number"}), 400
+    try:
+        if kind == 'survey':
+            if not topic:
+                return jsonify({"status": "error", "message": "Topic parameter is required"}), 400
+            image, data_hash = charts.chart_service.topic_chart(topic, fmt, guild_id)
+        elif kind == 'feedback':
+            image, data_hash = charts.chart_service.feedback_chart(group, fmt, guild_id)
+        elif kind == 'attendance':
+            image, data_hash = charts.chart_service.attendance_chart(group, fmt, guild_id)
+        else:
+            return jsonify({
+                "status": "error",
+                "message": "Chart must be 'survey', 'feedback' or 'attendance'"
+            }), 404
+    except Exception as e:
+        return jsonify({"status": "error", "message": f"Failed to render chart: {str(e)}"}), 500
+
+    # The data hash identifies the image, clients can revalidate without downloading it again
+    if request.if_none_match.contains(data_hash):
+        return Response(status=304, headers={"ETag": f'"{data_hash}"'})
+    return Response(image, mimetype=charts.FORMATS[fmt], headers={"ETag": f'"{data_hash}"'})
@@ -1,10 +1,8 @@
 from flask import Blueprint, jsonify, request
-import asyncio
-import bot
 from REST.api import requires_api_key
 # Import from utils package instead of app
 
-import REST.utils.bot_context as bc
+from REST.utils.bot_gateway import NotFound, gateway
 from REST.utils import bot_mock_ctx_json_message
 from REST.utils.json_messages import bot_not_running_json_message
 
@@ -25,20 +23,25 @@ def api_attendance():
         target_user_id (str, optional): Discord user ID to send DMs to. 
                                        If provided, the bot will attempt to send 
                                        actual DMs to this user instead of mocking them.
+        channel_id (str, optional): Channel to post a check in button to when starting.
+                                    Without it the students send the code to the bot by DM.
     """
     # Check if bot is running
-    if not bc.bot_running:
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     # Get parameters
     status = request.args.get('status')
     group_id = request.args.get('group_id')
     code = request.args.get('code')
     target_user_id = request.args.get('target_user_id')  # New parameter for DM target
+    channel_id = request.args.get('channel_id')
 
     if not status:
         return jsonify({"status": "error", "message": "Status parameter is required"}), 400
@@ -56,23 +59,20 @@ def api_attendance():
     if not target_user_id:
         return jsonify({"status": "error", "message": "Target User ID parameter is required"}), 400
 
-    try:
-        # This adds an attribute to the mock_ctx, which is target_user_id
-        bc.mock_ctx.author.target_user_id = target_user_id
-
-        async def execute_command():
-            await bot.attendance(bc.mock_ctx, status, code, group_id)
-            del bc.mock_ctx.author.target_user_id
+    # The check in channel is resolved next to the bot
+    options = {"channel_id": channel_id} if channel_id and status == 'start' else {}
 
-        # Run the coroutine in the bot's event loop
-        loop = bc.get_live_loop()
-        future = asyncio.run_coroutine_threadsafe(execute_command(), loop)
-        future.result(timeout=30)  # Wait up to 30 seconds for completion
+    try:
+        # The bot reports to target_user_id by DM
+        gateway.command('attendance', guild_id=guild_id, target_user_id=target_user_id, timeout=30,
+                        status=status, code=code, group_id=group_id, **options)
 
         return jsonify({
             "status": "success",
             "message": f"Attendance command executed: {status} attendance for group {group_id} with code {code}"
         })
+    except NotFound as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
     except Exception as e:
         return jsonify({
             "status": "error",
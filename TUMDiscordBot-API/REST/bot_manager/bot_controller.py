@@ -1,24 +1,19 @@
-from datetime import time
 from flask import Blueprint, jsonify, request
-import asyncio
-import threading
-import time
-import sys
-from pathlib import Path
-
-# Add the project root to Python path to make imports work correctly
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+import logging
 
 # Import settings manager
 from REST import settings_manager
 
-import bot
 from REST.api import requires_api_key
-from REST.app import setup_session_logging
 
-import REST.utils.bot_context as bc
+from REST.utils.bot_supervisor import BotState
+from REST.utils.bot_gateway import NotFound, gateway
+from REST.utils.bot_ipc import WorkerUnavailable
 from REST.utils import bot_is_running_json_message, bot_not_running_json_message, bot_mock_ctx_json_message
 
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
 # Get settings from the central manager
 SETTINGS = settings_manager.SETTINGS
 if not SETTINGS:
@@ -27,32 +22,24 @@ if not SETTINGS:
 # Create a blueprint for survey endpoints
 controller_bp = Blueprint('controller', __name__)
 
-# Global variable to track initialization errors
-bot_init_error = None
+# Seconds /api/start-bot waits for the bot to become ready before answering
+START_WAIT = 15
 
 
 @controller_bp.route('/api/start-bot', methods=['POST'])
 @requires_api_key
 def start_bot():
-    """Start the Discord bot without requiring API key"""
+    """Start the Discord bot under the supervisor, which restarts it when it crashes or stalls"""
     # Manually audit the API call for logging purposes
     from REST.api.api_validation import audit_api_call
     audit_api_call()
-    
-    global bot_init_error
-    bot_init_error = None  # Reset error state
-    
+
     # Check if bot is already running
-    if bc.bot_running and bc.bot_thread and bc.bot_thread.is_alive():
+    if gateway.state not in (BotState.STOPPED, BotState.CRASHED):
         return bot_is_running_json_message()
 
-    # Setup logging for this session
-    logger = setup_session_logging()
     logger.info("Bot starting up...")
-    
-    # Purge stale context from previous run
-    bc.mock_ctx = None
-    
+
     # Validate token before starting the bot
     settings = settings_manager.get_settings()
     if 'bot' not in settings:
@@ -67,93 +54,25 @@ def start_bot():
             "status": "error", 
             "message": f"Bot {token_key} is missing or empty in settings"
         }), 500
-    
-    # Start the bot in a separate thread with error handling
-    def bot_thread_with_error_handling():
-        global bot_init_error
-        try:
-            # Create a new event loop for this thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # Reload the bot module to ensure we're using a fresh instance
-            import importlib
-            importlib.reload(bot)
-            
-            # Start the bot with the new loop
-            bot.start(token_key)
-        except Exception as e:
-            # Capture the error message
-            error_msg = f"Bot failed to start: {str(e)}"
-            logger.error(error_msg)
-            bot_init_error = error_msg
-            bc.bot_running = False
-    
-    # Start the bot thread
-    bc.bot_thread = threading.Thread(target=bot_thread_with_error_handling)
-    bc.bot_thread.daemon = True
-    bc.bot_thread.start()
-    bc.bot_running = True
-    
-    # Wait a bit for the bot to connect or fail
-    time.sleep(5)  # Give bot some time to connect or fail
-    
-    # Check if an error occurred during bot startup
-    if bot_init_error:
-        bc.bot_running = False
-        return jsonify({"status": "error", "message": bot_init_error}), 500
-
-    # Initialize mock context if bot connected to a guild
-    def init_mock_context():
-        global bot_init_error
-        try:
-            if not hasattr(bot, 'bot') or not bot.bot:
-                raise RuntimeError("Bot instance not available")
-                
-            if not hasattr(bot.bot, 'guilds') or not bot.bot.guilds:
-                raise RuntimeError("Bot not connected to any guilds")
-                
-            guild = bot.bot.guilds[0]  # Get the first guild
-            bc.mock_ctx = bc.MockContext(guild=guild, author=bot.bot.user)
-            logger.info(f"Mock context initialized with guild: {guild.name}")
-            logger.info(f"Mock context initialized with author: {bot.bot.user.name}")
-        except RuntimeError as e:
-            # This is a critical error, stop the bot
-            logger.error(f"Critical error initializing mock context: {str(e)}")
-            logger.error("Stopping bot due to critical initialization error")
-            
-            # Stop the bot
-            try:
-                loop = bc.get_live_loop()
-                asyncio.run_coroutine_threadsafe(bot.bot.close(), loop)
-                bc.bot_running = False
-                bc.mock_ctx = None
-                
-                # Set a global error message that can be checked by the start_bot function
-                bot_init_error = f"Bot initialization failed: {str(e)}. Check logs for details."
-            except Exception as stop_error:
-                logger.error(f"Error stopping bot: {str(stop_error)}")
-        except Exception as e:
-            logger.error(f"Failed to initialize mock context: {str(e)}")
-            bot_init_error = f"Failed to initialize mock context: {str(e)}"
-            bc.bot_running = False
-
-    # Start a thread to initialize the mock context after the bot has connected
-    init_thread = threading.Thread(target=init_mock_context)
-    init_thread.daemon = True
-    init_thread.start()
-    
-    # Wait for the initialization thread to complete
-    init_thread.join(timeout=10)
-    
-    # Check if there was an initialization error
-    if bot_init_error:
-        bc.bot_running = False
-        return jsonify({"status": "error", "message": bot_init_error}), 500
 
-    # Get the development mode status for the response message
-    dev_mode = settings["bot"].get("development_mode", False)
-    
+    try:
+        # A crashed bot whose supervisor gave up is stopped first, so the supervisor starts over
+        if gateway.state is BotState.CRASHED:
+            gateway.stop()
+        if not gateway.start(token_key):
+            return bot_is_running_json_message()
+
+        state = gateway.wait_for((BotState.READY, BotState.CRASHED), timeout=START_WAIT)
+    except WorkerUnavailable as e:
+        # Worker mode: the bot process has to be started first (python bot_worker.py)
+        return jsonify({"status": "error", "message": str(e)}), 503
+    if state is BotState.CRASHED:
+        return jsonify({"status": "error", "message": gateway.last_error or "Bot failed to start",
+                        **gateway.status()}), 500
+    if state is not BotState.READY:
+        # Still connecting, the supervisor keeps trying and /api/bot-status reports the progress
+        return jsonify({"status": "success", "message": "Bot is starting", **gateway.status()}), 202
+
     logger.info(f"Bot started successfully in {'development' if dev_mode else 'production'} mode")
     return jsonify({
         "status": "success", 
@@ -165,52 +84,12 @@ def start_bot():
 @requires_api_key
 def stop_bot():
     """Stop the Discord bot"""
-    # Setup logging for this session
-    logger = setup_session_logging()
-    
     # Check if bot is running
-    if not bc.bot_running:
+    if gateway.state is BotState.STOPPED:
         return bot_not_running_json_message()
 
-    # Attempt to stop the bot
     try:
-        # Get the live loop
-        try:
-            loop = bc.get_live_loop()
-        except RuntimeError as e:
-            logger.error(f"Failed to get live loop: {str(e)}")
-            # If we can't get the loop, just clean up the state
-            bc.bot_running = False
-            bc.mock_ctx = None
-            return jsonify({"status": "success", "message": "Bot state cleaned up"}), 200
-        
-        # Close the Discord connection
-        try:
-            future = asyncio.run_coroutine_threadsafe(bot.bot.close(), loop)
-            future.result(timeout=10)  # Wait for the close operation to complete
-        except Exception as e:
-            logger.error(f"Failed to close Discord connection: {str(e)}")
-            # Continue with cleanup even if close fails
-        
-        # Stop the event loop
-        try:
-            loop.stop()
-            loop.close()
-        except Exception as e:
-            logger.error(f"Failed to stop/close loop: {str(e)}")
-            # Continue with cleanup even if loop stop/close fails
-        
-        # Wait for the bot thread to exit
-        try:
-            if bc.bot_thread and bc.bot_thread.is_alive():
-                bc.bot_thread.join(timeout=10)
-        except Exception as e:
-            logger.error(f"Failed to join bot thread: {str(e)}")
-        
-        # Reset all state
-        bc.bot_running = False
-        bc.mock_ctx = None
-        
+        gateway.stop()
         logger.info("Bot stopped successfully")
         return jsonify({"status": "success", "message": "Bot stopped successfully"}), 200
     except Exception as e:
@@ -222,11 +101,12 @@ def stop_bot():
 @controller_bp.route('/api/bot-status', methods=['GET'])
 @requires_api_key
 def bot_status():
-    """Check if the bot is running"""
-    if bc.bot_running:
-        return jsonify({"status": "success", "message": "Bot is running"}), 200
+    """Check if the bot is running, with the supervisor state (stopped/starting/ready/degraded/crashed)"""
+    if gateway.is_available():
+        return jsonify({"status": "success", "message": "Bot is running", **gateway.status()}), 200
     else:
-        return jsonify({"status": "Service Unavailable", "message": "Bot is not running"}), 503
+        return jsonify({"status": "Service Unavailable", "message": "Bot is not running",
+                        **gateway.status()}), 503
 
 
 @controller_bp.route('/api/ping', methods=['GET'])
@@ -234,15 +114,27 @@ def bot_status():
 def api_ping():
     """Endpoint for the ping command"""
     # Check if bot is running
-    if not bc.bot_running:
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
-    # Return a simple response
-    return jsonify({"status": "success", "message": "Pong!", "latency": f"{round(bot.bot.latency * 1000)}ms"})
+    # The latency is the mean over the connected shards, the shards are listed individually
+    latencies = gateway.latencies()
+    connected = [latency for _, latency in latencies if latency is not None]
+    return jsonify({
+        "status": "success",
+        "message": "Pong!",
+        "latency": f"{round(sum(connected) / len(connected) * 1000)}ms" if connected else None,
+        "shards": [
+            {"shard_id": shard_id, "latency": f"{round(latency * 1000)}ms" if latency is not None else None}
+            for shard_id, latency in latencies
+        ]
+    })
 
 
 @controller_bp.route('/api/clear', methods=['POST'])
@@ -250,12 +142,14 @@ def api_ping():
 def api_clear():
     """Endpoint for the clear command"""
     # Check if bot is running
-    if not bc.bot_running:
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     # Get parameters
     channel_id = request.args.get('channel_id')
@@ -272,25 +166,18 @@ def api_clear():
     if not channel_id:
         return jsonify({"status": "error", "message": "Channel parameter is required"}), 400
     try:
-        # TODO: This adds an attribute to the mock_ctx, which is target_user_i
-        channel = bc.mock_ctx.guild.get_channel(int(channel_id))
-        
-        async def execute_command():
-            await bot.clear(bc.mock_ctx, channel, limit)
-
-        # Get a live loop and run the coroutine
-        loop = bc.get_live_loop()
-        future = asyncio.run_coroutine_threadsafe(execute_command(), loop)
-        future.result(timeout=30)  # Wait up to 30 seconds for completion
+        result = gateway.command('clear', guild_id=guild_id, timeout=30, channel_id=channel_id, limit=limit)
 
         return jsonify({
             "status": "success",
-            "message": f"Clear command executed: Deleted {limit} messages in {channel}"
+            "message": f"Clear command executed: Deleted {limit} messages in {result['channel']}"
         })
+    except NotFound as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
     except Exception as e:
         return jsonify({
             "status": "error",
-            "message": f"Failed to clear {limit} messages from {channel}: {str(e)}"
+            "message": f"Failed to clear {limit} messages from {channel_id}: {str(e)}"
         }), 500
 
 
@@ -298,16 +185,15 @@ def api_clear():
 @requires_api_key
 def api_hello():
     """Endpoint for the hello command"""
-    # Setup logging for this session
-    logger = setup_session_logging()
-    
     # Check if bot is running
-    if not bc.bot_running:
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     # Get parameters
     member = request.args.get('member')
@@ -317,23 +203,8 @@ def api_hello():
         return jsonify({"status": "error", "message": "Member parameter is required"}), 400
 
     try:
-        # Set the target user ID on the mock context
-        bc.mock_ctx.author.target_user_id = member
-
-        async def execute_command():
-            try:
-                # Get a fresh bot instance and loop
-                bot_instance = bc.get_live_bot()
-                await bot.hello(bc.mock_ctx, message)
-            finally:
-                # Clean up the target_user_id
-                if hasattr(bc.mock_ctx.author, 'target_user_id'):
-                    del bc.mock_ctx.author.target_user_id
-
-        # Get a live loop and run the coroutine
-        loop = bc.get_live_loop()
-        future = asyncio.run_coroutine_threadsafe(execute_command(), loop)
-        future.result(timeout=30)  # Wait up to 30 seconds for completion
+        # The greeting is sent to the member by DM
+        gateway.command('hello', guild_id=guild_id, target_user_id=member, timeout=30, message=message)
 
         return jsonify({
             "status": "success",
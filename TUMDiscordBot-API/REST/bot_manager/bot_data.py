@@ -54,6 +54,56 @@ def get_files_in_directory(directory: Path) -> List[Dict[str, str]]:
         
     return sorted(files, key=lambda x: x['modified'], reverse=True)
 
+def get_guild_files(directory: Path, guild_id: str = None) -> List[Dict[str, str]]:
+    """
+    Get the files of a data directory together with those of its course server subdirectories.
+
+    Files written before the data was kept per server lie in the directory itself and
+    have no guild_id.
+
+    Args:
+        directory (Path): The data directory, e.g. data/attendance
+        guild_id (str, optional): Only list the files of this course server
+
+    Returns:
+        List[Dict[str, str]]: List of files with their metadata and guild_id
+    """
+    if guild_id:
+        files = []
+        guild_dirs = [directory / guild_id]
+    else:
+        files = [dict(file, guild_id=None) for file in get_files_in_directory(directory)]
+        guild_dirs = [path for path in directory.glob('*') if path.is_dir() and path.name.isdigit()]
+    for guild_dir in guild_dirs:
+        files.extend(dict(file, guild_id=guild_dir.name) for file in get_files_in_directory(guild_dir))
+    return sorted(files, key=lambda x: x['modified'], reverse=True)
+
+def data_response(directory: Path):
+    """
+    List the files of a data directory or return the content of one of them.
+
+    Query Parameters:
+        file (str, optional): Specific file to retrieve content from
+        guild_id (str, optional): Course server the files belong to
+
+    Returns:
+        JSON response with list of files or file content
+    """
+    file_name = request.args.get('file')
+    guild_id = request.args.get('guild_id')
+    if guild_id and not guild_id.isdigit():
+        return jsonify({"status": "error", "message": "Guild ID must be a number"}), 400
+
+    if file_name:
+        file_path = (directory / guild_id if guild_id else directory) / file_name
+        if not file_path.is_file():
+            abort(404, description="File not found")
+        content = read_csv_file(file_path)
+        return jsonify({'content': content})
+
+    files = get_guild_files(directory, guild_id)
+    return jsonify({'files': files})
+
 def read_csv_file(file_path: Path) -> List[Dict[str, str]]:
     """
     Read a CSV file and return its contents as a list of dictionaries.
@@ -80,22 +130,13 @@ def get_feedback_files():
     Query Parameters:
         api_key (str): API key for authentication
         file (str, optional): Specific file to retrieve content from
+        guild_id (str, optional): Course server the files belong to
         
     Returns:
         JSON response with list of files or file content
     """
     feedback_dir = BASE_DATA_DIR / 'tutor_session_feedback'
-    file_name = request.args.get('file')
-    
-    if file_name:
-        file_path = feedback_dir / file_name
-        if not file_path.is_file():
-            abort(404, description="File not found")
-        content = read_csv_file(file_path)
-        return jsonify({'content': content})
-    
-    files = get_files_in_directory(feedback_dir)
-    return jsonify({'files': files})
+    return data_response(feedback_dir)
 
 @data_bp.route('/api/data/surveys', methods=['GET'])
 @requires_api_key
@@ -106,22 +147,13 @@ def get_survey_files():
     Query Parameters:
         api_key (str): API key for authentication
         file (str, optional): Specific file to retrieve content from
+        guild_id (str, optional): Course server the files belong to
         
     Returns:
         JSON response with list of files or file content
     """
     survey_dir = BASE_DATA_DIR / 'exercise_feedback'
-    file_name = request.args.get('file')
-    
-    if file_name:
-        file_path = survey_dir / file_name
-        if not file_path.is_file():
-            abort(404, description="File not found")
-        content = read_csv_file(file_path)
-        return jsonify({'content': content})
-    
-    files = get_files_in_directory(survey_dir)
-    return jsonify({'files': files})
+    return data_response(survey_dir)
 
 @data_bp.route('/api/data/attendance', methods=['GET'])
 @requires_api_key
@@ -132,19 +164,10 @@ def get_attendance_files():
     Query Parameters:
         api_key (str): API key for authentication
         file (str, optional): Specific file to retrieve content from
+        guild_id (str, optional): Course server the files belong to
         
     Returns:
         JSON response with list of files or file content
     """
     attendance_dir = BASE_DATA_DIR / 'attendance'
-    file_name = request.args.get('file')
-    
-    if file_name:
-        file_path = attendance_dir / file_name
-        if not file_path.is_file():
-            abort(404, description="File not found")
-        content = read_csv_file(file_path)
-        return jsonify({'content': content})
-    
-    files = get_files_in_directory(attendance_dir)
-    return jsonify({'files': files}) 
\ No newline at end of file
+    return data_response(attendance_dir) 
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Contains the API endpoints for looking into a running process, e.g. when the bot stalls.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import math
+
+from flask import Blueprint, Response, jsonify, request
+
+from REST.api import requires_api_key
+from REST.utils import profiler
+from REST.utils.bot_gateway import LocalGateway, gateway
+from REST.utils.bot_ipc import WorkerUnavailable
+from REST.utils.bot_supervisor import supervisor
+from REST.utils.memory_report import DEFAULT_TOP
+
+# Create a blueprint for debug endpoints
+debug_bp = Blueprint('debug', __name__)
+
+# Looks into the REST process itself, which is the bot's when it runs in this process
+_local = LocalGateway(supervisor)
+
+
+@debug_bp.route('/api/debug/profile', methods=['GET'])
+@requires_api_key
+def profile():
+    """
+    Sample the stacks of all threads for ?seconds=N (default 5, at most 60) every ?interval_ms
+    (default 10). Returns the collapsed stacks with the asyncio tasks, pending view timeouts
+    and wait_for listeners of the bot loop and the state of its watchdog; ?format=collapsed
+    returns only the stacks, ready for flamegraph.pl or speedscope. ?process=bot profiles
+    the bot worker process.
+    """
+    try:
+        seconds = float(request.args.get('seconds', profiler.DEFAULT_SECONDS))
+        interval_ms = float(request.args.get('interval_ms', profiler.DEFAULT_INTERVAL_MS))
+    except ValueError:
+        return jsonify({"status": "error", "message": "seconds and interval_ms must be numbers"}), 400
+    if not 0 < seconds <= profiler.MAX_SECONDS:
+        return jsonify({
+            "status": "error",
+            "message": f"seconds must be between 0 and {profiler.MAX_SECONDS:.0f}"
+        }), 400
+    # nan and inf would get past the lower bound the profiler applies
+    if not math.isfinite(interval_ms):
+        return jsonify({"status": "error", "message": "interval_ms must be a finite number"}), 400
+
+    output = request.args.get('format', 'json')
+    if output not in ('json', 'collapsed'):
+        return jsonify({"status": "error", "message": "format must be json or collapsed"}), 400
+
+    source = gateway if request.args.get('process') == 'bot' else _local
+    try:
+        result = source.profile(seconds, interval_ms)
+    except profiler.ProfilerBusy as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+    except (WorkerUnavailable, TimeoutError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+
+    if output == 'collapsed':
+        return Response(result["collapsed"] + "\n", mimetype='text/plain')
+    return jsonify({"status": "success", **result})
+
+
+@debug_bp.route('/api/debug/memory', methods=['GET'])
+@requires_api_key
+def memory():
+    """
+    Account for the memory of the process: RSS, the ?top=N (default 15) source lines holding
+    the most memory while tracemalloc traces, live views by class, survey entries, the
+    attendance state per guild, the server information caches and py-cord's stores.
+    ?tracemalloc=start or stop switches tracing first. ?process=bot reports the bot worker
+    process.
+    """
+    try:
+        top = int(request.args.get('top', DEFAULT_TOP))
+    except ValueError:
+        return jsonify({"status": "error", "message": "top must be a number"}), 400
+
+    tracing = request.args.get('tracemalloc')
+    if tracing not in (None, 'start', 'stop'):
+        return jsonify({"status": "error", "message": "tracemalloc must be start or stop"}), 400
+
+    source = gateway if request.args.get('process') == 'bot' else _local
+    try:
+        result = source.memory(max(top, 0), tracemalloc=tracing)
+    except (WorkerUnavailable, TimeoutError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+
+    return jsonify({"status": "success", **result})
@@ -1,9 +1,7 @@
 from flask import Blueprint, jsonify, request
-import asyncio
-import bot
 from REST.api import requires_api_key
 # Import from utils package instead of app
-import REST.utils.bot_context as bc
+from REST.utils.bot_gateway import NotFound, gateway
 from REST.utils import bot_mock_ctx_json_message, bot_not_running_json_message
 
 # Create a blueprint for feedback endpoints
@@ -15,12 +13,14 @@ feedback_bp = Blueprint('feedback', __name__)
 def api_tutor_session_feedback():
     """Endpoint for the tutor-session-feedback command"""
     # Check if bot is running
-    if not bc.bot_running:
-        bot_not_running_json_message()
+    if not gateway.is_available():
+        return bot_not_running_json_message()
+
+    guild_id = request.args.get('guild_id')
 
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     # Get parameters
     group_id = request.args.get('group_id')
@@ -35,24 +35,18 @@ def api_tutor_session_feedback():
         return jsonify({"status": "error", "message": "Duration parameter is required"}), 400
 
     try:
-        # Find the target channel
-        channel = bc.mock_ctx.guild.get_channel(int(channel_id))
-        if not channel:
-            return jsonify({"status": "error", "message": f"Channel with ID {channel_id} not found"}), 404
-
         duration = float(duration)
-        async def execute_command():
-            await bot.tutor_session_feedback(bc.mock_ctx, group_id, channel, duration)
 
-        # Run the coroutine in the bot's event loop
-        loop = bc.get_live_loop()
-        future = asyncio.run_coroutine_threadsafe(execute_command(), loop)
-        future.result(timeout=30)
+        # The target channel is resolved next to the bot
+        gateway.command('tutor_session_feedback', guild_id=guild_id, timeout=30,
+                        group_id=group_id, channel_id=channel_id, duration=duration)
 
         return jsonify({
             "status": "success",
             "message": f"Tutor session feedback command executed for group {group_id}"
         })
+    except NotFound as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -0,0 +1,93 @@
+"""
+Contains the API endpoints for searching the log files in data/logs.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import datetime
+import json
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from REST.api import requires_api_key
+from REST.utils.log_index import LEVELS, log_index
+
+# Create a blueprint for log endpoints
+logs_bp = Blueprint('logs', __name__)
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def _parse_time(value):
+    """Parse an ISO date or date time ('2025-05-09' or '2025-05-09 14:55:59') to epoch seconds."""
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+@logs_bp.route('/api/logs/files', methods=['GET'])
+@requires_api_key
+def list_log_files():
+    """List the indexed log files with their time range"""
+    log_index.refresh()
+    return jsonify({"status": "success", "files": log_index.list_files()})
+
+
+@logs_bp.route('/api/logs/search', methods=['GET'])
+@requires_api_key
+def search_logs():
+    """
+    Search the log files. Results are streamed as JSON lines, one record per line,
+    the last line holds the cursor of the next page (null when there are no more results).
+    """
+    level = request.args.get('level')
+    if level and level.upper() not in LEVELS:
+        return jsonify({
+            "status": "error",
+            "message": f"Level must be one of {', '.join(LEVELS)}"
+        }), 400
+
+    try:
+        since = _parse_time(request.args.get('since'))
+        until = _parse_time(request.args.get('until'))
+    except ValueError:
+        return jsonify({"status": "error", "message": "since and until must be ISO dates or date times"}), 400
+
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Limit must be a number"}), 400
+    if limit < 1:
+        return jsonify({"status": "error", "message": "Limit must be at least 1"}), 400
+
+    log_index.refresh()
+    try:
+        results = log_index.search(
+            since=since,
+            until=until,
+            level=LEVELS[level.upper()] if level else None,
+            logger_name=request.args.get('logger'),
+            token=request.args.get('id'),
+            text=request.args.get('q'),
+            cursor=request.args.get('cursor'),
+        )
+        # Fail on an invalid cursor before the response is started
+        first = next(results, None)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    def generate():
+        returned = 0
+        cursor = None
+        item = first
+        while item is not None and returned < limit:
+            cursor, record = item
+            yield json.dumps(record) + "\n"
+            returned += 1
+            item = next(results, None)
+        # More results exist only if the generator produced one beyond the limit
+        yield json.dumps({"next_cursor": cursor if item is not None else None, "returned": returned}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -0,0 +1,152 @@
+"""
+Contains the API endpoints exposing runtime metrics in the Prometheus text format
+and the recorded request traces.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import math
+
+from flask import Blueprint, Response, jsonify, request
+
+from REST.utils.lazy_import import lazy_import
+from REST.api import requires_api_key
+import REST.utils.bot_context as bc
+from REST.utils.bot_gateway import gateway
+from REST.utils.bot_ipc import WorkerUnavailable
+from REST.utils.metrics import REGISTRY, Gauge
+from REST.utils.tracing import tracer
+# Registers the event loop metrics
+import REST.utils.loop_monitor  # noqa: F401
+
+bot = lazy_import('bot')
+
+# Create a blueprint for metrics endpoints
+metrics_bp = Blueprint('metrics', __name__)
+
+
+def _live_bot_or_none():
+    try:
+        return bc.get_live_bot()
+    except RuntimeError:
+        return None
+
+
+def _count_active_views() -> dict:
+    """Count the views py-cord is still dispatching interactions to, by view class."""
+    client = _live_bot_or_none()
+    if client is None or client.is_closed():
+        return {}
+
+    counts = {}
+    seen = set()
+    # Each view is stored once per item, so deduplicate by identity
+    for view, _ in list(client._connection._view_store._views.values()):
+        if id(view) in seen:
+            continue
+        seen.add(id(view))
+        key = (type(view).__name__,)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _count_active_sessions() -> dict:
+    """Count the tutor groups that currently accept attendance codes, per guild."""
+    # Scrapes must not import the bot before it has been started
+    if not bot.loaded:
+        return {}
+    return {
+        ("attendance", str(data.guild_id)): sum(data.group_status.values())
+        for data in bot.bot_data.all_guild_data()
+    }
+
+
+def _member_index_size() -> dict:
+    """Number of members held in the member cache, per guild and the shard serving it."""
+    client = _live_bot_or_none()
+    if client is None or client.is_closed():
+        return {}
+    return {(str(guild.id), str(guild.shard_id)): len(guild.members) for guild in client.guilds}
+
+
+def _shard_latencies() -> dict:
+    """Heartbeat latency of every connected shard."""
+    client = _live_bot_or_none()
+    if client is None or client.is_closed():
+        return {}
+    return {
+        (str(shard_id),): latency
+        for shard_id, latency in bc.shard_latencies(client) if math.isfinite(latency)
+    }
+
+
+ACTIVE_VIEWS = Gauge(
+    "bot_active_views", "Views still listening for interactions, by view class.",
+    ("view",), callback=_count_active_views,
+)
+ACTIVE_SESSIONS = Gauge(
+    "bot_active_sessions", "Running attendance sessions, per guild.",
+    ("kind", "guild"), callback=_count_active_sessions,
+)
+MEMBER_INDEX_SIZE = Gauge(
+    "bot_member_index_size", "Members held in the member cache, per guild.",
+    ("guild", "shard"), callback=_member_index_size,
+)
+GATEWAY_LATENCY = Gauge(
+    "bot_gateway_latency_seconds", "Heartbeat latency of the gateway connection, per shard.",
+    ("shard",), callback=_shard_latencies,
+)
+
+
+@metrics_bp.route('/api/metrics', methods=['GET'])
+@requires_api_key
+def metrics():
+    """Expose runtime metrics in the Prometheus text format, ?process=bot returns those of the bot process"""
+    if request.args.get('process') == 'bot':
+        try:
+            text = gateway.render_metrics()
+        except (WorkerUnavailable, TimeoutError) as e:
+            return jsonify({"status": "error", "message": str(e)}), 503
+        return Response(text, mimetype='text/plain; version=0.0.4')
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+@metrics_bp.route('/api/traces', methods=['GET'])
+@requires_api_key
+def list_traces():
+    """List the most recent request traces, newest first"""
+    try:
+        limit = int(request.args.get('limit', 50))
+        min_duration_ms = float(request.args.get('min_duration_ms', 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit and min_duration_ms must be numbers"}), 400
+
+    return jsonify({
+        "status": "success",
+        "traces": tracer.recent(limit=limit, name=request.args.get('endpoint'), min_duration_ms=min_duration_ms,
+                                caller_trace_id=request.args.get('caller_trace_id'))
+    })
+
+
+@metrics_bp.route('/api/traces/<trace_id>', methods=['GET'])
+@requires_api_key
+def get_trace(trace_id):
+    """Return the span breakdown of one request trace"""
+    trace = tracer.get(trace_id.lower())
+    if trace is None:
+        return jsonify({"status": "error", "message": f"Trace {trace_id} not found"}), 404
+
+    return jsonify({"status": "success", "trace": trace.breakdown()})
+
+
+@metrics_bp.route('/api/traces/export', methods=['POST'])
+@requires_api_key
+def export_traces():
+    """Write the traces held in memory to a JSONL file, one span per line"""
+    try:
+        path = tracer.export_jsonl()
+    except OSError as e:
+        return jsonify({"status": "error", "message": f"Failed to export traces: {str(e)}"}), 500
+
+    return jsonify({"status": "success", "message": f"Traces exported to {path.name}", "file": str(path)})
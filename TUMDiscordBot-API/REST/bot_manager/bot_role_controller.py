@@ -1,9 +1,7 @@
 from flask import Blueprint, jsonify, request
-import asyncio
-import bot
 from REST.api import requires_api_key
 # Import from utils package instead of app
-import REST.utils.bot_context as bc
+from REST.utils.bot_gateway import gateway
 from REST.utils import bot_not_running_json_message, bot_mock_ctx_json_message
 
 # Create a blueprint for role controller endpoints
@@ -14,12 +12,14 @@ role_bp = Blueprint('role', __name__)
 def api_give_member_role():
     """Endpoint for the give-member-role command"""
     # Check if bot is running
-    if not bc.bot_running:
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     # Get parameters
     user_id = request.args.get('user_id')
@@ -32,7 +32,9 @@ def api_give_member_role():
         return jsonify({"status": "error", "message": "Role_id parameter is required"}), 400
 
     try:
-        bot.assign_member_role(int(user_id), int(role_id))
+        result = gateway.call('assign_member_role', int(user_id), int(role_id), guild_id=guild_id)
+        if result["status"] != "success":
+            return jsonify({"status": "error", "message": result["message"]}), 500
 
         return jsonify({
             "status": "success",
@@ -49,16 +51,18 @@ def api_give_member_role():
 def roles():
     """Get the list of roles in the server"""
     # Check if bot is running
-    if not bc.bot_running or not bc.bot_thread or not bc.bot_thread.is_alive():
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     try:
         # Get roles from the bot
-        roles_list = bot.get_roles()
+        roles_list = gateway.call('get_roles', guild_id=guild_id)
 
         if roles_list is None:
             return jsonify({
@@ -82,16 +86,18 @@ def roles():
 def member_count():
     """Get the count of online and offline members"""
     # Check if bot is running
-    if not bc.bot_running or not bc.bot_thread or not bc.bot_thread.is_alive():
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     try:
         # Get member counts from the bot
-        member_counts = bot.get_member_counts()
+        member_counts = gateway.call('get_member_counts', guild_id=guild_id)
 
         if not member_counts:
             return jsonify({
@@ -119,16 +125,18 @@ def member_count():
 def channels():
     """Get the list of channels in the server"""
     # Check if bot is running
-    if not bc.bot_running or not bc.bot_thread or not bc.bot_thread.is_alive():
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     try:
         # Get channels from the bot
-        channels_list = bot.get_channels()
+        channels_list = gateway.call('get_channels', guild_id=guild_id)
 
         if channels_list is None:
             return jsonify({
@@ -152,16 +160,18 @@ def channels():
 def members():
     """Get the list of members in the server"""
     # Check if bot is running
-    if not bc.bot_running or not bc.bot_thread or not bc.bot_thread.is_alive():
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     try:
         # Get members from the bot
-        members_list = bot.get_members()
+        members_list = gateway.call('get_members', guild_id=guild_id)
 
         if members_list is None:
             return jsonify({
@@ -1,9 +1,7 @@
 from flask import Blueprint, jsonify, request
-import asyncio
-import bot
 from REST.api import requires_api_key
 # Import from utils package instead of app
-import REST.utils.bot_context as bc
+from REST.utils.bot_gateway import gateway
 from REST.utils import bot_not_running_json_message, bot_mock_ctx_json_message
 
 # Create a blueprint for server endpoints
@@ -14,16 +12,18 @@ server_bp = Blueprint('server', __name__)
 def server_info():
     """Get information about the Discord server (guild)"""
     # Check if bot is running
-    if not bc.bot_running or not bc.bot_thread or not bc.bot_thread.is_alive():
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     try:
         # Get information from the bot
-        guild_info = bot.get_guild_info()
+        guild_info = gateway.call('get_guild_info', guild_id=guild_id)
 
         if not guild_info:
             return jsonify({
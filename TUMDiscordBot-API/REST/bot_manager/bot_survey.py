@@ -1,9 +1,7 @@
 from flask import Blueprint, jsonify, request
-import asyncio
-import bot
 from REST.api import requires_api_key
 # Import from utils package instead of app
-import REST.utils.bot_context as bc
+from REST.utils.bot_gateway import NotFound, gateway
 from REST.utils import bot_not_running_json_message, bot_mock_ctx_json_message
 
 # Create a blueprint for survey endpoints
@@ -15,12 +13,14 @@ survey_bp = Blueprint('survey', __name__)
 def api_create_simple_survey():
     """Endpoint for creating a simple survey"""
     # Check if bot is running using the check_bot_status function
-    if not bc.bot_running:
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     # Get parameters
     message = request.args.get('message')
@@ -46,28 +46,20 @@ def api_create_simple_survey():
         return jsonify({"status": "error", "message": "Button type must be 'Difficulty' or 'Score'"}), 400
 
     try:
-        # Find the target channel
-        channel = bc.mock_ctx.guild.get_channel(int(channel_id))
-        if not channel:
-            return jsonify({"status": "error", "message": f"Channel with ID {channel_id} not found"}), 404
-
         duration = float(duration)
 
-        # Call the create_simple_survey function in a coroutine
-        async def execute_command():
-            # Use the ctx we just retrieved/created
-            await bot.create_simple_survey(bc.mock_ctx, message, button_type, main_topic, channel, duration)
-
-        # Run the coroutine in the bot's event loop
-        loop = bc.get_live_loop()
-        future = asyncio.run_coroutine_threadsafe(execute_command(), loop)
-        future.result(timeout=30)  # Wait up to 30 seconds for completion
+        # The target channel is resolved next to the bot
+        result = gateway.command('create_simple_survey', guild_id=guild_id, timeout=30,
+                                 message=message, button_type=button_type, main_topic=main_topic,
+                                 channel_id=channel_id, duration=duration)
 
         return jsonify({
             "status": "success",
-            "message": f"Simple survey created in channel {channel.name}"
+            "message": f"Simple survey created in channel {result['channel']}"
         })
 
+    except NotFound as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -80,12 +72,14 @@ def api_create_simple_survey():
 def api_create_complex_survey():
     """Endpoint for creating a complex survey"""
     # Check if bot is running using the check_bot_status function
-    if not bc.bot_running:
+    if not gateway.is_available():
         return bot_not_running_json_message()
 
+    guild_id = request.args.get('guild_id')
+
     # Try to get or create mock context if it doesn't exist
-    if not bc.mock_ctx:
-        return bot_mock_ctx_json_message()
+    if not gateway.has_context(guild_id):
+        return bot_mock_ctx_json_message(guild_id)
 
     # Get parameters
     message = request.args.get('message')
@@ -140,11 +134,6 @@ def api_create_complex_survey():
         }), 400
 
     try:
-        # Find the target channel
-        channel = bc.mock_ctx.guild.get_channel(int(channel_id))
-        if not channel:
-            return jsonify({"status": "error", "message": f"Channel with ID {channel_id} not found"}), 404
-
         # Convert dictionaries to JSON strings if needed
         questions_json = None
         button_types_json = None
@@ -156,27 +145,22 @@ def api_create_complex_survey():
 
         duration = float(duration)
 
-        # Call the create_complex_survey function in a coroutine
-        async def execute_command():
-            # Use the ctx we just retrieved/created
-            # Pass the JSON strings if they're provided
-            if questions_json and button_types_json:
-                await bot.create_complex_survey(bc.mock_ctx, message, main_topic, channel,
-                                                questions_json=questions_json, button_types_json=button_types_json,
-                                                duration=duration)
-            else:
-                await bot.create_complex_survey(bc.mock_ctx, message, main_topic, channel, duration=duration)
-
-        # Run the coroutine in the bot's event loop
-        loop = bc.get_live_loop()
-        future = asyncio.run_coroutine_threadsafe(execute_command(), loop)
-        future.result(timeout=30)  # Wait up to 30 seconds for completion
+        # Pass the JSON strings if they're provided
+        options = {}
+        if questions_json and button_types_json:
+            options = {"questions_json": questions_json, "button_types_json": button_types_json}
+
+        result = gateway.command('create_complex_survey', guild_id=guild_id, timeout=30,
+                                 message=message, main_topic=main_topic,
+                                 channel_id=channel_id, duration=duration, **options)
 
         return jsonify({
             "status": "success",
-            "message": f"Complex survey created in channel {channel.name}"
+            "message": f"Complex survey created in channel {result['channel']}"
         })
 
+    except NotFound as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
     except Exception as e:
         return jsonify({
             "status": "error",
@@ -0,0 +1,73 @@
+"""
+Bot Worker
+~~~~~~~~
+
+Runs the Discord bot in a process of its own and serves the REST API over a local Unix
+socket (see REST.utils.bot_gateway). Start it next to the REST server, from the REST
+directory like run.py::
+
+    python bot_worker.py --start
+
+The REST server connects to it when the "worker" section of .secrets.json is enabled.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+from pathlib import Path
+
+# Entry point: make the project root importable, the packages use absolute imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Importing REST configures logging, the worker writes a log file of its own next to the server's
+os.environ.setdefault("DISCORD_BOT_LOG_FILE", "discord_bot.worker.jsonl")
+
+from REST import settings_manager
+from REST.utils.logging_config import configure_logging, shutdown_logging
+from REST.utils.bot_ipc import IPCServer
+from REST.utils.bot_gateway import LocalGateway, WorkerGateway
+from REST.utils.bot_supervisor import supervisor
+# Registers the bot gauges, served to the REST API by /api/metrics?process=bot
+import REST.bot_manager.bot_metrics  # noqa: F401
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python bot_worker.py", description=__doc__.split("\n\n")[1])
+    parser.add_argument("--socket", help="Socket path, defaults to the one the REST server connects to")
+    parser.add_argument("--start", action="store_true", help="Start the bot right away instead of on /api/start-bot")
+    args = parser.parse_args(argv)
+
+    logger = configure_logging()
+    settings = settings_manager.SETTINGS or {}
+    socket_path = args.socket or WorkerGateway.from_settings().client.path
+
+    local = LocalGateway(supervisor)
+    server = IPCServer(socket_path, local.dispatch)
+    logger.info(f"Bot worker listening on {socket_path}")
+
+    if args.start:
+        dev_mode = settings.get("bot", {}).get("development_mode", False)
+        local.start('dev_token' if dev_mode else 'token')
+
+    def shutdown(signum, frame):
+        # serve_forever runs in this thread, shutdown() has to come from another one
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    try:
+        server.serve_forever()
+    finally:
+        logger.info("Bot worker shutting down")
+        local.stop()
+        server.server_close()
+        shutdown_logging()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,9 @@
+import sys
+from pathlib import Path
+
+# Entry point: make the project root importable, the packages use absolute imports
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
 # Import the main Flask app
 from REST.app import app
 
@@ -9,6 +15,10 @@ from REST.bot_manager.bot_server import server_bp
 from REST.bot_manager.bot_role_controller import role_bp
 from REST.bot_manager.bot_feedback import feedback_bp
 from REST.bot_manager.settings_controller import settings_bp
+from REST.bot_manager.bot_metrics import metrics_bp
+from REST.bot_manager.bot_logs import logs_bp
+from REST.bot_manager.bot_analytics import analytics_bp
+from REST.bot_manager.bot_debug import debug_bp
 
 app.register_blueprint(survey_bp)
 app.register_blueprint(controller_bp)
@@ -17,6 +27,10 @@ app.register_blueprint(server_bp)
 app.register_blueprint(role_bp)
 app.register_blueprint(feedback_bp)
 app.register_blueprint(settings_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(logs_bp)
+app.register_blueprint(analytics_bp)
+app.register_blueprint(debug_bp)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0')
@@ -1,15 +1,19 @@
 from pathlib import Path
+import asyncio
 import logging
-import sys
-import bot as bot_module  # Import the bot module
-import threading
-import importlib
+import time
 
-# Add the project root to Python path to make imports work correctly
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from flask import has_request_context, request
 
 # Import settings manager
 from REST import settings_manager
+from REST.utils.metrics import BOT_CALL_WAIT_SECONDS
+from REST.utils import tracing
+from REST.utils.lazy_import import lazy_import
+from REST.utils.role_cache import role_cache
+
+# py-cord and the bot package are only imported once the bot is started
+bot_module = lazy_import('bot')
 
 # Create logs directory if it doesn't exist
 logs_dir = Path('../data/logs')
@@ -18,10 +22,65 @@ logs_dir.mkdir(exist_ok=True, parents=True)
 # Configure logger
 logger = logging.getLogger('discord_bot')
 
-# Global variables
-bot_thread = None
-bot_running = False
-mock_ctx = None  # Will store our mock context
+# Global variables, the bot thread and its state are owned by REST.utils.bot_supervisor
+mock_ctx = None  # Will store our mock context, for the default guild
+mock_contexts = {}  # Mock contexts of the other guilds, by guild id, built on first use
+
+
+def get_default_guild():
+    """
+    Return the guild used when a request does not name one: the "guild_id" of the bot
+    settings if the bot is a member of it, the first guild otherwise.
+
+    Returns:
+        discord.Guild: The guild, None if the bot is not in any guild.
+    """
+    client = get_live_bot()
+    guild_id = (settings_manager.SETTINGS or {}).get("bot", {}).get("guild_id")
+    guild = client.get_guild(int(guild_id)) if guild_id else None
+    if guild is None and client.guilds:
+        guild = client.guilds[0]
+    return guild
+
+
+def get_mock_ctx(guild_id=None):
+    """
+    Return the mock context commands run with in a guild.
+
+    Args:
+        guild_id (int | str): The guild, None for the default guild.
+
+    Returns:
+        MockContext: The context, None if the bot is not a member of the guild or the
+            context cannot be built (e.g. the guild has no Admin role).
+    """
+    if guild_id is None or mock_ctx is None:
+        return mock_ctx
+    try:
+        guild_id = int(guild_id)
+    except ValueError:
+        return None
+    if guild_id == mock_ctx.guild.id:
+        return mock_ctx
+
+    try:
+        client = get_live_bot()
+    except RuntimeError:
+        return None
+    guild = client.get_guild(guild_id)
+    if guild is None:
+        # The bot left the guild
+        mock_contexts.pop(guild_id, None)
+        return None
+
+    ctx = mock_contexts.get(guild_id)
+    if ctx is None or ctx.guild is not guild:
+        try:
+            ctx = MockContext(guild=guild, author=client.user)
+        except RuntimeError:
+            return None
+        mock_contexts[guild_id] = ctx
+    return ctx
 
 
 def get_live_loop():
@@ -32,9 +91,7 @@ def get_live_loop():
       • bot instance is missing
       • loop is None or already closed
     """
-    client = getattr(bot_module, "bot", None)
-    if not client:
-        raise RuntimeError("Bot instance not available")
+    client = get_live_bot()
 
     loop = getattr(client, "loop", None)
     if loop is None or loop.is_closed():
@@ -49,18 +106,82 @@ def get_live_bot():
 
     Raise RuntimeError if bot instance is missing
     """
-    client = getattr(bot_module, "bot", None)
+    client = getattr(bot_module, "bot", None) if bot_module.loaded else None
     if not client:
         raise RuntimeError("Bot instance not available")
 
     return client
 
 
+def shard_latencies(client) -> list:
+    """
+    Return the gateway latency of every shard of a client.
+
+    Returns:
+        list: (shard_id, seconds) tuples, a single (0, seconds) for an unsharded client.
+            The latency is not finite while a shard is disconnected.
+    """
+    if hasattr(client, "latencies"):
+        return client.latencies
+    return [(client.shard_id or 0, client.latency)]
+
+
+def run_on_bot_loop(coro, timeout=30):
+    """
+    Schedule a coroutine on the bot event loop and block until it completes.
+    The time spent waiting is recorded per endpoint in the metrics registry. Inside a
+    trace, the queueing delay and the run on the bot loop are recorded as child spans
+    and the coroutine continues the trace of the request.
+
+    Args:
+        coro: The coroutine to run.
+        timeout (float): Seconds to wait before giving up, the coroutine is cancelled then.
+
+    Returns:
+        The result of the coroutine.
+
+    Raises:
+        RuntimeError: If the bot loop is not available.
+        TimeoutError: If the coroutine did not complete in time.
+    """
+    try:
+        loop = get_live_loop()
+    except RuntimeError:
+        coro.close()
+        raise
+
+    endpoint = request.endpoint if has_request_context() and request.endpoint else "internal"
+    outcome = "ok"
+    start = time.perf_counter()
+    future = asyncio.run_coroutine_threadsafe(_continue_trace(coro, tracing.current_span(), time.time()), loop)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        outcome = "timeout"
+        future.cancel()
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        BOT_CALL_WAIT_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, outcome=outcome)
+
+
+async def _continue_trace(coro, parent, scheduled):
+    if parent is None:
+        return await coro
+
+    # Time between scheduling and the bot loop picking the coroutine up
+    tracing.tracer.record_span("bot_loop.queue", parent, scheduled, time.time())
+    with tracing.tracer.span("bot_loop.run", parent=parent):
+        return await coro
+
+
 # Mock Discord ApplicationContext for API interactions
 class MockContext:
     def __init__(self, guild, author):
         self.guild = guild
-        self.author = MockUser(author)
+        self.author = MockUser(author, guild)
 
     async def respond(self, *args, **kwargs):
         # Check if the author has a target_user_id
@@ -103,7 +224,7 @@ class MockContext:
 
 # Mock User class that adds the roles attribute
 class MockUser:
-    def __init__(self, user):
+    def __init__(self, user, guild=None):
         # Setup logger
         self.logger = logging.getLogger('discord_bot')
 
@@ -119,25 +240,24 @@ class MockUser:
                 except (AttributeError, TypeError):
                     pass
 
-        # Find the Admin role ID from settings.json
+        # Find the Admin role ID in the role cache
         try:
-            settings = settings_manager.get_settings()
-
-            if 'access_roles' not in settings:
-                error_msg = "No access_roles found in .secrets.json"
+            access_roles = role_cache.access_roles(guild.id if guild is not None else None)
+            if not access_roles:
+                error_msg = "No roles found in the role cache"
                 self.logger.error(error_msg)
                 raise RuntimeError(error_msg)
 
             # Look for a role with name "Admin" in the access_roles list
             admin_role_id = None
-            for role in settings['access_roles']:
+            for role in access_roles:
                 if isinstance(role, dict) and 'name' in role and role['name'] == 'Admin' and 'id' in role:
                     admin_role_id = int(role['id'])
                     self.logger.info(f"Found Admin role with ID: {admin_role_id}")
                     break
 
             if admin_role_id is None:
-                error_msg = "Admin role not found in .secrets.json access_roles"
+                error_msg = "Admin role not found in the role cache"
                 self.logger.error(error_msg)
                 raise RuntimeError(error_msg)
 
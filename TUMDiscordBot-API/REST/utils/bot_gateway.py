@@ -0,0 +1,335 @@
+"""
+Bot Gateway
+~~~~~~~~
+
+The single way the REST blueprints reach the bot. By default the bot runs in a thread of
+the REST process (:class:`LocalGateway`). With ``"worker": {"enabled": true}`` in
+.secrets.json it runs in its own process started with ``python bot_worker.py``, and
+:class:`WorkerGateway` forwards the same calls over the IPC channel of REST.utils.bot_ipc.
+The bot then has a core and a GIL of its own, and restarting the REST server does not
+disconnect it from Discord.
+
+Both gateways take and return JSON serializable values only. Commands receive channels
+as ``channel_id`` and the gateway resolves them next to the bot. Every call takes an
+optional ``guild_id``, the course server it is about; without one the default guild is used.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import logging
+import math
+import time
+
+from REST import settings_manager
+from REST.utils.bot_ipc import DEFAULT_TIMEOUT, IPCClient, RemoteError, WorkerUnavailable
+from REST.utils.bot_supervisor import BotState, supervisor
+from REST.utils.lazy_import import lazy_import
+from REST.utils.loop_monitor import loop_monitor
+from REST.utils.memory_report import memory_monitor
+from REST.utils.metrics import REGISTRY
+from REST.utils import profiler
+import REST.utils.bot_context as bc
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+bot = lazy_import('bot')
+
+DEFAULT_SOCKET = settings_manager.PROJECT_ROOT / "data" / "runtime" / "bot.sock"
+DEFAULT_STATUS_TTL = 0.5
+
+# Functions of the bot package that return server information
+CALLS = ("get_guild_info", "get_channels", "get_members", "get_roles", "get_member_counts", "assign_member_role")
+# Slash commands the REST API runs with the mock context
+COMMANDS = ("hello", "clear", "attendance", "tutor_session_feedback", "create_simple_survey", "create_complex_survey")
+
+
+class NotFound(LookupError):
+    """A guild or channel named by a request is not known to the bot."""
+
+
+class ChannelNotFound(NotFound):
+    """The channel_id of a command does not belong to the guild of the bot."""
+
+
+class GuildNotFound(NotFound):
+    """The bot is not a member of the guild_id of a request."""
+
+
+class LocalGateway:
+    """Runs calls and commands on the bot thread of this process, supervised by ``supervisor``."""
+
+    # Methods a bot worker serves over IPC
+    EXPOSED = ("status", "has_context", "start", "stop", "wait_for", "latencies", "call", "command", "render_metrics",
+               "profile", "memory")
+
+    def __init__(self, bot_supervisor):
+        self.supervisor = bot_supervisor
+
+    @property
+    def state(self) -> BotState:
+        return self.supervisor.state
+
+    @property
+    def last_error(self):
+        return self.supervisor.last_error
+
+    def is_available(self) -> bool:
+        return self.supervisor.is_available()
+
+    def has_context(self, guild_id=None) -> bool:
+        """Whether commands can run in the guild (the default guild if None), i.e. its mock context exists."""
+        return bc.get_mock_ctx(guild_id) is not None
+
+    def status(self) -> dict:
+        return self.supervisor.status()
+
+    def start(self, token_key: str) -> bool:
+        return self.supervisor.start(token_key)
+
+    def stop(self) -> None:
+        self.supervisor.stop()
+
+    def wait_for(self, states, timeout: float) -> BotState:
+        return self.supervisor.wait_for(tuple(BotState(state) for state in states), timeout)
+
+    def latencies(self) -> list:
+        """Gateway latency in seconds per shard as [shard_id, seconds], None for a disconnected shard."""
+        return [
+            [shard_id, latency if math.isfinite(latency) else None]
+            for shard_id, latency in bc.shard_latencies(bc.get_live_bot())
+        ]
+
+    def call(self, name: str, *args, guild_id=None):
+        """
+        Call one of the server information functions of the bot package (see ``CALLS``).
+
+        Returns:
+            The JSON serializable result of the function.
+        """
+        if name not in CALLS:
+            raise ValueError(f"Unknown bot function: {name}")
+        return getattr(bot, name)(*args, guild_id=guild_id)
+
+    def command(self, name: str, guild_id=None, target_user_id=None, timeout: float = 30, **options) -> dict:
+        """
+        Run a slash command with the mock context of a guild and wait for it.
+
+        Args:
+            name (str): One of ``COMMANDS``.
+            guild_id (str): The guild the command runs in, None for the default guild.
+            target_user_id (str): Discord user the command responds to by DM, if any.
+            timeout (float): Seconds to wait for the command.
+            **options: The command options by name, ``channel_id`` is passed as ``channel``.
+
+        Returns:
+            dict: ``{"channel": <name>}`` when a channel was given, empty otherwise.
+
+        Raises:
+            GuildNotFound: If the bot is not a member of the guild.
+            ChannelNotFound: If ``channel_id`` is not a channel of the guild.
+        """
+        if name not in COMMANDS:
+            raise ValueError(f"Unknown bot command: {name}")
+        ctx = bc.get_mock_ctx(guild_id)
+        if ctx is None:
+            if guild_id is not None:
+                raise GuildNotFound(f"Bot is not a member of guild {guild_id}")
+            raise RuntimeError("Bot context is not initialized")
+
+        result = {}
+        if "channel_id" in options:
+            channel_id = options.pop("channel_id")
+            channel = ctx.guild.get_channel(int(channel_id))
+            if channel is None:
+                raise ChannelNotFound(f"Channel with ID {channel_id} not found")
+            options["channel"] = channel
+            result["channel"] = channel.name
+
+        async def execute_command():
+            if target_user_id:
+                ctx.author.target_user_id = target_user_id
+            try:
+                await getattr(bot, name)(ctx, **options)
+            finally:
+                if hasattr(ctx.author, 'target_user_id'):
+                    del ctx.author.target_user_id
+
+        bc.run_on_bot_loop(execute_command(), timeout=timeout)
+        return result
+
+    def render_metrics(self) -> str:
+        """The metrics of this process in the Prometheus text format."""
+        return REGISTRY.render()
+
+    def profile(self, seconds: float, interval_ms: float) -> dict:
+        """Sample the thread stacks of this process and describe what the bot loop waits for."""
+        try:
+            client = bc.get_live_bot()
+        except RuntimeError:
+            client = None
+        return {
+            **profiler.sample(seconds, interval_ms),
+            "asyncio": profiler.dump_tasks(client),
+            "loop_monitor": loop_monitor.snapshot(),
+        }
+
+    def memory(self, top: int, tracemalloc: str = None) -> dict:
+        """
+        Account for the memory of this process, see REST.utils.memory_report.
+
+        Args:
+            top (int): Allocating source lines to list.
+            tracemalloc (str): "start" or "stop" tracemalloc before the report, None to leave it.
+        """
+        if tracemalloc == "start":
+            memory_monitor.start_tracing()
+        elif tracemalloc == "stop":
+            memory_monitor.stop_tracing()
+        return memory_monitor.report(top)
+
+    def dispatch(self, method: str, params: dict):
+        """Answer an IPC request of a :class:`WorkerGateway`."""
+        if method not in self.EXPOSED:
+            raise ValueError(f"Unknown IPC method: {method}")
+        if method == "status":
+            return {**self.status(), "available": self.is_available(), "has_context": self.has_context()}
+        if method == "call":
+            return self.call(params["name"], *params.get("args", ()), guild_id=params.get("guild_id"))
+        result = getattr(self, method)(**params)
+        return result.value if isinstance(result, BotState) else result
+
+
+class WorkerGateway:
+    """
+    Forwards calls and commands to a bot worker process.
+
+    The status of the worker is cached for ``status_ttl`` seconds, so the availability
+    checks of the blueprints do not cost a round trip each. An unreachable worker
+    reports the bot as stopped.
+
+    Args:
+        socket_path (str): Socket the worker listens on.
+        timeout (float): Seconds to wait for an answer on top of the timeout of a command.
+        status_ttl (float): Seconds a status answer is reused.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=DEFAULT_TIMEOUT, status_ttl=DEFAULT_STATUS_TTL):
+        self.client = IPCClient(socket_path, timeout=timeout)
+        self.status_ttl = float(status_ttl)
+        self._status = None
+        self._status_at = 0.0
+
+    @classmethod
+    def from_settings(cls):
+        """Create a gateway configured by the "worker" section of .secrets.json."""
+        settings = (settings_manager.SETTINGS or {}).get("worker", {})
+        return cls(
+            socket_path=settings.get("socket", DEFAULT_SOCKET),
+            timeout=settings.get("timeout", DEFAULT_TIMEOUT),
+            status_ttl=settings.get("status_ttl", DEFAULT_STATUS_TTL),
+        )
+
+    def _remote_status(self) -> dict:
+        now = time.monotonic()
+        if self._status is None or now - self._status_at > self.status_ttl:
+            try:
+                self._status = self.client.call("status")
+            except (WorkerUnavailable, TimeoutError) as e:
+                self._status = {"state": BotState.STOPPED.value, "available": False, "has_context": False,
+                                "last_error": None, "worker_error": str(e)}
+            self._status_at = now
+        return self._status
+
+    def _invalidate(self) -> None:
+        self._status = None
+
+    @property
+    def state(self) -> BotState:
+        return BotState(self._remote_status()["state"])
+
+    @property
+    def last_error(self):
+        status = self._remote_status()
+        return status.get("last_error") or status.get("worker_error")
+
+    def is_available(self) -> bool:
+        return self._remote_status()["available"]
+
+    def has_context(self, guild_id=None) -> bool:
+        if guild_id is None:
+            return self._remote_status()["has_context"]
+        try:
+            return self._call("has_context", guild_id=guild_id)
+        except (WorkerUnavailable, TimeoutError):
+            return False
+
+    def status(self) -> dict:
+        status = dict(self._remote_status())
+        status.pop("available", None)
+        status.pop("has_context", None)
+        return {**status, "process": "worker"}
+
+    def start(self, token_key: str) -> bool:
+        self._invalidate()
+        return self._call("start", token_key=token_key)
+
+    def stop(self) -> None:
+        self._invalidate()
+        self._call("stop")
+
+    def wait_for(self, states, timeout: float) -> BotState:
+        self._invalidate()
+        state = self._call("wait_for", timeout=self.client.timeout + timeout,
+                           states=[BotState(state).value for state in states], wait=timeout)
+        self._invalidate()
+        return BotState(state)
+
+    def latencies(self) -> list:
+        return self._call("latencies")
+
+    def call(self, name: str, *args, guild_id=None):
+        return self._call("call", name=name, args=list(args), guild_id=guild_id)
+
+    def command(self, name: str, guild_id=None, target_user_id=None, timeout: float = 30, **options) -> dict:
+        return self._call("command", timeout=self.client.timeout + timeout, name=name, guild_id=guild_id,
+                          target_user_id=target_user_id, wait=timeout, **options)
+
+    def render_metrics(self) -> str:
+        return self._call("render_metrics")
+
+    def profile(self, seconds: float, interval_ms: float) -> dict:
+        return self._call("profile", timeout=self.client.timeout + seconds, seconds=seconds, interval_ms=interval_ms)
+
+    def memory(self, top: int, tracemalloc: str = None) -> dict:
+        return self._call("memory", top=top, tracemalloc=tracemalloc)
+
+    def _call(self, method: str, timeout: float = None, wait: float = None, **params):
+        """Forward one request, re-raising the errors the blueprints handle with their own type."""
+        if wait is not None:
+            params["timeout"] = wait
+        try:
+            return self.client.call(method, params, timeout=timeout)
+        except RemoteError as e:
+            error = _REMOTE_ERRORS.get(e.error_type)
+            if error is not None:
+                raise error(str(e)) from None
+            raise
+
+
+# Errors of the worker raised with their own type again
+_REMOTE_ERRORS = {error.__name__: error for error in (ChannelNotFound, GuildNotFound, TimeoutError, profiler.ProfilerBusy)}
+
+
+def create_gateway():
+    """The gateway selected by the "worker" section of .secrets.json."""
+    settings = (settings_manager.SETTINGS or {}).get("worker", {})
+    if settings.get("enabled", False):
+        logger.info("The bot runs in a worker process, the REST API connects over IPC")
+        return WorkerGateway.from_settings()
+    return LocalGateway(supervisor)
+
+
+# Shared by the REST blueprints
+gateway = create_gateway()
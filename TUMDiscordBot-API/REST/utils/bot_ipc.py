@@ -0,0 +1,261 @@
+"""
+Bot IPC
+~~~~~~~~
+
+Local request/response channel between the REST server and a bot worker process
+(see REST/bot_worker.py), over a Unix socket.
+
+Every message is one frame: a 4 byte big-endian length followed by compact UTF-8 JSON.
+A request is ``{"id": 1, "method": "status", "params": {}}``, the answer carries the same
+id and either ``"result"`` or ``"error": {"type": ..., "message": ...}``. Connections are
+kept open and reused, a connection handles one request at a time.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import itertools
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import struct
+import time
+
+from REST.utils.metrics import Histogram
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+DEFAULT_TIMEOUT = 35.0
+DEFAULT_POOL_SIZE = 8
+
+BOT_IPC_SECONDS = Histogram(
+    "bot_ipc_seconds", "Round trip of requests to the bot worker process, by method and outcome.",
+    ("method", "outcome"),
+)
+
+
+class WorkerUnavailable(ConnectionError):
+    """The bot worker process is not running or not listening on its socket."""
+
+
+class RemoteError(RuntimeError):
+    """An exception raised by the bot worker while handling a request."""
+
+    def __init__(self, error_type: str, message: str):
+        super().__init__(message)
+        self.error_type = error_type
+
+
+########################################
+#               FRAMING                #
+########################################
+
+def send_message(sock: socket.socket, message: dict) -> None:
+    """Write one frame."""
+    payload = json.dumps(message, separators=(",", ":"), default=str).encode("utf-8")
+    if len(payload) > MAX_FRAME_BYTES:
+        raise ValueError(f"IPC message of {len(payload)} bytes exceeds {MAX_FRAME_BYTES}")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def recv_message(sock: socket.socket):
+    """
+    Read one frame.
+
+    Returns:
+        The decoded message, None if the peer closed the connection between two frames.
+    """
+    header = _recv_exactly(sock, _HEADER.size, allow_eof=True)
+    if header is None:
+        return None
+    (length,) = _HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"IPC frame of {length} bytes exceeds {MAX_FRAME_BYTES}")
+    return json.loads(_recv_exactly(sock, length))
+
+
+def _recv_exactly(sock: socket.socket, size: int, allow_eof: bool = False):
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1024 * 1024))
+        if not chunk:
+            if allow_eof and remaining == size:
+                return None
+            raise ConnectionResetError("IPC connection closed in the middle of a frame")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+########################################
+#                SERVER                #
+########################################
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping IPC connection: {str(e)}")
+                return
+            if request is None:
+                return
+
+            response = {"id": request.get("id")}
+            try:
+                response["result"] = self.server.dispatch(request["method"], request.get("params") or {})
+            except Exception as e:
+                response["error"] = {"type": type(e).__name__, "message": str(e)}
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+
+
+class IPCServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves requests on a Unix socket, one thread per connection.
+
+    Args:
+        path (str): Socket path, a stale socket file is replaced.
+        dispatch: Callable ``(method, params) -> result`` answering a request.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, dispatch):
+        self.path = str(path)
+        self.dispatch = dispatch
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        super().__init__(self.path, _Handler)
+        # The channel has no API key, only the owner of the server may connect
+        os.chmod(self.path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+########################################
+#                CLIENT                #
+########################################
+
+class IPCClient:
+    """
+    Sends requests to an :class:`IPCServer`, reusing a small pool of connections.
+
+    Args:
+        path (str): Socket path of the server.
+        timeout (float): Default seconds to wait for an answer.
+        pool_size (int): Idle connections kept open.
+    """
+
+    def __init__(self, path, timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
+        self.path = str(path)
+        self.timeout = float(timeout)
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._ids = itertools.count(1)
+
+    def call(self, method: str, params: dict = None, timeout: float = None):
+        """
+        Send a request and wait for its answer.
+
+        Args:
+            method (str): Name of the remote method.
+            params (dict): JSON serializable keyword arguments of the method.
+            timeout (float): Seconds to wait, defaults to the client timeout.
+
+        Returns:
+            The result of the remote method.
+
+        Raises:
+            WorkerUnavailable: If the worker cannot be reached.
+            TimeoutError: If the worker did not answer in time.
+            RemoteError: If the remote method raised.
+        """
+        request = {"id": next(self._ids), "method": method, "params": params or {}}
+        outcome = "ok"
+        start = time.perf_counter()
+        try:
+            response = self._exchange(request, self.timeout if timeout is None else timeout)
+            if "error" in response:
+                outcome = "remote_error"
+                raise RemoteError(response["error"]["type"], response["error"]["message"])
+            return response.get("result")
+        except WorkerUnavailable:
+            outcome = "unavailable"
+            raise
+        except TimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            BOT_IPC_SECONDS.observe(time.perf_counter() - start, method=method, outcome=outcome)
+
+    def _exchange(self, request: dict, timeout: float) -> dict:
+        sock, pooled = self._acquire()
+        try:
+            sock.settimeout(timeout)
+            try:
+                send_message(sock, request)
+            except (BrokenPipeError, ConnectionResetError):
+                if not pooled:
+                    raise
+                # The worker restarted since this connection was opened, nothing was sent
+                sock.close()
+                sock, pooled = self._connect(), False
+                sock.settimeout(timeout)
+                send_message(sock, request)
+            response = recv_message(sock)
+        except socket.timeout:
+            sock.close()
+            raise TimeoutError(f"Bot worker did not answer {request['method']} within {timeout:.0f}s")
+        except (OSError, ValueError) as e:
+            sock.close()
+            raise WorkerUnavailable(f"Bot worker connection failed: {str(e)}") from e
+
+        if response is None or response.get("id") != request["id"]:
+            sock.close()
+            raise WorkerUnavailable("Bot worker closed the connection")
+        self._release(sock)
+        return response
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._connect(), False
+
+    def _release(self, sock: socket.socket) -> None:
+        try:
+            self._idle.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            raise WorkerUnavailable(f"Bot worker is not listening on {self.path}: {str(e)}") from e
+        return sock
+
+    def close(self) -> None:
+        """Close the idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
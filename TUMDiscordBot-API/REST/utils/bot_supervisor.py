@@ -0,0 +1,423 @@
+"""
+Bot Supervisor
+~~~~~~~~
+
+Owns the bot thread and its event loop. A monitor thread follows the bot through a small
+state machine, detects a dead bot thread, a stalled event loop or a lost gateway
+connection and restarts the bot with exponential backoff. The REST blueprints only read
+the current state (:meth:`BotSupervisor.is_available`), which is a plain attribute read.
+
+States::
+
+    stopped --start--> starting --ready--> ready <--> degraded
+                          ^                  |           |
+                          |            thread died    stalled
+                          |                  v           v
+                          +----backoff---- crashed <-----+
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from enum import Enum
+
+from REST import settings_manager
+from REST.utils.lazy_import import lazy_import
+from REST.utils.loop_monitor import loop_monitor
+from REST.utils.memory_report import memory_monitor
+from REST.utils.metrics import Counter, Gauge, Histogram
+import REST.utils.bot_context as bc
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+bot = lazy_import('bot')
+
+DEFAULT_POLL_INTERVAL = 0.5
+DEFAULT_READY_TIMEOUT = 60.0
+DEFAULT_DEGRADED_AFTER = 5.0
+DEFAULT_STALL_TIMEOUT = 60.0
+DEFAULT_BACKOFF_INITIAL = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+DEFAULT_STABLE_AFTER = 120.0
+STOP_TIMEOUT = 10.0
+
+# Errors a restart cannot fix (discord.errors class names)
+_FATAL_ERRORS = ("LoginFailure", "PrivilegedIntentsRequired")
+
+
+class BotState(str, Enum):
+    STOPPED = "stopped"
+    STARTING = "starting"
+    READY = "ready"
+    DEGRADED = "degraded"
+    CRASHED = "crashed"
+
+
+BOT_RESTARTS = Counter("bot_restarts_total", "Automatic bot restarts, by reason.", ("reason",))
+BOT_RECOVERY_SECONDS = Histogram(
+    "bot_recovery_seconds", "Time from detecting a failure until the bot was ready again.",
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+BOT_START_SECONDS = Histogram(
+    "bot_start_seconds", "Time from starting the bot thread until the client was ready.",
+    buckets=(1, 2.5, 5, 10, 20, 30, 60),
+)
+
+
+class BotSupervisor:
+    """
+    Runs the bot in a supervised thread.
+
+    Args:
+        poll_interval (float): Seconds between two health checks.
+        ready_timeout (float): A start that is not ready after this long counts as failed.
+        degraded_after (float): Seconds the loop may be unresponsive or the gateway
+            disconnected before the bot is reported as degraded.
+        stall_timeout (float): Seconds in the degraded state before the bot is restarted.
+        backoff_initial (float): Delay before the first restart, doubled for each further one.
+        backoff_max (float): Upper bound of the restart delay.
+        stable_after (float): Seconds the bot must stay ready before the backoff is reset.
+    """
+
+    def __init__(self, poll_interval=DEFAULT_POLL_INTERVAL, ready_timeout=DEFAULT_READY_TIMEOUT,
+                 degraded_after=DEFAULT_DEGRADED_AFTER, stall_timeout=DEFAULT_STALL_TIMEOUT,
+                 backoff_initial=DEFAULT_BACKOFF_INITIAL, backoff_max=DEFAULT_BACKOFF_MAX,
+                 stable_after=DEFAULT_STABLE_AFTER):
+        self.poll_interval = float(poll_interval)
+        self.ready_timeout = float(ready_timeout)
+        self.degraded_after = float(degraded_after)
+        self.stall_timeout = float(stall_timeout)
+        self.backoff_initial = float(backoff_initial)
+        self.backoff_max = float(backoff_max)
+        self.stable_after = float(stable_after)
+
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._state_changed = threading.Condition(self._lock)
+        # Held while the bot is launched or stopped, so stop() and a restart by the monitor
+        # cannot interleave. Not _lock: stopping takes seconds and waiters need the state meanwhile
+        self._lifecycle_lock = threading.Lock()
+        self._stopping = False
+        self._monitor_thread = None
+        self._bot_thread = None
+        self._token_key = None
+
+        self.state = BotState.STOPPED
+        self.state_since = time.time()
+        self.last_error = None
+        self.restarts = 0
+        self.attempt = 0
+        self.last_recovery_seconds = None
+        self._failed_at = None
+        self._last_pong = None
+        self._bot_error = None
+
+    @classmethod
+    def from_settings(cls):
+        """Create a supervisor configured by the optional "supervisor" section of .secrets.json."""
+        settings = (settings_manager.SETTINGS or {}).get("supervisor", {})
+        return cls(
+            poll_interval=settings.get("poll_interval", DEFAULT_POLL_INTERVAL),
+            ready_timeout=settings.get("ready_timeout", DEFAULT_READY_TIMEOUT),
+            degraded_after=settings.get("degraded_after", DEFAULT_DEGRADED_AFTER),
+            stall_timeout=settings.get("stall_timeout", DEFAULT_STALL_TIMEOUT),
+            backoff_initial=settings.get("backoff_initial", DEFAULT_BACKOFF_INITIAL),
+            backoff_max=settings.get("backoff_max", DEFAULT_BACKOFF_MAX),
+            stable_after=settings.get("stable_after", DEFAULT_STABLE_AFTER),
+        )
+
+    ########################################
+    #                STATE                 #
+    ########################################
+
+    def is_available(self) -> bool:
+        """Whether the bot can serve requests (ready or degraded)."""
+        return self.state in (BotState.READY, BotState.DEGRADED)
+
+    def _set_state(self, state: BotState, error=None) -> None:
+        with self._state_changed:
+            if state is not self.state:
+                logger.info(f"Bot state {self.state.value} -> {state.value}")
+                self.state = state
+                self.state_since = time.time()
+            if error is not None:
+                self.last_error = error
+            self._state_changed.notify_all()
+
+    def wait_for(self, states, timeout: float) -> BotState:
+        """
+        Block until the bot reaches one of ``states`` or the timeout expires.
+
+        Returns:
+            BotState: The state at return.
+        """
+        deadline = time.monotonic() + timeout
+        with self._state_changed:
+            while self.state not in states:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._state_changed.wait(remaining)
+            return self.state
+
+    def status(self) -> dict:
+        """Return the state machine and restart bookkeeping for the status endpoint."""
+        return {
+            "state": self.state.value,
+            "since": self.state_since,
+            "restarts": self.restarts,
+            "restart_attempt": self.attempt,
+            "last_error": self.last_error,
+            "last_recovery_seconds": self.last_recovery_seconds,
+            "loop_responsive_seconds_ago": (
+                round(time.monotonic() - self._last_pong, 3) if self._last_pong is not None else None
+            ),
+        }
+
+    ########################################
+    #              LIFECYCLE               #
+    ########################################
+
+    def start(self, token_key: str) -> bool:
+        """
+        Start the bot and its monitor thread.
+
+        Args:
+            token_key (str): "token" or "dev_token".
+
+        Returns:
+            bool: False if the bot is already supervised.
+        """
+        with self._lifecycle_lock, self._lock:
+            if self._monitor_thread is not None and self._monitor_thread.is_alive():
+                return False
+            self._token_key = token_key
+            self._stopping = False
+            self._stop_event.clear()
+            self.attempt = 0
+            self.last_error = None
+            self._failed_at = None
+            self._monitor_thread = threading.Thread(target=self._supervise, name="bot-supervisor", daemon=True)
+            self._monitor_thread.start()
+        # Periodic memory summaries follow the bot across restarts, started with the first one
+        memory_monitor.start()
+        return True
+
+    def stop(self) -> None:
+        """Stop the bot and the monitor thread, no restart follows."""
+        with self._lifecycle_lock:
+            self._stopping = True
+            self._stop_event.set()
+            self._stop_bot()
+        monitor = self._monitor_thread
+        if monitor is not None and monitor is not threading.current_thread():
+            monitor.join(STOP_TIMEOUT)
+        with self._lifecycle_lock:
+            # Unless start() ran in the meantime
+            if self._stopping:
+                self._set_state(BotState.STOPPED)
+
+    def _launch(self) -> None:
+        def run():
+            try:
+                bot.start(self._token_key)
+            except Exception as e:
+                logger.error(f"Bot failed: {str(e)}")
+                self._bot_error = e
+                self.last_error = f"{type(e).__name__}: {str(e)}"
+
+        bc.mock_ctx = None
+        bc.mock_contexts.clear()
+        self._last_pong = None
+        self._bot_error = None
+        self._bot_thread = threading.Thread(target=run, name="bot", daemon=True)
+        self._set_state(BotState.STARTING)
+        self._bot_thread.start()
+
+    def _stop_bot(self) -> None:
+        """Close the client and wait for the bot thread, a stuck loop is stopped instead."""
+        bc.mock_ctx = None
+        bc.mock_contexts.clear()
+        thread = self._bot_thread
+        if thread is None or not thread.is_alive():
+            return
+
+        loop_monitor.stop()
+        try:
+            client = bc.get_live_bot()
+            loop = bc.get_live_loop()
+        except RuntimeError:
+            client = loop = None
+
+        if client is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout=STOP_TIMEOUT)
+            except Exception as e:
+                logger.error(f"Failed to close Discord connection: {str(e)}")
+        thread.join(STOP_TIMEOUT)
+
+        if thread.is_alive() and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(STOP_TIMEOUT)
+        if thread.is_alive():
+            # The loop is blocked, leave the thread behind and build a new client on restart
+            logger.error("Bot thread did not exit, discarding its client")
+            bot.discord_bot.discard_client()
+
+    ########################################
+    #              SUPERVISION             #
+    ########################################
+
+    def _supervise(self) -> None:
+        while True:
+            with self._lifecycle_lock:
+                if self._stopping:
+                    return
+                self._launch()
+            reason = self._watch()
+            if reason is None:
+                return
+
+            self._failed_at = self._failed_at or time.monotonic()
+            with self._lifecycle_lock:
+                # stop() has closed the bot already, it must not be restarted
+                if self._stopping:
+                    return
+                self._stop_bot()
+            if reason == "fatal":
+                logger.error(f"Bot stopped, restarting would not help: {self.last_error}")
+                self._set_state(BotState.CRASHED)
+                return
+
+            self.attempt += 1
+            delay = min(self.backoff_max, self.backoff_initial * 2 ** (self.attempt - 1))
+            self.restarts += 1
+            BOT_RESTARTS.inc(reason=reason)
+            logger.warning(f"Bot {reason}, restarting in {delay:.1f}s (attempt {self.attempt})")
+            self._set_state(BotState.CRASHED, error=self.last_error or reason)
+            if self._stop_event.wait(delay):
+                return
+
+    def _watch(self):
+        """
+        Follow one run of the bot.
+
+        Returns:
+            str: Why the bot has to be restarted, "fatal" if it should not be, None when stopped.
+        """
+        started = time.monotonic()
+        ready_at = None
+        unhealthy_since = None
+        init_error = None
+
+        while not self._stop_event.wait(self.poll_interval):
+            now = time.monotonic()
+            if not self._bot_thread.is_alive():
+                if type(self._bot_error).__name__ in _FATAL_ERRORS:
+                    return "fatal"
+                return "crashed"
+
+            try:
+                client = bc.get_live_bot()
+            except RuntimeError:
+                client = None
+
+            if self.state is BotState.STARTING:
+                if client is not None and client.is_ready():
+                    init_error = self._init_mock_context(client)
+                    if init_error is None:
+                        ready_at = self._last_pong = now
+                        BOT_START_SECONDS.observe(now - started)
+                        self._recovered(now)
+                        self._set_state(BotState.READY)
+                        continue
+                if now - started > self.ready_timeout:
+                    if init_error is not None:
+                        # Connected, but the mock context cannot be built (e.g. no Admin role)
+                        self.last_error = init_error
+                        return "fatal"
+                    return "ready_timeout"
+                continue
+
+            problem = self._health_problem(client, now)
+            if problem is None:
+                unhealthy_since = None
+                if self.state is BotState.DEGRADED:
+                    self._recovered(now)
+                    self._set_state(BotState.READY)
+                if self.attempt and now - ready_at > self.stable_after:
+                    self.attempt = 0
+                continue
+
+            unhealthy_since = unhealthy_since or now
+            if now - unhealthy_since >= self.stall_timeout:
+                self.last_error = problem
+                return "stalled"
+            if now - unhealthy_since >= self.degraded_after and self.state is BotState.READY:
+                self._failed_at = unhealthy_since
+                self._set_state(BotState.DEGRADED, error=problem)
+        return None
+
+    def _health_problem(self, client, now: float):
+        """Return a description of what is wrong with a started bot, None if it is healthy."""
+        if client is None or client.is_closed():
+            return "client closed"
+
+        # Liveness probe: the loop runs the callback unless it is blocked
+        try:
+            client.loop.call_soon_threadsafe(self._pong)
+        except RuntimeError:
+            return "event loop closed"
+        if self._last_pong is not None and now - self._last_pong > self.degraded_after:
+            return f"event loop unresponsive for {now - self._last_pong:.1f}s"
+
+        # py-cord reconnects by itself, a gateway connection that stays down is reported here
+        latencies = bc.shard_latencies(client)
+        down = [str(shard_id) for shard_id, latency in latencies if not math.isfinite(latency)]
+        if not latencies:
+            return "gateway disconnected (no shard started)"
+        if down:
+            return f"gateway disconnected (shard {', '.join(down)})"
+        return None
+
+    def _pong(self) -> None:
+        self._last_pong = time.monotonic()
+
+    def _recovered(self, now: float) -> None:
+        if self._failed_at is not None:
+            self.last_recovery_seconds = round(now - self._failed_at, 3)
+            BOT_RECOVERY_SECONDS.observe(now - self._failed_at)
+            logger.info(f"Bot recovered after {self.last_recovery_seconds}s")
+            self._failed_at = None
+
+    def _init_mock_context(self, client):
+        """Build the mock context of the default guild, returns the error if not possible yet."""
+        # The role cache may still be stored by on_ready, so this is retried until the ready timeout
+        try:
+            guild = bc.get_default_guild()
+            if guild is None:
+                raise RuntimeError("Bot not connected to any guilds")
+            bc.mock_ctx = bc.MockContext(guild=guild, author=client.user)
+        except RuntimeError as e:
+            return f"Bot initialization failed: {str(e)}"
+        logger.info(f"Mock context initialized with guild: {guild.name}")
+        return None
+
+
+# Single supervisor shared by the REST blueprints
+supervisor = BotSupervisor.from_settings()
+
+BOT_STATE = Gauge(
+    "bot_state", "Current state of the supervised bot (1 for the active state).", ("state",),
+    callback=lambda: {(state.value,): int(supervisor.state is state) for state in BotState},
+)
+BOT_STATE_SECONDS = Gauge(
+    "bot_state_seconds", "Seconds since the bot entered its current state.",
+    callback=lambda: time.time() - supervisor.state_since,
+)
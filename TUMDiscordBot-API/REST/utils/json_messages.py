@@ -1,6 +1,11 @@
 from flask import jsonify
 
-def bot_mock_ctx_json_message():
+def bot_mock_ctx_json_message(guild_id=None):
+    if guild_id is not None:
+        return jsonify({
+            "status": "error",
+            "message": f"Bot context for guild {guild_id} could not be initialized. Make sure the bot is a member of this server."
+        }), 404
     return jsonify({
         "status": "error",
         "message": "Bot context could not be initialized. Make sure the bot is connected to a Discord server."
@@ -0,0 +1,61 @@
+"""
+Lazy Import
+~~~~~~~~
+
+Module proxies that import the real module on first attribute access. The REST server
+uses them for the Discord stack (py-cord, the ``bot`` package and ``utility``) and the
+analytics stack (pandas, matplotlib), so starting the API does not pay for either until
+an endpoint actually needs it.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import importlib
+import sys
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first use.
+
+    Args:
+        name (str): Dotted name of the module.
+    """
+
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the module has been imported (by this proxy or any other import)."""
+        return self._name in sys.modules
+
+    def load(self):
+        """Import the module if needed and return it."""
+        # import_module is a dictionary lookup once imported and blocks other threads
+        # while the first import is still running
+        return importlib.import_module(self._name)
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.load(), attr, value)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Return a proxy for the module ``name`` without importing it.
+
+    Args:
+        name (str): Dotted name of the module.
+
+    Returns:
+        LazyModule: Imports the module on the first attribute access.
+    """
+    return LazyModule(name)
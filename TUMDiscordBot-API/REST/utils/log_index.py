@@ -0,0 +1,421 @@
+"""
+Log Index
+~~~~~~~~
+
+Incrementally maintained index over the log files in data/logs, used by the
+/api/logs/search endpoint.
+
+For every file the index keeps the byte offset, timestamp and level of each log record,
+the time range of the file, the records per level and postings of logger names and
+id-like tokens (Discord snowflakes, trace ids, API paths). Files that only grew are
+indexed from where the previous run stopped, so a query only reads the records it returns.
+
+Both the plain text session logs and the JSON lines log are understood, rotated
+``.gz`` files are indexed once.
+
+Every file's index is persisted on its own in data/runtime/log_index, so a search only
+writes the indexes that changed. The index of a log that is still being written (it grows
+on every request) is persisted at most every ``SAVE_INTERVAL`` seconds; after a restart
+the records appended since are indexed again from the persisted offset.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import bisect
+import datetime
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_LOG_DIR = PROJECT_ROOT / 'data' / 'logs'
+DEFAULT_INDEX_DIR = PROJECT_ROOT / 'data' / 'runtime' / 'log_index'
+
+INDEX_VERSION = 2
+# Seconds between two saves of the index of a growing log file
+SAVE_INTERVAL = 60.0
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+_TEXT_RECORD_RE = re.compile(
+    r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3}) - (\S+) - (DEBUG|INFO|WARNING|ERROR|CRITICAL) - (.*)$'
+)
+# Tokens worth a posting list: Discord snowflakes, hex trace ids and API paths
+_ID_TOKEN_RE = re.compile(r'\b\d{15,20}\b|\b[0-9a-f]{16}\b|/api/[\w\-/]+')
+
+
+def _parse_record(line: str):
+    """
+    Parse the first line of a log record.
+
+    Returns:
+        tuple: (timestamp, level, logger name, message) or None if the line continues
+        the previous record (e.g. a traceback).
+    """
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+            timestamp = datetime.datetime.fromisoformat(entry["timestamp"]).timestamp()
+        except (ValueError, KeyError, TypeError):
+            return None
+        message = entry.get("message", "")
+        if entry.get("trace_id"):
+            message = f"{message} trace_id={entry['trace_id']}"
+        return timestamp, LEVELS.get(entry.get("level"), 0), entry.get("logger", ""), message
+
+    match = _TEXT_RECORD_RE.match(line)
+    if not match:
+        return None
+    stamp, millis, logger_name, level, message = match.groups()
+    timestamp = datetime.datetime.strptime(stamp, '%Y-%m-%d %H:%M:%S').timestamp() + int(millis) / 1000
+    return timestamp, LEVELS[level], logger_name, message
+
+
+def _tokens(logger_name: str, message: str) -> set:
+    tokens = {f"logger:{logger_name}"}
+    tokens.update(_ID_TOKEN_RE.findall(message))
+    return tokens
+
+
+class FileIndex:
+    """
+    Index of a single log file.
+
+    Args:
+        name (str): File name relative to the log directory.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.size = 0
+        self.mtime = 0.0
+        self.indexed_bytes = 0
+        self.offsets = []
+        self.timestamps = []
+        self.levels = []
+        self.by_level = {}
+        self.postings = {}
+        self.ordered = True
+
+    @property
+    def first_ts(self):
+        return self.timestamps[0] if self.timestamps else None
+
+    @property
+    def last_ts(self):
+        return self.timestamps[-1] if self.timestamps else None
+
+    def _add_record(self, offset: int, timestamp: float, level: int, logger_name: str, message: str) -> None:
+        entry_id = len(self.offsets)
+        if self.timestamps and timestamp < self.timestamps[-1]:
+            self.ordered = False
+        self.offsets.append(offset)
+        self.timestamps.append(timestamp)
+        self.levels.append(level)
+        self.by_level.setdefault(str(level), []).append(entry_id)
+        for token in _tokens(logger_name, message):
+            self.postings.setdefault(token, []).append(entry_id)
+
+    def update(self, path: Path) -> None:
+        """Index the part of the file written since the last update."""
+        stat = path.stat()
+        compressed = path.suffix == '.gz'
+        opener = gzip.open if compressed else open
+
+        with opener(path, 'rb') as f:
+            f.seek(self.indexed_bytes)
+            position = self.indexed_bytes
+            for raw in f:
+                # Leave a partially written last line for the next update
+                if not raw.endswith(b'\n') and not compressed:
+                    break
+                record = _parse_record(raw.decode('utf-8', errors='replace').rstrip('\r\n'))
+                if record is not None:
+                    self._add_record(position, *record)
+                elif not self.offsets:
+                    # Text before the first record header, keep it searchable
+                    self._add_record(position, 0.0, 0, "", "")
+                position += len(raw)
+
+        self.indexed_bytes = position
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+
+    def entry_range(self, since=None, until=None) -> range:
+        """Entry ids whose timestamp falls into [since, until]."""
+        if not self.ordered:
+            return range(len(self.offsets))
+        start = bisect.bisect_left(self.timestamps, since) if since is not None else 0
+        end = bisect.bisect_right(self.timestamps, until) if until is not None else len(self.offsets)
+        return range(start, end)
+
+    def to_dict(self) -> dict:
+        return {
+            "size": self.size, "mtime": self.mtime, "indexed_bytes": self.indexed_bytes,
+            "offsets": self.offsets, "timestamps": self.timestamps, "levels": self.levels,
+            "by_level": self.by_level, "postings": self.postings, "ordered": self.ordered,
+        }
+
+    @classmethod
+    def from_dict(cls, name: str, data: dict):
+        index = cls(name)
+        for key, value in data.items():
+            setattr(index, key, value)
+        return index
+
+
+class LogIndex:
+    """
+    Index over all log files of a directory, persisted between runs.
+
+    Args:
+        log_dir (Path): Directory holding the log files.
+        index_dir (Path): Directory the index of each log file is stored in.
+    """
+
+    def __init__(self, log_dir=DEFAULT_LOG_DIR, index_dir=DEFAULT_INDEX_DIR):
+        self.log_dir = Path(log_dir)
+        self.index_dir = Path(index_dir)
+        self.files = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        # Names of the indexes that changed since they were persisted, and when they were
+        self._dirty = set()
+        self._saved_at = {}
+
+    ########################################
+    #             MAINTENANCE              #
+    ########################################
+
+    def _index_path(self, name: str) -> Path:
+        return self.index_dir / f"{name}.json"
+
+    def _load(self) -> None:
+        self._loaded = True
+        if not self.index_dir.is_dir():
+            return
+        for path in self.index_dir.glob('*.json'):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if data.get("version") != INDEX_VERSION:
+                continue
+            self.files[data["name"]] = FileIndex.from_dict(data["name"], data["index"])
+
+    def _save(self, name: str) -> None:
+        self.index_dir.mkdir(exist_ok=True, parents=True)
+        path = self._index_path(name)
+        temp_path = path.with_suffix('.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump({"version": INDEX_VERSION, "name": name, "index": self.files[name].to_dict()}, f)
+        os.replace(temp_path, path)
+        self._dirty.discard(name)
+        self._saved_at[name] = time.monotonic()
+
+    def _persist(self, names, now: float) -> None:
+        """Save the given indexes, and the growing ones whose last save is ``SAVE_INTERVAL`` old."""
+        due = {name for name in self._dirty if now - self._saved_at.get(name, -SAVE_INTERVAL) >= SAVE_INTERVAL}
+        for name in set(names) | due:
+            try:
+                self._save(name)
+            except OSError as e:
+                logger.warning(f"Could not persist the index of {name}: {e}")
+
+    def refresh(self) -> int:
+        """
+        Bring the index up to date with the log directory.
+
+        Returns:
+            int: Number of files that were (re)indexed.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+            present = {}
+            for path in self.log_dir.iterdir():
+                if path.is_file() and (path.suffix in ('.log', '.jsonl') or path.name.endswith('.jsonl.gz')):
+                    present[path.name] = path
+
+            changed = 0
+            for name in set(self.files) - set(present):
+                del self.files[name]
+                self._dirty.discard(name)
+                self._index_path(name).unlink(missing_ok=True)
+                changed += 1
+
+            # Indexes built from scratch are saved right away, grown ones are debounced
+            rebuilt = []
+            for name, path in present.items():
+                stat = path.stat()
+                index = self.files.get(name)
+                if index is not None and index.size == stat.st_size and index.mtime == stat.st_mtime:
+                    continue
+                # A shrunk or rewritten file is indexed again, a grown one incrementally
+                fresh = index is None or stat.st_size < index.indexed_bytes or path.suffix == '.gz'
+                if fresh:
+                    index = self.files[name] = FileIndex(name)
+                try:
+                    index.update(path)
+                except OSError as e:
+                    logger.warning(f"Could not index log file {name}: {e}")
+                    continue
+                if fresh:
+                    rebuilt.append(name)
+                else:
+                    self._dirty.add(name)
+                changed += 1
+
+            self._persist(rebuilt, time.monotonic())
+            return changed
+
+    ########################################
+    #               QUERIES                #
+    ########################################
+
+    def list_files(self) -> list:
+        """Indexed files with their time range and record count, oldest first."""
+        return [
+            {
+                "file": index.name,
+                "first": _format_ts(index.first_ts),
+                "last": _format_ts(index.last_ts),
+                "records": len(index.offsets),
+                "size": index.size,
+            }
+            for index in self._ordered_files()
+        ]
+
+    def _ordered_files(self) -> list:
+        return sorted(self.files.values(), key=lambda index: (index.first_ts or 0, index.name))
+
+    def search(self, since=None, until=None, level=None, logger_name=None, token=None, text=None, cursor=None):
+        """
+        Yield the log records matching all given filters in chronological file order.
+
+        Args:
+            since (float): Earliest timestamp (epoch seconds).
+            until (float): Latest timestamp (epoch seconds).
+            level (int): Minimum level, e.g. 40 for ERROR and above.
+            logger_name (str): Exact logger name.
+            token (str): An id-like token, e.g. a channel id or a trace id.
+            text (str): Case-insensitive substring of the record.
+            cursor (str): Resume after the record the cursor points to.
+
+        Yields:
+            tuple: The cursor of the record and the record as dict.
+        """
+        start_file, start_entry = _parse_cursor(cursor)
+        needle = text.lower() if text else None
+
+        for index in self._ordered_files():
+            # Skip the files before the one the cursor points into
+            if start_file is not None and index.name != start_file:
+                continue
+            if since is not None and index.last_ts is not None and index.last_ts < since:
+                continue
+            if until is not None and index.first_ts is not None and index.first_ts > until:
+                continue
+
+            candidates = self._candidates(index, since, until, level, logger_name, token)
+            if start_file is not None:
+                candidates = [entry_id for entry_id in candidates if entry_id > start_entry]
+                start_file = None
+            if not candidates:
+                continue
+
+            for entry_id, raw in self._read_entries(index, candidates):
+                if needle and needle not in raw.lower():
+                    continue
+                yield f"{index.name}:{entry_id}", self._to_record(index, entry_id, raw)
+
+    def _candidates(self, index: FileIndex, since, until, level, logger_name, token) -> list:
+        entry_ids = index.entry_range(since, until)
+        selected = None
+
+        if level is not None:
+            by_level = set()
+            for code, ids in index.by_level.items():
+                if int(code) >= level:
+                    by_level.update(ids)
+            selected = by_level
+        for posting in (f"logger:{logger_name}" if logger_name else None, token):
+            if posting is None:
+                continue
+            ids = set(index.postings.get(posting, ()))
+            selected = ids if selected is None else selected & ids
+
+        if selected is None:
+            candidates = list(entry_ids)
+        else:
+            candidates = sorted(entry_id for entry_id in selected if entry_id in entry_ids)
+
+        if not index.ordered and (since is not None or until is not None):
+            candidates = [
+                entry_id for entry_id in candidates
+                if (since is None or index.timestamps[entry_id] >= since)
+                and (until is None or index.timestamps[entry_id] <= until)
+            ]
+        return candidates
+
+    def _read_entries(self, index: FileIndex, entry_ids: list):
+        path = self.log_dir / index.name
+        opener = gzip.open if path.suffix == '.gz' else open
+        try:
+            with opener(path, 'rb') as f:
+                for entry_id in entry_ids:
+                    start = index.offsets[entry_id]
+                    end = index.offsets[entry_id + 1] if entry_id + 1 < len(index.offsets) else index.indexed_bytes
+                    f.seek(start)
+                    yield entry_id, f.read(end - start).decode('utf-8', errors='replace')
+        except OSError as e:
+            logger.warning(f"Could not read log file {index.name}: {e}")
+
+    @staticmethod
+    def _to_record(index: FileIndex, entry_id: int, raw: str) -> dict:
+        first_line, _, rest = raw.partition('\n')
+        parsed = _parse_record(first_line.rstrip('\r'))
+        if parsed is None:
+            return {"file": index.name, "timestamp": None, "level": None, "logger": None, "message": raw.rstrip()}
+        timestamp, level, logger_name, message = parsed
+        record = {
+            "file": index.name,
+            "timestamp": _format_ts(timestamp),
+            "level": LEVEL_NAMES.get(level),
+            "logger": logger_name,
+            "message": message,
+        }
+        if rest.strip():
+            record["details"] = rest.rstrip()
+        return record
+
+
+def _format_ts(timestamp):
+    if not timestamp:
+        return None
+    return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def _parse_cursor(cursor):
+    if not cursor:
+        return None, -1
+    name, _, entry_id = cursor.rpartition(':')
+    if not name or not entry_id.isdigit():
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return name, int(entry_id)
+
+
+# Single index shared by the REST API
+log_index = LogIndex()
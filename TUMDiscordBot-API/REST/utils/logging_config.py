@@ -0,0 +1,242 @@
+"""
+Logging Config
+~~~~~~~~
+
+One-time logging setup for the REST API and the bot. Log calls only put the record on a
+queue; a single listener thread formats the records and writes them to the console and
+to a JSON lines file that is rotated by size and age and compressed with gzip.
+
+Configured by the optional "logging" section of .secrets.json.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import atexit
+import copy
+import datetime
+import gzip
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from REST import settings_manager
+from REST.utils import tracing
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_LOG_DIR = PROJECT_ROOT / 'data' / 'logs'
+LOG_FILE_NAME = 'discord_bot.jsonl'
+# Log file of a process that runs next to the REST server (bot_worker.py sets discord_bot.worker.jsonl),
+# two handlers rotating one file would rotate it under each other
+LOG_FILE_ENV = 'DISCORD_BOT_LOG_FILE'
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_ROTATE_HOURS = 24
+DEFAULT_BACKUP_COUNT = 14
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Reduce logging level for discord.py loggers to WARNING to suppress INFO logs
+QUIET_LOGGERS = ('discord', 'discord.client', 'discord.gateway')
+
+_listener = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        trace_id = getattr(record, 'trace_id', None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that captures the trace id of the calling thread or task and resolves
+    the message, so the listener thread does not touch the original arguments.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        record.trace_id = tracing.current_trace_id()
+        return record
+
+
+class CompressingRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    File handler rotating the log once it exceeds ``max_bytes`` or is older than
+    ``rotate_hours``. Rotated files are gzip compressed and named by their rotation time,
+    only the newest ``backup_count`` are kept.
+
+    Args:
+        filename (Path): The active log file.
+        max_bytes (int): Rotate once the file reaches this size, 0 disables it.
+        rotate_hours (float): Rotate once the file is this old, 0 disables it.
+        backup_count (int): Number of compressed files to keep.
+    """
+
+    def __init__(self, filename, max_bytes=DEFAULT_MAX_BYTES, rotate_hours=DEFAULT_ROTATE_HOURS,
+                 backup_count=DEFAULT_BACKUP_COUNT):
+        super().__init__(filename, 'a', encoding='utf-8', delay=False)
+        self.max_bytes = int(max_bytes)
+        self.rotate_seconds = float(rotate_hours) * 3600
+        self.backup_count = int(backup_count)
+        self.opened_at = self._file_start_time()
+
+    def _file_start_time(self) -> float:
+        # Continue the age of an existing file across restarts
+        try:
+            if os.path.getsize(self.baseFilename) > 0:
+                first = self._first_line_time()
+                return first if first is not None else os.path.getmtime(self.baseFilename)
+        except OSError:
+            pass
+        return time.time()
+
+    def _first_line_time(self):
+        try:
+            with open(self.baseFilename, encoding='utf-8') as f:
+                first = json.loads(f.readline())
+            return datetime.datetime.fromisoformat(first["timestamp"]).timestamp()
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.stream is None:
+            self.stream = self._open()
+        if self.rotate_seconds and time.time() - self.opened_at >= self.rotate_seconds:
+            return True
+        if self.max_bytes and self.stream.tell() >= self.max_bytes:
+            return True
+        return False
+
+    def doRollover(self) -> None:
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        base = Path(self.baseFilename)
+        if base.exists() and base.stat().st_size > 0:
+            stamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+            target = base.with_name(f"{base.stem}.{stamp}{base.suffix}.gz")
+            counter = 1
+            while target.exists():
+                target = base.with_name(f"{base.stem}.{stamp}-{counter}{base.suffix}.gz")
+                counter += 1
+            with open(base, 'rb') as source, gzip.open(target, 'wb') as compressed:
+                shutil.copyfileobj(source, compressed)
+            base.unlink()
+            self._remove_old_backups(base)
+
+        self.stream = self._open()
+        self.opened_at = time.time()
+
+    def _remove_old_backups(self, base: Path) -> None:
+        if self.backup_count <= 0:
+            return
+        # Only the timestamped backups of this file, not those of discord_bot.worker.jsonl
+        backups = sorted(base.parent.glob(f"{base.stem}.[0-9]*{base.suffix}.gz"))
+        for old in backups[:-self.backup_count]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+def configure_logging(log_dir=None, file_name: str = None) -> logging.Logger:
+    """
+    Set up logging once for the whole process, later calls return the configured logger.
+    Records of all loggers are queued and written by a background listener thread.
+
+    Args:
+        log_dir (Path): Directory of the log files, defaults to data/logs.
+        file_name (str): Log file of this process, defaults to $DISCORD_BOT_LOG_FILE or discord_bot.jsonl.
+
+    Returns:
+        logging.Logger: The 'discord_bot' logger.
+    """
+    global _listener
+
+    with _lock:
+        if _listener is not None:
+            return logging.getLogger('discord_bot')
+        # Worker processes (e.g. the chart renderer) re-import the app, only the main process owns the log file
+        if multiprocessing.parent_process() is not None:
+            return logging.getLogger('discord_bot')
+
+        settings = (settings_manager.SETTINGS or {}).get("logging", {})
+        log_dir = Path(log_dir or settings.get("directory", DEFAULT_LOG_DIR))
+        log_dir.mkdir(exist_ok=True, parents=True)
+
+        file_handler = CompressingRotatingFileHandler(
+            log_dir / (file_name or os.environ.get(LOG_FILE_ENV) or LOG_FILE_NAME),
+            max_bytes=settings.get("max_bytes", DEFAULT_MAX_BYTES),
+            rotate_hours=settings.get("rotate_hours", DEFAULT_ROTATE_HOURS),
+            backup_count=settings.get("backup_count", DEFAULT_BACKUP_COUNT),
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers = [file_handler]
+
+        if settings.get("console", True):
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+            handlers.append(console_handler)
+
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        # Replace handlers installed by earlier basicConfig calls
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_ContextQueueHandler(log_queue))
+        root.setLevel(settings.get("level", "INFO"))
+
+        for logger_name in QUIET_LOGGERS:
+            logging.getLogger(logger_name).setLevel(logging.WARNING)
+
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+    return logging.getLogger('discord_bot')
+
+
+def shutdown_logging() -> None:
+    """Flush the queued records and stop the listener thread."""
+    global _listener
+
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
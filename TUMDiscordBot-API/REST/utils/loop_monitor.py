@@ -0,0 +1,250 @@
+"""
+Loop Monitor
+~~~~~~~~
+
+Watchdog for the bot event loop. Measures the scheduling lag of a periodic tick and
+collects the slow callbacks reported by asyncio's debug mode, attributed to the
+command or view callback that was running.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import asyncio
+import functools
+import logging
+import re
+import threading
+from collections import OrderedDict, deque
+
+from REST import settings_manager
+from REST.utils.metrics import Counter, Gauge, Histogram
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+DEFAULT_TICK_INTERVAL = 1.0
+DEFAULT_SLOW_CALLBACK_MS = 100
+
+LOOP_LAG_SECONDS = Histogram(
+    "bot_loop_lag_seconds", "Event loop lag measured by the watchdog tick.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_LAG_LAST = Gauge("bot_loop_lag_seconds_last", "Lag of the most recent watchdog tick.")
+LOOP_LAG_MAX = Gauge("bot_loop_lag_seconds_max", "Highest watchdog tick lag since start.")
+SLOW_CALLBACKS = Counter(
+    "bot_slow_callbacks_total", "Loop steps slower than the configured threshold.", ("callback",)
+)
+SLOW_CALLBACK_SECONDS = Counter(
+    "bot_slow_callback_seconds_total", "Time the loop was blocked by slow steps.", ("callback",)
+)
+
+_TASK_NAME_RE = re.compile(r"name='([^']+)'")
+_CORO_NAME_RE = re.compile(r"coro=<([\w.<>]+)\(")
+
+
+class _SlowCallbackHandler(logging.Handler):
+    """Receives the "Executing <handle> took N seconds" warnings of the asyncio logger."""
+
+    def __init__(self, monitor):
+        super().__init__(level=logging.WARNING)
+        self.monitor = monitor
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not isinstance(record.msg, str) or not record.msg.startswith("Executing"):
+            return
+        if not isinstance(record.args, tuple) or len(record.args) != 2:
+            return
+        handle, duration = record.args
+        self.monitor.record_slow_callback(str(handle), float(duration))
+
+
+class LoopMonitor:
+    """
+    Measures event loop lag and slow callbacks of the bot loop.
+
+    Args:
+        tick_interval (float): Seconds between two lag measurements.
+        slow_callback_ms (float): Steps running longer than this are reported as slow.
+        slow_callback_detection (bool): Whether to enable asyncio's debug mode on the loop. Off by default,
+            debug mode records a traceback for every scheduled callback and checks every call for thread safety.
+    """
+
+    def __init__(self, tick_interval=DEFAULT_TICK_INTERVAL, slow_callback_ms=DEFAULT_SLOW_CALLBACK_MS,
+                 slow_callback_detection=False):
+        self.tick_interval = float(tick_interval)
+        self.slow_callback_seconds = float(slow_callback_ms) / 1000
+        self.slow_callback_detection = bool(slow_callback_detection)
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._task = None
+        self._handler = None
+        # Task name -> callback label, bounded so finished tasks age out
+        self._task_labels = OrderedDict()
+
+        self.recent_slow_callbacks = deque(maxlen=50)
+
+    @classmethod
+    def from_settings(cls):
+        """Create a monitor configured by the optional "monitoring" section of .secrets.json."""
+        settings = (settings_manager.SETTINGS or {}).get("monitoring", {})
+        return cls(
+            tick_interval=settings.get("loop_tick_interval", DEFAULT_TICK_INTERVAL),
+            slow_callback_ms=settings.get("slow_callback_ms", DEFAULT_SLOW_CALLBACK_MS),
+            slow_callback_detection=settings.get("slow_callback_detection", False),
+        )
+
+    def reset(self) -> None:
+        """Clear all collected measurements."""
+        for metric in (LOOP_LAG_SECONDS, LOOP_LAG_LAST, LOOP_LAG_MAX, SLOW_CALLBACKS, SLOW_CALLBACK_SECONDS):
+            metric.clear()
+        with self._lock:
+            self.recent_slow_callbacks = deque(maxlen=50)
+
+    ########################################
+    #              LIFECYCLE               #
+    ########################################
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Start the lag tick on the given loop and enable slow callback detection if configured.
+        Calling it again for the same loop (e.g. on reconnect) does nothing.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The bot event loop, must be the running loop.
+        """
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+
+        self._loop = loop
+        self._task_labels.clear()
+
+        if self.slow_callback_detection:
+            loop.slow_callback_duration = self.slow_callback_seconds
+            loop.set_debug(True)
+            if self._handler is None:
+                self._handler = _SlowCallbackHandler(self)
+                logging.getLogger('asyncio').addHandler(self._handler)
+
+        self._task = loop.create_task(self._tick(), name="loop-monitor")
+        detection = (f"slow callback threshold {self.slow_callback_seconds * 1000:.0f}ms"
+                     if self.slow_callback_detection else "slow callback detection off")
+        logger.info(f"Loop monitor started (tick {self.tick_interval}s, {detection})")
+
+    def stop(self) -> None:
+        """Cancel the lag tick. Safe to call from any thread."""
+        task, loop = self._task, self._loop
+        self._task = None
+        if task is not None and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(task.cancel)
+
+    def is_running(self) -> bool:
+        """Whether the lag tick is currently scheduled on a loop."""
+        return self._task is not None and not self._task.done()
+
+    async def _tick(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.tick_interval
+            await asyncio.sleep(self.tick_interval)
+            self.record_lag(max(0.0, loop.time() - expected))
+
+    ########################################
+    #              RECORDING               #
+    ########################################
+
+    def record_lag(self, lag: float) -> None:
+        """Add one lag measurement in seconds."""
+        LOOP_LAG_SECONDS.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+        if lag > LOOP_LAG_MAX.value():
+            LOOP_LAG_MAX.set(lag)
+
+        if lag >= self.slow_callback_seconds:
+            logger.warning(f"Bot event loop lag of {lag * 1000:.0f}ms detected")
+
+    def record_slow_callback(self, handle: str, duration: float) -> None:
+        """
+        Attribute a slow step reported by asyncio to a callback label.
+
+        Args:
+            handle (str): The formatted asyncio handle, usually the repr of a task.
+            duration (float): How long the step blocked the loop, in seconds.
+        """
+        label = self._label_for_handle(handle)
+        SLOW_CALLBACKS.inc(callback=label)
+        SLOW_CALLBACK_SECONDS.inc(duration, callback=label)
+        with self._lock:
+            self.recent_slow_callbacks.append({"callback": label, "duration_ms": round(duration * 1000, 1)})
+
+        logger.warning(f"Slow callback in {label}: blocked the bot event loop for {duration * 1000:.0f}ms")
+
+    def _label_for_handle(self, handle: str) -> str:
+        name = _TASK_NAME_RE.search(handle)
+        if name and name.group(1) in self._task_labels:
+            return self._task_labels[name.group(1)]
+
+        coro = _CORO_NAME_RE.search(handle)
+        if coro:
+            return coro.group(1)
+        if name:
+            return name.group(1)
+        return handle[:80]
+
+    ########################################
+    #             ATTRIBUTION              #
+    ########################################
+
+    def label_current_task(self, label: str) -> None:
+        """Attribute slow steps of the currently running task to the given label."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            return
+        if task is None:
+            return
+
+        self._task_labels[task.get_name()] = label
+        self._task_labels.move_to_end(task.get_name())
+        while len(self._task_labels) > 1024:
+            self._task_labels.popitem(last=False)
+
+    def track(self, func):
+        """
+        Decorator for coroutine callbacks (events, view and button callbacks).
+        Slow steps of the task running the callback are attributed to its qualified name.
+        """
+        label = func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            self.label_current_task(label)
+            return await func(*args, **kwargs)
+
+        return wrapper
+
+    ########################################
+    #               EXPORT                 #
+    ########################################
+
+    def snapshot(self) -> dict:
+        """Return the current state of the watchdog and the most recent slow callbacks."""
+        with self._lock:
+            recent = list(self.recent_slow_callbacks)
+        return {
+            "running": self.is_running(),
+            "lag_last": LOOP_LAG_LAST.value(),
+            "lag_max": LOOP_LAG_MAX.value(),
+            "ticks": LOOP_LAG_SECONDS.count(),
+            "recent_slow_callbacks": recent,
+        }
+
+
+# Single monitor shared by the bot events and the REST metrics endpoint
+loop_monitor = LoopMonitor.from_settings()
+
+MONITOR_RUNNING = Gauge(
+    "bot_loop_monitor_running", "Whether the bot event loop watchdog is ticking.",
+    callback=lambda: int(loop_monitor.is_running()),
+)
@@ -0,0 +1,338 @@
+"""
+Memory Report
+~~~~~~~~
+
+Accounts for the memory the bot holds on to over a long uptime: live views by class
+(including the ones py-cord no longer dispatches to), survey entries, the per-guild
+attendance state of bot_data, the server information caches of the functions module,
+py-cord's message, user and view stores and, while tracemalloc is tracing, the source
+lines that allocated the most.
+
+A background thread logs a summary every ``memory_snapshot_minutes`` with what changed
+since the previous one, so slow growth shows up in the log. Configured by the optional
+"monitoring" section of .secrets.json.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import gc
+import logging
+import resource
+import sys
+import threading
+import tracemalloc
+
+from REST import settings_manager
+from REST.utils.lazy_import import lazy_import
+import REST.utils.bot_context as bc
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+bot = lazy_import('bot')
+
+DEFAULT_SNAPSHOT_MINUTES = 60
+DEFAULT_TRACEMALLOC_FRAMES = 1
+DEFAULT_TOP = 15
+# Allocators listed in the periodic log line
+LOG_TOP = 5
+
+# Server information caches of bot.discord_bot_functions, by global name
+CACHES = ("_guilds", "_channels", "_members", "_roles", "_guild_member_counts")
+
+# Allocations of the import machinery and of tracemalloc itself are not of interest
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _kib(size: int) -> float:
+    return round(size / 1024, 1)
+
+
+def _shallow_size(obj) -> int:
+    """Size of an object, its attribute dict and the containers it references directly."""
+    size = sys.getsizeof(obj)
+    attrs = getattr(obj, "__dict__", None)
+    if attrs is not None:
+        size += sys.getsizeof(attrs)
+        for value in attrs.values():
+            if isinstance(value, (list, dict, set, tuple, str, bytes)):
+                size += sys.getsizeof(value)
+    return size
+
+
+def _data_size(value) -> int:
+    """Size of JSON like data (dicts, lists and scalars), counted recursively."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_data_size(key) + _data_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_data_size(item) for item in value)
+    return size
+
+
+def _flatten(report: dict, prefix: str = "") -> dict:
+    """The numbers of a report by dotted key, lists (e.g. the top allocators) are left out."""
+    values = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+########################################
+#               SECTIONS               #
+########################################
+
+def process_memory() -> dict:
+    """Resident set size, peak and garbage collector state of this process."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    result = {
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        "max_rss_kib": usage.ru_maxrss if sys.platform != "darwin" else _kib(usage.ru_maxrss),
+        "gc_objects": len(gc.get_objects()),
+        "threads": threading.active_count(),
+    }
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        result["rss_kib"] = _kib(pages * resource.getpagesize())
+    except (OSError, ValueError, IndexError):
+        pass
+    return result
+
+
+def live_objects() -> dict:
+    """
+    Views by class and survey entries that are still alive, found by walking the heap.
+
+    A view that is alive but not ``dispatchable`` is no longer in py-cord's view store,
+    i.e. something other than py-cord keeps it (e.g. the queue of a survey participant).
+    """
+    view_type = getattr(sys.modules.get("discord.ui"), "View", None)
+    entry_type = getattr(sys.modules.get("shared.entry"), "SurveyEntry", None)
+    types = tuple(cls for cls in (view_type, entry_type) if cls is not None)
+    if not types:
+        return {"views": {}, "survey_entries": 0}
+
+    dispatchable = set()
+    try:
+        client = bc.get_live_bot()
+        dispatchable = {id(view) for view, _ in list(client._connection._view_store._views.values())}
+    except (RuntimeError, AttributeError):
+        pass
+
+    views = {}
+    entries = 0
+    for obj in gc.get_objects():
+        if not isinstance(obj, types):
+            continue
+        if entry_type is not None and isinstance(obj, entry_type):
+            entries += 1
+            continue
+        stats = views.setdefault(type(obj).__name__, {"live": 0, "dispatchable": 0, "participants": 0, "kib": 0})
+        stats["live"] += 1
+        stats["dispatchable"] += id(obj) in dispatchable
+        stats["participants"] += len(getattr(obj, "users_interacted_with_view", ()))
+        stats["kib"] += _shallow_size(obj) + sum(_shallow_size(item) for item in obj.children)
+    for stats in views.values():
+        stats["kib"] = _kib(stats["kib"])
+    return {"views": dict(sorted(views.items())), "survey_entries": entries}
+
+
+def discord_stores() -> dict:
+    """Sizes of py-cord's message cache, user cache, view and modal stores."""
+    try:
+        client = bc.get_live_bot()
+        connection = client._connection
+    except (RuntimeError, AttributeError):
+        return {}
+    view_store = connection._view_store
+    messages = connection._messages
+    return {
+        "view_items": len(view_store._views),
+        "views": len({id(view) for view, _ in list(view_store._views.values())}),
+        "message_views": len(view_store._synced_message_views),
+        "modals": len(connection._modal_store._modals),
+        "messages": len(messages) if messages is not None else 0,
+        "max_messages": connection.max_messages or 0,
+        "users": len(connection._users),
+        "private_channels": len(connection._private_channels),
+        "members": sum(len(guild.members) for guild in client.guilds),
+    }
+
+
+def session_state() -> dict:
+    """Attendance lists and survey participants of bot_data, per guild."""
+    # Reports must not import the bot before it has been started
+    if not bot.loaded:
+        return {}
+    return {
+        str(data.guild_id): {
+            "attendance": {group: len(students) for group, students in data.groups.items()},
+            "open_groups": sum(data.group_status.values()),
+            "surveys": {str(survey): len(students) for survey, students in data.survey.items()},
+        }
+        for data in bot.bot_data.all_guild_data()
+    }
+
+
+def server_caches() -> dict:
+    """Entries and size of the server information caches, per cache."""
+    functions = sys.modules.get("bot.discord_bot_functions")
+    if functions is None:
+        return {}
+    caches = {}
+    for name in CACHES:
+        cache = getattr(functions, name, None)
+        if not isinstance(cache, dict):
+            continue
+        caches[name.lstrip("_")] = {
+            "guilds": len(cache),
+            "entries": sum(len(value) if isinstance(value, (list, dict)) else 1 for value in cache.values()),
+            "kib": _kib(_data_size(cache)),
+        }
+    return caches
+
+
+########################################
+#               MONITOR                #
+########################################
+
+class MemoryMonitor:
+    """
+    Builds memory reports and logs a periodic summary of what changed.
+
+    Args:
+        snapshot_minutes (float): Minutes between two logged summaries, 0 disables them.
+        tracemalloc_enabled (bool): Start tracemalloc with the monitor.
+        tracemalloc_frames (int): Frames stored per traced allocation, more frames cost more memory.
+    """
+
+    def __init__(self, snapshot_minutes=DEFAULT_SNAPSHOT_MINUTES, tracemalloc_enabled=False,
+                 tracemalloc_frames=DEFAULT_TRACEMALLOC_FRAMES):
+        self.snapshot_minutes = float(snapshot_minutes)
+        self.tracemalloc_enabled = bool(tracemalloc_enabled)
+        self.tracemalloc_frames = int(tracemalloc_frames)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_values = None
+        self._last_trace = None
+
+    @classmethod
+    def from_settings(cls):
+        """Create a monitor configured by the optional "monitoring" section of .secrets.json."""
+        settings = (settings_manager.SETTINGS or {}).get("monitoring", {})
+        return cls(
+            snapshot_minutes=settings.get("memory_snapshot_minutes", DEFAULT_SNAPSHOT_MINUTES),
+            tracemalloc_enabled=settings.get("tracemalloc", False),
+            tracemalloc_frames=settings.get("tracemalloc_frames", DEFAULT_TRACEMALLOC_FRAMES),
+        )
+
+    def start(self) -> None:
+        """Start tracemalloc if configured and the periodic summaries, once per process."""
+        with self._lock:
+            if self.tracemalloc_enabled:
+                self.start_tracing()
+            if self._thread is not None or self.snapshot_minutes <= 0:
+                return
+            self._thread = threading.Thread(target=self._run, name="memory-monitor", daemon=True)
+            self._thread.start()
+        logger.info(f"Logging a memory summary every {self.snapshot_minutes:g} minutes")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def start_tracing(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self._last_trace = None
+
+    def stop_tracing(self) -> None:
+        tracemalloc.stop()
+        self._last_trace = None
+
+    def top_allocators(self, top: int = DEFAULT_TOP, snapshot=None) -> dict:
+        """The source lines holding the most traced memory, empty while tracemalloc is off."""
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        snapshot = snapshot or tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": True,
+            "traced_kib": _kib(current),
+            "peak_kib": _kib(peak),
+            "overhead_kib": _kib(tracemalloc.get_tracemalloc_memory()),
+            "top": [
+                {"line": str(stat.traceback[0]), "kib": _kib(stat.size), "blocks": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ],
+        }
+
+    def report(self, top: int = DEFAULT_TOP) -> dict:
+        """
+        Account for the memory of this process.
+
+        Args:
+            top (int): Allocating source lines to list.
+
+        Returns:
+            dict: The sections ``process``, ``tracemalloc``, ``objects``, ``discord``,
+                ``sessions`` and ``caches``.
+        """
+        return {
+            "process": process_memory(),
+            "tracemalloc": self.top_allocators(top),
+            "objects": live_objects(),
+            "discord": discord_stores(),
+            "sessions": session_state(),
+            "caches": server_caches(),
+        }
+
+    def log_summary(self) -> None:
+        """Log the numbers of a report that changed since the previous summary, and the lines that grew most."""
+        report = self.report(top=0)
+        values = _flatten({key: value for key, value in report.items() if key != "tracemalloc"})
+        if tracemalloc.is_tracing():
+            values["tracemalloc.traced_kib"] = report["tracemalloc"]["traced_kib"]
+
+        if self._last_values is None:
+            changes = [f"{key} {value:g}" for key, value in values.items()]
+        else:
+            changes = [
+                f"{key} {value:g} ({value - self._last_values.get(key, 0):+g})"
+                for key, value in values.items() if value != self._last_values.get(key, 0)
+            ]
+        self._last_values = values
+
+        growth = ""
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            if self._last_trace is not None:
+                grown = [stat for stat in snapshot.compare_to(self._last_trace, "lineno") if stat.size_diff > 0]
+                growth = "; grew most: " + ", ".join(
+                    f"{stat.traceback[0]} {_kib(stat.size_diff):+g} KiB" for stat in grown[:LOG_TOP]
+                ) if grown else ""
+            self._last_trace = snapshot
+
+        logger.info(f"Memory summary: {', '.join(changes) or 'unchanged'}{growth}")
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.snapshot_minutes * 60):
+            try:
+                self.log_summary()
+            except Exception as e:
+                logger.warning(f"Memory summary failed: {str(e)}")
+
+
+# Shared by the bot supervisor and the debug endpoints
+memory_monitor = MemoryMonitor.from_settings()
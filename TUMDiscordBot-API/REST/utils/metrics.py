@@ -0,0 +1,324 @@
+"""
+Metrics
+~~~~~~~~
+
+In-process metrics registry with counters, gauges and histograms, rendered in the
+Prometheus text exposition format by the /api/metrics endpoint.
+
+Recording is a dictionary lookup and a few additions under a per-metric lock, so the
+metrics can be used on the request and bot hot paths.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import bisect
+import functools
+import logging
+import threading
+import time
+
+from REST.utils import tracing
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def collect(self) -> list:
+        raise NotImplementedError
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.collect())
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing value, e.g. the number of handled requests."""
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> list:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """
+    A value that can go up and down.
+
+    If a callback is given, the gauge is evaluated when the metrics are rendered.
+    The callback returns either a number or a dict mapping label value tuples to numbers.
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry=None, callback=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.callback = callback
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self) -> list:
+        if self.callback is not None:
+            try:
+                result = self.callback()
+            except Exception as e:
+                logging.getLogger('discord_bot').debug(f"Gauge {self.name} callback failed: {e}")
+                return []
+            items = result.items() if isinstance(result, dict) else [((), result)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Samples observations (e.g. durations) into cumulative buckets."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry=None, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [bucket counts..., +Inf count], sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def time(self, **labels):
+        """Context manager and decorator observing the wall time of the wrapped block."""
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def collect(self) -> list:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            # A fresh timer per call, the decorator may run concurrently
+            with _Timer(self.histogram, self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class Registry:
+    """Holds the registered metrics and renders them in the text exposition format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+########################################
+#           SHARED METRICS             #
+########################################
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "REST requests handled, by blueprint route and status.",
+    ("blueprint", "route", "method", "status"),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "REST request latency by blueprint route.",
+    ("blueprint", "route", "method"),
+)
+BOT_CALL_WAIT_SECONDS = Histogram(
+    "bot_call_wait_seconds", "Time the REST thread waited for a coroutine scheduled on the bot loop.",
+    ("endpoint", "outcome"),
+)
+DISCORD_REST_SECONDS = Histogram(
+    "discord_rest_request_duration_seconds", "Latency of Discord REST calls made by the bot, by route.",
+    ("method", "route", "outcome"),
+)
+DISCORD_RATE_LIMITS = Counter(
+    "discord_rate_limits_total", "HTTP 429 responses received from Discord.",
+    ("scope",),
+)
+STORAGE_WRITE_SECONDS = Histogram(
+    "storage_write_duration_seconds", "Duration of audit and CSV writes.",
+    ("kind",), buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+########################################
+#      DISCORD HTTP INSTRUMENTATION    #
+########################################
+
+class _RateLimitLogHandler(logging.Handler):
+    """Counts the rate limit warnings py-cord logs before it retries a 429 response."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.msg if isinstance(record.msg, str) else ""
+        if message.startswith("We are being rate limited"):
+            DISCORD_RATE_LIMITS.inc(scope="bucket")
+        elif message.startswith("Global rate limit has been hit"):
+            DISCORD_RATE_LIMITS.inc(scope="global")
+        elif message.startswith("Webhook ID %s is rate limited"):
+            DISCORD_RATE_LIMITS.inc(scope="webhook")
+
+
+_rate_limit_handler = None
+
+
+def _timed(original_request, route_index: int = 0):
+    """Wrap a py-cord request coroutine, the route is its positional argument at ``route_index``."""
+
+    @functools.wraps(original_request)
+    async def timed_request(*args, **kwargs):
+        route = args[route_index]
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            with tracing.span("discord.http", method=route.method, route=route.path):
+                return await original_request(*args, **kwargs)
+        except Exception as e:
+            status = getattr(e, "status", None)
+            outcome = str(status) if status else type(e).__name__
+            if status == 429:
+                DISCORD_RATE_LIMITS.inc(scope="cloudflare")
+            raise
+        finally:
+            DISCORD_REST_SECONDS.observe(
+                time.perf_counter() - start, method=route.method, route=route.path, outcome=outcome
+            )
+
+    return timed_request
+
+
+def instrument_discord_http(http) -> None:
+    """
+    Time every request of a py-cord HTTPClient and count the 429 responses it receives.
+    Interaction responses, followups and their edits are sent by py-cord's webhook adapter
+    instead of the client, its requests are timed as well. Inside a trace, each request is
+    also recorded as a "discord.http" span. Calling it again for an already instrumented
+    client does nothing.
+
+    Args:
+        http (discord.http.HTTPClient): The HTTP client of the bot (``bot.http``).
+    """
+    global _rate_limit_handler
+
+    if _rate_limit_handler is None:
+        # Imported here, the REST app does not load py-cord until the bot starts
+        from discord.webhook.async_ import AsyncWebhookAdapter
+
+        _rate_limit_handler = _RateLimitLogHandler(level=logging.WARNING)
+        logging.getLogger('discord.http').addHandler(_rate_limit_handler)
+        logging.getLogger('discord.webhook.async_').addHandler(_rate_limit_handler)
+        # Shared by every client of the process, patched once
+        AsyncWebhookAdapter.request = _timed(AsyncWebhookAdapter.request, route_index=1)
+
+    if getattr(http, "_metrics_instrumented", False):
+        return
+
+    http.request = _timed(http.request)
+    http._metrics_instrumented = True
@@ -0,0 +1,182 @@
+"""
+Profiler
+~~~~~~~~
+
+On-demand sampling profiler for a running process. The stacks of all threads (the Flask
+request threads, the bot thread and its supervisor, the log and trace writers) are read
+with ``sys._current_frames`` at a fixed interval and counted per stack, so a stalled bot
+can be looked at without restarting it under a profiler.
+
+The result is in the collapsed stack format (``thread;outer (file:line);inner (file:line) count``)
+read by flamegraph.pl, speedscope and inferno. Next to it, :func:`dump_tasks` lists the
+asyncio tasks of the bot loop with where they are suspended, the views waiting for their
+timeout and the ``wait_for`` listeners. Both only read the state of the bot loop from the
+calling thread, so they answer while the loop is blocked.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import asyncio
+import collections
+import sys
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+DEFAULT_SECONDS = 5.0
+MAX_SECONDS = 60.0
+DEFAULT_INTERVAL_MS = 10.0
+MIN_INTERVAL_MS = 1.0
+# Frames of a task stack listed in the dump
+TASK_STACK_LIMIT = 8
+
+
+class ProfilerBusy(RuntimeError):
+    """A profile is already being taken in this process."""
+
+
+_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    path = Path(code.co_filename)
+    try:
+        filename = path.relative_to(PROJECT_ROOT).as_posix()
+    except ValueError:
+        # Standard library and site-packages, the last two parts are enough to tell them apart
+        filename = "/".join(path.parts[-2:])
+    return f"{code.co_name} ({filename}:{frame.f_lineno})"
+
+
+def _collapse(frame, thread_name: str) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+def sample(seconds: float = DEFAULT_SECONDS, interval_ms: float = DEFAULT_INTERVAL_MS) -> dict:
+    """
+    Sample the stacks of all threads of this process.
+
+    Args:
+        seconds (float): How long to sample, at most ``MAX_SECONDS``.
+        interval_ms (float): Milliseconds between samples, at least ``MIN_INTERVAL_MS``.
+
+    Raises:
+        ProfilerBusy: Another profile is being taken.
+
+    Returns:
+        dict: The sample count, the samples per thread and ``collapsed``, the collapsed stacks
+            one per line, most frequent first.
+    """
+    seconds = min(max(float(seconds), 0.0), MAX_SECONDS)
+    interval = max(float(interval_ms), MIN_INTERVAL_MS) / 1000
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+
+    try:
+        own = threading.get_ident()
+        stacks = collections.Counter()
+        threads = collections.Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                name = names.get(ident, f"thread-{ident}")
+                stacks[_collapse(frame, name)] += 1
+                threads[name] += 1
+            samples += 1
+            # Sleep to the next tick, a late tick is not made up for
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            time.sleep(min(interval, deadline - now))
+        elapsed = time.perf_counter() - started
+    finally:
+        _lock.release()
+
+    return {
+        "seconds": round(elapsed, 3),
+        "interval_ms": interval * 1000,
+        "samples": samples,
+        "threads": dict(threads.most_common()),
+        "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+    }
+
+
+def _describe_task(task: asyncio.Task) -> dict:
+    coro = task.get_coro()
+    entry = {
+        "name": task.get_name(),
+        "coro": getattr(coro, "__qualname__", repr(coro)),
+        "done": task.done(),
+        "stack": [_frame_label(frame) for frame in task.get_stack(limit=TASK_STACK_LIMIT)],
+    }
+    waiting = getattr(task, "_fut_waiter", None)
+    if waiting is not None:
+        entry["awaiting"] = repr(waiting)
+    return entry
+
+
+def _pending_views(client, now: float) -> list:
+    views = []
+    seen = set()
+    # The store holds each view once per component, see bot_metrics._count_active_views
+    for view, _ in list(client._connection._view_store._views.values()):
+        if id(view) in seen:
+            continue
+        seen.add(id(view))
+        # Name mangled attributes of discord.ui.View
+        expiry = getattr(view, "_View__timeout_expiry", None)
+        views.append({
+            "view": type(view).__name__,
+            "timeout": view.timeout,
+            "expires_in": round(expiry - now, 1) if expiry is not None else None,
+            "items": len(view.children),
+        })
+    return sorted(views, key=lambda view: (view["expires_in"] is None, view["expires_in"] or 0))
+
+
+def _wait_for_listeners(client) -> list:
+    listeners = []
+    for event, entries in list(client._listeners.items()):
+        pending = [future for future, _ in list(entries) if not future.done()]
+        if pending:
+            listeners.append({"event": event, "pending": len(pending)})
+    return listeners
+
+
+def dump_tasks(client) -> dict:
+    """
+    Describe what the bot event loop is waiting for.
+
+    Args:
+        client: The bot client, None when the bot is not running.
+
+    Returns:
+        dict: The tasks of the loop with their suspended stacks, the views waiting for
+            their timeout (soonest first) and the pending ``wait_for`` listeners by event.
+    """
+    loop = getattr(client, "loop", None) if client is not None else None
+    if loop is None or loop.is_closed():
+        return {"running": False, "tasks": [], "views": [], "listeners": []}
+
+    # all_tasks retries when the loop adds a task while the set is copied
+    tasks = sorted(asyncio.all_tasks(loop), key=lambda task: task.get_name())
+    return {
+        "running": loop.is_running(),
+        "tasks": [_describe_task(task) for task in tasks],
+        "views": _pending_views(client, time.monotonic()),
+        "listeners": _wait_for_listeners(client),
+    }
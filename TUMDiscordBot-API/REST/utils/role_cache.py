@@ -0,0 +1,113 @@
+"""
+Role Cache
+~~~~~~~~
+
+The roles of the course servers, kept in data/runtime/roles.json instead of .secrets.json.
+The bot stores them on ready and whenever a role is created, changed or deleted; the file
+is only written when the roles changed and every write increments its version. The mock
+context looks up the Admin role here.
+
+Settings written by older versions keep the roles in "access_roles" and
+"guild_access_roles", they are read until the bot has stored the roles once.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import datetime
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from REST import settings_manager
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+DEFAULT_PATH = settings_manager.PROJECT_ROOT / "data" / "runtime" / "roles.json"
+
+
+class RoleCache:
+    """
+    Versioned file of the role lists of every guild, as returned by ``get_roles``.
+
+    Args:
+        path (Path): The JSON file.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._data = None
+
+    def _load(self) -> dict:
+        if self._data is None:
+            try:
+                with open(self.path) as f:
+                    self._data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._data = {}
+        return self._data
+
+    def _save(self, data: dict) -> None:
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    @property
+    def version(self) -> int:
+        return self._load().get("version", 0)
+
+    def store(self, roles: dict, default_guild_id=None) -> bool:
+        """
+        Store the roles of every guild, unless they are unchanged.
+
+        Args:
+            roles (dict): The role lists by guild id.
+            default_guild_id: The guild whose roles are used for a guild without an entry.
+
+        Returns:
+            bool: Whether the file was written.
+        """
+        default_guild_id = str(default_guild_id) if default_guild_id is not None else None
+        with self._lock:
+            data = self._load()
+            if data.get("guilds") == roles and data.get("default_guild_id") == default_guild_id:
+                return False
+            data = {
+                "version": data.get("version", 0) + 1,
+                "updated_at": datetime.datetime.now().isoformat(timespec='seconds'),
+                "default_guild_id": default_guild_id,
+                "guilds": roles,
+            }
+            self._save(data)
+            self._data = data
+        return True
+
+    def access_roles(self, guild_id=None):
+        """
+        The roles of a guild, those of the default guild if it has no entry.
+
+        Returns:
+            list: The roles, None if no roles were stored yet.
+        """
+        data = self._load()
+        guilds = data.get("guilds")
+        if guilds is None:
+            # Stored in the settings by older versions
+            settings = settings_manager.get_settings()
+            roles = settings.get("access_roles")
+            if guild_id is not None:
+                roles = settings.get("guild_access_roles", {}).get(str(guild_id), roles)
+            return roles
+        if guild_id is not None and str(guild_id) in guilds:
+            return guilds[str(guild_id)]
+        return guilds.get(data.get("default_guild_id"))
+
+
+# Written by the bot events, read by the mock context
+role_cache = RoleCache()
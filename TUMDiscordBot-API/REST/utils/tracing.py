@@ -0,0 +1,435 @@
+"""
+Tracing
+~~~~~~~~
+
+Lightweight tracing spans for REST requests. A trace is started by ``requires_api_key``,
+the current span is kept in a context variable and follows the coroutine scheduled on
+the bot loop by ``run_on_bot_loop``, so Discord API calls and file writes made on behalf
+of a request show up as timed child spans of it.
+
+Finished traces are kept in memory for the /api/traces endpoints and, if enabled in the
+"monitoring" settings, appended to a daily JSONL file by a background thread. A span that
+ends after its root (e.g. a Discord call still running when the request timed out) is
+appended to the file when it ends.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import contextvars
+import datetime
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from REST import settings_manager
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_EXPORT_DIR = PROJECT_ROOT / 'data' / 'traces'
+DEFAULT_MAX_TRACES = 200
+
+_TRACE_ID_RE = re.compile(r'[0-9a-fA-F]{8,32}')
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+class Span:
+    """
+    A timed operation belonging to a trace.
+
+    Args:
+        trace (Trace): The trace the span belongs to.
+        name (str): Name of the operation, e.g. "discord.http".
+        parent_id (str): Span id of the parent span, None for the root span.
+        attributes (dict): Additional information shown in the breakdown.
+    """
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start", "end", "status", "thread")
+
+    def __init__(self, trace, name: str, parent_id=None, attributes=None):
+        self.trace = trace
+        self.span_id = _new_id(4)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes or {}
+        self.start = time.time()
+        self.end = None
+        self.status = "ok"
+        self.thread = threading.current_thread().name
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.time()
+        return (end - self.start) * 1000
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def finish(self, status=None) -> None:
+        if self.end is not None:
+            return
+        self.end = time.time()
+        if status is not None:
+            self.status = status
+        self.trace.add(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "thread": self.thread,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """The finished spans of one request, grouped under a root span."""
+
+    def __init__(self, tracer, trace_id: str):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.root = None
+        self.spans = []
+        self.finished = False
+        self._exported = 0
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            late = self.finished
+            if span is self.root:
+                self.finished = True
+        if span is self.root:
+            self.tracer.finish(self)
+        elif late:
+            self.tracer.queue_export(self)
+
+    def to_dicts(self) -> list:
+        with self._lock:
+            return [span.to_dict() for span in self.spans]
+
+    def unexported(self) -> list:
+        """The spans not yet written by the exporter, marked as written."""
+        with self._lock:
+            spans, self._exported = self.spans[self._exported:], len(self.spans)
+            return [span.to_dict() for span in spans]
+
+    def breakdown(self) -> dict:
+        """
+        Return the spans as a tree ordered by start time, with offsets relative to the root
+        and the time of each span not covered by its children.
+        """
+        spans = sorted(self.to_dicts(), key=lambda s: s["start"])
+        root = self.root.to_dict() if self.root else (spans[0] if spans else None)
+        if root is None:
+            return {"trace_id": self.trace_id, "spans": []}
+
+        children = {}
+        for span in spans:
+            children.setdefault(span["parent_id"], []).append(span)
+
+        rows = []
+
+        def walk(span, depth):
+            child_time = sum(child["duration_ms"] for child in children.get(span["span_id"], []))
+            rows.append({
+                "name": span["name"],
+                "depth": depth,
+                "offset_ms": round((span["start"] - root["start"]) * 1000, 3),
+                "duration_ms": span["duration_ms"],
+                "self_ms": round(max(0.0, span["duration_ms"] - child_time), 3),
+                "status": span["status"],
+                "thread": span["thread"],
+                "attributes": span["attributes"],
+            })
+            for child in children.get(span["span_id"], []):
+                walk(child, depth + 1)
+
+        walk(root, 0)
+        return {
+            "trace_id": self.trace_id,
+            "name": root["name"],
+            "start": datetime.datetime.fromtimestamp(root["start"]).strftime('%Y-%m-%d %H:%M:%S'),
+            "duration_ms": root["duration_ms"],
+            "status": root["status"],
+            "spans": rows,
+        }
+
+    def summary(self) -> dict:
+        root = self.root
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name if root else None,
+            "caller_trace_id": root.attributes.get("caller_trace_id") if root else None,
+            "start": root.start if root else None,
+            "duration_ms": round(root.duration_ms, 3) if root else None,
+            "status": root.status if root else None,
+            "spans": len(self.spans),
+        }
+
+
+class _SpanScope:
+    """Context manager and decorator opening a child span of the current span."""
+
+    def __init__(self, tracer, name: str, attributes: dict, parent=None):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.span = None
+        self._token = None
+
+    def __enter__(self):
+        parent = self.parent if self.parent is not None else _current_span.get()
+        if parent is None or not self.tracer.enabled:
+            return None
+        self.span = Span(parent.trace, self.name, parent.span_id, dict(self.attributes))
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is None:
+            return False
+        _current_span.reset(self._token)
+        if exc_type:
+            self.span.set_attribute("error", f"{exc_type.__name__}: {exc}")
+        self.span.finish("error" if exc_type else None)
+        return False
+
+    def __call__(self, func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _SpanScope(self.tracer, self.name, self.attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _SpanScope(self.tracer, self.name, self.attributes):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class Tracer:
+    """
+    Creates traces and keeps the most recent finished ones.
+
+    Args:
+        enabled (bool): Whether spans are recorded at all.
+        max_traces (int): Number of finished traces kept in memory.
+        export (bool): Whether finished traces are appended to a JSONL file.
+        export_dir (Path): Directory of the daily JSONL files.
+    """
+
+    def __init__(self, enabled=True, max_traces=DEFAULT_MAX_TRACES, export=False, export_dir=DEFAULT_EXPORT_DIR):
+        self.enabled = bool(enabled)
+        self.max_traces = int(max_traces)
+        self.export = bool(export)
+        self.export_dir = Path(export_dir)
+
+        self._lock = threading.Lock()
+        self._traces = OrderedDict()
+        self._export_queue = queue.Queue()
+        self._export_thread = None
+
+    @classmethod
+    def from_settings(cls):
+        """Create a tracer configured by the optional "monitoring" section of .secrets.json."""
+        settings = (settings_manager.SETTINGS or {}).get("monitoring", {})
+        return cls(
+            enabled=settings.get("tracing", True),
+            max_traces=settings.get("trace_buffer_size", DEFAULT_MAX_TRACES),
+            export=settings.get("trace_export", False),
+            export_dir=settings.get("trace_export_dir", DEFAULT_EXPORT_DIR),
+        )
+
+    ########################################
+    #               SPANS                  #
+    ########################################
+
+    def start_trace(self, name: str, caller_trace_id=None, **attributes):
+        """
+        Start a new trace and make its root span the current span.
+
+        Every trace gets an id of its own, a caller sending the same id twice would otherwise
+        replace its first trace.
+
+        Args:
+            name (str): Name of the root span, usually the endpoint.
+            caller_trace_id (str): Hex id passed in by the caller, kept as the ``caller_trace_id`` attribute.
+            **attributes: Attributes of the root span.
+
+        Returns:
+            tuple: The root span and the token to pass to ``end_trace``, (None, None) if disabled.
+        """
+        if not self.enabled:
+            return None, None
+        if caller_trace_id and _TRACE_ID_RE.fullmatch(caller_trace_id):
+            attributes["caller_trace_id"] = caller_trace_id.lower()
+        trace = Trace(self, _new_id(8))
+        trace.root = Span(trace, name, None, attributes)
+        return trace.root, _current_span.set(trace.root)
+
+    def end_trace(self, root, token, status=None) -> None:
+        """Finish the root span started by ``start_trace`` and restore the previous span."""
+        if root is None:
+            return
+        _current_span.reset(token)
+        root.finish(status)
+
+    def span(self, name: str, parent=None, **attributes) -> _SpanScope:
+        """
+        Open a child span of the current span, usable as context manager or decorator.
+        Without an active trace nothing is recorded.
+        """
+        return _SpanScope(self, name, attributes, parent)
+
+    def record_span(self, name: str, parent, start: float, end: float, **attributes) -> None:
+        """Record an already measured interval (wall clock seconds) as a child of ``parent``."""
+        if parent is None or not self.enabled:
+            return
+        span = Span(parent.trace, name, parent.span_id, attributes)
+        span.start, span.end = start, end
+        parent.trace.add(span)
+
+    ########################################
+    #              STORAGE                 #
+    ########################################
+
+    def finish(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces[trace.trace_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        self.queue_export(trace)
+
+    def queue_export(self, trace: Trace) -> None:
+        """Queue the spans of a trace the exporter has not written yet, called again for late spans."""
+        if self.export:
+            self._ensure_exporter()
+            self._export_queue.put(trace)
+
+    def get(self, trace_id: str):
+        with self._lock:
+            return self._traces.get(trace_id)
+
+    def recent(self, limit=50, name=None, min_duration_ms=0.0, caller_trace_id=None) -> list:
+        """Summaries of the most recent traces, newest first."""
+        with self._lock:
+            traces = list(self._traces.values())
+        result = []
+        for trace in reversed(traces):
+            summary = trace.summary()
+            if name and summary["name"] != name:
+                continue
+            if caller_trace_id and summary["caller_trace_id"] != caller_trace_id.lower():
+                continue
+            if (summary["duration_ms"] or 0) < min_duration_ms:
+                continue
+            result.append(summary)
+            if len(result) >= limit:
+                break
+        return result
+
+    ########################################
+    #               EXPORT                 #
+    ########################################
+
+    def export_jsonl(self, path=None) -> Path:
+        """
+        Write all traces held in memory to a JSONL file, one span per line.
+
+        Args:
+            path (Path): Target file, defaults to a timestamped file in the export directory.
+
+        Returns:
+            Path: The written file.
+        """
+        if path is None:
+            timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+            path = self.export_dir / f"traces_dump_{timestamp}.jsonl"
+        path = Path(path)
+        path.parent.mkdir(exist_ok=True, parents=True)
+
+        with self._lock:
+            traces = list(self._traces.values())
+        with open(path, 'w') as f:
+            for trace in traces:
+                for span in trace.to_dicts():
+                    f.write(json.dumps(span) + "\n")
+        return path
+
+    def _ensure_exporter(self) -> None:
+        if self._export_thread is not None and self._export_thread.is_alive():
+            return
+        with self._lock:
+            if self._export_thread is not None and self._export_thread.is_alive():
+                return
+            self._export_thread = threading.Thread(target=self._export_worker, name="trace-exporter", daemon=True)
+            self._export_thread.start()
+
+    def _export_worker(self) -> None:
+        self.export_dir.mkdir(exist_ok=True, parents=True)
+        while True:
+            batch = [self._export_queue.get()]
+            # Write whatever else is waiting in one go
+            while True:
+                try:
+                    batch.append(self._export_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            export_file = self.export_dir / f"traces_{datetime.datetime.now().strftime('%Y-%m-%d')}.jsonl"
+            try:
+                with open(export_file, 'a') as f:
+                    for trace in batch:
+                        for span in trace.unexported():
+                            f.write(json.dumps(span) + "\n")
+            except OSError as e:
+                logger.error(f"Failed to export traces to {export_file}: {e}")
+
+
+# Single tracer shared by the REST API and the bot
+tracer = Tracer.from_settings()
+
+
+def current_span():
+    """Return the span of the running request or coroutine, None outside of a trace."""
+    return _current_span.get()
+
+
+def current_trace_id():
+    """Return the id of the running trace, None outside of a trace."""
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+def span(name: str, **attributes) -> _SpanScope:
+    """Shortcut for ``tracer.span``."""
+    return tracer.span(name, **attributes)
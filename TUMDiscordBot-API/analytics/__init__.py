@@ -0,0 +1,12 @@
+from .survey_analytics import (
+    load_answers,
+    parse_file,
+    filter_answers,
+    distribution,
+    question_aggregates,
+    topic_aggregates,
+    session_trends,
+    SCALES,
+)
+from .attendance_analytics import load_attendance, read_attendance
+from .reports import survey_report, feedback_report, attendance_report
@@ -0,0 +1,78 @@
+"""
+Command line interface of the survey analytics.
+
+Usage::
+
+    python -m analytics distribution --by topic question --percent
+    python -m analytics questions --scale difficulty
+    python -m analytics topics --format json
+    python -m analytics trends --scale feedback --window 4
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import argparse
+import sys
+
+import pandas as pd
+
+from analytics import survey_analytics as sa
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m analytics", description="Survey and feedback analytics.")
+    parser.add_argument("report", choices=["distribution", "questions", "topics", "trends", "answers"])
+    parser.add_argument("--data-dir", action="append", help="Directory with survey CSV files, may be repeated.")
+    parser.add_argument("--scale", choices=list(sa.SCALES))
+    parser.add_argument("--topic")
+    parser.add_argument("--guild", help="Course server id, the files of every server by default.")
+    parser.add_argument("--kind", choices=["SS", "CS", "TS"], help="Simple, complex survey or tutor session.")
+    parser.add_argument("--since", help="Earliest session time, e.g. 2025-04-01.")
+    parser.add_argument("--until", help="Latest session time.")
+    parser.add_argument("--by", nargs="+", default=["scale"], help="Grouping columns of the distribution.")
+    parser.add_argument("--percent", action="store_true", help="Show the distribution in percent.")
+    parser.add_argument("--window", type=int, default=3, help="Sessions in the rolling mean of the trends.")
+    parser.add_argument("--format", choices=["table", "csv", "json"], default="table")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = _build_parser().parse_args(argv)
+
+    frame = sa.load_answers(args.data_dir)
+    frame = sa.filter_answers(frame, scale=args.scale, topic=args.topic, kind=args.kind,
+                              since=args.since, until=args.until, guild_id=args.guild)
+    if frame.empty:
+        print("No survey answers found.", file=sys.stderr)
+        return 1
+
+    if args.report == "distribution":
+        unknown = set(args.by) - set(sa.COLUMNS)
+        if unknown:
+            print(f"Unknown grouping columns: {', '.join(sorted(unknown))}", file=sys.stderr)
+            return 2
+        result = sa.distribution(frame, by=args.by, normalize=args.percent)
+    elif args.report == "questions":
+        result = sa.question_aggregates(frame)
+    elif args.report == "topics":
+        result = sa.topic_aggregates(frame)
+    elif args.report == "trends":
+        result = sa.session_trends(frame, window=args.window)
+    else:
+        result = frame
+
+    if args.format == "csv":
+        result.to_csv(sys.stdout)
+    elif args.format == "json":
+        if not isinstance(result.index, pd.RangeIndex):
+            result = result.reset_index()
+        print(result.to_json(orient="records", date_format="iso", indent=2))
+    else:
+        with pd.option_context("display.max_rows", None, "display.max_columns", None, "display.width", 200):
+            print(result.to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
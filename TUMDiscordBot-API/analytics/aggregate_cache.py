@@ -0,0 +1,104 @@
+"""
+Aggregate Cache
+~~~~~~~~
+
+Keeps a small partial aggregate per data file, keyed by the file's path below the data
+directory (the files of every course server are in a subdirectory), modification time and size. Refreshing only summarises files that are new or changed, reports are
+built from the partials and memoised per file set, so a new session file costs one
+CSV parse instead of a re-read of the whole directory.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+
+class AggregateCache:
+    """
+    Partial aggregates of the CSV files of one directory and its subdirectories.
+
+    Args:
+        directory (Path): Directory holding the data files, directly or one subdirectory per course server.
+        summarize (callable): Turns a file path into a partial aggregate DataFrame,
+            returns None for files that should be ignored.
+        max_reports (int): Number of memoised reports kept.
+    """
+
+    def __init__(self, directory, summarize, max_reports=64):
+        self.directory = Path(directory)
+        self.summarize = summarize
+        self.max_reports = max_reports
+
+        self._lock = threading.Lock()
+        # Path below the directory -> ((mtime_ns, size), partial aggregate or None)
+        self._partials = {}
+        self._combined = None
+        self._signature = ()
+        self._reports = OrderedDict()
+
+    def refresh(self) -> tuple:
+        """
+        Summarise new or changed files and forget deleted ones.
+
+        Returns:
+            tuple: The signature of the current file set.
+        """
+        with self._lock:
+            present = {}
+            if self.directory.is_dir():
+                for path in (*self.directory.glob('*.csv'), *self.directory.glob('*/*.csv')):
+                    stat = path.stat()
+                    present[path.relative_to(self.directory).as_posix()] = (path, (stat.st_mtime_ns, stat.st_size))
+
+            changed = set(self._partials) - set(present)
+            for name in changed:
+                del self._partials[name]
+
+            for name, (path, version) in present.items():
+                cached = self._partials.get(name)
+                if cached is not None and cached[0] == version:
+                    continue
+                self._partials[name] = (version, self.summarize(path))
+                changed.add(name)
+
+            if changed or self._combined is None:
+                frames = [partial for _, partial in self._partials.values() if partial is not None]
+                self._combined = pd.concat(frames, ignore_index=True) if frames else None
+                self._signature = tuple(sorted((name, version) for name, (version, _) in self._partials.items()))
+            return self._signature
+
+    def partials(self):
+        """Return the combined partial aggregates of all files, None if there are none."""
+        self.refresh()
+        return self._combined
+
+    def report(self, name: str, build, **params):
+        """
+        Return a memoised report, rebuilt only when the file set or the parameters change.
+
+        Args:
+            name (str): Name of the report.
+            build (callable): Called with the combined partials and ``params``.
+            **params: Report parameters, part of the cache key.
+        """
+        signature = self.refresh()
+        key = (name, tuple(sorted(params.items())), signature)
+
+        with self._lock:
+            if key in self._reports:
+                self._reports.move_to_end(key)
+                return self._reports[key]
+            combined = self._combined
+
+        result = build(combined, **params)
+
+        with self._lock:
+            self._reports[key] = result
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+        return result
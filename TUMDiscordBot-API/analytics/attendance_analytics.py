@@ -0,0 +1,107 @@
+"""
+Attendance Analytics
+~~~~~~~~
+
+Loads the attendance CSV files written by ``utility.save_attendance_to_csv``
+(``data/attendance/{guild_id}/{group}_{YYYY-MM-DD_HH-MM}.csv`` with a single ``Attendance``
+column) into a long-form pandas frame, one row per student and session.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import re
+from pathlib import Path
+
+import pandas as pd
+
+from analytics.survey_analytics import DATA_DIR, data_files, file_guild_id
+
+ATTENDANCE_DIR = DATA_DIR / 'attendance'
+
+COLUMNS = ["session", "guild_id", "group", "timestamp", "student"]
+
+_ATTENDANCE_FILE_RE = re.compile(r'^(?P<group>.+)_(?P<stamp>\d{4}-\d{2}-\d{2}_\d{2}-\d{2})$')
+
+
+def empty_frame() -> pd.DataFrame:
+    """Return an empty attendance frame with the typed columns."""
+    return _typed(pd.DataFrame({column: [] for column in COLUMNS}))
+
+
+def _typed(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.astype({
+        "session": "string",
+        "guild_id": "category",
+        "group": "category",
+        "timestamp": "datetime64[ns]",
+        "student": "string",
+    })
+
+
+def describe_file(path) -> dict:
+    """
+    Extract the session metadata encoded in an attendance file name.
+
+    Args:
+        path (Path): The CSV file.
+
+    Returns:
+        dict: session, guild_id, group and timestamp, None if the name is not recognised.
+    """
+    path = Path(path)
+    match = _ATTENDANCE_FILE_RE.match(path.stem)
+    if not match:
+        return None
+    return {
+        "session": path.stem,
+        "guild_id": file_guild_id(path),
+        "group": match["group"],
+        "timestamp": pd.to_datetime(match["stamp"], format="%Y-%m-%d_%H-%M"),
+    }
+
+
+def read_attendance(path):
+    """
+    Parse one attendance file.
+
+    Args:
+        path (Path): The CSV file.
+
+    Returns:
+        pd.DataFrame: One row per attending student, None if the file is not an attendance file.
+    """
+    meta = describe_file(path)
+    if meta is None:
+        return None
+
+    try:
+        students = pd.read_csv(path, dtype=str, keep_default_na=False)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, OSError):
+        return None
+    if "Attendance" not in students.columns:
+        return None
+
+    names = students["Attendance"].str.strip()
+    frame = pd.DataFrame({"student": names[names != ""].drop_duplicates()})
+    for key, value in meta.items():
+        frame[key] = value
+    return frame[COLUMNS]
+
+
+def load_attendance(directory=ATTENDANCE_DIR) -> pd.DataFrame:
+    """
+    Load all attendance files of a directory.
+
+    Args:
+        directory (Path): Directory to scan with its per server subdirectories, defaults to data/attendance.
+
+    Returns:
+        pd.DataFrame: One row per student and session, sorted by session time.
+    """
+    frames = [read_attendance(path) for path in data_files(directory)]
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        return empty_frame()
+    frame = _typed(pd.concat(frames, ignore_index=True))
+    return frame.sort_values(["timestamp", "session"], kind="stable", ignore_index=True)
@@ -0,0 +1,168 @@
+"""
+Chart Service
+~~~~~~~~
+
+Renders the analytics charts in one long-lived renderer process, so plotting neither
+blocks the request threads on the GIL nor pays the matplotlib import per request.
+Rendered images are cached by a hash of the chart data with LRU eviction; a repeated
+dashboard view is a dictionary lookup.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import hashlib
+import json
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from analytics import reports
+from analytics.survey_analytics import SCALES
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+DEFAULT_CACHE_ENTRIES = 128
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+RENDER_TIMEOUT = 60
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def render_chart(name: str, *args) -> bytes:
+    """Run the chart function ``name`` of analytics.charts, matplotlib is only imported where this runs."""
+    from analytics import charts
+    return getattr(charts, name)(*args)
+
+
+class ChartService:
+    """
+    Renders charts in a single worker process and caches the images.
+
+    Args:
+        max_entries (int): Number of images kept in the cache.
+        max_bytes (int): Total size of the cached images.
+        use_process (bool): Render in a worker process, otherwise in the calling thread.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES, max_bytes=DEFAULT_CACHE_BYTES, use_process=True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.use_process = use_process
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    ########################################
+    #              RENDERING               #
+    ########################################
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawn, forking a process that runs the bot loop and Flask threads is unsafe
+                self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _render(self, name, *args) -> bytes:
+        if not self.use_process:
+            return render_chart(name, *args)
+        try:
+            return self._get_executor().submit(render_chart, name, *args).result(timeout=RENDER_TIMEOUT)
+        except BrokenProcessPool:
+            logger.warning("Chart renderer process died, starting a new one")
+            with self._lock:
+                self._executor = None
+            return self._get_executor().submit(render_chart, name, *args).result(timeout=RENDER_TIMEOUT)
+
+    def shutdown(self) -> None:
+        """Stop the renderer process."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    ########################################
+    #                CACHE                 #
+    ########################################
+
+    def render(self, kind: str, fmt: str, name: str, *args) -> tuple:
+        """
+        Return the cached image for the chart data or render it with the chart function ``name``.
+
+        Returns:
+            tuple: The image bytes and the data hash (usable as ETag).
+        """
+        key = hashlib.sha256(json.dumps([kind, fmt, args], sort_keys=True, default=str).encode()).hexdigest()
+        with self._lock:
+            image = self._cache.get(key)
+            if image is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return image, key
+            self.misses += 1
+
+        image = self._render(name, *args)
+
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = image
+                self._cached_bytes += len(image)
+            while self._cache and (len(self._cache) > self.max_entries or self._cached_bytes > self.max_bytes):
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+        return image, key
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._cache), "bytes": self._cached_bytes, "hits": self.hits, "misses": self.misses}
+
+    ########################################
+    #                CHARTS                #
+    ########################################
+
+    def topic_chart(self, topic: str, fmt: str = "png", guild_id=None) -> tuple:
+        """Answer shares per question of a survey topic."""
+        report = reports.survey_report(guild_id=guild_id, topic=topic)
+        questions = []
+        for entry in report["topics"]:
+            labels = list(SCALES[entry["scale"]])
+            for question in entry["questions"]:
+                questions.append({
+                    "question": question["question"],
+                    "scale": entry["scale"],
+                    "labels": labels,
+                    "responses": question["responses"],
+                    "percentages": question["percentages"],
+                })
+        return self.render("topic", fmt, "render_topic_chart", topic, questions, fmt)
+
+    def feedback_chart(self, group=None, fmt: str = "png", guild_id=None) -> tuple:
+        """Mean tutor session feedback per session over time, one line per group."""
+        series = {}
+        for point in reports.feedback_report(guild_id=guild_id, group=group)["time_series"]:
+            series.setdefault(point["group"], []).append((point["timestamp"], point["mean"]))
+        title = f"Tutor session feedback of {group}" if group else "Tutor session feedback"
+        return self.render("feedback", fmt, "render_time_series_chart", title, series,
+                           "Mean feedback (1 = Poor, 3 = Good)", fmt, (0.8, 3.2))
+
+    def attendance_chart(self, group=None, fmt: str = "png", guild_id=None) -> tuple:
+        """Attendees per session over time, one line per group."""
+        series = {}
+        for point in reports.attendance_report(guild_id=guild_id, group=group)["time_series"]:
+            series.setdefault(point["group"], []).append((point["timestamp"], point["attendees"]))
+        title = f"Attendance of {group}" if group else "Attendance"
+        return self.render("attendance", fmt, "render_time_series_chart", title, series,
+                           "Students", fmt, None, True)
+
+
+# Single renderer shared by the REST API
+chart_service = ChartService()
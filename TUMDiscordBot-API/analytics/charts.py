@@ -0,0 +1,95 @@
+"""
+Charts
+~~~~~~~~
+
+Headless (Agg) matplotlib rendering of the analytics reports. The functions take plain
+report data (lists and dicts) and return the encoded image, so they can run in a
+separate renderer process.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import datetime
+import io
+
+from matplotlib.figure import Figure
+from matplotlib.ticker import MaxNLocator, PercentFormatter
+
+
+def _encode(fig: Figure, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    # Figure with the Agg canvas, no pyplot state and no GUI backend involved
+    fig.savefig(buffer, format=fmt, dpi=100)
+    return buffer.getvalue()
+
+
+def render_topic_chart(topic: str, questions: list, fmt: str = "png") -> bytes:
+    """
+    Horizontal bars with the share of each answer per question of a survey topic.
+
+    Args:
+        topic (str): The survey topic, used as title.
+        questions (list): Dicts with ``question``, ``scale``, ``labels`` (in scale order)
+            and ``percentages`` (label -> percent).
+        fmt (str): "png" or "svg".
+    """
+    rows = max(len(questions), 1)
+    fig = Figure(figsize=(9, 2.2 * rows + 0.5), layout="constrained")
+    axes = fig.subplots(rows, 1, squeeze=False)[:, 0]
+
+    if not questions:
+        axes[0].text(0.5, 0.5, "No answers", ha="center", va="center")
+        axes[0].set_axis_off()
+
+    for ax, question in zip(axes, questions):
+        labels = question["labels"]
+        values = [question["percentages"].get(label, 0) for label in labels]
+        rects = ax.barh(labels, values, align="center", height=0.5)
+        ax.bar_label(rects, [f"{value:.0f}%" for value in values], padding=4, fontweight="bold")
+        ax.set_title(f"{question['question']} ({question['responses']} answers)", loc="left", fontsize=10)
+        ax.set_xlim(0, 100)
+        ax.xaxis.set_major_formatter(PercentFormatter())
+        ax.xaxis.grid(True, linestyle="--", color="grey", alpha=0.25)
+        ax.invert_yaxis()
+
+    fig.suptitle(topic)
+    return _encode(fig, fmt)
+
+
+def render_time_series_chart(title: str, series: dict, ylabel: str, fmt: str = "png", ylim=None,
+                             integer=False) -> bytes:
+    """
+    One line per series over the session timestamps.
+
+    Args:
+        title (str): Chart title.
+        series (dict): Series name -> list of (ISO timestamp, value) points.
+        ylabel (str): Label of the value axis.
+        fmt (str): "png" or "svg".
+        ylim (tuple): Fixed range of the value axis.
+        integer (bool): Only use integer ticks on the value axis.
+    """
+    fig = Figure(figsize=(9, 5), layout="constrained")
+    ax = fig.subplots()
+
+    if not series:
+        ax.text(0.5, 0.5, "No sessions", ha="center", va="center")
+        ax.set_axis_off()
+
+    for name, points in series.items():
+        times = [datetime.datetime.fromisoformat(point[0]) for point in points]
+        ax.plot(times, [point[1] for point in points], marker="o", label=name)
+
+    ax.set_title(title)
+    ax.set_ylabel(ylabel)
+    ax.set_xlabel("Session")
+    if ylim is not None:
+        ax.set_ylim(*ylim)
+    if integer:
+        ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+    ax.yaxis.grid(True, linestyle="--", color="grey", alpha=0.25)
+    ax.tick_params(axis="x", labelrotation=45)
+    if len(series) > 1:
+        ax.legend()
+    return _encode(fig, fmt)
@@ -0,0 +1,199 @@
+"""
+Reports
+~~~~~~~~
+
+JSON-ready survey, tutor feedback and attendance aggregates for the /api/analytics
+endpoints. Every data file is reduced to a small partial aggregate (answer counts and
+value sums per question, or the attendees of a session); counts and sums are additive,
+so the reports are built from the cached partials without reading the CSV files again.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import pandas as pd
+
+from analytics.aggregate_cache import AggregateCache
+from analytics.attendance_analytics import ATTENDANCE_DIR, read_attendance
+from analytics.attendance_analytics import describe_file as describe_attendance_file
+from analytics.survey_analytics import (
+    ANSWER_ORDER,
+    EXERCISE_FEEDBACK_DIR,
+    TUTOR_SESSION_FEEDBACK_DIR,
+    read_answers,
+    session_time,
+)
+
+_ANSWER_KEYS = ["session", "guild_id", "kind", "topic", "group", "timestamp", "scale", "question", "answer"]
+
+
+########################################
+#          PARTIAL AGGREGATES          #
+########################################
+
+def answer_partial(path):
+    """Answer counts and value sums per question and label of one survey or feedback file."""
+    frame = read_answers(path)
+    if frame is None:
+        return None
+    # Grouping drops missing keys: no group (surveys) and no server (files of the old flat layout)
+    frame = frame.fillna({"group": "", "guild_id": ""})
+    return (
+        frame.groupby(_ANSWER_KEYS, sort=False)["value"]
+        .agg(count="size", value_sum="sum")
+        .reset_index()
+    )
+
+
+def attendance_partial(path):
+    """Attendees of one attendance session."""
+    meta = describe_attendance_file(path)
+    frame = read_attendance(path)
+    if meta is None or frame is None:
+        return None
+    # A session nobody attended still counts as a session, a file of the old flat layout has no server
+    return pd.DataFrame([{**meta, "guild_id": meta["guild_id"] or "", "attendees": len(frame),
+                          "students": tuple(frame["student"])}])
+
+
+survey_cache = AggregateCache(EXERCISE_FEEDBACK_DIR, answer_partial)
+feedback_cache = AggregateCache(TUTOR_SESSION_FEEDBACK_DIR, answer_partial)
+attendance_cache = AggregateCache(ATTENDANCE_DIR, attendance_partial)
+
+
+########################################
+#               HELPERS                #
+########################################
+
+def _filter(frame, since=None, until=None, **equals):
+    if frame is None or frame.empty:
+        return None
+    mask = pd.Series(True, index=frame.index)
+    for column, value in equals.items():
+        if value:
+            mask &= frame[column] == value
+    if since:
+        mask &= frame["timestamp"] >= session_time(since)
+    if until:
+        mask &= frame["timestamp"] <= session_time(until)
+    frame = frame[mask]
+    return None if frame.empty else frame
+
+
+def _breakdown(frame: pd.DataFrame, keys: list) -> list:
+    """Responses, mean value, counts and percentages per label for each group of ``keys``."""
+    counts = frame.pivot_table(index=keys, columns="answer", values="count", aggfunc="sum", fill_value=0)
+    counts = counts.reindex(columns=[label for label in ANSWER_ORDER if label in counts.columns])
+    sums = frame.groupby(keys)[["count", "value_sum"]].sum()
+    totals = sums["count"]
+    means = (sums["value_sum"] / totals).round(3)
+    percentages = counts.div(totals, axis=0).mul(100).round(2)
+
+    rows = []
+    for key in counts.index:
+        key_values = key if isinstance(key, tuple) else (key,)
+        row = dict(zip(keys, key_values))
+        distribution = counts.loc[key]
+        used = distribution[distribution > 0].index
+        row.update({
+            "responses": int(totals.loc[key]),
+            "mean": float(means.loc[key]),
+            "distribution": {label: int(distribution[label]) for label in used},
+            "percentages": {label: float(percentages.loc[key, label]) for label in used},
+        })
+        rows.append(row)
+    return rows
+
+
+def _sessions(frame: pd.DataFrame) -> int:
+    # Two servers closing the same group in the same minute have sessions of the same name
+    return int(len(frame[["guild_id", "session"]].drop_duplicates()))
+
+
+def _time_series(frame: pd.DataFrame, keys: list) -> list:
+    series = frame.groupby(["timestamp", "session", "guild_id"] + keys)[["count", "value_sum"]].sum().reset_index()
+    series["mean"] = (series["value_sum"] / series["count"]).round(3)
+    series["timestamp"] = series["timestamp"].dt.strftime('%Y-%m-%dT%H:%M')
+    series = series.rename(columns={"count": "responses"}).drop(columns="value_sum")
+    return series.sort_values(["timestamp", "session"], kind="stable").to_dict(orient="records")
+
+
+########################################
+#               REPORTS                #
+########################################
+
+def build_survey_report(partials, guild_id=None, topic=None, since=None, until=None) -> dict:
+    """Aggregates of the exercise surveys per topic and question, plus one point per session."""
+    frame = _filter(partials, since, until, guild_id=guild_id, topic=topic)
+    if frame is None:
+        return {"sessions": 0, "responses": 0, "topics": [], "time_series": []}
+
+    topics = _breakdown(frame, ["topic", "scale"])
+    questions = _breakdown(frame, ["topic", "scale", "question"])
+    for entry in topics:
+        entry["questions"] = [
+            {key: value for key, value in question.items() if key not in ("topic", "scale")}
+            for question in questions
+            if question["topic"] == entry["topic"] and question["scale"] == entry["scale"]
+        ]
+
+    return {
+        "sessions": _sessions(frame),
+        "responses": int(frame["count"].sum()),
+        "topics": topics,
+        "time_series": _time_series(frame, ["kind", "topic", "scale"]),
+    }
+
+
+def build_feedback_report(partials, guild_id=None, group=None, since=None, until=None) -> dict:
+    """Tutor session feedback per group, plus one point per session."""
+    frame = _filter(partials, since, until, guild_id=guild_id, group=group)
+    if frame is None:
+        return {"sessions": 0, "responses": 0, "overall": None, "groups": [], "time_series": []}
+
+    overall = _breakdown(frame.assign(scope="all"), ["scope"])[0]
+    overall.pop("scope")
+    return {
+        "sessions": _sessions(frame),
+        "responses": int(frame["count"].sum()),
+        "overall": overall,
+        "groups": _breakdown(frame, ["group"]),
+        "time_series": _time_series(frame, ["group"]),
+    }
+
+
+def build_attendance_report(partials, guild_id=None, group=None, since=None, until=None) -> dict:
+    """Attendance per tutor group, plus one point per session."""
+    frame = _filter(partials, since, until, guild_id=guild_id, group=group)
+    if frame is None:
+        return {"sessions": 0, "attendance": 0, "groups": [], "time_series": []}
+
+    grouped = frame.groupby("group")
+    per_group = grouped["attendees"].agg(sessions="size", attendance="sum", mean="mean", max="max")
+    per_group["mean"] = per_group["mean"].round(2)
+    per_group["unique_students"] = grouped["students"].agg(lambda sessions: len(set().union(*sessions)))
+    per_group["last_session"] = grouped["timestamp"].max().dt.strftime('%Y-%m-%dT%H:%M')
+
+    series = frame.sort_values(["timestamp", "session"], kind="stable")
+    series = series[["timestamp", "session", "guild_id", "group", "attendees"]]
+    series = series.assign(timestamp=series["timestamp"].dt.strftime('%Y-%m-%dT%H:%M'))
+
+    return {
+        "sessions": int(len(frame)),
+        "attendance": int(frame["attendees"].sum()),
+        "unique_students": len(set().union(*frame["students"])),
+        "groups": per_group.reset_index().to_dict(orient="records"),
+        "time_series": series.to_dict(orient="records"),
+    }
+
+
+def survey_report(**params) -> dict:
+    return survey_cache.report("surveys", build_survey_report, **params)
+
+
+def feedback_report(**params) -> dict:
+    return feedback_cache.report("feedback", build_feedback_report, **params)
+
+
+def attendance_report(**params) -> dict:
+    return attendance_cache.report("attendance", build_attendance_report, **params)
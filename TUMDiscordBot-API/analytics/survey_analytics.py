@@ -0,0 +1,316 @@
+"""
+Survey Analytics
+~~~~~~~~
+
+Loads the survey and tutor session feedback CSV files written by the bot into one
+long-form pandas frame (one row per student answer) and computes answer distributions,
+per-question and per-topic aggregates and trends across sessions.
+
+File layouts written by ``utility.save_survey_entry_to_csv``:
+
+* ``data/exercise_feedback/{guild_id}/{SS|CS}_{topic}_{YYYY-MM-DD_HH-MM}.csv``: a ``Name``
+  column followed by one column per question, answers are difficulty or expected score labels.
+* ``data/tutor_session_feedback/{guild_id}/{group}_{YYYY-MM-DD_HH-MM}.csv``: ``Name`` and ``Feedback``.
+
+The course server is the name of the subdirectory; files written before the data was kept
+per server lie in the directory itself and have no ``guild_id``.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = PROJECT_ROOT / 'data'
+EXERCISE_FEEDBACK_DIR = DATA_DIR / 'exercise_feedback'
+TUTOR_SESSION_FEEDBACK_DIR = DATA_DIR / 'tutor_session_feedback'
+
+# Answer scales in display order, each label mapped to its numeric value
+DIFFICULTY_SCALE = {"Very Easy": 1, "Easy": 2, "Medium": 3, "Hard": 4, "Very Hard": 5}
+SCORE_SCALE = {"20%": 20, "40%": 40, "60%": 60, "80%": 80, "100%": 100}
+FEEDBACK_SCALE = {"Poor": 1, "Satisfactory": 2, "Good": 3}
+SCALES = {"difficulty": DIFFICULTY_SCALE, "score": SCORE_SCALE, "feedback": FEEDBACK_SCALE}
+
+ANSWER_ORDER = [label for scale in SCALES.values() for label in scale]
+_SCALE_OF = {label: name for name, scale in SCALES.items() for label in scale}
+_VALUE_OF = {label: value for scale in SCALES.values() for label, value in scale.items()}
+
+ANSWER_DTYPE = pd.CategoricalDtype(ANSWER_ORDER, ordered=True)
+SCALE_DTYPE = pd.CategoricalDtype(list(SCALES))
+
+COLUMNS = ["session", "guild_id", "kind", "topic", "group", "timestamp", "student", "question", "answer", "scale",
+           "value"]
+
+_SURVEY_FILE_RE = re.compile(r'^(?P<kind>SS|CS)_(?P<topic>.+)_(?P<stamp>\d{4}-\d{2}-\d{2}_\d{2}-\d{2})$')
+_FEEDBACK_FILE_RE = re.compile(r'^(?P<group>.+)_(?P<stamp>\d{4}-\d{2}-\d{2}_\d{2}-\d{2})$')
+
+
+def empty_frame() -> pd.DataFrame:
+    """Return an empty answer frame with the typed columns."""
+    return _typed(pd.DataFrame({column: [] for column in COLUMNS}))
+
+
+def _typed(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.astype({
+        "session": "string",
+        "guild_id": "category",
+        "kind": "category",
+        "topic": "category",
+        "group": "category",
+        "timestamp": "datetime64[ns]",
+        "student": "string",
+        "question": "category",
+        "answer": ANSWER_DTYPE,
+        "scale": SCALE_DTYPE,
+        "value": "float64",
+    })
+
+
+def data_files(directory) -> list:
+    """
+    The CSV files of a data directory and of its per server subdirectories, sorted.
+
+    Args:
+        directory (Path): e.g. data/exercise_feedback.
+    """
+    directory = Path(directory)
+    return sorted([*directory.glob('*.csv'), *directory.glob('*/*.csv')])
+
+
+def file_guild_id(path):
+    """The course server of a data file, the name of its subdirectory; None for a file of the old flat layout."""
+    name = Path(path).parent.name
+    return name if name.isdigit() else None
+
+
+def describe_file(path) -> dict:
+    """
+    Extract the session metadata encoded in a survey or feedback file name.
+
+    Args:
+        path (Path): The CSV file.
+
+    Returns:
+        dict: session, guild_id, kind, topic, group and timestamp, None if the name is not recognised.
+    """
+    path = Path(path)
+    match = _SURVEY_FILE_RE.match(path.stem)
+    if match:
+        kind, topic, group = match["kind"], match["topic"], None
+    else:
+        match = _FEEDBACK_FILE_RE.match(path.stem)
+        if not match:
+            return None
+        kind, topic, group = "TS", "Tutor Session", match["group"]
+
+    return {
+        "session": path.stem,
+        "guild_id": file_guild_id(path),
+        "kind": kind,
+        "topic": topic,
+        "group": group,
+        "timestamp": pd.to_datetime(match["stamp"], format="%Y-%m-%d_%H-%M"),
+    }
+
+
+def parse_file(path) -> pd.DataFrame:
+    """
+    Parse one survey or feedback CSV file into long form, one row per answer.
+
+    Args:
+        path (Path): The CSV file.
+
+    Returns:
+        pd.DataFrame: The answers, empty if the file is unknown or has no answers.
+    """
+    frame = read_answers(path)
+    return empty_frame() if frame is None else _typed(frame)
+
+
+def read_answers(path):
+    """
+    Read one survey or feedback file into long form without converting the column types,
+    used to concatenate many files before typing them once.
+
+    Args:
+        path (Path): The CSV file.
+
+    Returns:
+        pd.DataFrame: The answers, None if the file is unknown or has no answers.
+    """
+    meta = describe_file(path)
+    if meta is None:
+        return None
+
+    try:
+        wide = pd.read_csv(path, dtype=str, keep_default_na=False)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, OSError):
+        return None
+    if "Name" not in wide.columns or len(wide.columns) < 2:
+        return None
+
+    frame = wide.melt(id_vars="Name", var_name="question", value_name="answer")
+    frame = frame.rename(columns={"Name": "student"})
+    frame["answer"] = frame["answer"].str.strip()
+    # Answers outside the known scales (e.g. empty cells of partially answered surveys) are dropped
+    frame = frame[frame["answer"].isin(_SCALE_OF)]
+    if frame.empty:
+        return None
+
+    frame["scale"] = frame["answer"].map(_SCALE_OF)
+    frame["value"] = frame["answer"].map(_VALUE_OF)
+    for key, value in meta.items():
+        frame[key] = value
+    return frame[COLUMNS]
+
+
+def load_answers(directories=None) -> pd.DataFrame:
+    """
+    Load all survey and feedback files of the given directories into one frame.
+
+    Args:
+        directories (list): Directories to scan, defaults to the exercise and tutor
+            session feedback directories.
+
+    Returns:
+        pd.DataFrame: One row per answer, sorted by session time.
+    """
+    if directories is None:
+        directories = [EXERCISE_FEEDBACK_DIR, TUTOR_SESSION_FEEDBACK_DIR]
+
+    frames = [
+        read_answers(path)
+        for directory in directories if Path(directory).is_dir()
+        for path in data_files(directory)
+    ]
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        return empty_frame()
+
+    # Concatenate the plain columns first, the categories are built once for all files
+    frame = _typed(pd.concat(frames, ignore_index=True))
+    return frame.sort_values(["timestamp", "session"], kind="stable", ignore_index=True)
+
+
+def session_time(value) -> pd.Timestamp:
+    """
+    A since/until bound comparable with the session times, which are naive local times (taken
+    from the file names). A bound with a UTC offset is converted to local time.
+
+    Args:
+        value (str): ISO date or date time, e.g. "2025-04-01" or "2025-04-01T10:00:00+02:00".
+    """
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = pd.Timestamp(timestamp.to_pydatetime().astimezone().replace(tzinfo=None))
+    return timestamp
+
+
+def filter_answers(frame: pd.DataFrame, scale=None, topic=None, kind=None, since=None, until=None,
+                   guild_id=None) -> pd.DataFrame:
+    """
+    Select a subset of the answers.
+
+    Args:
+        frame (pd.DataFrame): Answers as returned by ``load_answers``.
+        guild_id (str): Course server.
+        scale (str): "difficulty", "score" or "feedback".
+        topic (str): Survey topic.
+        kind (str): "SS" (simple survey), "CS" (complex survey) or "TS" (tutor session).
+        since (str): Earliest session time.
+        until (str): Latest session time.
+    """
+    mask = np.ones(len(frame), dtype=bool)
+    if guild_id:
+        mask &= (frame["guild_id"] == str(guild_id)).to_numpy()
+    if scale:
+        mask &= (frame["scale"] == scale).to_numpy()
+    if topic:
+        mask &= (frame["topic"] == topic).to_numpy()
+    if kind:
+        mask &= (frame["kind"] == kind).to_numpy()
+    if since:
+        mask &= (frame["timestamp"] >= session_time(since)).to_numpy()
+    if until:
+        mask &= (frame["timestamp"] <= session_time(until)).to_numpy()
+    return frame[mask]
+
+
+########################################
+#             AGGREGATES               #
+########################################
+
+def distribution(frame: pd.DataFrame, by=("scale",), normalize=False) -> pd.DataFrame:
+    """
+    Count the answers per label.
+
+    Args:
+        frame (pd.DataFrame): Answers as returned by ``load_answers``.
+        by (tuple): Columns to group by, e.g. ("topic", "question").
+        normalize (bool): Return the share of each label in percent instead of counts.
+
+    Returns:
+        pd.DataFrame: One row per group, one column per answer label in scale order.
+    """
+    by = list(by)
+    counts = frame.groupby(by + ["answer"], observed=True).size().unstack("answer", fill_value=0)
+    # Keep the labels in scale order and drop the ones that never occur
+    counts = counts.reindex(columns=[label for label in ANSWER_ORDER if label in counts.columns])
+    if normalize:
+        totals = counts.sum(axis=1).to_numpy()[:, None]
+        counts = (100 * counts / np.where(totals == 0, 1, totals)).round(2)
+    counts.columns = counts.columns.astype(str)
+    return counts
+
+
+def _aggregate(frame: pd.DataFrame, by: list) -> pd.DataFrame:
+    grouped = frame.groupby(by, observed=True)
+    result = grouped["value"].agg(responses="size", mean="mean", median="median", std="std")
+    result["students"] = grouped["student"].nunique()
+    result["sessions"] = grouped["session"].nunique()
+    # Most frequent label per group
+    counts = frame.groupby(by + ["answer"], observed=True).size().reset_index(name="count")
+    top = counts.sort_values("count", ascending=False, kind="stable").drop_duplicates(by)
+    result["mode"] = top.set_index(by)["answer"].astype(str)
+    result[["mean", "median", "std"]] = result[["mean", "median", "std"]].round(3)
+    return result
+
+
+def question_aggregates(frame: pd.DataFrame) -> pd.DataFrame:
+    """Responses, mean, median, spread and most frequent answer per question and scale."""
+    return _aggregate(frame, ["scale", "topic", "question"])
+
+
+def topic_aggregates(frame: pd.DataFrame) -> pd.DataFrame:
+    """Responses, mean, median, spread and most frequent answer per topic and scale."""
+    return _aggregate(frame, ["scale", "topic"])
+
+
+def session_trends(frame: pd.DataFrame, window=3) -> pd.DataFrame:
+    """
+    Mean answer value per session in chronological order, with the change to the
+    previous session and a rolling mean over the last sessions of the same scale.
+
+    Args:
+        frame (pd.DataFrame): Answers as returned by ``load_answers``.
+        window (int): Number of sessions in the rolling mean.
+
+    Returns:
+        pd.DataFrame: One row per session and scale.
+    """
+    sessions = (
+        frame.groupby(["scale", "timestamp", "session", "kind", "topic"], observed=True)["value"]
+        .agg(responses="size", mean="mean")
+        .reset_index()
+        .sort_values(["scale", "timestamp"], kind="stable", ignore_index=True)
+    )
+    by_scale = sessions.groupby("scale", observed=True)["mean"]
+    sessions["change"] = by_scale.diff()
+    sessions["rolling_mean"] = by_scale.transform(lambda values: values.rolling(window, min_periods=1).mean())
+    sessions[["mean", "change", "rolling_mean"]] = sessions[["mean", "change", "rolling_mean"]].round(3)
+    return sessions
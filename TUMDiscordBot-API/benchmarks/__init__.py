@@ -0,0 +1,10 @@
+"""
+Benchmarks
+~~~~~~~~
+
+Performance checks for the REST API and the bot, runnable as modules
+(e.g. ``python -m benchmarks.startup``).
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
@@ -0,0 +1,666 @@
+"""
+Classroom Burst Load Generator
+~~~~~~~~
+
+Simulates the first minute after a tutor posts a survey or starts the attendance: hundreds
+of students arrive along an arrival curve and, after a think time, press ``Participate``
+(AnnouncementView), answer the DifficultyView/ScoreView questions (DynamicButton.callback),
+rate the tutor session (TutorSessionView), DM the attendance code (on_message) or check in
+with the attendance button and its code dialog (CheckInView).
+
+The tutor's actions go through the REST API and the students act through the ``/_fake``
+routes of the fake Discord (see fake_discord), the same paths a real course takes. The
+report lists per step the acknowledgement latency of the interactions as Discord sees it,
+the ones answered after Discord's 3 second deadline (the student sees "This interaction
+failed") or not at all, the DMs that never arrived, the event loop lag of the bot and the
+Discord calls the bot made, read from the metrics before and after the burst.
+
+By default the REST API, the bot and a fake Discord are started in this process. Pass
+``--api-url`` and ``--fake-url`` to load a running server whose bot uses the fake Discord
+(``"fake_discord": {"enabled": true}``), e.g. with latency and rate limits configured.
+
+Usage (from the project root)::
+
+    python -m benchmarks.burst complex_survey --students 300 --arrival spike --ramp 30
+    python -m benchmarks.burst attendance --api-url http://127.0.0.1:5000 --fake-url http://127.0.0.1:8765
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import math
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.hotpaths import REST_DIR, RESULTS_DIR, Environment, git_commit
+from benchmarks.stats import percentiles
+
+# Discord invalidates an interaction that is not acknowledged within this many seconds
+ACK_DEADLINE = 3.0
+DEFAULT_STUDENTS = 300
+DEFAULT_RAMP = 30.0
+DEFAULT_THINK = 3.0
+DEFAULT_TIMEOUT = 15.0
+# Share of the students who press a button a second time right away
+DEFAULT_DOUBLE_CLICK = 0.05
+ARRIVALS = ("uniform", "poisson", "spike")
+FEEDBACK_WEIGHTS = {"Good": 0.5, "Satisfactory": 0.35, "Poor": 0.15}
+
+_METRIC_RE = re.compile(r'^([a-zA-Z_:][\w:]*)(\{.*\})?\s+(\S+)$')
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def arrival_offsets(students: int, curve: str, ramp: float, rng: random.Random) -> list:
+    """
+    Seconds after the post at which each student arrives.
+
+    Args:
+        students (int): Number of students.
+        curve (str): ``uniform`` over the ramp, ``poisson`` arrivals at a constant rate or
+            ``spike``, most students within the first quarter of the ramp.
+        ramp (float): Seconds over which the students arrive.
+        rng (random.Random): Source of randomness.
+
+    Returns:
+        list: The sorted offsets.
+    """
+    if curve == "uniform":
+        offsets = [rng.uniform(0, ramp) for _ in range(students)]
+    elif curve == "poisson":
+        offsets = list(itertools.accumulate(rng.expovariate(students / ramp) for _ in range(students)))
+    elif curve == "spike":
+        offsets = [min(rng.expovariate(4 / ramp), ramp) for _ in range(students)]
+    else:
+        raise ValueError(f"Unknown arrival curve: {curve} (expected one of {', '.join(ARRIVALS)})")
+    return sorted(offsets)
+
+
+def parse_metrics(text: str) -> dict:
+    """Samples of a Prometheus text exposition, by (name, labels)."""
+    samples = {}
+    for line in text.splitlines():
+        match = _METRIC_RE.match(line)
+        if match is None or line.startswith("#"):
+            continue
+        name, labels, value = match.groups()
+        samples[(name, tuple(sorted(_LABEL_RE.findall(labels or ""))))] = float(value)
+    return samples
+
+
+def buttons(components: list) -> dict:
+    """Custom ids of the enabled buttons of a message, by label."""
+    return {
+        component.get("label"): component["custom_id"]
+        for row in components or [] for component in row.get("components", [])
+        if component.get("type") == 2 and component.get("custom_id") and not component.get("disabled")
+    }
+
+
+class Step:
+    """
+    Latencies and outcomes of one step of the students, e.g. pressing Participate.
+
+    Args:
+        name (str): Name of the step in the report.
+        deadline (float): Answers slower than this count as late, None for DMs.
+    """
+
+    def __init__(self, name: str, deadline: float = None):
+        self.name = name
+        self.deadline = deadline
+        self.latencies = []
+        self.lost = 0
+        self.errors = 0
+
+    @property
+    def late(self) -> int:
+        return sum(1 for latency in self.latencies if self.deadline is not None and latency > self.deadline)
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+        result = {
+            "count": len(latencies) + self.lost + self.errors,
+            "answered": len(latencies),
+            "late": self.late,
+            "lost": self.lost,
+            "errors": self.errors,
+        }
+        result.update(percentiles(latencies, digits=1))
+        return result
+
+
+class Burst:
+    """
+    One burst: the tutor posts, the students arrive and act, the steps record the outcome.
+
+    Args:
+        api_url (str): Base URL of the REST API.
+        fake_url (str): Base URL of the fake Discord.
+        api_key (str): API key of the REST API.
+        students (int): Number of students.
+        arrival (str): Arrival curve, see :func:`arrival_offsets`.
+        ramp (float): Seconds over which the students arrive.
+        think (float): Median seconds a student needs per question.
+        timeout (float): Seconds to wait for an answer before it counts as lost.
+        double_click (float): Share of the students who press a button twice.
+        seed (int): Seed of the arrivals, think times and answers.
+    """
+
+    def __init__(self, api_url: str, fake_url: str, api_key: str, students: int = DEFAULT_STUDENTS,
+                 arrival: str = "spike", ramp: float = DEFAULT_RAMP, think: float = DEFAULT_THINK,
+                 timeout: float = DEFAULT_TIMEOUT, double_click: float = DEFAULT_DOUBLE_CLICK, seed: int = 0):
+        self.api_url = api_url.rstrip("/")
+        self.fake_url = fake_url.rstrip("/")
+        self.api_key = api_key
+        self.students = students
+        self.arrival = arrival
+        self.ramp = ramp
+        self.think_median = think
+        self.timeout = timeout
+        self.double_click = double_click
+        self.rng = random.Random(seed)
+        self.steps = {}
+        self.session = None
+        self.world = None
+        self.guild = None
+
+    ########################################
+    #               REQUESTS               #
+    ########################################
+
+    async def api(self, method: str, path: str, **params) -> dict:
+        """Call the REST API as the tutor, raises on an error response."""
+        async with self.session.request(method, self.api_url + path,
+                                        params={"api_key": self.api_key, **params}) as response:
+            body = await response.json(content_type=None)
+            if response.status >= 400:
+                raise RuntimeError(f"{method} {path} answered {response.status}: {body.get('message')}")
+            return body
+
+    async def fake(self, method: str, path: str, payload: dict = None, **params):
+        """Call a driver route of the fake Discord."""
+        async with self.session.request(method, self.fake_url + path, json=payload,
+                                        params={key: str(value) for key, value in params.items()}) as response:
+            body = await response.json(content_type=None)
+            if response.status >= 400:
+                raise RuntimeError(f"{method} {path} answered {response.status}: {body}")
+            return body
+
+    async def metrics(self) -> dict:
+        """The metrics of the process running the bot."""
+        status = await self.api("GET", "/api/bot-status")
+        params = {"api_key": self.api_key}
+        if status.get("process") == "worker":
+            params["process"] = "bot"
+        async with self.session.get(self.api_url + "/api/metrics", params=params) as response:
+            return parse_metrics(await response.text())
+
+    ########################################
+    #               STUDENTS               #
+    ########################################
+
+    def step(self, name: str, deadline: float = None) -> Step:
+        if name not in self.steps:
+            self.steps[name] = Step(name, deadline)
+        return self.steps[name]
+
+    async def think(self) -> None:
+        await asyncio.sleep(self.rng.lognormvariate(math.log(self.think_median), 0.6))
+
+    async def press(self, step_name: str, message_id, custom_id: str, user_id, repeat: bool = True):
+        """
+        Press a button as a student and record the acknowledgement.
+
+        Returns:
+            dict: The interaction as reported by the fake Discord, None if it was not answered.
+        """
+        step = self.step(step_name, ACK_DEADLINE)
+        try:
+            result = await self.fake("POST", "/_fake/interactions", {
+                "type": "button", "message_id": str(message_id), "custom_id": custom_id,
+                "user_id": str(user_id), "wait": self.timeout,
+            })
+        except Exception:
+            step.errors += 1
+            return None
+        if not result["responded"]:
+            step.lost += 1
+            return None
+        step.latencies.append(result["response_ms"] / 1000)
+        if repeat and self.rng.random() < self.double_click:
+            await self.press(f"{step_name} (again)", message_id, custom_id, user_id, repeat=False)
+        return result
+
+    async def submit(self, step_name: str, custom_id: str, values: dict, user_id, channel_id):
+        """
+        Submit a modal the bot opened as a student and record the acknowledgement.
+
+        Returns:
+            dict: The interaction as reported by the fake Discord, None if it was not answered.
+        """
+        step = self.step(step_name, ACK_DEADLINE)
+        try:
+            result = await self.fake("POST", "/_fake/interactions", {
+                "type": "modal", "custom_id": custom_id, "values": values, "user_id": str(user_id),
+                "channel_id": str(channel_id), "wait": self.timeout,
+            })
+        except Exception:
+            step.errors += 1
+            return None
+        if not result["responded"]:
+            step.lost += 1
+            return None
+        step.latencies.append(result["response_ms"] / 1000)
+        return result
+
+    async def wait_for_message(self, step_name: str, path: str, after, predicate, started: float = None):
+        """
+        Wait for a message of the bot in a channel or DM and record how long it took.
+
+        Args:
+            step_name (str): The step the delivery is recorded as.
+            path (str): Driver route of the channel or DM messages.
+            after: Only messages newer than this id count.
+            predicate: Called with each new message of the bot, True for the awaited one.
+            started (float): ``time.perf_counter()`` the latency is measured from, now by default.
+
+        Returns:
+            dict: The message, None if it did not arrive in time.
+        """
+        step = self.step(step_name)
+        started = time.perf_counter() if started is None else started
+        try:
+            message = await self.next_message(path, after, predicate, started + self.timeout)
+        except Exception:
+            step.errors += 1
+            return None
+        if message is None:
+            step.lost += 1
+        else:
+            step.latencies.append(time.perf_counter() - started)
+        return message
+
+    async def next_message(self, path: str, after, predicate, deadline: float):
+        """The first new message of the bot matching ``predicate``, None if none came before the deadline."""
+        after = int(after or 0)
+        while (remaining := deadline - time.perf_counter()) > 0:
+            messages = await self.fake("GET", path, after=after, wait=round(remaining, 3))
+            for message in messages:
+                after = max(after, int(message["id"]))
+                if message["author"]["id"] == self.world["bot_user_id"] and predicate(message):
+                    return message
+        return None
+
+    async def crowd(self, student) -> None:
+        """Run ``student(user_id)`` for every student at their arrival offset."""
+        members = await self.fake("GET", f"/_fake/guilds/{self.guild['id']}/members", role="Student")
+        if len(members) < self.students:
+            raise RuntimeError(f"The fake guild has {len(members)} students, {self.students} were requested")
+        chosen = self.rng.sample(members, self.students)
+        offsets = arrival_offsets(self.students, self.arrival, self.ramp, self.rng)
+
+        async def arrive(offset, user_id):
+            await asyncio.sleep(offset)
+            await student(user_id)
+
+        await asyncio.gather(*(arrive(offset, user_id) for offset, user_id in zip(offsets, chosen)))
+
+    async def posted_message(self, channel_id: str, after) -> dict:
+        """The message with buttons the bot posts to a channel after a tutor action."""
+        message = await self.next_message(f"/_fake/channels/{channel_id}/messages", after,
+                                          lambda message: bool(buttons(message.get("components"))),
+                                          time.perf_counter() + self.timeout)
+        if message is None:
+            raise RuntimeError(f"The bot did not post a message with buttons to channel {channel_id}")
+        return message
+
+    async def last_message_id(self, channel_id: str) -> int:
+        messages = await self.fake("GET", f"/_fake/channels/{channel_id}/messages")
+        return max((int(message["id"]) for message in messages), default=0)
+
+    ########################################
+    #              SCENARIOS               #
+    ########################################
+
+    async def attendance(self, channel_id: str, group: str) -> None:
+        """The tutor starts the attendance, the students DM the code and wait for the confirmation."""
+        tutor = (await self.fake("GET", f"/_fake/guilds/{self.guild['id']}/members", role="Admin"))[0]
+        code = f"burst{self.rng.randrange(10000):04d}"
+        await self.api("POST", "/api/attendance", status="start", group_id=group, code=code, target_user_id=tutor)
+
+        async def student(user_id):
+            started = time.perf_counter()
+            try:
+                message = await self.fake("POST", "/_fake/messages", {"user_id": user_id, "content": code})
+            except Exception:
+                self.step("attendance confirmation").errors += 1
+                return
+            await self.wait_for_message("attendance confirmation", f"/_fake/users/{user_id}/dm", message["id"],
+                                        lambda reply: "attendance list" in reply["content"], started)
+
+        try:
+            await self.crowd(student)
+        finally:
+            await self.api("POST", "/api/attendance", status="stop", group_id=group, code=code, target_user_id=tutor)
+
+    async def check_in(self, channel_id: str, group: str) -> None:
+        """
+        The tutor starts the attendance with a check in button in the channel, the students
+        press it and enter the code in the dialog it opens.
+        """
+        tutor = (await self.fake("GET", f"/_fake/guilds/{self.guild['id']}/members", role="Admin"))[0]
+        code = f"burst{self.rng.randrange(10000):04d}"
+        after = await self.last_message_id(channel_id)
+        await self.api("POST", "/api/attendance", status="start", group_id=group, code=code,
+                       target_user_id=tutor, channel_id=channel_id)
+        message = await self.posted_message(channel_id, after)
+        button = buttons(message["components"])["Check in"]
+
+        async def student(user_id):
+            await self.think()
+            result = await self.press("check in button", message["id"], button, user_id, repeat=False)
+            if result is None:
+                return
+            # The dialog is the response to the button
+            modal = result["responses"][0].get("data") or {}
+            field = modal["components"][0]["components"][0]["custom_id"]
+            # Typing the code, py-cord also stores the dialog only after answering the button
+            await self.think()
+            result = await self.submit("code modal", modal["custom_id"], {field: code}, user_id, channel_id)
+            if result is not None and "attendance list" not in (result["responses"][0].get("data") or {}).get(
+                    "content", ""):
+                self.step("code modal").errors += 1
+
+        try:
+            await self.crowd(student)
+        finally:
+            await self.api("POST", "/api/attendance", status="stop", group_id=group, code=code, target_user_id=tutor)
+
+    async def tutor_feedback(self, channel_id: str, group: str) -> None:
+        """The tutor posts the session feedback, the students rate it once."""
+        after = await self.last_message_id(channel_id)
+        await self.api("POST", "/api/tutor-session-feedback", group_id=group, channel_id=channel_id,
+                       duration=self.duration())
+        message = await self.posted_message(channel_id, after)
+        options = buttons(message["components"])
+
+        async def student(user_id):
+            await self.think()
+            label = self.rng.choices(list(FEEDBACK_WEIGHTS), weights=list(FEEDBACK_WEIGHTS.values()))[0]
+            await self.press("feedback", message["id"], options[label], user_id)
+
+        await self.crowd(student)
+
+    async def simple_survey(self, channel_id: str, group: str) -> None:
+        """The tutor posts a one question survey, the students answer it in the channel."""
+        after = await self.last_message_id(channel_id)
+        await self.api("POST", "/api/create-simple-survey", message="How difficult was the exercise?",
+                       button_type="Difficulty", main_topic="Burst", channel_id=channel_id,
+                       duration=self.duration())
+        message = await self.posted_message(channel_id, after)
+        options = list(buttons(message["components"]).values())
+
+        async def student(user_id):
+            await self.think()
+            await self.press("answer", message["id"], self.rng.choice(options), user_id)
+
+        await self.crowd(student)
+
+    async def complex_survey(self, channel_id: str, group: str, questions: int = 3) -> None:
+        """
+        The tutor posts a survey of several questions, the students press Participate and
+        answer the questions the bot sends them by DM one after the other.
+        """
+        after = await self.last_message_id(channel_id)
+        params = {}
+        for i in range(1, questions + 1):
+            params[f"question_{i}"] = f"Question {i}"
+            params[f"button_{i}"] = "Difficulty" if i % 2 else "Score"
+        await self.api("POST", "/api/create-complex-survey", message="Exercise feedback", main_topic="Burst",
+                       channel_id=channel_id, duration=self.duration(), **params)
+        announcement = await self.posted_message(channel_id, after)
+        participate = buttons(announcement["components"])["Participate"]
+
+        async def student(user_id):
+            await asyncio.sleep(self.rng.uniform(0, 1))
+            dm = f"/_fake/users/{user_id}/dm"
+            after = max((int(message["id"]) for message in await self.fake("GET", dm)), default=0)
+            started = time.perf_counter()
+            if await self.press("participate", announcement["id"], participate, user_id) is None:
+                return
+            question = await self.wait_for_message("first question DM", dm, after,
+                                                   lambda message: bool(buttons(message.get("components"))), started)
+            for number in range(1, questions + 1):
+                if question is None:
+                    return
+                await self.think()
+                options = list(buttons(question["components"]).values())
+                result = await self.press(f"answer {number}", question["id"], self.rng.choice(options), user_id,
+                                          repeat=number == questions)
+                if result is None or number == questions:
+                    return
+                # The next question is the response to the interaction
+                data = result["responses"][0].get("data") or {}
+                question = {"id": result["message_id"], "components": data.get("components")}
+
+        await self.crowd(student)
+
+    def duration(self) -> float:
+        """Seconds the posted views accept answers, long enough for the slowest student."""
+        return round(self.ramp * 2 + self.think_median * 10 + self.timeout, 0)
+
+    ########################################
+    #                 RUN                  #
+    ########################################
+
+    async def run(self, scenario: str, channel: str = "surveys", group: str = None) -> dict:
+        """
+        Run a scenario and return the report.
+
+        Args:
+            scenario (str): One of ``SCENARIOS``.
+            channel (str): Name of the channel the tutor posts to.
+            group (str): Tutor group, the first group of the settings by default.
+
+        Returns:
+            dict: The report, see :func:`print_report`.
+        """
+        import aiohttp
+
+        # Every student holds a long-polling request, the default connection limit would queue them
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0),
+                                         timeout=aiohttp.ClientTimeout(total=None)) as self.session:
+            self.world = await self.fake("GET", "/_fake/world")
+            self.guild = self.world["guilds"][0]
+            channel_id = self.guild["channels"].get(channel)
+            if channel_id is None:
+                raise RuntimeError(f"The fake guild has no channel {channel}")
+            if group is None:
+                group = (await self.api("GET", "/api/settings/groups"))["data"]["groups"][0]
+
+            metrics_before = await self.metrics()
+            fake_before = await self.fake("GET", "/_fake/stats")
+            started = time.perf_counter()
+            await getattr(self, scenario)(channel_id, group)
+            seconds = time.perf_counter() - started
+            # The watchdog of the bot loop ticks once per second
+            await asyncio.sleep(1.5)
+            metrics_after = await self.metrics()
+            fake_after = await self.fake("GET", "/_fake/stats")
+
+        return {
+            "scenario": scenario,
+            "students": self.students,
+            "arrival": self.arrival,
+            "ramp_s": self.ramp,
+            "think_s": self.think_median,
+            "seconds": round(seconds, 1),
+            "steps": {name: step.summary() for name, step in self.steps.items()},
+            "loop": loop_report(metrics_before, metrics_after),
+            "discord": discord_report(metrics_before, metrics_after, fake_before, fake_after),
+        }
+
+
+SCENARIOS = ("attendance", "check_in", "tutor_feedback", "simple_survey", "complex_survey")
+
+
+########################################
+#                REPORT                #
+########################################
+
+def _delta(before: dict, after: dict, name: str) -> dict:
+    """Increase of every sample of a metric, by labels."""
+    return {labels: value - before.get((sample, labels), 0)
+            for (sample, labels), value in after.items() if sample == name}
+
+
+def loop_report(before: dict, after: dict) -> dict:
+    """Event loop lag of the bot during the burst, from the watchdog histogram."""
+    buckets = _delta(before, after, "bot_loop_lag_seconds_bucket")
+    ticks = sum(_delta(before, after, "bot_loop_lag_seconds_count").values())
+    from REST.utils.loop_monitor import loop_monitor
+
+    report = {"ticks": int(ticks), "slow_callbacks": int(sum(_delta(before, after, "bot_slow_callbacks_total").values()))}
+    if not loop_monitor.slow_callback_detection:
+        # Only counted with monitoring.slow_callback_detection, which puts the loop in debug mode
+        report["slow_callbacks"] = None
+    if ticks:
+        report["mean_ms"] = round(sum(_delta(before, after, "bot_loop_lag_seconds_sum").values()) / ticks * 1000, 1)
+        # The upper bound of the bucket holding the 95th percentile
+        bounds = sorted((float(dict(labels)["le"]), count) for labels, count in buckets.items())
+        report["p95_at_most_ms"] = next(
+            (round(bound * 1000, 1) for bound, count in bounds if count >= ticks * 0.95), None)
+    lag_max = [value for (name, _), value in after.items() if name == "bot_loop_lag_seconds_max"]
+    if lag_max:
+        report["max_since_start_ms"] = round(lag_max[0] * 1000, 1)
+    return report
+
+
+def discord_report(before: dict, after: dict, fake_before: dict, fake_after: dict) -> dict:
+    """
+    Discord calls the bot made during the burst, by route. The fake Discord counts every
+    call, the bot metrics time the same calls (interaction callbacks included) and should agree.
+    """
+    routes = {}
+    for key, count in fake_after["requests"].items():
+        route = key.rsplit(" ", 1)[0]
+        count -= fake_before["requests"].get(key, 0)
+        if count:
+            routes[route] = routes.get(route, 0) + count
+    return {
+        "calls": sum(routes.values()),
+        "calls_in_bot_metrics": int(sum(_delta(before, after, "discord_rest_request_duration_seconds_count").values())),
+        "rate_limited": fake_after["rate_limited"] - fake_before["rate_limited"],
+        "rate_limits_seen_by_bot": int(sum(_delta(before, after, "discord_rate_limits_total").values())),
+        "routes": dict(sorted(routes.items(), key=lambda item: item[1], reverse=True)),
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\n{report['scenario']}: {report['students']} students, {report['arrival']} arrivals over "
+          f"{report['ramp_s']:.0f}s, think time {report['think_s']:.1f}s, took {report['seconds']:.1f}s")
+    print(f"{'step':<26} {'count':>6} {'answered':>8} {'late':>5} {'lost':>5} {'errors':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, step in report["steps"].items():
+        print(f"{name:<26} {step['count']:>6} {step['answered']:>8} {step['late']:>5} {step['lost']:>5} "
+              f"{step['errors']:>6} " + " ".join(f"{step.get(key, '-'):>8}" for key in
+                                                   ("p50_ms", "p95_ms", "p99_ms", "max_ms")))
+    loop = report["loop"]
+    print(f"Bot event loop: {loop['ticks']} ticks, mean lag {loop.get('mean_ms', '-')} ms, p95 <= "
+          f"{loop.get('p95_at_most_ms', '-')} ms, max since start {loop.get('max_since_start_ms', '-')} ms, "
+          f"{'-' if loop['slow_callbacks'] is None else loop['slow_callbacks']} slow callbacks")
+    discord = report["discord"]
+    print(f"Discord calls: {discord['calls']} ({discord['calls_in_bot_metrics']} in the bot metrics), "
+          f"{discord['rate_limited']} answered with 429")
+    for route, count in list(discord["routes"].items())[:8]:
+        print(f"  {route:<60} {count:>6}")
+
+
+def serve(app) -> tuple:
+    """Serve the Flask app on a free local port in a daemon thread, returns the server and its URL."""
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="burst-api", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.burst", description=__doc__.split("\n\n")[1])
+    parser.add_argument("scenario", choices=SCENARIOS)
+    parser.add_argument("--students", type=int, default=DEFAULT_STUDENTS,
+                        help=f"Students taking part (default: {DEFAULT_STUDENTS})")
+    parser.add_argument("--arrival", choices=ARRIVALS, default="spike", help="Arrival curve (default: spike)")
+    parser.add_argument("--ramp", type=float, default=DEFAULT_RAMP,
+                        help=f"Seconds over which the students arrive (default: {DEFAULT_RAMP:.0f})")
+    parser.add_argument("--think", type=float, default=DEFAULT_THINK,
+                        help=f"Median think time per question in seconds (default: {DEFAULT_THINK})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"Seconds until an answer counts as lost (default: {DEFAULT_TIMEOUT:.0f})")
+    parser.add_argument("--double-click", type=float, default=DEFAULT_DOUBLE_CLICK,
+                        help=f"Share of students pressing a button twice (default: {DEFAULT_DOUBLE_CLICK})")
+    parser.add_argument("--channel", default="surveys", help="Channel the tutor posts to (default: surveys)")
+    parser.add_argument("--group", help="Tutor group, the first group of the settings by default")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--members", type=int, default=1000, help="Members of the fake guild started in-process")
+    parser.add_argument("--api-url", help="REST API to load instead of starting one in-process")
+    parser.add_argument("--fake-url", help="Fake Discord the bot of --api-url is connected to")
+    parser.add_argument("--api-key", help="API key for --api-url")
+    parser.add_argument("--output", type=Path, help="Report file (default: data/benchmarks/burst_<scenario>_<commit>.json)")
+    args = parser.parse_args(argv)
+
+    if bool(args.api_url) != bool(args.fake_url):
+        parser.error("--api-url and --fake-url are used together")
+
+    commit = git_commit()
+    output = (args.output or RESULTS_DIR / f"burst_{args.scenario}_{commit}.json").resolve()
+    options = dict(students=args.students, arrival=args.arrival, ramp=args.ramp, think=args.think,
+                   timeout=args.timeout, double_click=args.double_click, seed=args.seed)
+
+    if args.api_url:
+        if not args.api_key:
+            parser.error("--api-key is required with --api-url")
+        burst = Burst(args.api_url, args.fake_url, args.api_key, **options)
+        report = asyncio.run(burst.run(args.scenario, args.channel, args.group))
+    else:
+        os.chdir(REST_DIR)
+        sys.path.insert(0, str(REST_DIR))
+        with tempfile.TemporaryDirectory(prefix="burst_") as workdir:
+            env = Environment(Path(workdir), args.members, 1, "full")
+            server = None
+            try:
+                fake = env.start_bot()
+                server, api_url = serve(env.app)
+                burst = Burst(api_url, fake.base_url, env.api_key, **options)
+                report = asyncio.run(burst.run(args.scenario, args.channel, args.group))
+            finally:
+                if server is not None:
+                    server.shutdown()
+                env.close()
+
+    report.update(commit=commit, created=datetime.datetime.now().isoformat(timespec="seconds"))
+    print_report(report)
+    output.parent.mkdir(exist_ok=True, parents=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nReport written to {output}")
+
+    failed = sum(step["late"] + step["lost"] + step["errors"] for step in report["steps"].values())
+    if failed:
+        print(f"FAIL: {failed} answers late, lost or failed")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
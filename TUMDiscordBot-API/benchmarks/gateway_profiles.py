@@ -0,0 +1,149 @@
+"""
+Gateway Profile Benchmark
+~~~~~~~~
+
+Connects to Discord once per gateway profile (see bot.gateway_profiles), each in a fresh
+interpreter, and reports the gateway events received until the client is ready, the
+events per second afterwards, the cached members and the peak resident memory. The bot
+token of .secrets.json is used, so the numbers reflect the servers the bot is a member of.
+Run it while the bot itself is stopped, a token should only hold one gateway session.
+
+Usage (from the project root)::
+
+    python -m benchmarks.gateway_profiles --seconds 60 --token-key dev_token
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_SECONDS = 60
+READY_TIMEOUT = 120
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in KiB on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def observe(profile: str, token: str, seconds: float) -> dict:
+    """
+    Log in with the options of a profile and count the gateway events.
+
+    Args:
+        profile (str): The gateway profile.
+        token (str): The bot token.
+        seconds (float): How long to count events once the client is ready.
+
+    Returns:
+        dict: The measurements of the profile.
+    """
+    import discord
+    from bot.gateway_profiles import gateway_options
+
+    client = discord.Client(**gateway_options(profile))
+    events = collections.Counter()
+    ready = asyncio.Event()
+
+    @client.event
+    async def on_socket_event_type(event_type):
+        events[event_type] += 1
+
+    @client.event
+    async def on_ready():
+        ready.set()
+
+    async with client:
+        started = time.perf_counter()
+        runner = asyncio.create_task(client.start(token))
+        waiter = asyncio.create_task(ready.wait())
+        done, _ = await asyncio.wait({runner, waiter}, timeout=READY_TIMEOUT, return_when=asyncio.FIRST_COMPLETED)
+        if runner in done:
+            runner.result()  # Raises the login or connection error
+        if waiter not in done:
+            waiter.cancel()
+            raise TimeoutError(f"Not ready within {READY_TIMEOUT}s")
+        ready_seconds = time.perf_counter() - started
+        startup_events = sum(events.values())
+
+        events.clear()
+        await asyncio.sleep(seconds)
+        steady = dict(events)
+        members = sum(1 for _ in client.get_all_members())
+        guilds = len(client.guilds)
+        await client.close()
+        runner.cancel()
+
+    return {
+        "profile": profile,
+        "guilds": guilds,
+        "ready_seconds": round(ready_seconds, 2),
+        "startup_events": startup_events,
+        "events_per_second": round(sum(steady.values()) / seconds, 2),
+        "top_events": sorted(steady.items(), key=lambda item: item[1], reverse=True)[:5],
+        "cached_members": members,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_profile(profile: str, token_key: str, seconds: float) -> dict:
+    """Measure one profile in a fresh interpreter, so the memory of the others is not counted."""
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.gateway_profiles", "--child", profile,
+         "--token-key", token_key, "--seconds", str(seconds)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Profile {profile} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    # Imported here, the settings are only needed to run the benchmark
+    from bot.gateway_profiles import PROFILES
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.gateway_profiles", description=__doc__.split("\n\n")[1])
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES), help="Profiles to compare")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_SECONDS,
+                        help=f"Seconds to count events after the client is ready (default: {DEFAULT_SECONDS})")
+    parser.add_argument("--token-key", default="dev_token", help='Token of .secrets.json to log in with: "token" or "dev_token"')
+    parser.add_argument("--child", choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        from REST import settings_manager
+        token = settings_manager.SETTINGS["bot"][args.token_key]
+        print(json.dumps(asyncio.run(observe(args.child, token, args.seconds))))
+        return 0
+
+    print(f"{'profile':<10} {'guilds':>6} {'ready s':>8} {'startup ev':>11} {'events/s':>9} {'members':>8} {'peak RSS MiB':>13}")
+    failed = False
+    for profile in args.profiles:
+        try:
+            r = run_profile(profile, args.token_key, args.seconds)
+        except RuntimeError as e:
+            print(f"FAIL: {str(e)}")
+            failed = True
+            continue
+        print(f"{r['profile']:<10} {r['guilds']:>6} {r['ready_seconds']:>8} {r['startup_events']:>11} "
+              f"{r['events_per_second']:>9} {r['cached_members']:>8} {r['peak_rss_mb']:>13}")
+        if r["top_events"]:
+            print("           " + ", ".join(f"{name} {count}" for name, count in r["top_events"]))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,488 @@
+"""
+Hot Path Benchmark
+~~~~~~~~
+
+Times the code paths that grow with the size of a course: auditing into a growing daily
+file, appending survey entries to a CSV file, the percentages of the tutor session
+feedback view, member lists and counts of a large guild, listing large data directories,
+attendance matching in on_message and full /api/* round trips through the Flask test
+client. The bot runs against the fake Discord (see fake_discord) with a synthetic guild of
+``--members`` members, so neither a token nor network access is needed.
+
+Every case reports the p50/p95/p99 wall time per call and the memory allocated per call,
+measured with tracemalloc in a separate pass so tracing does not inflate the timings. The
+results are written as JSON to data/benchmarks; pass the file of an earlier commit with
+``--compare`` to check for regressions.
+
+Usage (from the project root)::
+
+    python -m benchmarks.hotpaths --members 10000
+    python -m benchmarks.hotpaths --only audit api --compare data/benchmarks/hotpaths_<commit>.json
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import argparse
+import asyncio
+import copy
+import csv
+import datetime
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.stats import percentiles
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+REST_DIR = PROJECT_ROOT / 'REST'
+RESULTS_DIR = PROJECT_ROOT / 'data' / 'benchmarks'
+
+DEFAULT_MEMBERS = 10000
+DEFAULT_ITERATIONS = 200
+DEFAULT_THRESHOLD = 0.25
+WARMUP = 3
+# Calls traced with tracemalloc per case, tracing slows every allocation down
+ALLOCATION_RUNS = 20
+READY_TIMEOUT = 120
+ATTENDANCE_CODE = "bench42"
+
+
+def calls_needed(iterations: int) -> int:
+    """Calls :func:`measure` makes of a case, for cases that consume one input per call."""
+    return WARMUP + iterations + min(iterations, ALLOCATION_RUNS)
+
+
+def measure(name: str, func, iterations: int, **params) -> dict:
+    """
+    Time a function and measure its allocations.
+
+    Args:
+        name (str): Name of the case.
+        func: Called without arguments, once per sample.
+        iterations (int): Timed calls, at least 1.
+        **params: Parameters of the case, part of its key in the results.
+
+    Returns:
+        dict: The percentiles in milliseconds and the KiB allocated (peak) and retained per call.
+    """
+    for _ in range(WARMUP):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - started)
+
+    allocated, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(min(iterations, ALLOCATION_RUNS)):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func()
+            current, peak = tracemalloc.get_traced_memory()
+            allocated.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": name,
+        "params": params,
+        "iterations": len(samples),
+        "mean_ms": round(statistics.mean(samples) / 1e6, 3),
+        **percentiles(samples, scale=1e-6),
+        "alloc_kib": round(statistics.mean(allocated) / 1024, 1),
+        "retained_kib": round(statistics.mean(retained) / 1024, 1),
+    }
+
+
+def case_key(result: dict) -> str:
+    """``name[param=value,...]``, identifies a case across result files."""
+    params = ",".join(f"{key}={value}" for key, value in sorted(result["params"].items()))
+    return f"{result['name']}[{params}]" if params else result["name"]
+
+
+class Environment:
+    """
+    Temporary files, settings and audit directory of a benchmark run, the Flask test
+    client and, once a case needs it, the bot connected to the fake Discord.
+
+    Args:
+        workdir (Path): Temporary directory, removed by the caller.
+        members (int): Members of each fake guild.
+        guilds (int): Fake guilds.
+        profile (str): Gateway profile of the bot.
+    """
+
+    def __init__(self, workdir: Path, members: int, guilds: int, profile: str):
+        from REST import settings_manager
+
+        self.workdir = workdir
+        self.members = members
+
+        # The bot logs in to the fake with its own copy of the settings
+        settings = copy.deepcopy(settings_manager.SETTINGS or {})
+        settings.setdefault("bot", {}).update(token="fake", dev_token="fake")
+        settings["worker"] = {"enabled": False}
+        settings["sharding"] = {"enabled": False}
+        settings["gateway"] = {"profile": profile}
+        settings["fake_discord"] = {"enabled": True, "guilds": guilds, "members": members, "global_rate_limit": 0}
+        settings_manager.SETTINGS_PATH = workdir / ".secrets.json"
+        settings_manager.update_settings(settings)
+        if settings_manager.SETTINGS is None:
+            settings_manager.SETTINGS = settings
+        else:
+            settings_manager.SETTINGS.clear()
+            settings_manager.SETTINGS.update(settings)
+
+        # Imported once the settings are in place, the gateway is selected on import
+        import run
+        from REST.api import api_validation
+        from REST.utils.role_cache import role_cache
+        from bot.command_sync import command_sync
+
+        api_validation.audit_dir = workdir / "audit"
+        api_validation.audit_dir.mkdir()
+        # The role cache and the command sync state of the fake guilds stay in the workdir
+        role_cache.path = workdir / "roles.json"
+        command_sync.state_path = workdir / "command_sync.json"
+        self.client = run.app.test_client()
+        self.app = run.app
+        self.api_key = next(iter(settings_manager.SETTINGS["api_keys"]))
+        self._bot_started = False
+
+    def url(self, path: str, **params) -> str:
+        query = "&".join(f"{key}={value}" for key, value in {"api_key": self.api_key, **params}.items())
+        return f"{path}?{query}"
+
+    def start_bot(self):
+        """Start the bot through the API and wait until it is ready, returns the fake Discord."""
+        import fake_discord
+        from REST.utils.bot_gateway import gateway
+        from REST.utils.bot_supervisor import BotState
+
+        if not self._bot_started:
+            started = time.perf_counter()
+            response = self.client.post(self.url("/api/start-bot"))
+            if response.status_code not in (200, 202):
+                raise RuntimeError(f"Starting the bot failed: {response.get_json()}")
+            if gateway.wait_for((BotState.READY, BotState.CRASHED), timeout=READY_TIMEOUT) is not BotState.READY:
+                raise RuntimeError(f"The bot is not ready: {gateway.last_error}")
+            self._bot_started = True
+            print(f"Bot ready after {time.perf_counter() - started:.1f}s "
+                  f"({len(fake_discord.fake.world.guilds)} guild(s) of {self.members} members)")
+        return fake_discord.fake
+
+    def close(self) -> None:
+        if self._bot_started:
+            import fake_discord
+            self.client.post(self.url("/api/stop-bot"))
+            fake_discord.fake.stop()
+
+
+########################################
+#                CASES                 #
+########################################
+
+def bench_audit(env: Environment, iterations: int) -> list:
+    """audit_api_call, which rewrites the daily audit file on every request."""
+    from REST.api import api_validation
+
+    results = []
+    for entries in (0, 1000, 10000):
+        audit_file = api_validation.audit_dir / f"audit_{datetime.datetime.now().strftime('%Y-%m-%d')}.json"
+        entry = {"timestamp": "2024-01-01 00:00:00", "endpoint": "/api/ping", "api_key": "[REDACTED]",
+                 "params": {}, "ip_address": "127.0.0.1"}
+        with open(audit_file, 'w') as f:
+            json.dump([entry] * entries, f, indent=2)
+        with env.app.test_request_context(env.url("/api/ping")):
+            results.append(measure("audit_api_call", api_validation.audit_api_call,
+                                   min(iterations, 50 if entries else iterations), entries=entries))
+        audit_file.unlink()
+    return results
+
+
+def bench_survey_csv(env: Environment, iterations: int) -> list:
+    """save_survey_entry_to_csv, which checks the whole file for an earlier entry of the student."""
+    import bot  # noqa: F401, utility and bot import each other and bot has to come first
+    from shared import SurveyEntry
+    from utility import save_survey_entry_to_csv
+
+    options = {"Difficulty": "Hard", "Topic": "Recursion", "Feedback": "Good"}
+    results = []
+    for entries in (100, 1000, 10000):
+        path = env.workdir / "surveys" / f"survey_{entries}.csv"
+        path.parent.mkdir(exist_ok=True)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=["Name", *options])
+            writer.writeheader()
+            writer.writerows({"Name": f"Student {i} (student{i})", **options} for i in range(entries))
+
+        names = (f"New student {i} (new{i})" for i in itertools.count())
+        results.append(measure(
+            "save_survey_entry_to_csv",
+            lambda: save_survey_entry_to_csv(str(path), SurveyEntry(next(names), options)),
+            min(iterations, 50), entries=entries,
+        ))
+    return results
+
+
+def bench_feedback_view(env: Environment, iterations: int) -> list:
+    """TutorSessionView.update_percentage, run on every button press of the feedback survey."""
+    import discord
+    from bot.ui.view import TutorSessionView
+    from shared import SurveyEntry
+
+    async def create_view():
+        # A view needs a running loop
+        return TutorSessionView("G1", None)
+
+    results = []
+    for participants in (100, 1000, 10000):
+        view = asyncio.run(create_view())
+        view.users_interacted_with_view = list(range(participants))
+        for i in range(participants):
+            target = (view.users_good_review, view.users_satisfactory_review, view.users_poor_review)[i % 3]
+            target.append(SurveyEntry(f"Student {i}", {"Feedback": "Good"}))
+        embed = discord.Embed(title="Tutor session feedback")
+        embed.add_field(name="Participants: 0", value="", inline=False)
+        for option in ("Good", "Satisfactory", "Poor"):
+            embed.add_field(name=option, value="`0.00 %`")
+        results.append(measure("TutorSessionView.update_percentage", lambda: view.update_percentage(embed),
+                               iterations, participants=participants))
+    return results
+
+
+def bench_members(env: Environment, iterations: int) -> list:
+    """get_members and get_member_counts of the fake guild."""
+    from bot import discord_bot_functions as functions
+
+    fake = env.start_bot()
+    guild_id = next(iter(fake.world.guilds))
+    return [
+        measure("get_members", lambda: functions.get_members(guild_id), min(iterations, 50), members=env.members),
+        measure("get_member_counts", lambda: functions.get_member_counts(guild_id), iterations, members=env.members),
+    ]
+
+
+def bench_list_files(env: Environment, iterations: int) -> list:
+    """get_files_in_directory, which lists a data directory for /api/data/*."""
+    from REST.bot_manager.bot_data import get_files_in_directory
+
+    results = []
+    for files in (100, 1000, 10000):
+        directory = env.workdir / f"files_{files}"
+        directory.mkdir()
+        for i in range(files):
+            (directory / f"G{i % 8}_2024-01-{i % 28 + 1:02d}_{i:05d}.csv").write_text("Attendance\n")
+        results.append(measure("get_files_in_directory", lambda: get_files_in_directory(directory),
+                               min(iterations, 50 if files >= 10000 else iterations), files=files))
+    return results
+
+
+def bench_on_message(env: Environment, iterations: int) -> list:
+    """on_message for DMs to the bot: ordinary messages, a wrong code and students sending the code."""
+    import discord
+    from bot import bot_data
+    from bot.discord_bot_events import on_message
+    from fake_discord.world import timestamp
+    import REST.utils.bot_context as bc
+
+    fake = env.start_bot()
+    guild_id = next(iter(fake.world.guilds))
+    students = fake.members(guild_id, "Student")
+    calls = calls_needed(iterations)
+    message_ids = itertools.count(discord.utils.time_snowflake(datetime.datetime.now(datetime.timezone.utc)))
+
+    async def direct_messages(contents: list) -> list:
+        """Messages as the gateway would deliver them, from a different student each."""
+        client = bc.get_live_bot()
+        messages = []
+        for user_id, content in zip(itertools.cycle(students), contents):
+            user = client.get_user(user_id)
+            channel = user.dm_channel or await user.create_dm()
+            data = {
+                "id": str(next(message_ids)), "channel_id": str(channel.id), "content": content,
+                "author": {"id": str(user.id), "username": user.name, "discriminator": "0", "avatar": None},
+                "timestamp": timestamp(), "edited_timestamp": None, "tts": False, "mention_everyone": False,
+                "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0,
+            }
+            messages.append(discord.Message(state=client._connection, channel=channel, data=data))
+        return messages
+
+    def handle(messages):
+        return lambda: bc.run_on_bot_loop(on_message(next(messages)))
+
+    data = bot_data.guild_data(guild_id)
+    group = next(iter(data.groups))
+    results = [measure("on_message", handle(iter(bc.run_on_bot_loop(
+        direct_messages(["Thanks for the session, see you next week!"] * calls), timeout=120))),
+        iterations, case="no_session")]
+
+    data.attendance_code, data.group_status[group] = ATTENDANCE_CODE, True
+    try:
+        results.append(measure("on_message", handle(iter(bc.run_on_bot_loop(
+            direct_messages(["wrong"] * calls), timeout=120))), iterations, case="wrong_code"))
+        # Every student is added once and gets a confirmation DM from the fake Discord
+        matching_iterations = min(iterations, len(students) - WARMUP - ALLOCATION_RUNS)
+        if matching_iterations >= 1:
+            matching = bc.run_on_bot_loop(
+                direct_messages([ATTENDANCE_CODE] * calls_needed(matching_iterations)), timeout=120)
+            results.append(measure("on_message", handle(iter(matching)), matching_iterations, case="code_match"))
+    finally:
+        data.attendance_code, data.group_status[group] = "", False
+        data.groups[group].clear()
+    return results
+
+
+def bench_api(env: Environment, iterations: int) -> list:
+    """GET round trips through the Flask test client, with API key check, audit and tracing."""
+    fake = env.start_bot()
+    guild_id = next(iter(fake.world.guilds))
+    routes = [
+        ("/api/bot-status", {}), ("/api/ping", {}), ("/api/server-info", {}), ("/api/member-count", {}),
+        ("/api/member-count", {"guild_id": guild_id}), ("/api/roles", {}), ("/api/channels", {}),
+        ("/api/members", {}), ("/api/data/surveys", {}), ("/api/metrics", {}),
+    ]
+    results = []
+    for path, params in routes:
+        url = env.url(path, **params)
+        status = env.client.get(url).status_code
+        if status != 200:
+            print(f"WARNING: GET {path} answered {status}")
+        heavy = path in ("/api/members", "/api/metrics")
+        results.append(measure(f"GET {path}", lambda: env.client.get(url), min(iterations, 50) if heavy else iterations,
+                               **({"guild_id": "given"} if params else {})))
+    return results
+
+
+# Cases by name, in the order they run
+BENCHMARKS = {
+    "audit": bench_audit,
+    "survey_csv": bench_survey_csv,
+    "feedback_view": bench_feedback_view,
+    "members": bench_members,
+    "list_files": bench_list_files,
+    "on_message": bench_on_message,
+    "api": bench_api,
+}
+
+
+########################################
+#               RESULTS                #
+########################################
+
+def git_commit() -> str:
+    """The checked out commit, with a "-dirty" suffix for uncommitted changes."""
+    try:
+        result = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=30)
+        return result.stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def compare(results: list, baseline: dict, threshold: float) -> list:
+    """
+    Compare the p95 of every case with a baseline.
+
+    Args:
+        results (list): Results of this run.
+        baseline (dict): An earlier result file.
+        threshold (float): Relative slowdown that counts as a regression, e.g. 0.25.
+
+    Returns:
+        list: Keys of the cases that regressed.
+    """
+    before = {case_key(result): result for result in baseline.get("results", [])}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit', 'unknown')} (p95, regression above +{threshold:.0%}):")
+    for result in results:
+        key = case_key(result)
+        old = before.get(key)
+        if old is None or not old["p95_ms"]:
+            print(f"  {key:<60} new")
+            continue
+        change = result["p95_ms"] / old["p95_ms"] - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"  {key:<60} {old['p95_ms']:>10.3f} -> {result['p95_ms']:>10.3f} ms {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def print_results(results: list) -> None:
+    print(f"\n{'case':<60} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'alloc KiB':>10} {'kept KiB':>9}")
+    for result in results:
+        print(f"{case_key(result):<60} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+              f"{result['alloc_kib']:>10.1f} {result['retained_kib']:>9.1f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.hotpaths", description=__doc__.split("\n\n")[1])
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS), help="Cases to run")
+    parser.add_argument("--members", type=int, default=DEFAULT_MEMBERS,
+                        help=f"Members of the fake guild (default: {DEFAULT_MEMBERS})")
+    parser.add_argument("--guilds", type=int, default=1, help="Fake guilds")
+    parser.add_argument("--profile", default="full", help="Gateway profile of the bot (default: full)")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS,
+                        help=f"Timed calls per case, fewer for the slow ones (default: {DEFAULT_ITERATIONS})")
+    parser.add_argument("--output", type=Path, help="Result file (default: data/benchmarks/hotpaths_<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier result file to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Relative p95 slowdown that fails the comparison (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+    if args.iterations < 1:
+        parser.error("--iterations must be at least 1")
+
+    commit = git_commit()
+    output = (args.output or RESULTS_DIR / f"hotpaths_{commit}.json").resolve()
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+
+    # Relative paths of the REST package (e.g. the audit directory) expect to run from REST like the server
+    os.chdir(REST_DIR)
+    sys.path.insert(0, str(REST_DIR))
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="hotpaths_") as workdir:
+        env = Environment(Path(workdir), args.members, args.guilds, args.profile)
+        try:
+            for name in BENCHMARKS:
+                if name in args.only:
+                    print(f"Running {name}...")
+                    results.extend(BENCHMARKS[name](env, args.iterations))
+        finally:
+            env.close()
+
+    print_results(results)
+    output.parent.mkdir(exist_ok=True, parents=True)
+    output.write_text(json.dumps({
+        "commit": commit,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "members": args.members,
+        "guilds": args.guilds,
+        "profile": args.profile,
+        "results": results,
+    }, indent=2))
+    print(f"\nResults written to {output}")
+
+    if baseline is not None and compare(results, baseline, args.threshold):
+        print("FAIL: p95 regressions")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,501 @@
+"""
+Traffic Replay
+~~~~~~~~
+
+Replays the recorded traffic of the REST API against a running server, to test a change
+with the requests a course actually made instead of a synthetic mix.
+
+The timeline is built from the request lines werkzeug logs to data/logs (the plain text
+session logs and the JSON lines log, rotated ``.gz`` files included) and from the daily
+audit files in data/audit. The audit files know the endpoint and its parameters but not the
+method, requests found in both sources are taken from the logs; an audit entry gets the
+method the logs used for its path, GET if the path is not in the logs. Request bodies are
+not recorded, so only GET requests are replayed unless ``--methods`` says otherwise.
+
+Requests are sent at their recorded pace, ``--speed`` times faster, with idle gaps shortened
+to ``--max-gap`` seconds. They are sent on schedule whether or not the earlier ones were
+answered, up to ``--concurrency`` at a time; the report lists how far the replay fell behind
+the schedule, and per endpoint the status codes and the latency distribution. The API key
+of the recording is replaced by the one of the target.
+
+By default the REST API and a bot connected to the fake Discord (see fake_discord) are
+started in this process. Pass ``--api-url`` and ``--api-key`` to replay against a running
+server.
+
+Usage (from the project root)::
+
+    python -m benchmarks.replay --since 2025-05-05 --until 2025-05-06 --speed 10
+    python -m benchmarks.replay --api-url http://127.0.0.1:5000 --api-key <key> --compare data/benchmarks/replay_<commit>.json
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import argparse
+import asyncio
+import collections
+import datetime
+import gzip
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+from benchmarks.hotpaths import (
+    DEFAULT_THRESHOLD, PROJECT_ROOT, REST_DIR, RESULTS_DIR, Environment, compare, git_commit
+)
+from benchmarks.stats import percentiles
+
+DEFAULT_LOG_DIR = PROJECT_ROOT / 'data' / 'logs'
+DEFAULT_AUDIT_DIR = PROJECT_ROOT / 'data' / 'audit'
+DEFAULT_SPEED = 1.0
+DEFAULT_MAX_GAP = 5.0
+DEFAULT_CONCURRENCY = 32
+DEFAULT_TIMEOUT = 30.0
+
+_TEXT_RECORD_RE = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3}) - werkzeug - \w+ - (.*)$')
+# werkzeug colours the request line of error responses on a terminal
+_ANSI_RE = re.compile(r'\x1b\[[\d;]*m')
+_REQUEST_LINE_RE = re.compile(r'"(GET|POST|PUT|PATCH|DELETE) (\S+) HTTP/[\d.]+" (\d{3})')
+# Discord ids in a path are grouped into one endpoint
+_ID_RE = re.compile(r'/\d{5,}(?=/|$)')
+
+
+class Request:
+    """
+    A recorded request.
+
+    Args:
+        timestamp (float): Epoch seconds when it was made.
+        method (str): HTTP method.
+        path (str): Path without the query.
+        params (list): Query parameters as (name, value) pairs.
+        status (int): Status code of the recording, None for audit entries.
+        source (str): ``log`` or ``audit``.
+    """
+
+    __slots__ = ("timestamp", "method", "path", "params", "status", "source")
+
+    def __init__(self, timestamp: float, method: str, path: str, params: list, status: int = None,
+                 source: str = "log"):
+        self.timestamp = timestamp
+        self.method = method
+        self.path = path
+        self.params = params
+        self.status = status
+        self.source = source
+
+    @property
+    def endpoint(self) -> str:
+        return f"{self.method} {_ID_RE.sub('/{id}', self.path)}"
+
+
+########################################
+#               TIMELINE               #
+########################################
+
+def _request_from_message(timestamp: float, message: str):
+    match = _REQUEST_LINE_RE.search(_ANSI_RE.sub('', message))
+    if not match:
+        return None
+    method, target, status = match.groups()
+    path, _, query = target.partition('?')
+    return Request(timestamp, method, path, parse_qsl(query, keep_blank_values=True), int(status))
+
+
+def _open_log(path: Path):
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, encoding='utf-8', errors='replace')
+
+
+def read_logs(log_dir: Path) -> list:
+    """
+    The requests werkzeug logged in a log directory.
+
+    Args:
+        log_dir (Path): Directory of the ``.log`` session logs and the ``.jsonl`` log.
+
+    Returns:
+        list: The :class:`Request` objects, in file order.
+    """
+    requests = []
+    files = sorted(log_dir.glob('*.log')) + sorted(log_dir.glob('*.jsonl*'))
+    for path in files:
+        with _open_log(path) as f:
+            for line in f:
+                if line.startswith('{'):
+                    if '"werkzeug"' not in line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                        timestamp = datetime.datetime.fromisoformat(entry["timestamp"]).timestamp()
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if entry.get("logger") != "werkzeug":
+                        continue
+                    message = entry.get("message", "")
+                else:
+                    match = _TEXT_RECORD_RE.match(line)
+                    if not match:
+                        continue
+                    stamp, millis, message = match.groups()
+                    timestamp = datetime.datetime.strptime(stamp, '%Y-%m-%d %H:%M:%S').timestamp() + int(millis) / 1000
+                request = _request_from_message(timestamp, message)
+                if request is not None:
+                    requests.append(request)
+    return requests
+
+
+def read_audit(audit_dir: Path) -> list:
+    """
+    The API calls of the daily audit files, without a method (see :func:`build_timeline`).
+
+    Args:
+        audit_dir (Path): Directory of the ``audit_<date>.json`` files.
+
+    Returns:
+        list: The :class:`Request` objects, in file order.
+    """
+    requests = []
+    for path in sorted(audit_dir.glob('audit_*.json')):
+        try:
+            entries = json.loads(path.read_text())
+        except (OSError, json.JSONDecodeError):
+            print(f"Skipping unreadable audit file {path.name}")
+            continue
+        for entry in entries:
+            try:
+                timestamp = datetime.datetime.strptime(entry["timestamp"], '%Y-%m-%d %H:%M:%S').timestamp()
+                endpoint = entry["endpoint"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            params = [(key, str(value)) for key, value in (entry.get("params") or {}).items()]
+            requests.append(Request(timestamp, None, endpoint, params, source="audit"))
+    return requests
+
+
+def build_timeline(logged: list, audited: list) -> list:
+    """
+    Merge the logged and the audited requests into one timeline.
+
+    An API call shows up in both sources: the audit entry is written when the request
+    starts, the log line when it is answered, so an audit entry is dropped if the logs hold
+    the same path within the same or the next second.
+
+    Args:
+        logged (list): Requests of :func:`read_logs`.
+        audited (list): Requests of :func:`read_audit`.
+
+    Returns:
+        list: The requests sorted by time.
+    """
+    seen = collections.Counter((int(request.timestamp), request.path) for request in logged)
+    methods = collections.defaultdict(collections.Counter)
+    for request in logged:
+        methods[request.path][request.method] += 1
+
+    timeline = list(logged)
+    for request in audited:
+        second = int(request.timestamp)
+        for key in ((second, request.path), (second + 1, request.path)):
+            if seen[key]:
+                seen[key] -= 1
+                break
+        else:
+            known = methods.get(request.path)
+            request.method = known.most_common(1)[0][0] if known else "GET"
+            timeline.append(request)
+    timeline.sort(key=lambda request: request.timestamp)
+    return timeline
+
+
+def select(timeline: list, methods: list, prefix: str, since: float = None, until: float = None,
+           limit: int = None) -> list:
+    """The requests of the timeline to replay, see the command line options."""
+    selected = [
+        request for request in timeline
+        if request.method in methods and request.path.startswith(prefix)
+        and (since is None or request.timestamp >= since) and (until is None or request.timestamp < until)
+    ]
+    return selected[:limit] if limit else selected
+
+
+def schedule(requests: list, speed: float, max_gap: float) -> list:
+    """
+    Seconds after the start at which each request is sent.
+
+    Args:
+        requests (list): The selected requests, sorted by time.
+        speed (float): Replay speed, 1 for the recorded pace.
+        max_gap (float): Longest recorded pause kept, in recorded seconds.
+
+    Returns:
+        list: The offsets, one per request.
+    """
+    offsets = []
+    offset = 0.0
+    previous = None
+    for request in requests:
+        if previous is not None:
+            offset += min(request.timestamp - previous, max_gap)
+        previous = request.timestamp
+        offsets.append(offset / speed)
+    return offsets
+
+
+########################################
+#                REPLAY                #
+########################################
+
+class Endpoint:
+    """Latencies and outcomes of the replayed requests of one endpoint."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = []
+        self.statuses = collections.Counter()
+        self.changed = 0
+        self.errors = 0
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+        result = {
+            "name": self.name,
+            "params": {},
+            "count": len(latencies) + self.errors,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "status_changed": self.changed,
+            "errors": self.errors,
+            "p50_ms": None,
+            "p95_ms": None,
+            "p99_ms": None,
+            "max_ms": None,
+        }
+        result.update(percentiles(latencies))
+        return result
+
+
+class Replay:
+    """
+    Sends a timeline of requests to a REST API on schedule.
+
+    Args:
+        api_url (str): Base URL of the REST API.
+        api_key (str): API key replacing the recorded one.
+        concurrency (int): Requests in flight at most.
+        timeout (float): Seconds until a request counts as an error.
+    """
+
+    def __init__(self, api_url: str, api_key: str, concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.api_url = api_url.rstrip('/')
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.endpoints = {}
+        self.behind = []
+
+    def url(self, request: Request) -> str:
+        params = [(key, self.api_key if key == "api_key" else value) for key, value in request.params]
+        return f"{self.api_url}{request.path}?{urlencode(params)}" if params else f"{self.api_url}{request.path}"
+
+    async def send(self, session, request: Request) -> None:
+        import aiohttp
+
+        endpoint = self.endpoints.get(request.endpoint)
+        if endpoint is None:
+            endpoint = self.endpoints[request.endpoint] = Endpoint(request.endpoint)
+        started = time.perf_counter()
+        try:
+            async with session.request(request.method, self.url(request)) as response:
+                await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            endpoint.errors += 1
+            return
+        endpoint.latencies.append(time.perf_counter() - started)
+        endpoint.statuses[response.status] += 1
+        if request.status is not None and request.status != response.status:
+            endpoint.changed += 1
+
+    async def run(self, requests: list, offsets: list) -> float:
+        """
+        Replay the requests, each at its offset.
+
+        Returns:
+            float: Seconds the replay took.
+        """
+        import aiohttp
+
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def send(request):
+            try:
+                await self.send(session, request)
+            finally:
+                slots.release()
+
+        tasks = set()
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency),
+                                         timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            started = time.perf_counter()
+            for request, offset in zip(requests, offsets):
+                delay = started + offset - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await slots.acquire()
+                # How late the request leaves, because of the event loop or all slots being busy
+                self.behind.append(max(time.perf_counter() - started - offset, 0.0))
+                task = asyncio.create_task(send(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+            return time.perf_counter() - started
+
+    def results(self) -> list:
+        summaries = [endpoint.summary() for endpoint in self.endpoints.values()]
+        return sorted(summaries, key=lambda result: result["count"], reverse=True)
+
+    def behind_summary(self) -> dict:
+        behind = percentiles(self.behind, digits=1)
+        return {"p95_ms": behind.get("p95_ms", 0.0), "max_ms": behind.get("max_ms", 0.0)}
+
+
+########################################
+#                REPORT                #
+########################################
+
+def print_report(report: dict) -> None:
+    print(f"\nReplayed {report['requests']} requests recorded over {report['recorded_s']:.0f}s "
+          f"({report['from']} to {report['to']}) in {report['seconds']:.1f}s, "
+          f"speed {report['speed']}x, gaps cut to {report['max_gap_s']}s")
+    behind = report["behind_schedule"]
+    print(f"Behind schedule: p95 {behind['p95_ms']} ms, max {behind['max_ms']} ms")
+    print(f"{'endpoint':<44} {'count':>6} {'statuses':<18} {'changed':>7} {'errors':>6} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for result in report["results"]:
+        statuses = " ".join(f"{status}:{count}" for status, count in result["statuses"].items())
+        print(f"{result['name']:<44} {result['count']:>6} {statuses:<18} {result['status_changed']:>7} "
+              f"{result['errors']:>6} " + " ".join(
+                  f"{result[key]:>9.3f}" if result[key] is not None else f"{'-':>9}"
+                  for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms")))
+
+
+def _parse_time(value: str) -> float:
+    """Parse an ISO date or date time ('2025-05-09' or '2025-05-09 14:55:59') to epoch seconds."""
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def _format_time(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp).isoformat(sep=' ', timespec='seconds')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay", description=__doc__.split("\n\n")[1])
+    parser.add_argument("--logs", type=Path, default=DEFAULT_LOG_DIR, help="Log directory (default: data/logs)")
+    parser.add_argument("--audit", type=Path, default=DEFAULT_AUDIT_DIR, help="Audit directory (default: data/audit)")
+    parser.add_argument("--since", type=_parse_time, help="First recorded time to replay, ISO date or date time")
+    parser.add_argument("--until", type=_parse_time, help="Replay the requests recorded before this time")
+    parser.add_argument("--methods", nargs="+", default=["GET"], type=str.upper,
+                        help="Methods to replay (default: GET, the bodies of other requests are not recorded)")
+    parser.add_argument("--prefix", default="/api/", help="Replay the paths starting with this (default: /api/)")
+    parser.add_argument("--limit", type=int, help="Replay at most this many requests")
+    parser.add_argument("--speed", type=float, default=DEFAULT_SPEED,
+                        help=f"Replay speed, 10 for ten times the recorded pace (default: {DEFAULT_SPEED:.0f})")
+    parser.add_argument("--max-gap", type=float, default=DEFAULT_MAX_GAP,
+                        help=f"Longest recorded pause kept in seconds (default: {DEFAULT_MAX_GAP:.0f})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Requests in flight at most (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"Seconds until a request counts as an error (default: {DEFAULT_TIMEOUT:.0f})")
+    parser.add_argument("--members", type=int, default=1000, help="Members of the fake guild started in-process")
+    parser.add_argument("--no-bot", action="store_true", help="Do not start the bot of the in-process API")
+    parser.add_argument("--api-url", help="REST API to replay against instead of starting one in-process")
+    parser.add_argument("--api-key", help="API key for --api-url")
+    parser.add_argument("--output", type=Path, help="Report file (default: data/benchmarks/replay_<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier report to compare the p95 per endpoint with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Relative p95 slowdown that fails the comparison (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    if args.api_url and not args.api_key:
+        parser.error("--api-key is required with --api-url")
+
+    commit = git_commit()
+    output = (args.output or RESULTS_DIR / f"replay_{commit}.json").resolve()
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+
+    logged = read_logs(args.logs.resolve())
+    audited = read_audit(args.audit.resolve()) if args.audit.is_dir() else []
+    timeline = build_timeline(logged, audited)
+    requests = select(timeline, args.methods, args.prefix, args.since, args.until, args.limit)
+    print(f"{len(logged)} logged and {len(audited)} audited requests, {len(timeline)} after merging, "
+          f"{len(requests)} selected")
+    if not requests:
+        print("Nothing to replay")
+        return 1
+    offsets = schedule(requests, args.speed, args.max_gap)
+    print(f"Replaying over {offsets[-1]:.1f}s")
+
+    if args.api_url:
+        replay = Replay(args.api_url, args.api_key, args.concurrency, args.timeout)
+        seconds = asyncio.run(replay.run(requests, offsets))
+    else:
+        from benchmarks.burst import serve
+
+        os.chdir(REST_DIR)
+        sys.path.insert(0, str(REST_DIR))
+        with tempfile.TemporaryDirectory(prefix="replay_") as workdir:
+            env = Environment(Path(workdir), args.members, 1, "full")
+            server = None
+            try:
+                if not args.no_bot:
+                    env.start_bot()
+                server, api_url = serve(env.app)
+                replay = Replay(api_url, env.api_key, args.concurrency, args.timeout)
+                seconds = asyncio.run(replay.run(requests, offsets))
+            finally:
+                if server is not None:
+                    server.shutdown()
+                env.close()
+
+    results = replay.results()
+    report = {
+        "commit": commit,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "requests": len(requests),
+        "from": _format_time(requests[0].timestamp),
+        "to": _format_time(requests[-1].timestamp),
+        "recorded_s": round(requests[-1].timestamp - requests[0].timestamp, 1),
+        "seconds": round(seconds, 1),
+        "speed": args.speed,
+        "max_gap_s": args.max_gap,
+        "behind_schedule": replay.behind_summary(),
+        "results": results,
+    }
+    print_report(report)
+    output.parent.mkdir(exist_ok=True, parents=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nReport written to {output}")
+
+    failed = False
+    errors = sum(result["errors"] for result in results)
+    if errors:
+        print(f"FAIL: {errors} requests got no answer")
+        failed = True
+    if baseline is not None and compare([result for result in results if result["p95_ms"] is not None],
+                                        baseline, args.threshold):
+        print("FAIL: p95 regressions")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
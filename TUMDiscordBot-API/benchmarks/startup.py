@@ -0,0 +1,125 @@
+"""
+Startup Benchmark
+~~~~~~~~
+
+Measures the import time of the REST entry point with ``python -X importtime`` in fresh
+interpreters and checks it against a budget. The Discord stack and the analytics stack
+are imported lazily, the benchmark fails as well if any of them is imported at startup.
+
+Usage (from the project root)::
+
+    python -m benchmarks.startup --budget-ms 350 --runs 5
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+REST_DIR = PROJECT_ROOT / 'REST'
+
+DEFAULT_BUDGET_MS = 350
+DEFAULT_RUNS = 5
+
+# Only imported when the bot is started or an analytics endpoint is called
+DEFERRED_PACKAGES = ("discord", "bot", "utility", "shared", "fake_discord", "pandas", "numpy", "matplotlib")
+
+
+def parse_importtime(output: str, module: str) -> tuple:
+    """
+    Parse the ``-X importtime`` report of one interpreter run.
+
+    Args:
+        output (str): The stderr of the run.
+        module (str): The module that was imported.
+
+    Returns:
+        tuple: The cumulative import time of ``module`` in microseconds and a list of
+            (name, self time in microseconds) for every module imported by it.
+    """
+    total = None
+    pending = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # Header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if depth == 0:
+            if name == module:
+                total = int(cumulative_us)
+                break
+            pending = []
+            continue
+        pending.append((name, int(self_us)))
+    if total is None:
+        raise RuntimeError(f"{module} is missing from the import time report")
+    return total, pending
+
+
+def measure(module: str = "run") -> tuple:
+    """
+    Import ``module`` in a fresh interpreter, started in the REST directory like the server.
+
+    Returns:
+        tuple: See :func:`parse_importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REST_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr, module)
+
+
+def by_package(modules: list) -> dict:
+    """Sum the self time per top-level package."""
+    totals = {}
+    for name, self_us in modules:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return totals
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.split("\n\n")[1])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Maximum median import time (default: {DEFAULT_BUDGET_MS})")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Interpreter runs to take the median of")
+    parser.add_argument("--top", type=int, default=10, help="Number of packages listed")
+    parser.add_argument("--module", default="run", help="Module imported from the REST directory")
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(max(args.runs, 1))]
+    median_ms = statistics.median(total for total, _ in runs) / 1000
+    modules = runs[-1][1]
+
+    print(f"import {args.module}: median {median_ms:.1f} ms over {len(runs)} runs (budget {args.budget_ms:.0f} ms)")
+    print("Slowest packages (self time, last run):")
+    packages = sorted(by_package(modules).items(), key=lambda item: item[1], reverse=True)
+    for package, self_us in packages[:args.top]:
+        print(f"  {package:<30} {self_us / 1000:8.1f} ms")
+
+    failed = False
+    eager = sorted({name.split(".")[0] for name, _ in modules} & set(DEFERRED_PACKAGES))
+    if eager:
+        print(f"FAIL: imported at startup but should be lazy: {', '.join(eager)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"FAIL: import time {median_ms:.1f} ms exceeds the budget of {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+Stats
+~~~~~~~~
+
+Latency percentiles shared by the benchmarks, so every report cuts its samples the same way.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import statistics
+
+
+def percentiles(samples, scale: float = 1000, digits: int = 3) -> dict:
+    """
+    The median, 95th and 99th percentile and the maximum of a sample.
+
+    A single sample is all of them; the percentiles of two or more are interpolated
+    between the samples (the "inclusive" method of ``statistics.quantiles``).
+
+    Args:
+        samples: The measured values, in any order.
+        scale (float): Factor to milliseconds, 1000 for seconds, 1e-6 for nanoseconds.
+        digits (int): Decimal places of the results.
+
+    Returns:
+        dict: ``p50_ms``, ``p95_ms``, ``p99_ms`` and ``max_ms``, empty without samples.
+    """
+    samples = sorted(samples)
+    if not samples:
+        return {}
+    if len(samples) == 1:
+        p50 = p95 = p99 = samples[0]
+    else:
+        # The 99 cut points between the percentiles, cuts[49] is the median
+        cuts = statistics.quantiles(samples, n=100, method="inclusive")
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    return {
+        "p50_ms": round(p50 * scale, digits),
+        "p95_ms": round(p95 * scale, digits),
+        "p99_ms": round(p99 * scale, digits),
+        "max_ms": round(samples[-1] * scale, digits),
+    }
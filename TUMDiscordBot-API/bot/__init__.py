@@ -1,11 +1,18 @@
 # First import basic data
 from . import bot_data
 
-# Import and initialize the bot instance first
-from .discord_bot import bot, start, _verify_author_roles
+# Client factory and lifecycle, the client itself is built when the bot is started
+from . import discord_bot
+from .discord_bot import create_bot, start, _verify_author_roles
 
-
-# Only after bot is fully initialized, import the modules that depend on it
+# The command and event modules fill the registry the clients are built from
 from .discord_bot_functions import *
 from .discord_bot_slash_commands import *
-from .discord_bot_events import *
\ No newline at end of file
+from .discord_bot_events import *
+
+
+def __getattr__(name):
+    # `bot.bot` is the current client, replaced when the token changes
+    if name == "bot":
+        return discord_bot.bot
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
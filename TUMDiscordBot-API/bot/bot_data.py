@@ -8,12 +8,6 @@ Contains variables that are used by the bot and other modules.
 :license: MIT, see LICENSE for more details.
 """
 
-import sys
-from pathlib import Path
-
-# Add the project root to Python path to make imports work correctly
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 # Import settings manager
 from REST import settings_manager
 
@@ -23,16 +17,61 @@ if not SETTINGS:
     raise RuntimeError("Settings could not be loaded. Cannot initialize bot data.")
 
 PERMISSION_DENIED = "You lack the permissions to use this command!"
-# Used for marking the attendance based on dynamic instructor defined "password" with len <= 10
-ATTENDANCE_CODE = ""
-
-# Dynamically create group variables based on settings.json
-# Tutor groups attendance lists
-for group in SETTINGS["groups"]:
-    # Create the variable name using the original group name from settings
-    var_name = f"group_{group}"
-    globals()[var_name] = []
-    globals()[f"{var_name}_status"] = False
+
+
+class GuildData:
+    """
+    Attendance and survey state of one guild (course server).
+
+    Args:
+        guild_id (int): The id of the guild.
+    """
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        # Used for marking the attendance based on dynamic instructor defined "password" with len <= 10
+        self.attendance_code = ""
+        # Tutor groups attendance lists and whether they accept attendance codes
+        self.groups = {group: [] for group in SETTINGS["groups"]}
+        self.group_status = {group: False for group in SETTINGS["groups"]}
+        # Students added to a survey, by survey id
+        self.survey = {}
+        # Check in view of the running attendance, None while the codes are sent by DM
+        self.check_in_view = None
+
+    def find_group(self, group_id: str):
+        """Return the group name from the settings matching ``group_id`` case-insensitively, None if unknown."""
+        group_id = group_id.lower()
+        for group in self.groups:
+            if group.lower() == group_id:
+                return group
+        return None
+
+    def active_group(self):
+        """Return the group currently accepting attendance codes, None if there is none."""
+        for group, status in self.group_status.items():
+            if status:
+                return group
+        return None
+
+
+# State of every guild the bot has been used in, by guild id
+_guilds = {}
+
+
+def guild_data(guild_id) -> GuildData:
+    """Return the state of a guild, created on first use."""
+    guild_id = int(guild_id)
+    data = _guilds.get(guild_id)
+    if data is None:
+        data = _guilds.setdefault(guild_id, GuildData(guild_id))
+    return data
+
+
+def all_guild_data() -> list:
+    """Return the state of all guilds."""
+    return list(_guilds.values())
+
 
 # Lectures data
 lectures = {}
@@ -0,0 +1,220 @@
+"""
+Command Sync
+~~~~~~~~
+
+Registers the slash commands with Discord only when they changed. Registering is slow and
+rate limited, and ``on_ready`` runs again on every reconnect, so the schema of the
+registered commands is hashed together with the application and the guilds it is synced
+to. The hash and the command ids Discord assigned are kept in data/runtime; while the
+hash is unchanged the ids are restored from there and no request is made.
+
+``"command_sync": {"force": true}`` in .secrets.json syncs on every ``on_ready``. An
+interaction naming a command the bot does not know (e.g. the commands were changed by
+another deployment with the same token) forces a sync as well.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import discord
+
+from REST import settings_manager
+from REST.utils.metrics import Counter
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+DEFAULT_STATE_PATH = settings_manager.PROJECT_ROOT / "data" / "runtime" / "command_sync.json"
+STATE_VERSION = 1
+# Seconds between two syncs forced by unknown commands
+FORCE_COOLDOWN = 60
+
+COMMAND_SYNCS = Counter(
+    "bot_command_syncs_total", "Slash command syncs on ready, by result.", ("result",)
+)
+
+
+def schema_hash(client: discord.Bot, guild_ids: list) -> str:
+    """
+    Hash of everything a sync registers: the application, the command schemas and the guilds.
+
+    Args:
+        client (discord.Bot): The logged in client.
+        guild_ids (list): The guilds the commands are registered in.
+    """
+    commands = sorted(
+        ({"type": command.type, **command.to_dict()} for command in client.pending_application_commands),
+        key=lambda command: (command["name"], command["type"]),
+    )
+    schema = {
+        "application_id": client.application_id,
+        "commands": commands,
+        "guild_ids": sorted(guild_ids),
+    }
+    return hashlib.sha256(json.dumps(schema, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class CommandSync:
+    """
+    Syncs the slash commands on ready unless the stored schema hash matches.
+
+    Args:
+        force (bool): Sync on every ``on_ready``, regardless of the stored hash.
+        state_path (Path): JSON file keeping the hash and command ids per application.
+    """
+
+    def __init__(self, force=False, state_path=DEFAULT_STATE_PATH):
+        self.force = bool(force)
+        self.state_path = Path(state_path)
+        self._syncing = False
+        self._forced_at = None
+
+    @classmethod
+    def from_settings(cls):
+        """Create a sync configured by the optional "command_sync" section of .secrets.json."""
+        settings = (settings_manager.SETTINGS or {}).get("command_sync", {})
+        return cls(force=settings.get("force", False))
+
+    ########################################
+    #                STATE                 #
+    ########################################
+
+    def _load(self) -> dict:
+        try:
+            with open(self.state_path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if data.get("version") != STATE_VERSION:
+            return {}
+        return data.get("applications", {})
+
+    def _save(self, applications: dict) -> None:
+        self.state_path.parent.mkdir(exist_ok=True, parents=True)
+        temp_path = self.state_path.with_suffix('.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump({"version": STATE_VERSION, "applications": applications}, f, indent=2)
+        os.replace(temp_path, self.state_path)
+
+    ########################################
+    #                 SYNC                 #
+    ########################################
+
+    @staticmethod
+    def _restore(client: discord.Bot, commands: dict, guild_ids: list) -> bool:
+        """
+        Map the stored command ids to the commands, as a sync would.
+
+        Returns:
+            bool: False if a command has no stored id, the commands then have to be synced.
+        """
+        by_name = {command.name: command for command in client.pending_application_commands}
+        if set(by_name) - set(commands.values()):
+            return False
+        restored = {command_id: by_name[name] for command_id, name in commands.items() if name in by_name}
+
+        # Interactions are dispatched to the command objects themselves, so they are updated in
+        # place like Bot.sync_commands does: it sets guild_ids and id and maps the id in the private
+        # _application_commands, which has no public setter in py-cord 2.5.0 (pinned in
+        # requirements.txt). Check both against sync_commands when upgrading
+        for command in by_name.values():
+            command.guild_ids = guild_ids
+        for command_id, command in restored.items():
+            command.id = command_id
+        client._application_commands.update(restored)
+        return True
+
+    @staticmethod
+    async def _register(client: discord.Bot, guild_ids: list) -> None:
+        # To sync to all guilds (global commands - can take up to an hour to register)
+        await client.sync_commands()
+
+        # To sync to specific guilds for immediate testing (faster than global commands)
+        # Every course server the bot is in gets the commands right away
+        if guild_ids:
+            logger.info(f"Syncing commands to guilds: {', '.join(guild.name for guild in client.guilds)}")
+            await client.sync_commands(guild_ids=guild_ids)
+
+    async def sync(self, client: discord.Bot, force: bool = False) -> bool:
+        """
+        Sync the slash commands of the client if their schema or guilds changed.
+
+        Args:
+            client (discord.Bot): The logged in client.
+            force (bool): Sync even if the stored hash matches.
+
+        Returns:
+            bool: Whether the commands were registered with Discord.
+        """
+        if self._syncing:
+            return False
+        self._syncing = True
+        try:
+            guild_ids = sorted(guild.id for guild in client.guilds)
+            digest = schema_hash(client, guild_ids)
+            applications = self._load()
+            key = str(client.application_id)
+            stored = applications.get(key, {})
+
+            if not (force or self.force) and stored.get("hash") == digest \
+                    and self._restore(client, stored.get("commands", {}), guild_ids):
+                logger.info(f"Slash commands unchanged since {stored.get('synced_at')}, skipping the sync")
+                COMMAND_SYNCS.inc(result="skipped")
+                return False
+
+            if force or self.force:
+                reason = "forced"
+            elif not stored.get("hash"):
+                reason = "no previous sync"
+            elif stored.get("guild_ids") != guild_ids:
+                reason = "guilds changed"
+            else:
+                reason = "commands changed"
+            logger.info(f"Syncing {len(client.pending_application_commands)} commands ({reason})...")
+            started = time.perf_counter()
+            try:
+                await self._register(client, guild_ids)
+            except Exception as e:
+                logger.error(f"Error syncing commands: {e}")
+                COMMAND_SYNCS.inc(result="failed")
+                return False
+
+            applications[key] = {
+                "hash": digest,
+                "guild_ids": guild_ids,
+                # The ids the sync mapped, private in py-cord 2.5.0 like the write in _restore
+                "commands": {
+                    str(command_id): command.name
+                    for command_id, command in client._application_commands.items()
+                },
+                "synced_at": datetime.datetime.now().isoformat(timespec='seconds'),
+            }
+            try:
+                self._save(applications)
+            except OSError as e:
+                logger.warning(f"Could not store the command sync state: {e}")
+            logger.info(f"Synced commands in {time.perf_counter() - started:.1f}s")
+            COMMAND_SYNCS.inc(result="synced")
+            return True
+        finally:
+            self._syncing = False
+
+    async def resync(self, client: discord.Bot) -> bool:
+        """Force a sync after an unknown command was invoked, at most once per ``FORCE_COOLDOWN``."""
+        now = time.monotonic()
+        if self._forced_at is not None and now - self._forced_at < FORCE_COOLDOWN:
+            return False
+        self._forced_at = now
+        return await self.sync(client, force=True)
+
+
+# Shared by the event handlers
+command_sync = CommandSync.from_settings()
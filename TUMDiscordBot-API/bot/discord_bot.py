@@ -10,14 +10,10 @@ A basic bot created for the tutors and instructors of the Introductory Programmi
 
 import asyncio
 import discord
-import sys
 import logging
-from pathlib import Path
 
-from bot import bot_data
-
-# Add the project root to Python path to make imports work correctly
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from bot import gateway_profiles
+from bot.registry import registry
 
 # Import settings manager
 from REST import settings_manager
@@ -35,13 +31,48 @@ SETTINGS = settings_manager.SETTINGS
 if not SETTINGS:
     raise RuntimeError("Settings could not be loaded. Cannot start the bot.")
 
-bot = commands.Bot(
-    intents=discord.Intents.all(),
-    status=discord.Status.streaming,
-    activity=discord.Streaming(
-        name="Coding with Jimbo", url="https://www.youtube.com/watch?v=dQw4w9WgXcQ"
-    ),
-)
+# The current client, built by start() on the bot thread (py-cord binds a client to the loop it is created on)
+bot = None
+# Token the current client logged in with
+_token = None
+# Seconds a stopped loop waits for the client to finish closing
+CLOSE_GRACE = 5
+
+
+def create_bot() -> commands.Bot:
+    """
+    Client factory, builds a new client with the commands, events and hooks of the registry.
+
+    With ``"sharding": {"enabled": true}`` in .secrets.json the client is an
+    :class:`commands.AutoShardedBot`: the guilds are spread over several gateway
+    connections, by default as many as Discord recommends ("shard_count" overrides it,
+    "shard_ids" selects the shards run by this process). The intents and member cache
+    follow the gateway profile (see bot.gateway_profiles).
+
+    Returns:
+        commands.Bot: The new, not yet started client.
+    """
+    profile = gateway_profiles.profile_from_settings()
+    logger.info(f"Using the {profile} gateway profile")
+    options = dict(
+        **gateway_profiles.gateway_options(profile),
+        # Commands are synced in on_ready, only when they changed (see bot.command_sync)
+        auto_sync_commands=False,
+        status=discord.Status.streaming,
+        activity=discord.Streaming(
+            name="Coding with Jimbo", url="https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+        ),
+    )
+    sharding = SETTINGS.get("sharding", {})
+    if sharding.get("enabled", False):
+        client = commands.AutoShardedBot(
+            shard_count=sharding.get("shard_count"), shard_ids=sharding.get("shard_ids"), **options
+        )
+    else:
+        client = commands.Bot(**options)
+    registry.apply(client)
+    return client
+
 
 ###########################################
 #              BOT FUNCTIONS              #
@@ -50,22 +81,18 @@ bot = commands.Bot(
 
 def start(token_key=None) -> None:
     """
-    Startup function.
+    Startup function, blocks the calling thread until the bot is closed.
+
+    A restart with the same token reuses the previous client: the registered commands and
+    their ids stay valid, only the connection state is cleared. A different token is a
+    different application, so a new client is built by the factory and the cached server
+    information is dropped.
 
     Args:
         token_key: Optional key to specify which token to use.
                If None, uses token based on development_mode setting.
     """
-    # Update global keyword so it can be accessed.
-    global bot
-    global _guilds, _channels, _members, _roles, _member_counts
-
-    # Clear any existing data
-    _guilds = {}
-    _channels = {}
-    _members = {}
-    _roles = {}
-    _member_counts = {"online": 0, "offline": 0, "total": 0}
+    global bot, _token
 
     # Determine which token to use based on development mode
     if token_key is None:
@@ -79,37 +106,72 @@ def start(token_key=None) -> None:
         # If a specific token key is provided, use that token
         token = SETTINGS["bot"][token_key]
 
+    # Offline runs talk to the in-process fake Discord instead of discord.com
+    if SETTINGS.get("fake_discord", {}).get("enabled", False):
+        import fake_discord
+        fake_discord.install()
+
     # Create a new event loop and set it as the current loop
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    
-    # Create a new bot instance if needed
-    global bot
-    recreated = False
-    if hasattr(bot, 'is_closed') and bot.is_closed():
-        bot = commands.Bot(
-            intents=discord.Intents.all(),
-            status=discord.Status.streaming,
-            activity=discord.Streaming(
-                name="Coding with Jimbo", url="https://www.youtube.com/watch?v=dQw4w9WgXcQ"
-            ),
-        )
-        recreated = True
-        # Update the bot reference in the top-level bot package so other modules see the new client
-        pkg = sys.modules.get('bot')
-        if pkg is not None:
-            setattr(pkg, 'bot', bot)
-
-    # Reload dependent modules only if the bot instance was recreated.
-    if recreated:
-        import importlib, sys as _sys
-        for mod in ['bot.discord_bot_functions', 'bot.discord_bot_slash_commands', 'bot.discord_bot_events']:
-            if mod in _sys.modules:
-                importlib.reload(_sys.modules[mod])
-
-    # Run the bot with the selected token
-    bot.run(token)
 
+    if bot is None or token != _token:
+        if bot is not None:
+            logger.info("Bot token changed, building a new client")
+            # Imported here, the functions module needs the package to be initialised
+            from bot import discord_bot_functions
+            discord_bot_functions.clear_caches()
+        bot = create_bot()
+        _token = token
+    else:
+        logger.info("Reusing the bot client, registered commands are kept")
+
+    _run(bot, token, loop)
+
+
+def discard_client() -> None:
+    """Forget the current client, the next start() builds a new one. Used when a client's loop is stuck."""
+    global bot
+    bot = None
+
+
+def _run(client: commands.Bot, token: str, loop: asyncio.AbstractEventLoop) -> None:
+    """Run the client on ``loop`` until it is closed, like ``Client.run`` without owning signals."""
+
+    async def runner():
+        # Binds the client (HTTP client, connection state) to the running loop
+        async with client:
+            if client.is_closed():
+                # Reopen a client that ran before: reset the connection caches and the HTTP session.
+                # _listeners holds the wait_for futures of the closed loop, private in py-cord 2.5.0
+                # (pinned in requirements.txt), check it when upgrading
+                client._listeners.clear()
+                try:
+                    client.clear()
+                except AttributeError:
+                    # Closed before it logged in, there is no HTTP session to recreate yet
+                    pass
+            await client.start(token)
+
+    future = asyncio.ensure_future(runner(), loop=loop)
+    future.add_done_callback(lambda _: loop.stop())
+    try:
+        loop.run_forever()
+    finally:
+        if not loop.is_closed():
+            # start() returns as soon as the gateway is closed, let a running close() finish
+            # closing the HTTP session before the remaining tasks are cancelled
+            closing = [task for task in asyncio.all_tasks(loop) if task.get_coro().__name__ == "close"]
+            if closing:
+                loop.run_until_complete(asyncio.wait(closing, timeout=CLOSE_GRACE))
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(loop), return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    if future.done() and not future.cancelled() and future.exception() is not None:
+        raise future.exception()
 
 
 def _verify_author_roles(user: discord.User | discord.Member) -> bool:
@@ -1,108 +1,171 @@
 import discord
-import sys
 import asyncio
 import time
 import logging
-from pathlib import Path
 
 import utility
-from bot import bot_data, bot
-from bot.discord_bot_functions import get_roles
+import REST.utils.bot_context as bc
+from bot import bot_data
+from bot.command_sync import command_sync
+from bot.discord_bot_functions import forget_guild, get_roles, refresh_all, refresh_guild
+from bot.event_filter import message_filter
+from bot.registry import registry
 
-# Add the project root to Python path to make imports work correctly
-sys.path.insert(0, str(Path(__file__).parent.parent))
-from REST import settings_manager
+from REST.utils.loop_monitor import loop_monitor
+from REST.utils.metrics import instrument_discord_http
+from REST.utils.role_cache import role_cache
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+
+# Helper: get the current live bot instance
+def _bot():
+    return bc.get_live_bot()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
 
 ########################################
 #              BOT EVENTS              #
 ########################################
 
 
-@bot.event
+@registry.event
 async def on_ready() -> None:
-    # Sync commands with Discord. Uncomment when done and pre-demo
-    await update_roles_in_settings()
+    client = _bot()
+    # Start the event loop watchdog, on reconnects this is a no-op
+    loop_monitor.start(asyncio.get_running_loop())
+    # Time Discord REST calls and count rate limits, also a no-op on reconnects
+    instrument_discord_http(client.http)
+
+    # Events missed while disconnected are not replayed after a new session, rebuild the
+    # server information caches (an unchanged entry is kept) and store the roles
+    refresh_all(client.guilds)
+    update_role_cache()
+
+    # A restart clears the views of the client, add the open check in buttons again
+    for data in bot_data.all_guild_data():
+        view = data.check_in_view
+        if view is not None and view.message is not None:
+            client.add_view(view, message_id=view.message.id)
+
+    # Register the slash commands, only if they or the guilds changed since the last sync
+    await command_sync.sync(client)
 
-    logger.info("Syncing commands...")
+    logger.info(f'-----\nLogged in as {client.user.name}.\nWith the bot id="{client.user.id}"\n-----')
+
+
+def update_role_cache() -> None:
+    """
+    Store the roles of every server in the role cache (see REST.utils.role_cache), the
+    file is only written when they changed.
+    """
     try:
-        # To sync to all guilds (global commands - can take up to an hour to register)
-        await bot.sync_commands()
-
-        # To sync to specific guilds for immediate testing (faster than global commands)
-        # If your bot is only in one guild, sync commands to just that guild for faster updates
-        logger.info(f"Synced commands... {bot.all_commands}")
-        if len(bot.guilds) > 0:
-            logger.info(f"Syncing commands to guild: {bot.guilds[0].name}")
-            await bot.sync_commands(guild_ids=[bot.guilds[0].id])
+        default_guild = bc.get_default_guild()
+        if role_cache.store(get_roles() or {}, default_guild.id if default_guild else None):
+            logger.info(f"Stored the roles of {len(_bot().guilds)} server(s), role cache version {role_cache.version}")
     except Exception as e:
-        logger.error(f"Error syncing commands: {e}")
+        logger.error(f"Error updating the role cache: {e}")
 
-    logger.info(f'-----\nLogged in as {bot.user.name}.\nWith the bot id="{bot.user.id}"\n-----')
 
+@registry.event
+async def on_guild_join(guild: discord.Guild) -> None:
+    refresh_guild(guild)
+    update_role_cache()
 
-async def update_roles_in_settings():
-    """
-    Fetch roles from the Discord server and update settings.json
-    This is run after the bot is fully initialized
+
+@registry.event
+async def on_guild_remove(guild: discord.Guild) -> None:
+    forget_guild(guild.id)
+    update_role_cache()
+
+
+@registry.event
+async def on_guild_update(before: discord.Guild, after: discord.Guild) -> None:
+    refresh_guild(after, ("guilds",))
+
+
+@registry.event
+async def on_guild_role_create(role: discord.Role) -> None:
+    if refresh_guild(role.guild, ("roles",)):
+        update_role_cache()
+
+
+@registry.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role) -> None:
+    if refresh_guild(after.guild, ("roles",)):
+        update_role_cache()
+
+
+@registry.event
+async def on_guild_role_delete(role: discord.Role) -> None:
+    if refresh_guild(role.guild, ("roles",)):
+        update_role_cache()
+
+
+@registry.event
+async def on_guild_channel_create(channel: discord.abc.GuildChannel) -> None:
+    refresh_guild(channel.guild, ("channels",))
+
+
+@registry.event
+async def on_guild_channel_update(before: discord.abc.GuildChannel, after: discord.abc.GuildChannel) -> None:
+    refresh_guild(after.guild, ("channels",))
+
+
+@registry.event
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel) -> None:
+    refresh_guild(channel.guild, ("channels",))
+
+
+@registry.event
+async def on_unknown_application_command(interaction: discord.Interaction) -> None:
     """
-    max_retries = 5
-    retry_count = 0
-
-    while retry_count < max_retries:
-        try:
-            logger.info(f"Fetching roles and updating .secrets.json (attempt {retry_count + 1}/{max_retries})...")
-
-            # Make sure the bot is connected to at least one guild
-            if not bot.guilds:
-                logger.info("Bot not connected to any guilds yet, waiting...")
-                await asyncio.sleep(2)
-                retry_count += 1
-                continue
+    This event is triggered when an interaction names a command the bot has no id for,
+    e.g. the commands were registered again by another deployment with the same token.
 
-            # Use the get_roles function to fetch role data
-            roles_data = get_roles()
+    Args:
+        interaction :class:`discord.Interaction`: The interaction of the unknown command.
+    """
+    logger.warning(f"Unknown application command {interaction.data.get('name')}, syncing the commands")
+    try:
+        await interaction.response.send_message(
+            "The commands are being updated, please try again in a moment.", ephemeral=True
+        )
+    except discord.HTTPException as e:
+        logger.error(f"Error answering an unknown command: {e}")
+    await command_sync.resync(_bot())
 
-            if not roles_data:
-                logger.info("No role data returned, waiting...")
-                await asyncio.sleep(2)
-                retry_count += 1
-                continue
 
-            guild_id = str(bot.guilds[0].id)
-            if guild_id not in roles_data:
-                logger.info(f"No roles found for guild {guild_id}, waiting...")
-                await asyncio.sleep(2)
-                retry_count += 1
-                continue
+@registry.event
+async def on_shard_ready(shard_id: int) -> None:
+    logger.info(f"Shard {shard_id} is ready")
+    client = _bot()
+    # The first connection is handled by on_ready. A shard that had to identify again missed the
+    # events of its guilds in between, rebuild their entries (those of the other shards are kept)
+    if client.is_ready():
+        refresh_all([guild for guild in client.guilds if guild.shard_id == shard_id],
+                    shard_id=shard_id, shard_count=client.shard_count)
+        update_role_cache()
 
-            guild_roles = roles_data[guild_id]
 
-            # Get current settings
-            settings = settings_manager.get_settings()
+@registry.event
+async def on_shard_disconnect(shard_id: int) -> None:
+    logger.warning(f"Shard {shard_id} disconnected from the gateway")
 
-            # Store the complete role data in access_roles
-            settings["access_roles"] = guild_roles
-            settings_manager.update_settings(settings)
 
-            logger.info(f"Successfully updated settings.json with {len(guild_roles)} roles from server")
-            return
+@registry.event
+async def on_shard_resumed(shard_id: int) -> None:
+    logger.info(f"Shard {shard_id} resumed its session")
 
-        except Exception as e:
-            logger.error(f"Error updating roles in settings.json: {e}")
-            await asyncio.sleep(2)
-            retry_count += 1
 
-    logger.error("Failed to update roles in settings.json after multiple attempts")
+@registry.before_invoke
+async def label_application_command(ctx: discord.ApplicationContext) -> None:
+    """Attribute slow event loop steps of a slash command to the command name."""
+    loop_monitor.label_current_task(f"/{ctx.command.qualified_name}")
 
 
-@bot.event
+@registry.event
+@loop_monitor.track
 async def on_message(message: discord.Message) -> None:
     """
     This event is triggered when a message is sent in a channel.
@@ -110,43 +173,49 @@ async def on_message(message: discord.Message) -> None:
     Args:
         message :class:`discord.Message`: The message that was sent.
     """
-    # Ignore messages from the bot itself
-    if message.author == bot.user:
+    client = _bot()
+
+    # Drop the messages there is nothing to do for (the bot's own, other bots, no open session...)
+    if not message_filter.check(message, client.user):
         return
 
-    # Process commands first
-    await bot.process_commands(message)
+    # Legacy prefix commands, the bot is slash command only by default
+    if message_filter.prefix_commands:
+        await client.process_commands(message)
 
     # Get the message content
     message_content = message.content.lower()
 
     # Check for attendance messages
-    # Only check if the message content is a reasonable length for attendance codes
-    if len(message_content) <= 10:  # Reasonable limit for attendance codes
-        # If there's an active attendance code and the message matches it
-        if bot_data.ATTENDANCE_CODE and message_content.lower() == bot_data.ATTENDANCE_CODE.lower():
-            logger.info(f"Attendance code matched: {message_content}")
-            
+    if message_filter.attendance and (message.guild is None or message_filter.attendance_in_channels):
+        # Sessions of every course server accepting this code; a DM counts for the servers
+        # the author is a member of, a channel message only for its own server
+        for data in bot_data.all_guild_data():
+            if not data.attendance_code or message_content != data.attendance_code.lower():
+                continue
+            # The code is entered with the check in button
+            if data.check_in_view is not None:
+                continue
+            if message.guild is not None and message.guild.id != data.guild_id:
+                continue
+            guild = client.get_guild(data.guild_id)
+            if guild is None or await utility.get_guild_member(guild, message.author.id) is None:
+                continue
+
             # Find the active group for attendance
-            active_group_id = None
-            for group_id in bot_data.SETTINGS["groups"]:
-                group_status = getattr(bot_data, f"group_{group_id}_status")
-                if group_status:
-                    active_group_id = group_id
-                    break
-            
+            active_group_id = data.active_group()
             if active_group_id:
-                # Get the active group list
-                group_list = getattr(bot_data, f"group_{active_group_id}")
-                
+                logger.info(f"Attendance code matched: {message_content} in guild {guild.name}")
+
                 # For debugging purposes
                 logger.debug(f"Attendance code received: {message_content}, Active Group: {active_group_id}")
                 logger.debug(f"Group Status: True, Channel: {message.channel}")
-                
+
                 # Add student to attendance list
                 await utility.add_student_to_attendance_list(
                     message=message,
-                    group=group_list,
+                    group=data.groups[active_group_id],
                     status=True,
-                    id=bot_data.ATTENDANCE_CODE,  # Pass the attendance code as the ID to match against
-                )
\ No newline at end of file
+                    id=data.attendance_code,  # Pass the attendance code as the ID to match against
+                    guild=guild,
+                )
@@ -5,6 +5,8 @@ from os import path
 
 import discord
 
+import utility
+
 # Replace direct bot import with live fetch helper
 import REST.utils.bot_context as bc
 
@@ -13,85 +15,212 @@ _channels = {}
 _members = {}
 _roles = {}
 _member_counts = {"online": 0, "offline": 0, "total": 0}
+_guild_member_counts = {}
 
 # Helper: get the current live bot instance
 def _bot():
     return bc.get_live_bot()
 
-# Functions to retrieve Discord server information
-def get_guild_info():
-    """Get information about all guilds the bot is connected to.
-    The bot is usually connected to only one, but this is the correct way since bot.guilds returns a list.
+
+def _selected_guilds(guild_id=None) -> list:
+    """Return all guilds of the bot, or only the one with guild_id (empty if the bot is not a member)."""
+    if guild_id is None:
+        return _bot().guilds
+    guild = _bot().get_guild(int(guild_id))
+    return [guild] if guild else []
+
+
+def _store(cache: dict, data: dict, guild_id) -> None:
+    """Replace a per-guild cache, or only the entry of one guild."""
+    if guild_id is None:
+        cache.clear()
+    cache.update(data)
+
+
+def clear_caches():
+    """Forget the cached server information, used when the bot switches to another token."""
+    global _members, _member_counts, _guild_member_counts
+    for cache in (_guilds, _channels, _roles):
+        cache.clear()
+    _members = {}
+    _member_counts = {"online": 0, "offline": 0, "total": 0}
+    _guild_member_counts = {}
+
+
+########################################
+#         EVENT-DRIVEN CACHES          #
+########################################
+
+# The guild, channel and role caches are kept up to date by the gateway events (see
+# refresh_guild) instead of being rebuilt on every request.
+
+def _guild_entry(guild) -> dict:
+    # The member count changes without a guild update, it is added when the entry is read
+    return {
+        "id": str(guild.id),
+        "name": guild.name,
+        "icon_url": str(guild.icon.url) if guild.icon else None,
+        "description": guild.description,
+        "created_at": guild.created_at.isoformat() if guild.created_at else None,
+        "owner_id": str(guild.owner_id) if guild.owner_id else None,
+        "shard_id": guild.shard_id
+    }
+
+
+def _channel_entries(guild) -> list:
+    guild_channels = []
+    for channel in guild.channels:
+        channel_data = {
+            "id": str(channel.id),
+            "name": channel.name,
+            "type": str(channel.type),
+            "position": channel.position,
+            "category_id": str(channel.category_id) if channel.category_id else None
+        }
+
+        if hasattr(channel, 'topic') and channel.topic:
+            channel_data["topic"] = channel.topic
+
+        guild_channels.append(channel_data)
+    return guild_channels
+
+
+def _role_entries(guild) -> list:
+    guild_roles = []
+    for role in guild.roles:
+        # Skip the @everyone role
+        if role.name == "@everyone":
+            continue
+
+        guild_roles.append({
+            "id": str(role.id),
+            "name": role.name,
+            "color": str(role.color),
+            "position": role.position,
+            "mentionable": role.mentionable,
+            "permissions": str(role.permissions.value)
+        })
+    return guild_roles
+
+
+# Cache and entry builder by cache name
+_CACHES = {
+    "guilds": (_guilds, _guild_entry),
+    "channels": (_channels, _channel_entries),
+    "roles": (_roles, _role_entries),
+}
+
+
+def refresh_guild(guild, kinds=tuple(_CACHES)) -> list:
+    """
+    Rebuild the entries of one guild, called by the gateway events of what changed.
+
+    Args:
+        guild: The guild.
+        kinds: The caches to rebuild, "guilds", "channels" and/or "roles".
 
     Returns:
-        dict: Information about the guilds.
+        list: The caches whose entry changed.
     """
-    global _guilds
+    key = str(guild.id)
+    changed = []
+    for kind in kinds:
+        cache, build = _CACHES[kind]
+        entry = build(guild)
+        if cache.get(key) != entry:
+            # Replaced, never changed in place: a request may be serializing the old entry
+            cache[key] = entry
+            changed.append(kind)
+    return changed
+
+
+def forget_guild(guild_id) -> None:
+    """Drop the entries of a guild the bot left."""
+    key = str(guild_id)
+    for cache, _ in _CACHES.values():
+        cache.pop(key, None)
+
+
+def refresh_all(guilds, shard_id=None, shard_count=1) -> None:
+    """
+    Rebuild the entries of every guild and drop those of guilds the bot is no longer in.
 
-    try:
-        # Collect guild data
-        guilds_data = {}
-        for guild in _bot().guilds:
-            guilds_data[str(guild.id)] = {
-                "id": str(guild.id),
-                "name": guild.name,
-                "member_count": guild.member_count,
-                "icon_url": str(guild.icon.url) if guild.icon else None,
-                "description": guild.description,
-                "created_at": guild.created_at.isoformat() if guild.created_at else None,
-                "owner_id": str(guild.owner_id) if guild.owner_id else None
-            }
+    Args:
+        guilds: The guilds the bot is in.
+        shard_id: Only touch the guilds of this shard, ``guilds`` are then the guilds of the
+            shard and the entries of the other shards are kept.
+        shard_count: The number of shards, to tell which shard a cached guild belongs to.
+    """
+    keys = {str(guild.id) for guild in guilds}
+    for cache, _ in _CACHES.values():
+        for key in set(cache) - keys:
+            # Same formula as Guild.shard_id
+            if shard_id is None or (int(key) >> 22) % shard_count == shard_id:
+                cache.pop(key, None)
+    for guild in guilds:
+        refresh_guild(guild)
 
-        # Store in global variable for caching
-        _guilds = guilds_data
-        return guilds_data
+
+def _entry(kind: str, guild):
+    """The entry of a guild, built if no event has primed it yet."""
+    cache, _ = _CACHES[kind]
+    key = str(guild.id)
+    if key not in cache:
+        refresh_guild(guild, (kind,))
+    return cache[key]
+
+
+# Functions to retrieve Discord server information
+def get_guild_info(guild_id=None):
+    """Get information about all guilds the bot is connected to, one per course server.
+
+    Args:
+        guild_id: Only return this guild.
+
+    Returns:
+        dict: Information about the guilds, by guild id.
+    """
+    try:
+        guilds_data = {
+            str(guild.id): {**_entry("guilds", guild), "member_count": guild.member_count}
+            for guild in _selected_guilds(guild_id)
+        }
+        return guilds_data or None
     except Exception as e:
         print(f"Error getting guild info: {e}")
         return None
 
-def get_channels():
+def get_channels(guild_id=None):
     """Get information about channels in the guilds.
 
+    Args:
+        guild_id: Only return the channels of this guild.
+
     Returns:
-        dict: Information about the channels.
+        dict: Information about the channels, by guild id.
     """
-    global _channels
-
     try:
-        # Collect channel data
-        channels_data = {}
-        for guild in _bot().guilds:
-            guild_channels = []
-            for channel in guild.channels:
-                channel_data = {
-                    "id": str(channel.id),
-                    "name": channel.name,
-                    "type": str(channel.type),
-                    "position": channel.position,
-                    "category_id": str(channel.category_id) if channel.category_id else None
-                }
-
-                if hasattr(channel, 'topic') and channel.topic:
-                    channel_data["topic"] = channel.topic
-
-                guild_channels.append(channel_data)
-
-            channels_data[str(guild.id)] = guild_channels
-
-        # Store in global variable for caching
-        _channels = channels_data
-        return channels_data
+        channels_data = {str(guild.id): _entry("channels", guild) for guild in _selected_guilds(guild_id)}
+        return channels_data or None
     except Exception as e:
         print(f"Error getting channels: {e}")
         return None
 
-def get_members():
+def get_members(guild_id=None):
     """Get information about members in the guilds.
 
+    The gateway profile (see bot.gateway_profiles) limits what is known: without presences
+    the status of every member is "unknown" and the online/offline counts are None, without
+    the members intent only the members who used an interaction are listed and the total
+    is the member count Discord reports for the guild, bots included.
+
+    Args:
+        guild_id: Only return the members of this guild.
+
     Returns:
-        dict: Information about the members.
+        dict: Information about the members, by guild id.
     """
-    global _members, _member_counts
+    global _member_counts
 
     try:
         # Collect member data
@@ -99,8 +228,9 @@ def get_members():
         all_online = 0
         all_offline = 0
         all_total = 0
+        intents = _bot().intents
 
-        for guild in _bot().guilds:
+        for guild in _selected_guilds(guild_id):
             guild_members = []
             online_count = 0
             offline_count = 0
@@ -112,12 +242,14 @@ def get_members():
 
                 member_roles = [str(role.id) for role in member.roles if role.id != guild.id]
 
-                status = "offline"
-                if member.status == discord.Status.online or member.status == discord.Status.idle or member.status == discord.Status.dnd:
+                if not intents.presences:
+                    status = "unknown"
+                elif member.status == discord.Status.online or member.status == discord.Status.idle or member.status == discord.Status.dnd:
                     status = "online"
                     online_count += 1
                 else:
-                   offline_count += 1
+                    status = "offline"
+                    offline_count += 1
 
                 member_data = {
                     "id": str(member.id),
@@ -134,73 +266,66 @@ def get_members():
                 guild_members.append(member_data)
 
             members_data[str(guild.id)] = guild_members
+            total = len(guild_members) if intents.members else (guild.member_count or 0)
+            _guild_member_counts[str(guild.id)] = {
+                "online": online_count if intents.presences else None,
+                "offline": offline_count if intents.presences else None,
+                "total": total
+            }
 
             all_online += online_count
             all_offline += offline_count
-            all_total += len(guild_members)
-
-        # Update member counts
-        _member_counts = {
-            "online": all_online,
-            "offline": all_offline,
-            "total": all_total
-        }
+            all_total += total
+
+        # Update member counts, the totals only cover all guilds if all were collected
+        if guild_id is None:
+            _member_counts = {
+                "online": all_online if intents.presences else None,
+                "offline": all_offline if intents.presences else None,
+                "total": all_total
+            }
 
         # Store in global variable for caching
-        _members = members_data
-        return members_data
+        _store(_members, members_data, guild_id)
+        return members_data or None
     except Exception as e:
         print(f"Error getting members: {e}")
         return None
 
-def get_roles():
+def get_roles(guild_id=None):
     """Get information about roles in the guilds.
 
+    Args:
+        guild_id: Only return the roles of this guild.
+
     Returns:
-        dict: Information about the roles.
+        dict: Information about the roles, by guild id.
     """
-    global _roles
-
     try:
-        # Collect role data
-        roles_data = {}
-        for guild in _bot().guilds:
-            guild_roles = []
-            for role in guild.roles:
-                # Skip the @everyone role
-                if role.name == "@everyone":
-                    continue
-
-                role_data = {
-                    "id": str(role.id),
-                    "name": role.name,
-                    "color": str(role.color),
-                    "position": role.position,
-                    "mentionable": role.mentionable,
-                    "permissions": str(role.permissions.value)
-                }
-
-                guild_roles.append(role_data)
-
-            roles_data[str(guild.id)] = guild_roles
-
-        # Store in global variable for caching
-        _roles = roles_data
-        return roles_data
+        roles_data = {str(guild.id): _entry("roles", guild) for guild in _selected_guilds(guild_id)}
+        return roles_data or None
     except Exception as e:
         print(f"Error getting roles: {e}")
         return None
 
 
-def get_member_counts():
+def get_member_counts(guild_id=None):
     """Get the count of online and offline members.
 
+    Args:
+        guild_id: Only count the members of this guild.
+
     Returns:
-        dict: Counts of online and offline members.
+        dict: Counts of online and offline members, None if the bot is not a member of the guild.
+            The online and offline counts are None if the gateway profile has no presences.
     """
-    global _member_counts
-
     try:
+        if guild_id is not None:
+            key = str(int(guild_id))
+            if key not in _guild_member_counts:
+                get_members(guild_id)
+            return _guild_member_counts.get(key)
+
         # If member counts are already cached, return them
         if _member_counts["total"] > 0:
             return _member_counts
@@ -213,20 +338,25 @@ def get_member_counts():
         return {"online": 0, "offline": 0, "total": 0}
 
 
-def assign_member_role(user_id: int, role_id: int):
+def assign_member_role(user_id: int, role_id: int, guild_id=None):
     try:
-        print(_bot().guilds[0].name)
-        role = _bot().guilds[0].get_role(int(role_id))
-        member = _bot().guilds[0].get_member(user_id)
+        guilds = _selected_guilds(guild_id) if guild_id is not None else [bc.get_default_guild()]
+        guild = guilds[0] if guilds else None
+        if guild is None:
+            raise RuntimeError(f"Bot is not a member of guild {guild_id}")
+        role = guild.get_role(int(role_id))
+        if role is None:
+            raise RuntimeError(f"Role {role_id} not found in guild {guild.name}")
 
         # Create a coroutine for adding roles and run it using asyncio
         async def add_role_coroutine():
+            member = await utility.get_guild_member(guild, user_id)
+            if member is None:
+                raise RuntimeError(f"Member {user_id} not found in guild {guild.name}")
             await member.add_roles(role)
 
-        # Run the coroutine in the bot's event loop
-        future = asyncio.run_coroutine_threadsafe(add_role_coroutine(), _bot().loop)
-        # Wait for the result, with a timeout
-        future.result(timeout=10)
+        # Run the coroutine in the bot's event loop and wait for the result, with a timeout
+        bc.run_on_bot_loop(add_role_coroutine(), timeout=10)
 
         return {"status": "success", "message": "Role assigned successfully"}
     except Exception as e:
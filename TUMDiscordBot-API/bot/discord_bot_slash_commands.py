@@ -3,9 +3,11 @@ import re
 import json
 import logging
 
-from bot import bot_data, bot
+import REST.utils.bot_context as bc
+from bot import bot_data
 from bot.discord_bot import _verify_author_roles
-from bot.ui.view import TutorSessionView, DifficultyView, ScoreView, AnnouncementView
+from bot.registry import registry
+from bot.ui.view import TutorSessionView, DifficultyView, ScoreView, AnnouncementView, CheckInView, CheckInModal
 from discord import option
 
 from utility import *
@@ -14,18 +16,53 @@ from utility import *
 logger = logging.getLogger('discord_bot')
 
 
+# Helper: get the current live bot instance
+def _bot():
+    return bc.get_live_bot()
+
+
+async def post_check_in_view(channel: discord.TextChannel, group_id: str) -> CheckInView:
+    """
+    Post the check in button of a started attendance to ``channel``.
+
+    Args:
+        channel :class:`discord.TextChannel`: The channel the students check in from.
+        group_id :class:`str`: The ID of the tutor group.
+
+    Returns:
+        :class:`CheckInView`: The posted view, it answers once it is the guild's ``check_in_view``.
+    """
+    view = CheckInView(channel.guild.id, group_id)
+    await channel.send(f"Attendance check for group {group_id}, press the button and enter the code.", view=view)
+    return view
+
+
+async def close_check_in_view(guild_id: int, replacement: CheckInView = None) -> None:
+    """
+    Disable the check in button of the guild's attendance, if one was posted.
+
+    Args:
+        guild_id :class:`int`: The ID of the guild.
+        replacement :class:`CheckInView`: The button of a restarted attendance, taking the place of the closed one.
+    """
+    data = bot_data.guild_data(guild_id)
+    view, data.check_in_view = data.check_in_view, replacement
+    if view is not None:
+        await view.close()
+
+
 ################################################
 #              BOT SLASH COMMANDS              #
 ################################################
 
 
-@bot.slash_command(description="Ping-Pong game.")
+@registry.slash_command(description="Ping-Pong game.")
 async def ping(ctx: discord.ApplicationContext) -> None:
     """Simple command to check if the bot is responding."""
-    await ctx.respond(f"Pong! Latency: {round(bot.latency * 1000)}ms")
+    await ctx.respond(f"Pong! Latency: {round(ctx.bot.latency * 1000)}ms")
 
 
-@bot.slash_command(description="Say hello to a member with a custom message.")
+@registry.slash_command(description="Say hello to a member with a custom message.")
 @option(
     "member",
     discord.Member,
@@ -45,7 +82,7 @@ async def hello(ctx: discord.ApplicationContext, message: str) -> None:
     await ctx.respond(f"{message}")
 
 
-@bot.slash_command(description="Deletes the specified amount of messages from channel.")
+@registry.slash_command(description="Deletes the specified amount of messages from channel.")
 @option(
     "channel",
     discord.TextChannel,
@@ -76,7 +113,7 @@ async def clear(ctx: discord.ApplicationContext, channel: discord.TextChannel, l
         await ctx.respond(f"Error deleting messages: {str(e)}", ephemeral=True)
 
 
-@bot.slash_command(
+@registry.slash_command(
     description="Gives a specific role to a member.",
 )
 @option(
@@ -104,7 +141,7 @@ async def give_member_role(ctx: discord.ApplicationContext, member: discord.Memb
         await ctx.respond(f"Error assigning role: {str(e)}")
 
 
-@bot.slash_command(
+@registry.slash_command(
     description="Start or stop the attendance check for the specified group.",
 )
 @option(
@@ -120,27 +157,57 @@ async def give_member_role(ctx: discord.ApplicationContext, member: discord.Memb
     "code",
     description="Enter the attendance code for.",
 )
+@option(
+    "channel",
+    description="Post a check in button to this channel instead of accepting the code in DM.",
+    required=False,
+)
 
 async def attendance(
         ctx: discord.ApplicationContext,
         status: str,
         code: str,
         group_id: str,
+        channel: discord.TextChannel = None,
 ) -> None:
     """Start or stop attendance tracking for a specific group."""
     # Convert group_id to lowercase for case-insensitive comparison
     group_id = group_id.lower()
     code = code.lower()
 
+    # Attendance is taken per course server
+    if ctx.guild is None:
+        await ctx.respond("The attendance can only be managed from a server.")
+        return
+
     match status.lower():
         case "start":
             if _verify_author_roles(ctx.author):
-                try:
-                    update_dm_accept_status(group_id, code)
-                    logger.info(f"Started attendance for group {group_id} with code {code}")
+                if channel is not None and len(code) > CheckInModal.INPUT_MAX_LENGTH:
                     await ctx.respond(
-                        f"{ctx.author.mention}, accepting messages in DM, please send attendance code."
+                        f"The check in accepts codes of up to {CheckInModal.INPUT_MAX_LENGTH} characters."
                     )
+                    return
+                try:
+                    # Post the button first, if that fails the attendance is left as it was
+                    view = await post_check_in_view(channel, group_id) if channel is not None else None
+                    try:
+                        update_dm_accept_status(group_id, code, ctx.guild.id)
+                    except Exception:
+                        if view is not None:
+                            await view.close()
+                        raise
+                    logger.info(f"Started attendance for group {group_id} with code {code}")
+                    # A restarted attendance replaces the button of the previous one
+                    await close_check_in_view(ctx.guild.id, view)
+                    if channel is None:
+                        await ctx.respond(
+                            f"{ctx.author.mention}, accepting messages in DM, please send attendance code."
+                        )
+                    else:
+                        await ctx.respond(
+                            f"{ctx.author.mention}, the check in for group {group_id} is open in {channel.mention}."
+                        )
                 except Exception as e:
                     logger.error(f"Error starting attendance: {e}")
                     await ctx.respond(f"Error starting attendance: {str(e)}")
@@ -153,9 +220,12 @@ async def attendance(
                     await ctx.respond(
                         f"{ctx.author.mention}, messages in DM are no longer accepted for code {code}."
                     )
+
+                    # Close the check in button, so the list does not change anymore
+                    await close_check_in_view(ctx.guild.id)
                     
                     # Get the group list before cleanup
-                    group_list_text = prepare_group_list_for_embed(group_id)
+                    group_list_text = prepare_group_list_for_embed(group_id, ctx.guild.id)
                     
                     # Create and send the embed
                     tutor_dm = await ctx.author.create_dm()
@@ -171,7 +241,7 @@ async def attendance(
                     
                     # Do the cleanup
                     logger.info(f"Stopping attendance for group {group_id}")
-                    success = attendance_cleanup(group_id=group_id)
+                    success = attendance_cleanup(group_id=group_id, guild_id=ctx.guild.id)
                     
                     if success:
                         logger.info(f"Successfully stopped attendance for group {group_id}")
@@ -192,7 +262,7 @@ async def attendance(
             )
 
 
-@bot.slash_command(
+@registry.slash_command(
     name="tutor-session-feedback",
     description="Allows students to leave feedback on tutor sessions.",
 )
@@ -215,9 +285,9 @@ async def tutor_session_feedback(
         embed.add_field(name="Satisfactory", inline=True, value=default_value)
         embed.add_field(name="Poor", inline=True, value=default_value)
         embed.set_author(
-            name="Author: " + ctx.author.display_name, icon_url=ctx.author.avatar.url
+            name="Author: " + ctx.author.display_name, icon_url=ctx.author.display_avatar.url
         )
-        view = TutorSessionView(group_id=group_id, duration=duration)
+        view = TutorSessionView(group_id=group_id, duration=duration, guild_id=ctx.guild.id if ctx.guild else None)
         await channel.send(
             embed=embed,
             view=view,
@@ -229,7 +299,7 @@ async def tutor_session_feedback(
         await ctx.respond(bot_data.PERMISSION_DENIED)
 
 
-@bot.slash_command(
+@registry.slash_command(
     name="create-complex-survey",
     description="Create a multiple question survey.",
 )
@@ -369,6 +439,15 @@ async def create_complex_survey(
 
         return True
 
+    # The replies are server messages, which a client without their intents (the minimal gateway profile) never sees
+    intents = _bot().intents
+    if ctx.guild is not None and not (intents.guild_messages and intents.message_content):
+        await ctx.respond(
+            "The bot does not receive server messages with its gateway profile, "
+            "please pass the questions_json and button_types_json options instead."
+        )
+        return
+
     # Start the interaction.
     await ctx.respond(
         "```Please send a list of the questions that should be included in the survey, you have five minutes to respond.\nYour message must be in the following format:\n"
@@ -391,7 +470,7 @@ async def create_complex_survey(
 
     # Get list of the questions.
     try:
-        response: discord.Message = await bot.wait_for(
+        response: discord.Message = await _bot().wait_for(
             "message", check=is_valid_response, timeout=300.0
         )
     except TimeoutError:
@@ -414,7 +493,7 @@ async def create_complex_survey(
 
     # Get list of the button types.
     try:
-        response: discord.Message = await bot.wait_for(
+        response: discord.Message = await _bot().wait_for(
             "message", check=is_valid_response, timeout=300.0
         )
     except TimeoutError:
@@ -473,7 +552,7 @@ async def create_complex_survey(
     )
 
 
-@bot.slash_command(name="create-simple-survey", description="Create a one question survey."
+@registry.slash_command(name="create-simple-survey", description="Create a one question survey."
                    )
 @option("message", description="Survey announcement message.")
 @option(
@@ -0,0 +1,120 @@
+"""
+Event Filter
+~~~~~~~~
+
+Cheap checks that drop gateway events the bot has nothing to do for before any work is
+done. With the message content intent every message of every channel reaches
+``on_message``, while the bot only reacts to attendance codes: messages of bots, guild
+messages when no attendance session of that guild is open and messages longer than every
+active code are dropped on arrival. The bot is slash command only, so messages are no
+longer run through the legacy prefix command parser unless enabled.
+
+Configured by the optional "event_filter" section of .secrets.json. The handled and the
+dropped events are counted in the metrics registry.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import discord
+
+from bot import bot_data
+from REST import settings_manager
+from REST.utils.metrics import Counter
+
+EVENTS_HANDLED = Counter(
+    "bot_events_handled_total", "Gateway events passed on to their handler.", ("event",)
+)
+EVENTS_FILTERED = Counter(
+    "bot_events_filtered_total", "Gateway events dropped by the pre-filter, by reason.", ("event", "reason")
+)
+
+
+class MessageFilter:
+    """
+    Decides whether ``on_message`` has anything to do for a message.
+
+    Args:
+        ignore_bots (bool): Drop messages of bots, the bot's own messages are always dropped.
+        prefix_commands (bool): Run messages through the prefix command parser. Every
+            message (except those of bots) is then handled, a command can be in any of them.
+        attendance (bool): Accept attendance codes.
+        attendance_in_channels (bool): Accept attendance codes posted in a guild channel,
+            not only in a DM to the bot.
+    """
+
+    def __init__(self, ignore_bots=True, prefix_commands=False, attendance=True, attendance_in_channels=True):
+        self.ignore_bots = bool(ignore_bots)
+        self.prefix_commands = bool(prefix_commands)
+        self.attendance = bool(attendance)
+        self.attendance_in_channels = bool(attendance_in_channels)
+
+    @classmethod
+    def from_settings(cls):
+        """Create a filter configured by the optional "event_filter" section of .secrets.json."""
+        settings = (settings_manager.SETTINGS or {}).get("event_filter", {})
+        return cls(
+            ignore_bots=settings.get("ignore_bots", True),
+            prefix_commands=settings.get("prefix_commands", False),
+            attendance=settings.get("attendance", True),
+            attendance_in_channels=settings.get("attendance_in_channels", True),
+        )
+
+    @staticmethod
+    def active_codes() -> dict:
+        """
+        The attendance code of every guild with a group accepting codes by message, lowercase, by guild id.
+        A guild checking in with a button takes the code in the interaction and listens to no message.
+        """
+        return {
+            data.guild_id: data.attendance_code.lower()
+            for data in bot_data.all_guild_data()
+            if data.attendance_code and data.active_group() is not None and data.check_in_view is None
+        }
+
+    def reason_to_drop(self, message: discord.Message, own_user) -> str | None:
+        """
+        Return why ``message`` can be dropped, None if it has to be handled.
+
+        Args:
+            message :class:`discord.Message`: The received message.
+            own_user :class:`discord.ClientUser`: The user of the bot.
+        """
+        if message.author == own_user:
+            return "own_message"
+        if self.ignore_bots and message.author.bot:
+            return "bot_author"
+        if self.prefix_commands:
+            return None
+        if not self.attendance:
+            return "no_handler"
+
+        codes = self.active_codes()
+        if not codes:
+            return "no_session"
+        if message.guild is not None:
+            if not self.attendance_in_channels:
+                return "guild_channel"
+            if message.guild.id not in codes:
+                return "guild_not_listening"
+        if len(message.content) > max(len(code) for code in codes.values()):
+            return "too_long"
+        return None
+
+    def check(self, message: discord.Message, own_user) -> bool:
+        """
+        Count a message as handled or filtered.
+
+        Returns:
+            bool: Whether ``on_message`` has to handle the message.
+        """
+        reason = self.reason_to_drop(message, own_user)
+        if reason is not None:
+            EVENTS_FILTERED.inc(event="message", reason=reason)
+            return False
+        EVENTS_HANDLED.inc(event="message")
+        return True
+
+
+# Shared by the event handlers
+message_filter = MessageFilter.from_settings()
@@ -0,0 +1,81 @@
+"""
+Gateway Profiles
+~~~~~~~~
+
+The events a client subscribes to and the members it keeps in memory, selected with
+``"gateway": {"profile": ...}`` in .secrets.json:
+
+- ``minimal``: guilds, direct messages and interactions. Members are only cached once they
+  used a command or a component, member lists and online counts are not available. No
+  server messages are received: attendance codes posted in a channel are not seen and
+  ``/create-complex-survey`` needs its questions as options instead of replies.
+- ``roster``: additionally all members and guild messages, without presences and typing.
+  Member counts have a total but no online/offline split.
+- ``full``: every intent, including presences. The default.
+
+Presence updates are by far the largest share of gateway traffic on a course server, and
+every cached member costs memory, so the smaller profiles suit servers that only need the
+commands and take attendance by DM or with the check in button. Compare them with ``python -m benchmarks.gateway_profiles``.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import discord
+
+from REST import settings_manager
+
+PROFILES = ("minimal", "roster", "full")
+DEFAULT_PROFILE = "full"
+
+
+def profile_intents(profile: str) -> discord.Intents:
+    """
+    Return the intents of a profile.
+
+    Args:
+        profile (str): One of ``PROFILES``.
+
+    Returns:
+        discord.Intents: The intents the client identifies with.
+    """
+    if profile == "minimal":
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.dm_messages = True
+        return intents
+    if profile == "roster":
+        intents = discord.Intents.default()
+        intents.members = True
+        intents.message_content = True
+        intents.typing = False
+        intents.voice_states = False
+        return intents
+    if profile == "full":
+        return discord.Intents.all()
+    raise ValueError(f"Unknown gateway profile: {profile} (expected one of {', '.join(PROFILES)})")
+
+
+def gateway_options(profile: str) -> dict:
+    """
+    Return the client options of a profile.
+
+    Args:
+        profile (str): One of ``PROFILES``.
+
+    Returns:
+        dict: ``intents``, ``member_cache_flags`` and ``chunk_guilds_at_startup`` keyword arguments.
+    """
+    intents = profile_intents(profile)
+    return {
+        "intents": intents,
+        # Members who used an interaction are always cached, all of them only with the members intent
+        "member_cache_flags": discord.MemberCacheFlags.from_intents(intents),
+        "chunk_guilds_at_startup": intents.members,
+    }
+
+
+def profile_from_settings() -> str:
+    """The profile configured in the "gateway" section of .secrets.json."""
+    settings = (settings_manager.SETTINGS or {}).get("gateway", {})
+    return settings.get("profile", DEFAULT_PROFILE)
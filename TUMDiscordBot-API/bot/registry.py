@@ -0,0 +1,65 @@
+"""
+Registry
+~~~~~~~~
+
+Collects the slash commands, events and invoke hooks when the bot modules are imported,
+independent of any client. Every client built by :func:`bot.discord_bot.create_bot` gets
+the same command objects, so restarting the bot never re-executes the command modules.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import discord
+
+
+class CommandRegistry:
+    """Slash commands, event handlers and hooks, applied to a client with :meth:`apply`."""
+
+    def __init__(self):
+        self.commands = []
+        self.events = []
+        self.before_invoke_hook = None
+
+    def slash_command(self, **kwargs):
+        """
+        Decorator registering a slash command, takes the arguments of :func:`discord.slash_command`.
+
+        Returns the command object, so it can still be awaited directly (as the REST API does
+        with a mock context).
+        """
+        def decorator(func):
+            command = discord.slash_command(**kwargs)(func)
+            self.commands.append(command)
+            return command
+        return decorator
+
+    def event(self, coro):
+        """Decorator registering an event handler, named after the event (e.g. ``on_ready``)."""
+        self.events.append(coro)
+        return coro
+
+    def before_invoke(self, coro):
+        """Decorator registering the hook that runs before every application command."""
+        self.before_invoke_hook = coro
+        return coro
+
+    def apply(self, client: discord.Bot) -> None:
+        """
+        Add all registered commands, events and hooks to a new client.
+
+        Args:
+            client (discord.Bot): A client that has not been started yet.
+        """
+        for command in self.commands:
+            # Ids belong to the application of the previous client, the sync assigns new ones
+            command.id = None
+            client.add_application_command(command)
+        for coro in self.events:
+            client.event(coro)
+        if self.before_invoke_hook is not None:
+            client.before_invoke(self.before_invoke_hook)
+
+
+# Filled by discord_bot_slash_commands and discord_bot_events on import
+registry = CommandRegistry()
@@ -13,6 +13,7 @@ from discord.enums import ButtonStyle
 from discord.interactions import Interaction
 from discord.partial_emoji import PartialEmoji
 from shared import SurveyEntry
+from REST.utils.loop_monitor import loop_monitor
 
 
 class DynamicButton(discord.ui.Button):
@@ -66,6 +67,7 @@ class DynamicButton(discord.ui.Button):
         )
         self.view_reference = view_reference
 
+    @loop_monitor.track
     async def callback(self, interaction: Interaction):
         # Verify if the user has already interacted with the view.
         def can_interact() -> bool:
@@ -87,7 +89,8 @@ class DynamicButton(discord.ui.Button):
         def save_student_name() -> None:
             # Get the student name.
             if self.view_reference.survey_entry.student_name == "":
-                member = self.view_reference.guild.get_member(interaction.user.id)
+                # Not cached without the members intent, the user's own name is used then
+                member = self.view_reference.guild.get_member(interaction.user.id) or interaction.user
                 # Store both display name and username
                 self.view_reference.survey_entry.student_name = f"{member.display_name} ({interaction.user.name})"
 
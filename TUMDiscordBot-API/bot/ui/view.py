@@ -8,14 +8,14 @@ Contains various views used when interacting with the bot.
 import discord
 import logging
 import REST.utils.bot_context as bc
-import importlib, sys as _sys
-from pathlib import Path
 
 from discord.enums import ButtonStyle
 from shared import SurveyEntry
-from utility import save_survey_entry_to_csv
+from utility import data_file_dir, save_survey_entry_to_csv
 from datetime import datetime
+from bot import bot_data
 from bot.ui.button import DynamicButton
+from REST.utils.loop_monitor import loop_monitor
 
 # Get the logger configured in app.py
 logger = logging.getLogger('discord_bot')
@@ -57,9 +57,11 @@ class TutorSessionView(discord.ui.View):
         If ``None`` then the view was not sent using :meth:`InteractionResponse.send_message`.
     group_id: :class:`str`
         Tutor group id.
+    guild_id: Optional[:class:`int`]
+        The guild the feedback is collected in, its files are kept apart from other servers.
     """
 
-    def __init__(self, group_id: str, duration):
+    def __init__(self, group_id: str, duration, guild_id: int = None):
         super().__init__(timeout=duration, disable_on_timeout=True)
         self.group_id = group_id
         self.users_interacted_with_view = []
@@ -70,13 +72,12 @@ class TutorSessionView(discord.ui.View):
         self.mid_feedback_percentage = 0
         self.bad_feedback_percentage = 0
         current_time = datetime.now().strftime("%Y-%m-%d_%H-%M")
-        # Resolve absolute path for tutor session feedback
-        project_root = Path(__file__).resolve().parents[2]
-        feedback_dir = project_root / 'data' / 'tutor_session_feedback'
-        feedback_dir.mkdir(exist_ok=True, parents=True)
+        # Resolve absolute path for tutor session feedback of the guild
+        feedback_dir = data_file_dir('tutor_session_feedback', guild_id)
         self.path = str(feedback_dir / f"{group_id}_{current_time}.csv")
 
     @discord.ui.button(label="Good", style=ButtonStyle.primary)
+    @loop_monitor.track
     async def good_callback(
             self, button: discord.ui.Button, interaction: discord.Interaction
     ):
@@ -95,6 +96,7 @@ class TutorSessionView(discord.ui.View):
             await interaction.response.edit_message(embed=interaction.message.embeds[0])
 
     @discord.ui.button(label="Satisfactory", style=ButtonStyle.primary)
+    @loop_monitor.track
     async def satisfactory_callback(
             self, button: discord.ui.Button, interaction: discord.Interaction
     ):
@@ -113,6 +115,7 @@ class TutorSessionView(discord.ui.View):
             await interaction.response.edit_message(embed=interaction.message.embeds[0])
 
     @discord.ui.button(label="Poor", style=ButtonStyle.primary)
+    @loop_monitor.track
     async def poor_callback(
             self, button: discord.ui.Button, interaction: discord.Interaction
     ):
@@ -261,6 +264,7 @@ class AnnouncementView(discord.ui.View):
         self.views_queue_template = views_queue
 
     @discord.ui.button(label="Participate", style=ButtonStyle.green)
+    @loop_monitor.track
     async def participate_callback(
             self, button: discord.ui.Button, interaction: discord.Interaction
     ):
@@ -409,10 +413,8 @@ class DifficultyView(discord.ui.View):
         
         # Generate filename with timestamp
         current_time = datetime.now().strftime("%Y-%m-%d_%H-%M")
-        # Resolve absolute path for exercise feedback
-        project_root = Path(__file__).resolve().parents[2]
-        survey_dir = project_root / 'data' / 'exercise_feedback'
-        survey_dir.mkdir(exist_ok=True, parents=True)
+        # Resolve absolute path for exercise feedback of the guild
+        survey_dir = data_file_dir('exercise_feedback', self.guild.id if self.guild is not None else None)
         path = str(survey_dir / f"{survey_type}_{self.topic}_{current_time}.csv")
         
         # Save all collected entries
@@ -529,10 +531,8 @@ class ScoreView(discord.ui.View):
             
             # Generate filename with timestamp
             current_time = datetime.now().strftime("%Y-%m-%d_%H-%M")
-            # Resolve absolute path for exercise feedback
-            project_root = Path(__file__).resolve().parents[2]
-            survey_dir = project_root / 'data' / 'exercise_feedback'
-            survey_dir.mkdir(exist_ok=True, parents=True)
+            # Resolve absolute path for exercise feedback of the guild
+            survey_dir = data_file_dir('exercise_feedback', self.guild.id if self.guild is not None else None)
             path = str(survey_dir / f"{survey_type}_{self.topic}_{current_time}.csv")
             
             # Save all collected entries
@@ -544,3 +544,125 @@ class ScoreView(discord.ui.View):
             logger.info(f"DEBUG: Saved {entry_count} responses for {survey_type} survey on topic '{self.topic}' to {path}")
                 
         return await super().on_timeout()
+
+
+class CheckInView(discord.ui.View):
+    """Represents a custom UI view.
+    A view with a single ``Check in`` button that is posted to a channel when the attendance starts.\n
+    The button opens a :class:`CheckInModal` asking for the attendance code, so a check in is
+    validated within the interaction instead of by reading every direct message.
+
+    Parameters
+    ----------
+    guild_id: :class:`int`
+        The guild the attendance is taken in.
+    group_id: :class:`str`
+        Tutor group id, e.g. 'g5'
+
+    Attributes
+    ----------
+    children: List[:class:`Item`]
+        The list of children attached to this view.
+    message: Optional[:class:`.Message`]
+        The message that this view is attached to.
+        If ``None`` then the view has not been sent with a message.
+    guild_id: :class:`int`
+        The guild the attendance is taken in.
+    group_id: :class:`str`
+        Tutor group id.
+    """
+
+    # Seconds a student has to submit the code once the dialog is open
+    MODAL_TIMEOUT = 300
+
+    def __init__(self, guild_id: int, group_id: str):
+        # Open until the tutor stops the attendance
+        super().__init__(timeout=None)
+        self.guild_id = guild_id
+        self.group_id = group_id
+
+    # The fixed custom_id keeps the button working once the view is added again after a restart,
+    # the views are told apart by their message
+    @discord.ui.button(label="Check in", style=ButtonStyle.green, custom_id="check_in")
+    @loop_monitor.track
+    async def check_in_callback(
+            self, button: discord.ui.Button, interaction: discord.Interaction
+    ):
+        data = bot_data.guild_data(self.guild_id)
+        # A button of an earlier attendance, or pressed while the attendance stops
+        if data.check_in_view is not self or not data.attendance_code:
+            await interaction.response.send_message("The attendance check is over.", ephemeral=True)
+            return
+        modal = CheckInModal(self, timeout=self.MODAL_TIMEOUT, max_length=len(data.attendance_code))
+        modal.user_id = interaction.user.id
+        await interaction.response.send_modal(modal)
+
+    async def close(self) -> None:
+        """Disable the button and stop listening, called when the attendance stops."""
+        self.disable_all_items()
+        self.stop()
+        if self.message is not None:
+            try:
+                await self.message.edit(content=f"The attendance check for group {self.group_id} is over.", view=self)
+            except discord.HTTPException as e:
+                logger.error(f"Error closing the check in message: {e}")
+
+
+class CheckInModal(discord.ui.Modal):
+    """Represents a custom UI modal.
+    The dialog opened by the ``Check in`` button of a :class:`CheckInView`, asking the student for the attendance code.
+    The student is added to the attendance list of the running group and answered with an ephemeral message.
+
+    Parameters
+    ----------
+    check_in_view: :class:`CheckInView`
+        The view whose button opened the dialog.
+    timeout: Optional[:class:`float`]
+        Seconds the dialog waits for the code.
+    max_length: :class:`int`
+        Length of the active code, the input accepts nothing longer.
+    """
+
+    # Longest value Discord accepts for a text input
+    INPUT_MAX_LENGTH = 4000
+
+    def __init__(self, check_in_view: CheckInView, timeout: float, max_length: int):
+        # One dialog per student and guild, pressing the button again replaces it
+        super().__init__(
+            discord.ui.InputText(
+                label="Attendance code", max_length=min(max(max_length, 1), self.INPUT_MAX_LENGTH)
+            ),
+            title="Attendance check in",
+            custom_id=f"check_in_{check_in_view.guild_id}",
+            timeout=timeout,
+        )
+        self.check_in_view = check_in_view
+        self.user_id = None
+
+    async def callback(self, interaction: discord.Interaction):
+        data = bot_data.guild_data(self.check_in_view.guild_id)
+        group_id = data.active_group()
+        if data.check_in_view is not self.check_in_view or group_id is None:
+            await interaction.response.send_message("The attendance check is over.", ephemeral=True)
+            return
+        if self.children[0].value.strip().lower() != data.attendance_code.lower():
+            await interaction.response.send_message("Wrong attendance code, please try again.", ephemeral=True)
+            return
+
+        # Format: "DisplayName (username)"
+        student_info = f"{interaction.user.display_name} ({interaction.user.name})"
+        group = data.groups[group_id]
+        if student_info in group:
+            await interaction.response.send_message("You are already on the attendance list.", ephemeral=True)
+            return
+        group.append(student_info)
+        logger.info(f"Checked in {student_info} for group {group_id}")
+        await interaction.response.send_message("You are added to the attendance list.", ephemeral=True)
+
+    async def on_timeout(self) -> None:
+        # py-cord 2.5.0 (pinned in requirements.txt) only drops a dialog from its ModalStore once it is
+        # submitted, one closed without submitting stays there. The store is private, check it when upgrading
+        store = _bot()._connection._modal_store._modals
+        key = (self.user_id, self.custom_id)
+        if store.get(key) is self:
+            del store[key]
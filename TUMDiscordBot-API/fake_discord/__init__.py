@@ -0,0 +1,36 @@
+"""
+Fake Discord
+~~~~~~~~
+
+An in-process stand-in for Discord, to run the REST API and the bot under load without a
+token or network. With ``"fake_discord": {"enabled": true}`` in .secrets.json the bot
+connects to a local :class:`FakeDiscord` instead of discord.com, see the README.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import discord.http
+
+from .server import FakeDiscord, FakeInteraction
+from .world import World
+
+# The server py-cord is pointed at, kept across bot restarts like the real Discord
+fake = None
+
+
+def install(server: FakeDiscord = None) -> FakeDiscord:
+    """
+    Start a fake server (the one of the settings by default) and send the HTTP requests
+    and gateway connections of every py-cord client of this process to it. Calling it
+    again returns the running server.
+
+    Returns:
+        FakeDiscord: The running server.
+    """
+    global fake
+    if fake is None:
+        fake = (server or FakeDiscord.from_settings()).start()
+        # Every route of py-cord, the webhooks of interactions included, is built from this base
+        discord.http.Route.base = property(lambda route: fake.api_url)
+    return fake
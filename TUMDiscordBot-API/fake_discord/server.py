@@ -0,0 +1,1198 @@
+"""
+Fake Discord Server
+~~~~~~~~
+
+An aiohttp server speaking the part of the Discord HTTP API and gateway protocol the bot
+uses, backed by a :class:`fake_discord.world.World`. It runs on an event loop of its own
+in a daemon thread, so load on the fake does not show up as lag of the bot loop.
+
+Latency and rate limits can be injected: a fixed delay plus jitter per request, a share
+of requests answered with 429, per-route buckets with the rate limit headers of Discord
+and a global limit per second. Simulated users are driven through the Python methods of
+:class:`FakeDiscord` or, from another process, through the ``/_fake`` routes.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from aiohttp import WSMsgType, web
+
+from REST import settings_manager
+from fake_discord.world import CATEGORY_CHANNEL, DM_CHANNEL, World, timestamp
+
+# Get the logger configured in app.py
+logger = logging.getLogger('discord_bot')
+
+API_PREFIX = "/api/v10"
+HEARTBEAT_INTERVAL_MS = 41250
+
+# Gateway intents the dispatched events depend on
+GUILDS = 1 << 0
+GUILD_MEMBERS = 1 << 1
+GUILD_PRESENCES = 1 << 8
+GUILD_MESSAGES = 1 << 9
+DIRECT_MESSAGES = 1 << 12
+MESSAGE_CONTENT = 1 << 15
+
+# Interaction and callback types of the Discord API
+COMMAND_INTERACTION = 2
+COMPONENT_INTERACTION = 3
+MODAL_INTERACTION = 5
+EPHEMERAL = 1 << 6
+
+# Roughly the limits of Discord: [requests, per seconds] per channel, guild or webhook
+DEFAULT_RATE_LIMITS = {
+    "POST /channels/{channel_id}/messages": [5, 5.0],
+    "DELETE /channels/{channel_id}/messages/{message_id}": [5, 1.0],
+    "PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}": [10, 10.0],
+}
+DEFAULT_GLOBAL_RATE_LIMIT = 50
+
+# Options of the "fake_discord" section of .secrets.json
+_OPTIONS = (
+    "guilds", "members", "channels", "online_ratio", "seed", "latency_ms", "jitter_ms", "gateway_latency_ms",
+    "rate_limit_ratio", "retry_after", "rate_limits", "global_rate_limit", "presence_updates_per_second",
+    "host", "port",
+)
+# Options that can be changed while the server runs, with PATCH /_fake/config
+_RUNTIME_OPTIONS = (
+    "latency_ms", "jitter_ms", "gateway_latency_ms", "rate_limit_ratio", "retry_after", "global_rate_limit",
+)
+
+
+class _Session:
+    """A gateway connection of a client, identified as one shard."""
+
+    def __init__(self, ws: web.WebSocketResponse):
+        self.ws = ws
+        self.session_id = uuid.uuid4().hex
+        self.identified = False
+        self.intents = 0
+        self.shard_id, self.shard_count = 0, 1
+        self.large_threshold = 250
+        self.seq = 0
+        self._lock = asyncio.Lock()
+
+    def identify(self, data: dict) -> None:
+        self.identified = True
+        self.intents = data.get("intents", 0)
+        self.shard_id, self.shard_count = data.get("shard") or (0, 1)
+        self.large_threshold = data.get("large_threshold", 250)
+
+    def serves(self, guild_id) -> bool:
+        """Whether events of a guild go to this shard, DMs go to shard 0 like on Discord."""
+        if guild_id is None:
+            return self.shard_id == 0
+        return (guild_id >> 22) % self.shard_count == self.shard_id
+
+    async def send(self, payload: dict) -> None:
+        async with self._lock:
+            await self.ws.send_str(json.dumps(payload))
+
+    async def dispatch(self, event: str, data: dict) -> None:
+        self.seq += 1
+        await self.send({"op": 0, "t": event, "s": self.seq, "d": data})
+
+
+class FakeInteraction:
+    """An interaction started by a simulated user, answered by the bot through the callback route."""
+
+    def __init__(self, interaction_id: int, token: str, kind: int, channel_id: int):
+        self.id = interaction_id
+        self.token = token
+        self.type = kind
+        self.channel_id = channel_id
+        self.created = time.perf_counter()
+        self.response_seconds = None
+        self.responses = []  # The callback followed by the followup messages
+        self.original_message_id = None
+        self._responded = threading.Event()
+        self._responded_async = asyncio.Event()
+
+    def _respond(self, payload: dict) -> None:
+        self.responses.append(payload)
+        if self.response_seconds is None:
+            self.response_seconds = time.perf_counter() - self.created
+            self._responded.set()
+            self._responded_async.set()
+
+    @property
+    def responded(self) -> bool:
+        return self._responded.is_set()
+
+    def wait(self, timeout: float = 10.0) -> dict:
+        """
+        Block until the bot answered the interaction.
+
+        Returns:
+            dict: The callback payload.
+
+        Raises:
+            TimeoutError: If the bot did not answer in time.
+        """
+        if not self._responded.wait(timeout):
+            raise TimeoutError(f"Interaction {self.id} was not answered within {timeout:.0f}s")
+        return self.responses[0]
+
+    def as_dict(self) -> dict:
+        return {
+            "id": str(self.id), "type": self.type, "responded": self.responded,
+            "response_ms": round(self.response_seconds * 1000, 2) if self.response_seconds is not None else None,
+            "message_id": str(self.original_message_id) if self.original_message_id else None,
+            "responses": self.responses,
+        }
+
+
+class FakeDiscord:
+    """
+    Serves a synthetic Discord on localhost.
+
+    Args:
+        guilds (int): Course servers the bot is a member of.
+        members (int): Members per server.
+        channels (int): Text channels per server.
+        online_ratio (float): Share of the members that are online.
+        seed (int): Seed of the generated world and of the injected failures.
+        latency_ms (float): Delay added to every HTTP request.
+        jitter_ms (float): Random extra delay of up to this much.
+        gateway_latency_ms (float): Delay of the heartbeat acknowledgements, the latency py-cord reports.
+        rate_limit_ratio (float): Share of HTTP requests answered with 429 regardless of the buckets.
+        retry_after (float): The retry_after of those injected 429s.
+        rate_limits (dict): Per-route buckets, ``{"POST /channels/{channel_id}/messages": [5, 5.0]}``.
+        global_rate_limit (int): Requests per second over all routes, 0 for no limit.
+        presence_updates_per_second (float): PRESENCE_UPDATE events sent to clients with the presences intent.
+        host (str): Interface to listen on.
+        port (int): Port to listen on, 0 for a free one.
+    """
+
+    def __init__(self, guilds=1, members=500, channels=6, online_ratio=0.25, seed=0, latency_ms=0.0,
+                 jitter_ms=0.0, gateway_latency_ms=0.0, rate_limit_ratio=0.0, retry_after=1.0, rate_limits=None,
+                 global_rate_limit=DEFAULT_GLOBAL_RATE_LIMIT, presence_updates_per_second=0.0,
+                 host="127.0.0.1", port=0):
+        self.world = World(guilds=guilds, members=members, channels=channels, online_ratio=online_ratio, seed=seed)
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.gateway_latency_ms = float(gateway_latency_ms)
+        self.rate_limit_ratio = float(rate_limit_ratio)
+        self.retry_after = float(retry_after)
+        self.rate_limits = DEFAULT_RATE_LIMITS if rate_limits is None else rate_limits
+        self.global_rate_limit = int(global_rate_limit)
+        self.presence_updates_per_second = float(presence_updates_per_second)
+        self.host = host
+        self.port = int(port)
+
+        self.rng = random.Random(seed)
+        self.sessions = set()
+        self.interactions = {}  # token -> FakeInteraction
+        self.requests = Counter()  # (route, status) -> count
+        self.events = Counter()  # gateway event -> count
+        self._buckets = {}  # (route, major parameter) -> [window end, count]
+        self._global_window = [0.0, 0]
+        self._unknown_routes = set()
+        self._message_waiters = {}  # channel id -> futures of driver requests waiting for a message
+
+        self._loop = None
+        self._thread = None
+        self._runner = None
+        self._background = []
+
+    @classmethod
+    def from_settings(cls):
+        """Create a server configured by the "fake_discord" section of .secrets.json."""
+        settings = (settings_manager.SETTINGS or {}).get("fake_discord", {})
+        return cls(**{key: value for key, value in settings.items() if key in _OPTIONS})
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def api_url(self) -> str:
+        """The API base py-cord sends its requests to, see fake_discord.install."""
+        return self.base_url + API_PREFIX
+
+    @property
+    def gateway_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/gateway"
+
+    ########################################
+    #              LIFECYCLE               #
+    ########################################
+
+    def start(self):
+        """Start serving in a daemon thread, returns once the port is bound."""
+        if self._thread is not None:
+            return self
+        started = threading.Event()
+        failure = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self._loop = loop
+            try:
+                loop.run_until_complete(self._serve())
+            except Exception as e:
+                failure.append(e)
+                started.set()
+                return
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self._shutdown())
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name="fake-discord", daemon=True)
+        self._thread.start()
+        started.wait()
+        if failure:
+            self._thread = None
+            raise failure[0]
+        logger.info(f"Fake Discord serving {len(self.world.guilds)} guild(s) on {self.base_url}")
+        return self
+
+    def stop(self) -> None:
+        """Close the gateway connections and stop the server."""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    async def _serve(self) -> None:
+        app = web.Application(middlewares=[self._middleware], client_max_size=32 * 1024 * 1024)
+        self._add_routes(app.router)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        if self.presence_updates_per_second > 0:
+            self._background.append(asyncio.create_task(self._presence_updates()))
+
+    async def _shutdown(self) -> None:
+        for task in list(self._background):
+            task.cancel()
+        for session in list(self.sessions):
+            await session.ws.close()
+        await self._runner.cleanup()
+
+    def _call(self, coro, timeout: float = 30):
+        """Run a coroutine on the loop of the server from another thread."""
+        if self._loop is None:
+            coro.close()
+            raise RuntimeError("The fake Discord server is not running")
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def _add_routes(self, router) -> None:
+        api = API_PREFIX
+        routes = [
+            ("GET", "/gateway", self._get_gateway),
+            ("GET", "/gateway/bot", self._get_gateway),
+            ("GET", "/users/@me", self._get_me),
+            ("GET", "/oauth2/applications/@me", self._get_application),
+            ("POST", "/users/@me/channels", self._create_dm),
+            ("GET", "/users/{user_id}", self._get_user),
+            ("GET", "/channels/{channel_id}", self._get_channel),
+            ("GET", "/channels/{channel_id}/messages", self._get_messages),
+            ("POST", "/channels/{channel_id}/messages", self._create_message),
+            ("POST", "/channels/{channel_id}/messages/bulk-delete", self._bulk_delete),
+            ("GET", "/channels/{channel_id}/messages/{message_id}", self._get_message),
+            ("PATCH", "/channels/{channel_id}/messages/{message_id}", self._edit_message),
+            ("DELETE", "/channels/{channel_id}/messages/{message_id}", self._delete_message),
+            ("POST", "/channels/{channel_id}/typing", self._no_content),
+            ("GET", "/guilds/{guild_id}", self._get_guild),
+            ("GET", "/guilds/{guild_id}/channels", self._get_guild_channels),
+            ("GET", "/guilds/{guild_id}/roles", self._get_guild_roles),
+            ("GET", "/guilds/{guild_id}/members", self._get_guild_members),
+            ("GET", "/guilds/{guild_id}/members/{user_id}", self._get_guild_member),
+            ("PUT", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", self._add_member_role),
+            ("DELETE", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", self._remove_member_role),
+            ("POST", "/interactions/{interaction_id}/{token}/callback", self._interaction_callback),
+            ("POST", "/webhooks/{webhook_id}/{token}", self._create_followup),
+            ("GET", "/webhooks/{webhook_id}/{token}/messages/{message_id}", self._get_webhook_message),
+            ("PATCH", "/webhooks/{webhook_id}/{token}/messages/{message_id}", self._edit_webhook_message),
+            ("DELETE", "/webhooks/{webhook_id}/{token}/messages/{message_id}", self._delete_webhook_message),
+        ]
+        for scope in ("/applications/{application_id}", "/applications/{application_id}/guilds/{guild_id}"):
+            routes += [
+                ("GET", scope + "/commands", self._get_commands),
+                ("PUT", scope + "/commands", self._bulk_upsert_commands),
+                ("POST", scope + "/commands", self._upsert_command),
+                ("GET", scope + "/commands/{command_id}", self._get_command),
+                ("PATCH", scope + "/commands/{command_id}", self._edit_command),
+                ("DELETE", scope + "/commands/{command_id}", self._delete_command),
+            ]
+        for method, path, handler in routes:
+            router.add_route(method, api + path, handler)
+        router.add_route("*", api + "/{tail:.*}", self._unknown_route)
+
+        router.add_get("/gateway", self._gateway)
+
+        router.add_get("/_fake/world", self._driver_world)
+        router.add_get("/_fake/guilds/{guild_id}/members", self._driver_members)
+        router.add_get("/_fake/stats", self._driver_stats)
+        router.add_patch("/_fake/config", self._driver_config)
+        router.add_post("/_fake/messages", self._driver_send_message)
+        router.add_post("/_fake/interactions", self._driver_interaction)
+        router.add_get("/_fake/channels/{channel_id}/messages", self._driver_channel_messages)
+        router.add_get("/_fake/users/{user_id}/dm", self._driver_dm_messages)
+
+    ########################################
+    #          LATENCY, RATE LIMITS        #
+    ########################################
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        route = f"{request.method} {request.match_info.route.resource.canonical}"
+        if not request.path.startswith(API_PREFIX):
+            return await handler(request)
+        route = route.replace(API_PREFIX, "", 1)
+
+        delay = self.latency_ms + self.rng.random() * self.jitter_ms
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        if not self._authorized(request):
+            response = _error(401, "401: Unauthorized", 0)
+        else:
+            response = self._rate_limit(request, route)
+            if response is None:
+                headers = request.get("ratelimit_headers")
+                response = await handler(request)
+                if headers:
+                    response.headers.update(headers)
+        self.requests[(route, response.status)] += 1
+        return response
+
+    @staticmethod
+    def _authorized(request: web.Request) -> bool:
+        # Interaction callbacks and webhooks are authorized by their token
+        if request.path.startswith((API_PREFIX + "/interactions/", API_PREFIX + "/webhooks/")):
+            return True
+        return request.headers.get("Authorization", "").startswith("Bot ")
+
+    def _rate_limit(self, request: web.Request, route: str):
+        """Count a request against the limits, the 429 response if it exceeds one."""
+        now = time.monotonic()
+        if self.rate_limit_ratio and self.rng.random() < self.rate_limit_ratio:
+            return _too_many(self.retry_after, "user")
+
+        if self.global_rate_limit:
+            window = self._global_window
+            if now >= window[0]:
+                window[:] = [now + 1.0, 0]
+            if window[1] >= self.global_rate_limit:
+                return _too_many(window[0] - now, "global")
+            window[1] += 1
+
+        limit = self.rate_limits.get(route)
+        if limit is None:
+            return None
+        requests, per = limit
+        info = request.match_info
+        major = info.get("channel_id") or info.get("guild_id") or info.get("webhook_id")
+        bucket = self._buckets.get((route, major))
+        if bucket is None or now >= bucket[0]:
+            bucket = self._buckets[(route, major)] = [now + per, 0]
+        if bucket[1] >= requests:
+            return _too_many(bucket[0] - now, "user")
+        bucket[1] += 1
+        reset_after = bucket[0] - now
+        request["ratelimit_headers"] = {
+            "X-RateLimit-Limit": str(requests),
+            "X-RateLimit-Remaining": str(requests - bucket[1]),
+            "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Bucket": uuid.uuid5(uuid.NAMESPACE_URL, route).hex,
+        }
+        return None
+
+    ########################################
+    #                GATEWAY               #
+    ########################################
+
+    async def _gateway(self, request: web.Request):
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        session = _Session(ws)
+        await session.send({"op": 10, "d": {"heartbeat_interval": HEARTBEAT_INTERVAL_MS}})
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                payload = json.loads(msg.data)
+                op, data = payload.get("op"), payload.get("d")
+                if op == 1:
+                    self._background.append(asyncio.create_task(self._heartbeat_ack(session)))
+                elif op == 2:
+                    session.identify(data)
+                    self.sessions.add(session)
+                    await self._ready(session)
+                elif op == 6:
+                    # Sessions are not kept, the client identifies again
+                    await session.send({"op": 9, "d": False})
+                elif op == 8:
+                    await self._request_members(session, data)
+        finally:
+            self.sessions.discard(session)
+        return ws
+
+    async def _heartbeat_ack(self, session: _Session) -> None:
+        if self.gateway_latency_ms > 0:
+            await asyncio.sleep(self.gateway_latency_ms / 1000)
+        try:
+            await session.send({"op": 11})
+        except ConnectionError:
+            pass
+        finally:
+            self._background.remove(asyncio.current_task())
+
+    async def _ready(self, session: _Session) -> None:
+        world = self.world
+        guilds = [guild for guild in world.guilds.values() if session.serves(guild.id)]
+        await session.dispatch("READY", {
+            "v": 10, "user": world.bot_user, "session_id": session.session_id, "session_type": "normal",
+            "resume_gateway_url": self.gateway_url, "shard": [session.shard_id, session.shard_count],
+            "application": {"id": str(world.application_id), "flags": 0},
+            "guilds": [{"id": str(guild.id), "unavailable": True} for guild in guilds],
+            "private_channels": [], "relationships": [], "user_settings": {}, "geo_ordered_rtc_regions": [],
+        })
+        self.events["READY"] += 1
+        if not session.intents & GUILDS:
+            return
+        for guild in guilds:
+            await session.dispatch("GUILD_CREATE", world.guild_create_payload(
+                guild, with_members=bool(session.intents & GUILD_MEMBERS),
+                with_presences=bool(session.intents & GUILD_PRESENCES),
+                large_threshold=session.large_threshold,
+            ))
+            self.events["GUILD_CREATE"] += 1
+
+    async def _request_members(self, session: _Session, data: dict) -> None:
+        guild = self.world.guilds.get(int(data["guild_id"]))
+        if guild is None:
+            return
+        if data.get("user_ids"):
+            wanted = [int(user_id) for user_id in data["user_ids"]]
+            members = [guild.members[user_id] for user_id in wanted if user_id in guild.members]
+        else:
+            query = (data.get("query") or "").lower()
+            members = [member for member in guild.members.values() if member["user"]["username"].startswith(query)]
+            if data.get("limit"):
+                members = members[:data["limit"]]
+
+        chunks = [members[start:start + 1000] for start in range(0, len(members), 1000)] or [[]]
+        for index, chunk in enumerate(chunks):
+            payload = {"guild_id": str(guild.id), "members": chunk, "chunk_index": index,
+                       "chunk_count": len(chunks), "nonce": data.get("nonce")}
+            if data.get("presences"):
+                payload["presences"] = self.world.presence_payloads(guild, chunk)
+            await session.dispatch("GUILD_MEMBERS_CHUNK", payload)
+            self.events["GUILD_MEMBERS_CHUNK"] += 1
+
+    async def _dispatch(self, event: str, data: dict, guild_id=None, intent: int = 0) -> None:
+        """Send an event to the shards serving its guild (shard 0 for DMs) that have the intent."""
+        for session in list(self.sessions):
+            if not session.serves(guild_id) or (intent and not session.intents & intent):
+                continue
+            payload = data
+            if event in ("MESSAGE_CREATE", "MESSAGE_UPDATE"):
+                payload = self._message_for(session, data)
+            try:
+                await session.dispatch(event, payload)
+            except ConnectionError:
+                self.sessions.discard(session)
+        self.events[event] += 1
+
+    def _message_for(self, session: _Session, message: dict) -> dict:
+        """Without the message content intent the content of other users' guild messages is empty."""
+        if session.intents & MESSAGE_CONTENT or "guild_id" not in message:
+            return message
+        if int(message["author"]["id"]) == self.world.application_id:
+            return message
+        return {**message, "content": "", "embeds": [], "attachments": [], "components": []}
+
+    async def _dispatch_message(self, event: str, message: dict) -> None:
+        guild_id = int(message["guild_id"]) if "guild_id" in message else None
+        await self._dispatch(event, message, guild_id, GUILD_MESSAGES if guild_id else DIRECT_MESSAGES)
+
+    async def _presence_updates(self) -> None:
+        world = self.world
+        members = [(guild, user_id) for guild in world.guilds.values() for user_id in guild.members
+                   if user_id != world.application_id]
+        while True:
+            await asyncio.sleep(1 / self.presence_updates_per_second)
+            guild, user_id = self.rng.choice(members)
+            if world.presences.pop(user_id, None) is None:
+                world.presences[user_id] = status = "online"
+            else:
+                status = "offline"
+            await self._dispatch("PRESENCE_UPDATE", world.presence_payload(guild, user_id, status),
+                                 guild.id, GUILD_PRESENCES)
+
+    ########################################
+    #               HTTP API               #
+    ########################################
+
+    async def _get_gateway(self, request: web.Request):
+        shards = max(1, math.ceil(len(self.world.guilds) / 1000))
+        return _json({
+            "url": self.gateway_url, "shards": shards,
+            "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 1},
+        })
+
+    async def _get_me(self, request: web.Request):
+        return _json(self.world.bot_user)
+
+    async def _get_application(self, request: web.Request):
+        world = self.world
+        return _json({
+            "id": str(world.application_id), "name": world.bot_user["global_name"], "icon": None,
+            "description": "", "rpc_origins": [], "bot_public": True, "bot_require_code_grant": False,
+            "owner": world.bot_user, "summary": "", "verify_key": "", "flags": 0, "team": None,
+        })
+
+    async def _get_user(self, request: web.Request):
+        user = self.world.users.get(_snowflake(request, "user_id"))
+        if user is None:
+            return _error(404, "Unknown User", 10013)
+        return _json(user)
+
+    async def _create_dm(self, request: web.Request):
+        payload = await request.json()
+        user_id = int(payload["recipient_id"])
+        if user_id not in self.world.users:
+            return _error(404, "Unknown User", 10013)
+        return _json(self.world.dm_channel(user_id))
+
+    async def _get_channel(self, request: web.Request):
+        channel = self.world.channels.get(_snowflake(request, "channel_id"))
+        if channel is None:
+            return _error(404, "Unknown Channel", 10003)
+        return _json(channel)
+
+    async def _get_messages(self, request: web.Request):
+        channel_id = _snowflake(request, "channel_id")
+        if channel_id not in self.world.channels:
+            return _error(404, "Unknown Channel", 10003)
+        query = request.query
+        return _json(self.world.history(
+            channel_id, limit=min(int(query.get("limit", 50)), 100),
+            before=int(query["before"]) if "before" in query else None,
+            after=int(query["after"]) if "after" in query else None,
+        ))
+
+    async def _get_message(self, request: web.Request):
+        message = self.world.messages.get(_snowflake(request, "channel_id"), {}).get(_snowflake(request, "message_id"))
+        if message is None:
+            return _error(404, "Unknown Message", 10008)
+        return _json(message)
+
+    async def _create_message(self, request: web.Request):
+        channel_id = _snowflake(request, "channel_id")
+        if channel_id not in self.world.channels:
+            return _error(404, "Unknown Channel", 10003)
+        payload, attachments = await self._read_payload(request)
+        message = self._new_message(channel_id, payload, attachments)
+        await self._dispatch_message("MESSAGE_CREATE", message)
+        return _json(message)
+
+    async def _edit_message(self, request: web.Request):
+        channel_id = _snowflake(request, "channel_id")
+        message = self.world.messages.get(channel_id, {}).get(_snowflake(request, "message_id"))
+        if message is None:
+            return _error(404, "Unknown Message", 10008)
+        payload, attachments = await self._read_payload(request)
+        await self._update_message(message, payload, attachments)
+        return _json(message)
+
+    async def _delete_message(self, request: web.Request):
+        channel_id = _snowflake(request, "channel_id")
+        message = self.world.messages.get(channel_id, {}).pop(_snowflake(request, "message_id"), None)
+        if message is None:
+            return _error(404, "Unknown Message", 10008)
+        await self._dispatch_deletion("MESSAGE_DELETE", channel_id, {"id": message["id"]})
+        return web.Response(status=204)
+
+    async def _bulk_delete(self, request: web.Request):
+        channel_id = _snowflake(request, "channel_id")
+        message_ids = [int(message_id) for message_id in (await request.json()).get("messages", [])]
+        if not 2 <= len(message_ids) <= 100:
+            return _error(400, "You must provide between 2 and 100 messages to delete", 50016)
+        messages = self.world.messages.get(channel_id, {})
+        deleted = [str(message_id) for message_id in message_ids if messages.pop(message_id, None) is not None]
+        await self._dispatch_deletion("MESSAGE_DELETE_BULK", channel_id, {"ids": deleted})
+        return web.Response(status=204)
+
+    async def _no_content(self, request: web.Request):
+        return web.Response(status=204)
+
+    async def _get_guild(self, request: web.Request):
+        guild = self.world.guilds.get(_snowflake(request, "guild_id"))
+        if guild is None:
+            return _error(404, "Unknown Guild", 10004)
+        return _json({**self.world.guild_payload(guild), "approximate_member_count": len(guild.members)})
+
+    async def _get_guild_channels(self, request: web.Request):
+        guild = self.world.guilds.get(_snowflake(request, "guild_id"))
+        if guild is None:
+            return _error(404, "Unknown Guild", 10004)
+        return _json([self.world.channels[channel_id] for channel_id in guild.channels])
+
+    async def _get_guild_roles(self, request: web.Request):
+        guild = self.world.guilds.get(_snowflake(request, "guild_id"))
+        if guild is None:
+            return _error(404, "Unknown Guild", 10004)
+        return _json(list(guild.roles.values()))
+
+    async def _get_guild_members(self, request: web.Request):
+        guild = self.world.guilds.get(_snowflake(request, "guild_id"))
+        if guild is None:
+            return _error(404, "Unknown Guild", 10004)
+        limit = min(int(request.query.get("limit", 1)), 1000)
+        after = int(request.query.get("after", 0))
+        members = [member for user_id, member in guild.members.items() if user_id > after]
+        return _json(members[:limit])
+
+    async def _get_guild_member(self, request: web.Request):
+        guild = self.world.guilds.get(_snowflake(request, "guild_id"))
+        member = guild.members.get(_snowflake(request, "user_id")) if guild else None
+        if member is None:
+            return _error(404, "Unknown Member", 10007)
+        return _json(member)
+
+    async def _add_member_role(self, request: web.Request):
+        return await self._change_member_role(request, add=True)
+
+    async def _remove_member_role(self, request: web.Request):
+        return await self._change_member_role(request, add=False)
+
+    async def _change_member_role(self, request: web.Request, add: bool):
+        guild = self.world.guilds.get(_snowflake(request, "guild_id"))
+        member = guild.members.get(_snowflake(request, "user_id")) if guild else None
+        if member is None:
+            return _error(404, "Unknown Member", 10007)
+        role_id = request.match_info["role_id"]
+        if int(role_id) not in guild.roles:
+            return _error(404, "Unknown Role", 10011)
+        if add and role_id not in member["roles"]:
+            member["roles"].append(role_id)
+        elif not add and role_id in member["roles"]:
+            member["roles"].remove(role_id)
+        await self._dispatch("GUILD_MEMBER_UPDATE", {**member, "guild_id": str(guild.id)}, guild.id, GUILD_MEMBERS)
+        return web.Response(status=204)
+
+    ########################################
+    #               COMMANDS               #
+    ########################################
+
+    @staticmethod
+    def _command_scope(request: web.Request):
+        guild_id = request.match_info.get("guild_id")
+        return int(guild_id) if guild_id else None
+
+    async def _get_commands(self, request: web.Request):
+        return _json(list(self.world.commands.get(self._command_scope(request), {}).values()))
+
+    async def _bulk_upsert_commands(self, request: web.Request):
+        scope = self._command_scope(request)
+        previous = self.world.commands.pop(scope, {})
+        stored = []
+        for data in await request.json():
+            # Commands keep their id when they are registered again
+            existing = next((command for command in previous.values() if command["name"] == data["name"]), None)
+            stored.append(self.world.store_command(scope, data, int(existing["id"]) if existing else None))
+        return _json(stored)
+
+    async def _upsert_command(self, request: web.Request):
+        return _json(self.world.store_command(self._command_scope(request), await request.json()))
+
+    async def _get_command(self, request: web.Request):
+        command = self.world.commands.get(self._command_scope(request), {}).get(_snowflake(request, "command_id"))
+        if command is None:
+            return _error(404, "Unknown application command", 10063)
+        return _json(command)
+
+    async def _edit_command(self, request: web.Request):
+        scope, command_id = self._command_scope(request), _snowflake(request, "command_id")
+        if command_id not in self.world.commands.get(scope, {}):
+            return _error(404, "Unknown application command", 10063)
+        return _json(self.world.store_command(scope, await request.json(), command_id))
+
+    async def _delete_command(self, request: web.Request):
+        if self.world.commands.get(self._command_scope(request), {}).pop(_snowflake(request, "command_id"), None) is None:
+            return _error(404, "Unknown application command", 10063)
+        return web.Response(status=204)
+
+    ########################################
+    #             INTERACTIONS             #
+    ########################################
+
+    async def _interaction_callback(self, request: web.Request):
+        interaction = self.interactions.get(request.match_info["token"])
+        if interaction is None or str(interaction.id) != request.match_info["interaction_id"]:
+            return _error(404, "Unknown interaction", 10062)
+        if interaction.responded:
+            return _error(400, "Interaction has already been acknowledged.", 40060)
+        payload, attachments = await self._read_payload(request)
+        callback, data = payload.get("type"), payload.get("data") or {}
+
+        if callback in (4, 5):
+            # A response message, deferred ones are filled in by editing @original
+            message = self._new_message(interaction.channel_id, data if callback == 4 else {"flags": data.get("flags", 0)},
+                                        attachments, interaction=interaction)
+            interaction.original_message_id = int(message["id"])
+            if not message["flags"] & EPHEMERAL:
+                await self._dispatch_message("MESSAGE_CREATE", message)
+        elif callback == 7:
+            message = self.world.find_message(interaction.original_message_id)
+            if message is not None:
+                await self._update_message(message, data, attachments)
+        interaction._respond(payload)
+        return web.Response(status=204)
+
+    def _interaction_of(self, request: web.Request):
+        return self.interactions.get(request.match_info["token"])
+
+    def _webhook_message(self, request: web.Request):
+        interaction = self._interaction_of(request)
+        if interaction is None:
+            return None
+        message_id = request.match_info["message_id"]
+        message_id = interaction.original_message_id if message_id == "@original" else int(message_id)
+        return self.world.find_message(message_id) if message_id else None
+
+    async def _create_followup(self, request: web.Request):
+        interaction = self._interaction_of(request)
+        if interaction is None:
+            return _error(404, "Unknown Webhook", 10015)
+        payload, attachments = await self._read_payload(request)
+        message = self._new_message(interaction.channel_id, payload, attachments, interaction=interaction)
+        if not message["flags"] & EPHEMERAL:
+            await self._dispatch_message("MESSAGE_CREATE", message)
+        interaction.responses.append({"type": "followup", "data": payload})
+        return _json(message)
+
+    async def _get_webhook_message(self, request: web.Request):
+        message = self._webhook_message(request)
+        if message is None:
+            return _error(404, "Unknown Message", 10008)
+        return _json(message)
+
+    async def _edit_webhook_message(self, request: web.Request):
+        message = self._webhook_message(request)
+        if message is None:
+            return _error(404, "Unknown Message", 10008)
+        payload, attachments = await self._read_payload(request)
+        await self._update_message(message, payload, attachments)
+        return _json(message)
+
+    async def _delete_webhook_message(self, request: web.Request):
+        message = self._webhook_message(request)
+        if message is None:
+            return _error(404, "Unknown Message", 10008)
+        channel_id = int(message["channel_id"])
+        self.world.messages[channel_id].pop(int(message["id"]), None)
+        await self._dispatch_deletion("MESSAGE_DELETE", channel_id, {"id": message["id"]})
+        return web.Response(status=204)
+
+    async def _unknown_route(self, request: web.Request):
+        route = f"{request.method} {request.path[len(API_PREFIX):]}"
+        if route not in self._unknown_routes:
+            self._unknown_routes.add(route)
+            logger.warning(f"Fake Discord does not implement {route}")
+        return _error(404, "404: Not Found", 0)
+
+    ########################################
+    #           MESSAGE HELPERS            #
+    ########################################
+
+    async def _read_payload(self, request: web.Request) -> tuple:
+        """The JSON body of a request and the attachment payloads of its files (multipart bodies)."""
+        if not request.can_read_body:
+            return {}, []
+        if request.content_type == "application/x-www-form-urlencoded":
+            # Interaction callbacks without files are sent as a form with a payload_json field
+            form = await request.post()
+            return json.loads(form.get("payload_json") or "{}"), []
+        if not request.content_type.startswith("multipart/"):
+            return await request.json(), []
+
+        payload, attachments = {}, []
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name == "payload_json":
+                payload = json.loads(await part.text())
+            elif part.filename:
+                size = len(await part.read())
+                attachment_id = self.world.snowflakes.next()
+                attachments.append({
+                    "id": str(attachment_id), "filename": part.filename, "size": size,
+                    "url": f"{self.base_url}/attachments/{attachment_id}/{part.filename}",
+                    "proxy_url": f"{self.base_url}/attachments/{attachment_id}/{part.filename}",
+                    "content_type": part.headers.get("Content-Type"),
+                })
+        return payload, attachments
+
+    def _new_message(self, channel_id: int, payload: dict, attachments: list, interaction: FakeInteraction = None,
+                     author: dict = None) -> dict:
+        metadata = None
+        if interaction is not None:
+            metadata = {"id": str(interaction.id), "type": interaction.type, "name": ""}
+        message = self.world.add_message(
+            channel_id, author or self.world.bot_user, content=payload.get("content"), embeds=payload.get("embeds"),
+            components=payload.get("components"), attachments=attachments, flags=payload.get("flags") or 0,
+            interaction=metadata,
+        )
+        for waiter in self._message_waiters.pop(channel_id, ()):
+            if not waiter.done():
+                waiter.set_result(None)
+        return message
+
+    async def _update_message(self, message: dict, payload: dict, attachments: list) -> None:
+        for key in ("content", "embeds", "components", "flags"):
+            if key in payload:
+                message[key] = payload[key] if payload[key] is not None else type(message[key])()
+        if attachments:
+            message["attachments"] = attachments
+        message["edited_timestamp"] = timestamp()
+        await self._dispatch_message("MESSAGE_UPDATE", message)
+
+    async def _dispatch_deletion(self, event: str, channel_id: int, data: dict) -> None:
+        guild = self.world.guild_of_channel(channel_id)
+        data = {**data, "channel_id": str(channel_id)}
+        if guild is not None:
+            data["guild_id"] = str(guild.id)
+        await self._dispatch(event, data, guild.id if guild else None,
+                             GUILD_MESSAGES if guild else DIRECT_MESSAGES)
+
+    ########################################
+    #           SIMULATED USERS            #
+    ########################################
+
+    def send_message(self, user_id: int, content: str, channel_id: int = None) -> dict:
+        """
+        Let a member send a message, as a DM to the bot if no channel is given.
+
+        Returns:
+            dict: The message payload.
+        """
+        return self._call(self._user_message(int(user_id), content, int(channel_id) if channel_id else None))
+
+    def invoke_command(self, name: str, user_id: int, guild_id: int = None, channel_id: int = None,
+                       **options) -> FakeInteraction:
+        """
+        Let a member run a slash command registered by the bot.
+
+        Args:
+            name (str): The command name.
+            user_id (int): The member running it.
+            guild_id (int): The guild, defaults to the guild of the channel or the first guild of the member.
+            channel_id (int): The channel, defaults to the first text channel of the guild.
+            **options: The options by name, ids for channel, member and role options.
+
+        Returns:
+            FakeInteraction: The interaction, ``wait()`` blocks until the bot answered.
+        """
+        return self._call(self._command_interaction(name, int(user_id), guild_id, channel_id, options))
+
+    def click_button(self, message_id: int, custom_id: str, user_id: int, values: list = None) -> FakeInteraction:
+        """Let a user press a button (or choose ``values`` of a select menu) of a message of the bot."""
+        return self._call(self._component_interaction(int(message_id), custom_id, int(user_id), values))
+
+    def submit_modal(self, custom_id: str, user_id: int, values: dict, channel_id: int = None) -> FakeInteraction:
+        """Let a user submit a modal the bot opened, ``values`` are the text inputs by custom_id."""
+        return self._call(self._modal_interaction(custom_id, int(user_id), values, channel_id))
+
+    def channel_messages(self, channel_id: int) -> list:
+        """The messages of a channel, oldest first."""
+        return self._call(self._list_messages(int(channel_id)))
+
+    def dm_messages(self, user_id: int) -> list:
+        """The messages of the DM channel of the bot with a user, oldest first."""
+        channel_id = self.world.dm_channels.get(int(user_id))
+        return self.channel_messages(channel_id) if channel_id else []
+
+    def members(self, guild_id: int, role: str = None) -> list:
+        """Ids of the members of a guild, the bot excluded, optionally only those with a role."""
+        guild = self.world.guilds[int(guild_id)]
+        role_id = str(guild.role_id(role)) if role else None
+        return [user_id for user_id, member in guild.members.items()
+                if user_id != self.world.application_id and (role_id is None or role_id in member["roles"])]
+
+    def stats(self) -> dict:
+        """Requests per route and status, gateway events per type and the connected shards."""
+        return {
+            "requests": {f"{route} {status}": count for (route, status), count in sorted(self.requests.items())},
+            "rate_limited": sum(count for (_, status), count in self.requests.items() if status == 429),
+            "events": dict(self.events),
+            "sessions": sorted([session.shard_id, session.shard_count] for session in self.sessions),
+            "interactions": len(self.interactions),
+            "unknown_routes": sorted(self._unknown_routes),
+        }
+
+    async def _list_messages(self, channel_id: int, after: int = 0, wait: float = 0) -> list:
+        """The messages of a channel newer than ``after``, waiting up to ``wait`` seconds for one."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            messages = [message for message_id, message in self.world.messages.get(channel_id, {}).items()
+                        if message_id > after]
+            remaining = deadline - loop.time()
+            if messages or remaining <= 0:
+                return messages
+            waiter = loop.create_future()
+            self._message_waiters.setdefault(channel_id, set()).add(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._message_waiters.get(channel_id, set()).discard(waiter)
+
+    async def _user_message(self, user_id: int, content: str, channel_id=None) -> dict:
+        world = self.world
+        author = world.users.get(user_id)
+        if author is None:
+            raise ValueError(f"Unknown user {user_id}")
+        if channel_id is None:
+            channel_id = int(world.dm_channel(user_id)["id"])
+        else:
+            guild = world.guild_of_channel(channel_id)
+            if guild is None or user_id not in guild.members:
+                raise ValueError(f"User {user_id} cannot send messages to channel {channel_id}")
+        message = self._new_message(channel_id, {"content": content}, [], author=author)
+        await self._dispatch_message("MESSAGE_CREATE", message)
+        return message
+
+    def _resolve_place(self, user_id: int, guild_id=None, channel_id=None) -> tuple:
+        """The guild and channel of an interaction from the given ids and the member's guilds."""
+        world = self.world
+        if channel_id is not None:
+            channel_id = int(channel_id)
+            guild = world.guild_of_channel(channel_id)
+        elif guild_id is not None:
+            guild = world.guilds.get(int(guild_id))
+            if guild is None:
+                raise ValueError(f"Unknown guild {guild_id}")
+        else:
+            guild = next((guild for guild in world.guilds.values() if user_id in guild.members), None)
+        if guild is not None and channel_id is None:
+            channel_id = next(channel_id for channel_id in guild.channels
+                              if world.channels[channel_id]["type"] != CATEGORY_CHANNEL)
+        if guild is None and channel_id is None:
+            channel_id = int(world.dm_channel(user_id)["id"])
+        if guild is not None and user_id not in guild.members:
+            raise ValueError(f"User {user_id} is not a member of guild {guild.id}")
+        return guild, channel_id
+
+    async def _interaction(self, kind: int, user_id: int, guild, channel_id: int, data: dict,
+                           message: dict = None) -> FakeInteraction:
+        world = self.world
+        interaction = FakeInteraction(world.snowflakes.next(), uuid.uuid4().hex, kind, channel_id)
+        payload = {
+            "id": str(interaction.id), "application_id": str(world.application_id), "type": kind,
+            "data": data, "token": interaction.token, "version": 1, "locale": "en-US",
+            "app_permissions": "8", "entitlements": [], "channel_id": str(channel_id),
+            "channel": world.channels[channel_id],
+        }
+        if guild is not None:
+            member = guild.members[user_id]
+            payload["guild_id"] = str(guild.id)
+            payload["guild_locale"] = "en-US"
+            payload["member"] = {**member, "permissions": world.member_permissions(guild, member)}
+        else:
+            payload["user"] = world.users[user_id]
+        if message is not None:
+            payload["message"] = message
+
+        self.interactions[interaction.token] = interaction
+        await self._dispatch("INTERACTION_CREATE", payload, guild.id if guild else None)
+        return interaction
+
+    async def _command_interaction(self, name: str, user_id: int, guild_id, channel_id, options: dict):
+        world = self.world
+        guild, channel_id = self._resolve_place(user_id, guild_id, channel_id)
+        command = world.find_command(name, guild.id if guild else None)
+        if command is None:
+            raise ValueError(f"The bot has not registered the command {name}")
+
+        data_options, resolved = [], {}
+        for option in command.get("options", []):
+            if option["name"] not in options:
+                continue
+            value = options[option["name"]]
+            kind = option["type"]
+            if kind == 6:  # Member
+                member = guild.members[int(value)]
+                resolved.setdefault("users", {})[str(value)] = member["user"]
+                resolved.setdefault("members", {})[str(value)] = {k: v for k, v in member.items() if k != "user"}
+                value = str(value)
+            elif kind == 7:  # Channel
+                channel = world.channels[int(value)]
+                resolved.setdefault("channels", {})[str(value)] = {**channel, "permissions": "8"}
+                value = str(value)
+            elif kind == 8:  # Role
+                resolved.setdefault("roles", {})[str(value)] = guild.roles[int(value)]
+                value = str(value)
+            data_options.append({"name": option["name"], "type": kind, "value": value})
+
+        data = {"id": command["id"], "name": name, "type": 1, "options": data_options, "resolved": resolved}
+        if guild is not None:
+            data["guild_id"] = str(guild.id)
+        return await self._interaction(COMMAND_INTERACTION, user_id, guild, channel_id, data)
+
+    async def _component_interaction(self, message_id: int, custom_id: str, user_id: int, values=None):
+        message = self.world.find_message(message_id)
+        if message is None:
+            raise ValueError(f"Unknown message {message_id}")
+        channel_id = int(message["channel_id"])
+        guild = self.world.guild_of_channel(channel_id)
+        if guild is None and self.world.channels[channel_id]["type"] == DM_CHANNEL:
+            # Only the recipient of a DM can press its buttons
+            if self.world.dm_channels.get(user_id) != channel_id:
+                raise ValueError(f"User {user_id} cannot see message {message_id}")
+        data = {"custom_id": custom_id, "component_type": 2 if values is None else 3}
+        if values is not None:
+            data["values"] = list(values)
+        interaction = await self._interaction(COMPONENT_INTERACTION, user_id, guild, channel_id, data, message)
+        interaction.original_message_id = message_id
+        return interaction
+
+    async def _modal_interaction(self, custom_id: str, user_id: int, values: dict, channel_id=None):
+        guild, channel_id = self._resolve_place(user_id, None, channel_id) if channel_id else (
+            None, int(self.world.dm_channel(user_id)["id"]))
+        data = {"custom_id": custom_id, "components": [
+            {"type": 1, "components": [{"type": 4, "custom_id": key, "value": value}]}
+            for key, value in values.items()
+        ]}
+        return await self._interaction(MODAL_INTERACTION, user_id, guild, channel_id, data)
+
+    ########################################
+    #             DRIVER ROUTES            #
+    ########################################
+
+    async def _driver_world(self, request: web.Request):
+        world = self.world
+        return _json({
+            "bot_user_id": str(world.application_id),
+            "guilds": [{
+                "id": str(guild.id), "name": guild.name, "members": len(guild.members) - 1,
+                "roles": {role["name"]: role["id"] for role in guild.roles.values()},
+                "channels": {world.channels[channel_id]["name"]: str(channel_id) for channel_id in guild.channels
+                             if world.channels[channel_id]["type"] != CATEGORY_CHANNEL},
+            } for guild in world.guilds.values()],
+            "commands": sorted({command["name"] for commands in world.commands.values()
+                                for command in commands.values()}),
+        })
+
+    async def _driver_members(self, request: web.Request):
+        guild_id = _snowflake(request, "guild_id")
+        if guild_id not in self.world.guilds:
+            return _error(404, "Unknown Guild", 10004)
+        return _json([str(user_id) for user_id in self.members(guild_id, request.query.get("role"))])
+
+    async def _driver_stats(self, request: web.Request):
+        return _json(self.stats())
+
+    async def _driver_config(self, request: web.Request):
+        for key, value in (await request.json()).items():
+            if key not in _RUNTIME_OPTIONS:
+                return _error(400, f"{key} cannot be changed at runtime", 0)
+            setattr(self, key, type(getattr(self, key))(value))
+        return _json({key: getattr(self, key) for key in _RUNTIME_OPTIONS})
+
+    async def _driver_send_message(self, request: web.Request):
+        payload = await request.json()
+        try:
+            message = await self._user_message(int(payload["user_id"]), payload["content"],
+                                               int(payload["channel_id"]) if payload.get("channel_id") else None)
+        except (KeyError, ValueError) as e:
+            return _error(400, str(e), 0)
+        return _json(message)
+
+    async def _driver_interaction(self, request: web.Request):
+        payload = await request.json()
+        try:
+            kind = payload["type"]
+            user_id = int(payload["user_id"])
+            if kind == "command":
+                interaction = await self._command_interaction(
+                    payload["name"], user_id, payload.get("guild_id"), payload.get("channel_id"),
+                    payload.get("options") or {})
+            elif kind == "button":
+                interaction = await self._component_interaction(
+                    int(payload["message_id"]), payload["custom_id"], user_id, payload.get("values"))
+            elif kind == "modal":
+                interaction = await self._modal_interaction(
+                    payload["custom_id"], user_id, payload.get("values") or {}, payload.get("channel_id"))
+            else:
+                return _error(400, f"Unknown interaction type {kind}", 0)
+        except (KeyError, ValueError) as e:
+            return _error(400, str(e), 0)
+
+        wait = float(payload.get("wait", 0))
+        if wait > 0:
+            try:
+                await asyncio.wait_for(interaction._responded_async.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        return _json(interaction.as_dict())
+
+    async def _driver_channel_messages(self, request: web.Request):
+        return _json(await self._list_messages(_snowflake(request, "channel_id"), *_long_poll(request)))
+
+    async def _driver_dm_messages(self, request: web.Request):
+        user_id = _snowflake(request, "user_id")
+        if user_id not in self.world.users:
+            return _error(404, "Unknown User", 10013)
+        # The channel the bot gets once it opens the DM, so a driver can wait for the first message
+        channel_id = int(self.world.dm_channel(user_id)["id"])
+        return _json(await self._list_messages(channel_id, *_long_poll(request)))
+
+
+def _long_poll(request: web.Request) -> tuple:
+    """The ``after`` message id and the seconds to ``wait`` for a newer message of a driver request."""
+    try:
+        return int(request.query.get("after", 0)), min(float(request.query.get("wait", 0)), 60.0)
+    except ValueError:
+        raise web.HTTPBadRequest(text="after and wait must be numbers")
+
+
+def _snowflake(request: web.Request, name: str) -> int:
+    try:
+        return int(request.match_info[name])
+    except ValueError:
+        raise web.HTTPBadRequest(text=json.dumps({"message": f"Invalid {name}", "code": 50035}),
+                                 content_type="application/json")
+
+
+def _json(data, status: int = 200, headers: dict = None) -> web.Response:
+    # py-cord only decodes bodies whose Content-Type is exactly application/json, without a charset
+    return web.Response(body=json.dumps(data).encode("utf-8"), status=status,
+                        headers={**(headers or {}), "Content-Type": "application/json"})
+
+
+def _error(status: int, message: str, code: int) -> web.Response:
+    return _json({"message": message, "code": code}, status=status)
+
+
+def _too_many(retry_after: float, scope: str) -> web.Response:
+    # py-cord only trusts a 429 that came through Discord's proxy, which sets Via
+    headers = {"Via": "1.1 google", "Retry-After": str(math.ceil(retry_after)), "X-RateLimit-Scope": scope}
+    if scope == "global":
+        headers["X-RateLimit-Global"] = "true"
+    return _json(
+        {"message": "You are being rate limited.", "retry_after": round(retry_after, 3), "global": scope == "global"},
+        status=429, headers=headers,
+    )
@@ -0,0 +1,349 @@
+"""
+Fake Discord World
+~~~~~~~~
+
+The synthetic data served by :class:`fake_discord.FakeDiscord`: course servers with
+roles, channels and thousands of members, the DM channels and messages created while it
+runs and the registered application commands. Everything is stored as the JSON payloads
+of the Discord API, so py-cord parses it like the real thing.
+
+The world is only touched from the event loop of the fake server.
+
+:copyright: (c) 2023-present Ivan Parmacli
+:license: MIT, see LICENSE for more details.
+"""
+
+import itertools
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+DISCORD_EPOCH_MS = 1420070400000
+
+# Channel types of the Discord API
+TEXT_CHANNEL = 0
+DM_CHANNEL = 1
+CATEGORY_CHANNEL = 4
+
+# Permission values of the synthetic roles
+EVERYONE_PERMISSIONS = "104324673"
+ADMIN_PERMISSIONS = "8"
+
+CHANNEL_NAMES = ("general", "announcements", "surveys", "attendance")
+ROLE_NAMES = ("Admin", "Tutor", "Student")
+
+# Messages kept per channel, older ones are dropped like they scroll out of the cache
+MAX_MESSAGES_PER_CHANNEL = 1000
+
+
+def timestamp(moment: float = None) -> str:
+    """ISO 8601 timestamp of a Unix time (now by default), as used in payloads."""
+    return datetime.fromtimestamp(time.time() if moment is None else moment, tz=timezone.utc).isoformat()
+
+
+class Snowflakes:
+    """Generates snowflake ids, unique within a world."""
+
+    def __init__(self):
+        self._increment = itertools.count()
+
+    def next(self, moment_ms: int = None) -> int:
+        """
+        Return a new id.
+
+        Args:
+            moment_ms (int): Creation time in Unix milliseconds, now by default. Guild ids are
+                spread over time so the shards they belong to, ``(id >> 22) % shards``, vary.
+        """
+        if moment_ms is None:
+            moment_ms = int(time.time() * 1000)
+        return ((moment_ms - DISCORD_EPOCH_MS) << 22) | (next(self._increment) & 0x3FFFFF)
+
+
+class FakeGuild:
+    """A synthetic course server."""
+
+    def __init__(self, guild_id: int, name: str, owner_id: int):
+        self.id = guild_id
+        self.name = name
+        self.owner_id = owner_id
+        self.joined_at = timestamp()
+        self.roles = OrderedDict()  # role id -> role payload
+        self.channels = []  # channel ids
+        self.members = OrderedDict()  # user id -> member payload
+
+    def role_id(self, name: str):
+        """Id of the role called ``name``, None if there is none."""
+        for role in self.roles.values():
+            if role["name"] == name:
+                return int(role["id"])
+        return None
+
+
+class World:
+    """
+    The state of the fake Discord.
+
+    Args:
+        guilds (int): Course servers the bot is a member of.
+        members (int): Members per server, every server has its own.
+        channels (int): Text channels per server.
+        online_ratio (float): Share of the members that are online.
+        seed (int): Seed of the generated names and presences.
+    """
+
+    def __init__(self, guilds=1, members=500, channels=6, online_ratio=0.25, seed=0):
+        self.rng = random.Random(seed)
+        self.snowflakes = Snowflakes()
+        self.users = {}  # user id -> user payload
+        self.guilds = OrderedDict()  # guild id -> FakeGuild
+        self.channels = {}  # channel id -> channel payload, DM channels included
+        self.dm_channels = {}  # user id -> DM channel id
+        self.messages = {}  # channel id -> OrderedDict(message id -> message payload)
+        self.commands = {}  # guild id (None for global) -> OrderedDict(command id -> command payload)
+        self.presences = {}  # user id -> status of the online members
+
+        self.bot_user = self.add_user("TUM Bot", bot=True)
+        self.application_id = int(self.bot_user["id"])
+
+        now_ms = int(time.time() * 1000)
+        for index in range(guilds):
+            # Created at different times over the last years, see Snowflakes.next
+            guild_id = self.snowflakes.next(now_ms - self.rng.randrange(3 * 365 * 24 * 3600 * 1000))
+            self._add_guild(guild_id, index, members, channels, online_ratio)
+
+    ########################################
+    #              GENERATION              #
+    ########################################
+
+    def add_user(self, name: str, bot: bool = False) -> dict:
+        user_id = self.snowflakes.next()
+        user = {
+            "id": str(user_id),
+            "username": name.lower().replace(" ", "_"),
+            "global_name": name,
+            "discriminator": "0",
+            "avatar": None,
+            "bot": bot,
+            "public_flags": 0,
+        }
+        self.users[user_id] = user
+        return user
+
+    def _add_guild(self, guild_id: int, index: int, members: int, channels: int, online_ratio: float) -> None:
+        students = [self.add_user(f"Student {index + 1}-{number:05d}") for number in range(members)]
+        instructor = students[0]
+        guild = FakeGuild(guild_id, f"Introductory Programming {index + 1}", int(instructor["id"]))
+        self.guilds[guild_id] = guild
+
+        # The @everyone role has the id of the guild
+        guild.roles[guild_id] = self._role(guild_id, "@everyone", 0, EVERYONE_PERMISSIONS)
+        for position, name in enumerate(ROLE_NAMES, start=1):
+            role_id = self.snowflakes.next()
+            permissions = ADMIN_PERMISSIONS if name == "Admin" else EVERYONE_PERMISSIONS
+            guild.roles[role_id] = self._role(role_id, name, len(ROLE_NAMES) + 1 - position, permissions)
+        admin, tutor, student = (guild.role_id(name) for name in ROLE_NAMES)
+
+        category_id = self.snowflakes.next()
+        self.channels[category_id] = self._channel(category_id, guild_id, "Text Channels", 0, CATEGORY_CHANNEL)
+        guild.channels.append(category_id)
+        names = list(CHANNEL_NAMES[:channels]) + [f"group-{n}" for n in range(1, channels - len(CHANNEL_NAMES) + 1)]
+        for position, name in enumerate(names):
+            channel_id = self.snowflakes.next()
+            self.channels[channel_id] = self._channel(channel_id, guild_id, name, position, TEXT_CHANNEL, category_id)
+            guild.channels.append(channel_id)
+
+        # One tutor per 50 students, the first member is the instructor
+        tutors = max(1, members // 50)
+        self.add_member(guild, self.bot_user, [admin])
+        for number, user in enumerate(students):
+            roles = [admin] if number == 0 else [tutor] if number <= tutors else [student]
+            self.add_member(guild, user, roles)
+            if self.rng.random() < online_ratio:
+                self.presences[int(user["id"])] = "online"
+
+    @staticmethod
+    def _role(role_id: int, name: str, position: int, permissions: str) -> dict:
+        return {
+            "id": str(role_id), "name": name, "color": 0, "hoist": False, "icon": None, "unicode_emoji": None,
+            "position": position, "permissions": permissions, "managed": False, "mentionable": True, "flags": 0,
+        }
+
+    @staticmethod
+    def _channel(channel_id: int, guild_id: int, name: str, position: int, channel_type: int, parent_id=None) -> dict:
+        return {
+            "id": str(channel_id), "type": channel_type, "guild_id": str(guild_id), "name": name,
+            "position": position, "permission_overwrites": [], "nsfw": False, "topic": None,
+            "parent_id": str(parent_id) if parent_id else None, "last_message_id": None, "rate_limit_per_user": 0,
+        }
+
+    def add_member(self, guild: FakeGuild, user: dict, role_ids: list) -> dict:
+        member = {
+            "user": user, "nick": None, "avatar": None, "roles": [str(role_id) for role_id in role_ids],
+            "joined_at": guild.joined_at, "premium_since": None, "deaf": False, "mute": False,
+            "flags": 0, "pending": False, "communication_disabled_until": None,
+        }
+        guild.members[int(user["id"])] = member
+        return member
+
+    ########################################
+    #               PAYLOADS               #
+    ########################################
+
+    def guild_of_channel(self, channel_id: int):
+        guild_id = self.channels.get(channel_id, {}).get("guild_id")
+        return self.guilds.get(int(guild_id)) if guild_id else None
+
+    def guild_payload(self, guild: FakeGuild) -> dict:
+        """The guild without members, channels and presences, as returned by GET /guilds/{id}."""
+        return {
+            "id": str(guild.id), "name": guild.name, "icon": None, "splash": None, "discovery_splash": None,
+            "banner": None, "description": None, "owner_id": str(guild.owner_id), "afk_channel_id": None,
+            "afk_timeout": 300, "verification_level": 0, "default_message_notifications": 0,
+            "explicit_content_filter": 0, "roles": list(guild.roles.values()), "emojis": [], "stickers": [],
+            "features": [], "mfa_level": 0, "application_id": None, "system_channel_id": None,
+            "system_channel_flags": 0, "rules_channel_id": None, "public_updates_channel_id": None,
+            "vanity_url_code": None, "premium_tier": 0, "premium_subscription_count": 0,
+            "preferred_locale": "en-US", "nsfw_level": 0, "premium_progress_bar_enabled": False,
+        }
+
+    def guild_create_payload(self, guild: FakeGuild, with_members: bool, with_presences: bool,
+                             large_threshold: int) -> dict:
+        """
+        The GUILD_CREATE event of a guild.
+
+        Like Discord, a guild above the large threshold only comes with the bot's own member
+        and the online members, the client requests the others in chunks.
+        """
+        large = len(guild.members) > large_threshold
+        if with_members and not large:
+            members = list(guild.members.values())
+        else:
+            members = [guild.members[self.application_id]]
+            if with_presences:
+                members += [member for user_id, member in guild.members.items() if user_id in self.presences]
+        return {
+            **self.guild_payload(guild),
+            "joined_at": guild.joined_at, "large": large, "unavailable": False,
+            "member_count": len(guild.members), "members": members,
+            "channels": [self.channels[channel_id] for channel_id in guild.channels],
+            "presences": self.presence_payloads(guild, members) if with_presences else [],
+            "voice_states": [], "threads": [], "stage_instances": [], "guild_scheduled_events": [],
+        }
+
+    def presence_payloads(self, guild: FakeGuild, members: list) -> list:
+        presences = []
+        for member in members:
+            status = self.presences.get(int(member["user"]["id"]))
+            if status is not None:
+                presences.append(self.presence_payload(guild, int(member["user"]["id"]), status))
+        return presences
+
+    @staticmethod
+    def presence_payload(guild: FakeGuild, user_id: int, status: str) -> dict:
+        return {
+            "user": {"id": str(user_id)}, "guild_id": str(guild.id), "status": status,
+            "activities": [], "client_status": {"desktop": status} if status != "offline" else {},
+        }
+
+    def member_permissions(self, guild: FakeGuild, member: dict) -> str:
+        admin = str(guild.role_id("Admin"))
+        return ADMIN_PERMISSIONS if admin in member["roles"] else EVERYONE_PERMISSIONS
+
+    def dm_channel(self, user_id: int) -> dict:
+        """The DM channel of the bot with a user, created on first use."""
+        channel_id = self.dm_channels.get(user_id)
+        if channel_id is None:
+            channel_id = self.snowflakes.next()
+            self.dm_channels[user_id] = channel_id
+            self.channels[channel_id] = {
+                "id": str(channel_id), "type": DM_CHANNEL, "last_message_id": None,
+                "recipients": [self.users[user_id]], "flags": 0,
+            }
+        return self.channels[channel_id]
+
+    ########################################
+    #               MESSAGES               #
+    ########################################
+
+    def add_message(self, channel_id: int, author: dict, content: str = "", embeds=None, components=None,
+                    attachments=None, flags: int = 0, interaction: dict = None) -> dict:
+        channel = self.channels[channel_id]
+        message_id = self.snowflakes.next()
+        message = {
+            "id": str(message_id), "channel_id": str(channel_id), "author": author, "content": content or "",
+            "timestamp": timestamp(), "edited_timestamp": None, "tts": False, "mention_everyone": False,
+            "mentions": [], "mention_roles": [], "attachments": attachments or [], "embeds": embeds or [],
+            "components": components or [], "pinned": False, "type": 0 if interaction is None else 20,
+            "flags": flags,
+        }
+        guild = self.guild_of_channel(channel_id)
+        if guild is not None:
+            message["guild_id"] = str(guild.id)
+            member = guild.members.get(int(author["id"]))
+            if member is not None:
+                message["member"] = {key: value for key, value in member.items() if key != "user"}
+        if interaction is not None:
+            message["interaction"] = interaction
+            message["application_id"] = str(self.application_id)
+
+        messages = self.messages.setdefault(channel_id, OrderedDict())
+        messages[message_id] = message
+        if len(messages) > MAX_MESSAGES_PER_CHANNEL:
+            messages.popitem(last=False)
+        channel["last_message_id"] = str(message_id)
+        return message
+
+    def find_message(self, message_id: int):
+        """The message with an id in any channel, None if it is unknown or deleted."""
+        for messages in self.messages.values():
+            message = messages.get(message_id)
+            if message is not None:
+                return message
+        return None
+
+    def history(self, channel_id: int, limit: int = 50, before: int = None, after: int = None) -> list:
+        """Messages of a channel, newest first, like GET /channels/{id}/messages."""
+        result = []
+        for message_id in reversed(self.messages.get(channel_id, {})):
+            if before is not None and message_id >= before:
+                continue
+            if after is not None and message_id <= after:
+                break
+            result.append(self.messages[channel_id][message_id])
+            if len(result) >= limit:
+                break
+        return result
+
+    ########################################
+    #               COMMANDS               #
+    ########################################
+
+    def store_command(self, guild_id, data: dict, command_id: int = None) -> dict:
+        """Register or update an application command, globally if ``guild_id`` is None."""
+        commands = self.commands.setdefault(guild_id, OrderedDict())
+        if command_id is None:
+            for existing in commands.values():
+                if existing["name"] == data["name"] and existing.get("type", 1) == data.get("type", 1):
+                    command_id = int(existing["id"])
+                    break
+            else:
+                command_id = self.snowflakes.next()
+        command = {
+            "type": 1, "description": "", "options": [], "default_member_permissions": None,
+            "dm_permission": True, "nsfw": False, **commands.get(command_id, {}), **data,
+            "id": str(command_id), "application_id": str(self.application_id), "version": str(self.snowflakes.next()),
+        }
+        if guild_id is not None:
+            command["guild_id"] = str(guild_id)
+        commands[command_id] = command
+        return command
+
+    def find_command(self, name: str, guild_id=None):
+        """The command called ``name``, preferring the one registered for the guild."""
+        for scope in (guild_id, None) if guild_id is not None else (None,):
+            for command in self.commands.get(scope, {}).values():
+                if command["name"] == name:
+                    return command
+        return None
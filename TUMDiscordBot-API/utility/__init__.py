@@ -1,5 +1,7 @@
 from .function_utils import (
     save_survey_entry_to_csv,
+    data_file_dir,
+    get_guild_member,
     add_student_to_attendance_list,
     attendance_cleanup,
     prepare_group_list_for_embed,
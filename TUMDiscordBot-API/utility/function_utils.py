@@ -23,6 +23,8 @@ logger = logging.getLogger('discord_bot')
 
 # Add live bot accessor
 import REST.utils.bot_context as bc
+from REST.utils.metrics import STORAGE_WRITE_SECONDS
+from REST.utils import tracing
 
 def _bot():
     return bc.get_live_bot()
@@ -33,18 +35,60 @@ def _bot():
 
 DEFAULT_CASE_WARNING = "Incorrect group id."
 
+# Project root directory (parent of the utility directory)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def data_file_dir(kind: str, guild_id=None) -> Path:
+    """
+    Return the directory the data files of a course server are stored in, creating it if needed.
+
+    The group ids come from the shared settings, so every server has the same groups; one
+    directory per server keeps their files apart. Files written before were stored in the
+    directory of the kind itself.
+
+    Args:
+        kind :class:`str`: "attendance", "exercise_feedback" or "tutor_session_feedback".
+        guild_id :class:`int`: The ID of the guild, None for the directory of the kind.
+    """
+    directory = PROJECT_ROOT / 'data' / kind
+    if guild_id is not None:
+        directory = directory / str(guild_id)
+    directory.mkdir(exist_ok=True, parents=True)
+    return directory
+
+
+async def get_guild_member(guild: discord.Guild, user_id: int):
+    """
+    Look up a member of a guild.
+
+    Without the members intent (see bot.gateway_profiles) only members who used an
+    interaction are cached, the others are fetched from Discord.
+
+    Returns:
+        discord.Member: The member, None if the user is not a member of the guild.
+    """
+    member = guild.get_member(user_id)
+    if member is not None or _bot().intents.members:
+        return member
+    try:
+        return await guild.fetch_member(user_id)
+    except discord.NotFound:
+        return None
+
 
 async def add_student_to_attendance_list(
-    message: discord.Message, group: list, status: bool, id: str
+    message: discord.Message, group: list, status: bool, id: str, guild: discord.Guild = None
 ) -> None:
     """
-    Adds a student to the specified group, only works if the student is in the INFUN server.
+    Adds a student to the specified group, only works if the student is a member of the guild.
 
     Args:
         message :class:`discord.Message`: The message sent by the user.
         group :class:`list`: List of participants of the tutor group.
         status :class:`bool`: Indicates whether attendance verification has started.
         id :class:`str`: The attendance code to check against.
+        guild :class:`discord.Guild`: The guild the attendance is taken in, defaults to the default guild.
     """
     try:
         logger.info(f"Adding student to attendance. Status: {status}, Code: {id}, Message content: {message.content}")
@@ -52,8 +96,8 @@ async def add_student_to_attendance_list(
         # Check if the message is a DM
         if isinstance(message.channel, discord.DMChannel):
             logger.info(f"Processing DM from {message.author.name}")
-            current_guild = _bot().guilds[0]
-            member = current_guild.get_member(message.author.id)
+            current_guild = guild or bc.get_default_guild()
+            member = await get_guild_member(current_guild, message.author.id)
             
             if member:
                 # Format: "DisplayName (username)"
@@ -72,8 +116,8 @@ async def add_student_to_attendance_list(
                 logger.error(f"Could not find member in guild: {message.author.name} ({message.author.id})")
         else:
             # Regular channel message
-            current_guild = _bot().guilds[0]
-            member = current_guild.get_member(message.author.id)
+            current_guild = guild or bc.get_default_guild()
+            member = await get_guild_member(current_guild, message.author.id)
             
             if member:
                 # Format: "DisplayName (username)"
@@ -88,24 +132,23 @@ async def add_student_to_attendance_list(
         logger.error(f"Error in add_student_to_attendance_list: {e}")
 
 
-def save_attendance_to_csv(group_id: str, attendance_list: list) -> None:
+@STORAGE_WRITE_SECONDS.time(kind="attendance_csv")
+@tracing.span("storage.write", kind="attendance_csv")
+def save_attendance_to_csv(group_id: str, attendance_list: list, guild_id: int = None) -> None:
     """
     Save the attendance list to a CSV file.
     
     Args:
         group_id :class:`str`: The ID of the tutor group.
         attendance_list :class:`list`: List of students who attended.
+        guild_id :class:`int`: The ID of the guild the attendance was taken in.
     """
+    # Generate filename with current timestamp
+    current_time = datetime.now().strftime("%Y-%m-%d_%H-%M")
     try:
-        # Get the project root directory (parent of the bot directory)
-        project_root = Path(__file__).parent.parent.absolute()
+        # Create the attendance directory of the guild using absolute path
+        attendance_dir = data_file_dir('attendance', guild_id)
         
-        # Create attendance directory using absolute path
-        attendance_dir = project_root / 'data' / 'attendance'
-        attendance_dir.mkdir(exist_ok=True, parents=True)
-        
-        # Generate filename with current timestamp
-        current_time = datetime.now().strftime("%Y-%m-%d_%H-%M")
         filename = f"{group_id}_{current_time}.csv"
         file_path = attendance_dir / filename
         
@@ -128,7 +171,7 @@ def save_attendance_to_csv(group_id: str, attendance_list: list) -> None:
             alternative_dir = Path.cwd() / 'attendance_data'
             alternative_dir.mkdir(exist_ok=True)
             
-            file_path = alternative_dir / f"{group_id}_{current_time}.csv"
+            file_path = alternative_dir / f"{guild_id}_{group_id}_{current_time}.csv"
             logger.info(f"Trying alternative path: {file_path}")
             
             with open(file_path, 'w', newline='', encoding='utf-8') as file:
@@ -142,49 +185,40 @@ def save_attendance_to_csv(group_id: str, attendance_list: list) -> None:
             logger.error(f"Failed to save attendance at alternative location: {ex}")
 
 
-def attendance_cleanup(group_id: str) -> None:
+def attendance_cleanup(group_id: str, guild_id: int) -> None:
     """
     Reset the specified group status and clear the students group list.
 
     Args:
         group_id :class:`str`: The ID of the tutor group.
+        guild_id :class:`int`: The ID of the guild the attendance was taken in.
     """
     try:
-        logger.info(f"Starting attendance cleanup for group {group_id}")
-        
-        # Convert to lowercase for case-insensitive comparison
-        group_id_lower = group_id.lower()
-        
+        logger.info(f"Starting attendance cleanup for group {group_id} in guild {guild_id}")
+        data = bot_data.guild_data(guild_id)
+
         # Find the original case version of the group ID
-        original_group_id = None
-        for group in bot_data.SETTINGS["groups"]:
-            if group.lower() == group_id_lower:
-                original_group_id = group
-                logger.info(f"Found original group ID: {original_group_id}")
-                break
-        
+        original_group_id = data.find_group(group_id)
+
         if original_group_id:
-            # Use the original case for variable access
-            var_name = f"group_{original_group_id}"
-            
-            # Get the group list using getattr
-            group_list = getattr(bot_data, var_name)
+            logger.info(f"Found original group ID: {original_group_id}")
+            group_list = data.groups[original_group_id]
             logger.info(f"Found group list with {len(group_list)} students")
             
             # Save attendance list before clearing
             logger.info(f"Saving attendance list for {original_group_id}")
-            save_attendance_to_csv(original_group_id, group_list)
+            save_attendance_to_csv(original_group_id, group_list, guild_id)
             
             # Clear the list
             group_list.clear()
             logger.info(f"Cleared attendance list for {original_group_id}")
             
             # Reset the status
-            setattr(bot_data, f"{var_name}_status", False)
+            data.group_status[original_group_id] = False
             logger.info(f"Reset status for {original_group_id}")
             
             # Reset the attendance code
-            setattr(bot_data, "ATTENDANCE_CODE", "")
+            data.attendance_code = ""
             logger.info("Reset attendance code")
             
             return True  # Return success
@@ -198,12 +232,13 @@ def attendance_cleanup(group_id: str) -> None:
         return False  # Return failure
 
 
-def prepare_group_list_for_embed(id: str) -> str:
+def prepare_group_list_for_embed(id: str, guild_id: int) -> str:
     """
     Adds a new line character for each student name, so that it will be displayed correctly in the embed.
 
     Args:
         id :class:`str`: The ID of the tutor group.
+        guild_id :class:`int`: The ID of the guild the attendance is taken in.
 
     Raises:
         :class:`RuntimeWarning`: Occurs when the tutor's group ID does not exist.
@@ -211,53 +246,40 @@ def prepare_group_list_for_embed(id: str) -> str:
     Returns:
         :class:`str`: A list of students.
     """
-    # Convert to lowercase for case-insensitive comparison
-    id_lower = id.lower()
-    
+    data = bot_data.guild_data(guild_id)
+
     # Find the original case version of the group ID
-    original_id = None
-    for group in bot_data.SETTINGS["groups"]:
-        if group.lower() == id_lower:
-            original_id = group
-            break
+    original_id = data.find_group(id)
     
     text = ""
     if original_id:
-        var_name = f"group_{original_id}"
-        group_list = getattr(bot_data, var_name)
-        
-        for entry in group_list:
+        for entry in data.groups[original_id]:
             text += entry + "\n"
         return text
     else:
         raise RuntimeWarning(DEFAULT_CASE_WARNING)
 
 
-def update_dm_accept_status(id: str, code: str) -> None:
+def update_dm_accept_status(id: str, code: str, guild_id: int) -> None:
     """
     Set the specified group status to True, so the messages from the students will be accepted by the bot.
 
     Args:
         id :class:`str`: The ID of the tutor group.
+        code :class:`str`: The attendance code the students have to send.
+        guild_id :class:`int`: The ID of the guild the attendance is taken in.
 
     Raises:
         :class:`RuntimeWarning`: Occurs when the tutor's group ID does not exist.
     """
-    # Convert to lowercase for case-insensitive comparison
-    id_lower = id.lower()
-    code = code.lower()
-    
+    data = bot_data.guild_data(guild_id)
+
     # Find the original case version of the group ID
-    original_id = None
-    for group in bot_data.SETTINGS["groups"]:
-        if group.lower() == id_lower:
-            original_id = group
-            break
+    original_id = data.find_group(id)
     
     if original_id:
-        var_name = f"group_{original_id}"
-        setattr(bot_data, f"{var_name}_status", True)
-        setattr(bot_data, "ATTENDANCE_CODE", code)
+        data.group_status[original_id] = True
+        data.attendance_code = code.lower()
     else:
         raise RuntimeWarning(DEFAULT_CASE_WARNING)
 
@@ -267,6 +289,8 @@ def update_dm_accept_status(id: str, code: str) -> None:
 ####################################################################
 
 
+@STORAGE_WRITE_SECONDS.time(kind="survey_csv")
+@tracing.span("storage.write", kind="survey_csv")
 def save_survey_entry_to_csv(path: str, entry: SurveyEntry) -> None:
     """
     Adds the student's answers to the csv file.
@@ -326,20 +350,21 @@ def verify_entry_not_in_csv(path: str, entry: str) -> bool:
         return True
 
 
-async def add_student_to_survey(message: discord.Message, id: str) -> None:
-    """Add a student to the survey list."""
+async def add_student_to_survey(message: discord.Message, id: str, guild_id: int) -> None:
+    """Add a student to the survey list of a guild."""
     try:
         # Get the student's information
         student_info = f"{message.author.name} ({message.author.id})"
         
-        # Get the group from bot_data
-        group = bot_data.SURVEY.get(id, [])
+        # Get the group from the survey registry of the guild
+        survey = bot_data.guild_data(guild_id).survey
+        group = survey.get(id, [])
         
         # Check if the student is already in the list
         if student_info not in group:
             # Add the student to the list
             group.append(student_info)
-            bot_data.SURVEY[id] = group
+            survey[id] = group
             
             # Send confirmation
             try: